@@ -39,6 +39,10 @@ from pathlib import Path
 from urllib.request import urlopen, Request
 from urllib.error import URLError, HTTPError
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "patcher"))
+import fastcopy  # noqa: E402  (shared with the patcher: reflink / hardlink / copy)
+import progress_bus  # noqa: E402  (shared with the patcher: throttled progress, rate, ETA)
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
@@ -94,6 +98,12 @@ def _platform_to_vcpkg_triplet(platform: str) -> str:
     return "x86-windows-static" if platform == "Win32" else "x64-windows-static"
 
 
+# Download / zip progress: a status line on the console (one line every few seconds in a
+# CI log), plus the NDJSON file given by --progress-json.
+PROGRESS = progress_bus.ProgressBus(progress_bus.ConsoleSink())
+_DOWNLOAD_CHUNK = 1024 * 1024
+
+
 def setup_logging() -> None:
     logging.basicConfig(level=logging.INFO, format="%(message)s")
 
@@ -153,8 +163,14 @@ def safe_rmtree(path: Path, retries: int = 8, base_delay_s: float = 0.5) -> None
 def download_file(url: str, dest: Path) -> None:
     req = Request(url, headers={"User-Agent": "CoOptUI-Build/1.0"})
     with urlopen(req, timeout=180) as resp:
-        with open(dest, "wb") as f:
-            shutil.copyfileobj(resp, f)
+        total = int(resp.headers.get("Content-Length") or 0)
+        with open(dest, "wb") as f, PROGRESS.phase(f"Downloading {dest.name}", total, unit="bytes") as phase:
+            while True:
+                chunk = resp.read(_DOWNLOAD_CHUNK)
+                if not chunk:
+                    break
+                f.write(chunk)
+                phase.advance(len(chunk))
 
 
 def _ensure_vcpkg_bootstrapped(vcpkg: Path) -> None:
@@ -608,40 +624,40 @@ def copy_coopt_ui(repo_root: Path, build_root: Path, plugin_dll: Path | None) ->
             dst = build_root / d.replace("/", os.sep)
             if dst.exists():
                 safe_rmtree(dst)
-            shutil.copytree(s, dst)
+            fastcopy.copytree(s, dst)
             if d == "lua/itemui":
                 for x in ITEMUI_EXCLUDE_DIRS:
                     (dst / x).exists() and safe_rmtree(dst / x)
                 (dst / "upvalue_check.lua").exists() and (dst / "upvalue_check.lua").unlink()
     (build_root / "lua" / "mq").mkdir(parents=True, exist_ok=True)
     if (repo_root / "lua" / "mq" / "ItemUtils.lua").is_file():
-        shutil.copy2(repo_root / "lua" / "mq" / "ItemUtils.lua", build_root / "lua" / "mq" / "ItemUtils.lua")
+        fastcopy.copy_file(repo_root / "lua" / "mq" / "ItemUtils.lua", build_root / "lua" / "mq" / "ItemUtils.lua")
     (build_root / "Macros").mkdir(parents=True, exist_ok=True)
     for m in ["sell.mac", "loot.mac"]:
         if (repo_root / "Macros" / m).is_file():
-            shutil.copy2(repo_root / "Macros" / m, build_root / "Macros" / m)
+            fastcopy.copy_file(repo_root / "Macros" / m, build_root / "Macros" / m)
     (build_root / "Macros" / "shared_config").mkdir(parents=True, exist_ok=True)
     for f in (repo_root / "Macros" / "shared_config").glob("*.mac") or []:
-        shutil.copy2(f, build_root / "Macros" / "shared_config" / f.name)
+        fastcopy.copy_file(f, build_root / "Macros" / "shared_config" / f.name)
     if (repo_root / COOPT_CONFIG_TEMPLATES).is_dir():
         ct_dst = build_root / COOPT_CONFIG_TEMPLATES
         if ct_dst.exists():
             safe_rmtree(ct_dst)
-        shutil.copytree(repo_root / COOPT_CONFIG_TEMPLATES, ct_dst)
+        fastcopy.copytree(repo_root / COOPT_CONFIG_TEMPLATES, ct_dst)
     (build_root / "resources" / "UIFiles" / "Default").mkdir(parents=True, exist_ok=True)
     for r in COOPT_RESOURCES:
         s = repo_root / r.replace("/", os.sep)
         if s.is_file():
-            shutil.copy2(s, build_root / "resources" / "UIFiles" / "Default" / Path(r).name)
+            fastcopy.copy_file(s, build_root / "resources" / "UIFiles" / "Default" / Path(r).name)
     for f in COOPT_ROOT_FILES:
         if (repo_root / f).is_file():
-            shutil.copy2(repo_root / f, build_root / f)
+            fastcopy.copy_file(repo_root / f, build_root / f)
     if plugin_dll and plugin_dll.is_file():
         (build_root / "plugins").mkdir(parents=True, exist_ok=True)
         plugin_dst = build_root / COOPT_PLUGIN_DLL.replace("/", os.sep)
         # Avoid copying file onto itself when caller already passed build_root/plugins/MQ2CoOptUI.dll
         if plugin_dll.resolve() != plugin_dst.resolve():
-            shutil.copy2(plugin_dll, plugin_dst)
+            fastcopy.copy_file(plugin_dll, plugin_dst)
 
 
 def deploy_keybind_config(repo_root: Path, build_root: Path) -> None:
@@ -906,8 +922,8 @@ def phase_build_e3_source(
     build_dir = output_dir / "build_E3Source"
     if build_dir.exists():
         safe_rmtree(build_dir)
-    shutil.copytree(prebuilt, build_dir)
-    log_step(f"Base: prebuilt -> {build_dir}")
+    counts = fastcopy.copytree(prebuilt, build_dir)
+    log_step(f"Base: prebuilt -> {build_dir} ({fastcopy.describe(counts)})")
 
     # E3Next from source (with SQLite.Interop + cleanup to match PS1)
     e3_src = paths.get("E3Next")
@@ -1108,7 +1124,8 @@ def phase_build_macroquest_default(
     build_dir = output_dir / "build_MacroQuestDefault"
     if build_dir.exists():
         safe_rmtree(build_dir)
-    shutil.copytree(prebuilt, build_dir)
+    counts = fastcopy.copytree(prebuilt, build_dir)
+    log_step(f"Base: prebuilt -> {build_dir} ({fastcopy.describe(counts)})")
 
     # Replace MQ core from our MacroQuest build (try release and Release for Win32/x64)
     mq_bin = mq_src / "build" / "solution" / "bin" / "release"
@@ -1188,49 +1205,53 @@ def phase_staging_and_zips(
     if staging.exists():
         safe_rmtree(staging)
     staging.mkdir(parents=True)
+    # Staging trees are only zipped and deleted, never edited, so files may be hardlinked
+    # to the repo / build outputs (link=True) where they cannot be reflinked.
 
     for d in COOPT_LUA_DIRS:
         s = repo_root / d.replace("/", os.sep)
         if s.is_dir():
             dst = staging / d.replace("/", os.sep)
-            shutil.copytree(s, dst)
+            fastcopy.copytree(s, dst, link=True)
             if d == "lua/itemui":
                 for x in ITEMUI_EXCLUDE_DIRS:
                     (dst / x).exists() and safe_rmtree(dst / x)
                 (dst / "upvalue_check.lua").exists() and (dst / "upvalue_check.lua").unlink()
     (staging / "lua" / "mq").mkdir(parents=True, exist_ok=True)
     if (repo_root / "lua" / "mq" / "ItemUtils.lua").is_file():
-        shutil.copy2(repo_root / "lua" / "mq" / "ItemUtils.lua", staging / "lua" / "mq" / "ItemUtils.lua")
+        fastcopy.copy_file(repo_root / "lua" / "mq" / "ItemUtils.lua", staging / "lua" / "mq" / "ItemUtils.lua", link=True)
     (staging / "Macros").mkdir(parents=True, exist_ok=True)
     for m in ["sell.mac", "loot.mac"]:
         if (repo_root / "Macros" / m).is_file():
-            shutil.copy2(repo_root / "Macros" / m, staging / "Macros" / m)
+            fastcopy.copy_file(repo_root / "Macros" / m, staging / "Macros" / m, link=True)
     (staging / "Macros" / "shared_config").mkdir(parents=True, exist_ok=True)
     for f in (repo_root / "Macros" / "shared_config").glob("*.mac") or []:
-        shutil.copy2(f, staging / "Macros" / "shared_config" / f.name)
+        fastcopy.copy_file(f, staging / "Macros" / "shared_config" / f.name, link=True)
     if (repo_root / COOPT_CONFIG_TEMPLATES).is_dir():
-        shutil.copytree(repo_root / COOPT_CONFIG_TEMPLATES, staging / COOPT_CONFIG_TEMPLATES)
+        fastcopy.copytree(repo_root / COOPT_CONFIG_TEMPLATES, staging / COOPT_CONFIG_TEMPLATES, link=True)
     (staging / "resources" / "UIFiles" / "Default").mkdir(parents=True, exist_ok=True)
     for r in COOPT_RESOURCES:
         s = repo_root / r.replace("/", os.sep)
         if s.is_file():
-            shutil.copy2(s, staging / "resources" / "UIFiles" / "Default" / Path(r).name)
+            fastcopy.copy_file(s, staging / "resources" / "UIFiles" / "Default" / Path(r).name, link=True)
     for f in COOPT_ROOT_FILES:
         if (repo_root / f).is_file():
-            shutil.copy2(repo_root / f, staging / f)
+            fastcopy.copy_file(repo_root / f, staging / f, link=True)
     if patcher_exe:
-        shutil.copy2(patcher_exe, staging / "CoOptUIPatcher.exe")
+        fastcopy.copy_file(patcher_exe, staging / "CoOptUIPatcher.exe", link=True)
 
     created = []
 
     def _zip_dir(src: Path, zip_path: Path, name: str):
         if zip_path.exists():
             zip_path.unlink()
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-            for root, _, files in os.walk(src):
-                for f in files:
-                    p = Path(root) / f
-                    zf.write(p, p.relative_to(src))
+        paths = [Path(root) / f for root, _, files in os.walk(src) for f in files]
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf, \
+                PROGRESS.phase(f"Zipping {zip_path.name}", len(paths)) as phase:
+            for p in paths:
+                rel = p.relative_to(src)
+                zf.write(p, rel)
+                phase.advance(item=rel.as_posix())
         log_step(f"{name}: {zip_path}")
         created.append(zip_path)
 
@@ -1246,11 +1267,12 @@ def phase_staging_and_zips(
     staging_plugin = output_dir / "dist_staging_plugin"
     if staging_plugin.exists():
         safe_rmtree(staging_plugin)
-    shutil.copytree(staging, staging_plugin)
+    counts = fastcopy.copytree(staging, staging_plugin, link=True)
+    log_step(f"Staging -> {staging_plugin.name} ({fastcopy.describe(counts)})")
     plugin_src = (build_e3 or build_mq or Path()) / "plugins" / "MQ2CoOptUI.dll"
     if plugin_src.exists():
         (staging_plugin / "plugins").mkdir(parents=True, exist_ok=True)
-        shutil.copy2(plugin_src, staging_plugin / "plugins" / "MQ2CoOptUI.dll")
+        fastcopy.copy_file(plugin_src, staging_plugin / "plugins" / "MQ2CoOptUI.dll", link=True)
     _zip_dir(staging_plugin, output_dir / f"CoOptUI-Patcher-Plugin_v{version}.zip", "CoOptUI + Patcher + Plugin")
     safe_rmtree(staging_plugin)
 
@@ -1358,7 +1380,11 @@ def main() -> int:
     parser.add_argument("--skip-e3-build", action="store_true", help="Skip E3 Source build")
     parser.add_argument("--skip-mq-build", action="store_true", help="Skip MacroQuest Default build")
     parser.add_argument("--verify-only", action="store_true", help="Run final verification only (no build)")
+    parser.add_argument("--progress-json", type=Path, help="Also write download / zip progress events to this NDJSON file")
     args = parser.parse_args()
+    progress_log = progress_bus.JsonLogSink(str(args.progress_json)) if args.progress_json else None
+    if progress_log:
+        PROGRESS.add_sink(progress_log)
 
     output_dir = args.output.resolve()
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -1422,6 +1448,9 @@ def main() -> int:
     except Exception as e:
         log_err(str(e))
         raise
+    finally:
+        if progress_log:
+            progress_log.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+"""`python -m patcher` (from the repository root): the headless command line, cli.py."""
+
+import os
+import sys
+
+# The patcher's modules import each other flat (they are not a package).
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main  # noqa: E402
+
+sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Batch mode: check, patch and verify every known MacroQuest install in one pass.
+
+Households running several clients keep one MQ root per client, and updating them meant
+one GUI session per root, each fetching the manifest and downloading the same files
+again. update_all() instead:
+
+  1. fetches the release and default-config manifests once;
+  2. plans every root concurrently (preflight, hash comparison);
+  3. downloads each distinct file once into the shared object store (object_store.py,
+     updater.stage_objects), without touching any install yet;
+  4. patches every root concurrently, each in one snapshot group (transaction.group):
+     every file now comes from the store, so the pass costs one download per file
+     however many roots there are, and "Revert" undoes a root's whole update.
+
+The result is one row per root for the GUI's status table. Nothing here touches Tk.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from installer import preflight_blockers
+from jobs import CancelToken, raise_if_cancelled
+from migrate_itemui_to_coopui import ensure_env_after_patch
+from object_store import ObjectStore
+from transaction import group as transaction_group
+from updater import (
+    compare_release,
+    fetch_default_config_manifest,
+    fetch_release_manifest,
+    install_default_config,
+    missing_default_config,
+    patch,
+    stage_objects,
+    write_installed_version,
+)
+from validator import validate_mq_root
+
+# Roots planned / patched at once. Each patch() already runs its own download workers,
+# so this mostly overlaps one root's hashing and disk writes with another's.
+DEFAULT_ROOT_WORKERS = 4
+
+STATUS_UP_TO_DATE = "Up to date"
+STATUS_UPDATED = "Updated"
+STATUS_BLOCKED = "Blocked"
+STATUS_FAILED = "Failed"
+
+# progress_callback(root, message) — called from worker threads.
+BatchProgressCb = Callable[[str, str], None] | None
+
+
+def known_installs(config: dict) -> list[str]:
+    """
+    Every valid MQ root the patcher knows about: config's recent_paths first, then
+    auto-detected installs. Deduplicated (case-insensitively on Windows); folders that
+    are not MacroQuest roots, or not yet set up (no lua/ or Macros/), are left out.
+    """
+    from path_finder import find_mq_installations
+    candidates = list(config.get("recent_paths") or []) + find_mq_installations()
+    roots = []
+    seen = set()
+    for path in candidates:
+        if not isinstance(path, str) or not path:
+            continue
+        key = os.path.normcase(os.path.abspath(path))
+        if key in seen:
+            continue
+        seen.add(key)
+        is_valid, needs_setup, _msg = validate_mq_root(path)
+        if is_valid and not needs_setup:
+            roots.append(os.path.normpath(path))
+    return roots
+
+
+def _row(root: str) -> dict:
+    return {"root": root, "status": STATUS_UP_TO_DATE, "files": 0, "defaults": 0, "message": ""}
+
+
+def update_all(
+    roots: list[str],
+    repo_base_url: str,
+    manifest_path: str = "release_manifest.json",
+    default_config_manifest_path: str = "default_config_manifest.json",
+    progress_callback: BatchProgressCb = None,
+    root_workers: int = DEFAULT_ROOT_WORKERS,
+    cancel: CancelToken | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    Update every root in `roots` (see module docstring).
+
+    cancel (jobs.CancelToken) stops every root at its next check and raises Cancelled;
+    roots already updated stay updated, the others are left as they were.
+
+    Returns (rows, error_message). error_message is set only when nothing could be done
+    (the release manifest could not be fetched). Each row is
+    {"root", "status", "files", "defaults", "message"}: status is one of STATUS_*,
+    files / defaults count what the root needed.
+    """
+    unique: dict[str, str] = {}
+    for root in roots:
+        unique.setdefault(os.path.normcase(os.path.abspath(root)), root)
+    roots = list(unique.values())
+    if not roots:
+        return [], "No MacroQuest installs to update."
+
+    def report(root: str, message: str) -> None:
+        if progress_callback:
+            progress_callback(root, message)
+
+    release, err = fetch_release_manifest(repo_base_url, manifest_path)
+    if err:
+        return [], err
+    default_files, default_err = fetch_default_config_manifest(
+        repo_base_url, default_config_manifest_path,
+    )
+    if default_err:
+        default_files = []
+
+    rows = {root: _row(root) for root in roots}
+    plans: dict[str, tuple[list, list]] = {}
+    workers = max(1, min(root_workers, len(roots)))
+
+    # 1. plan every root
+    def plan(root: str) -> None:
+        raise_if_cancelled(cancel)
+        report(root, "Checking...")
+        to_update = compare_release(release, root)
+        blocker = preflight_blockers(root, [e["path"] for e in to_update])
+        if blocker:
+            rows[root].update(status=STATUS_BLOCKED, message=blocker)
+            report(root, blocker)
+            return
+        defaults = missing_default_config(default_files, root)
+        rows[root].update(files=len(to_update), defaults=len(defaults))
+        plans[root] = (to_update, defaults)
+        report(root, f"{len(to_update)} file(s) to update" if to_update else STATUS_UP_TO_DATE)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coopui-batch") as pool:
+        list(pool.map(_guarded(plan, rows), roots))
+
+    # 2. each distinct file is staged once in the object store, by the first root that
+    #    needs it (its installed copy may serve as a delta base). With the store
+    #    disabled, every root downloads what it needs in step 3.
+    first: dict[str, list] = {}
+    claimed = set()
+    for root in roots:
+        to_update, defaults = plans.get(root, ([], []))
+        for entry in to_update + defaults:
+            key = (entry.get("hash") or "").strip().lower()
+            if key and key not in claimed:
+                claimed.add(key)
+                first.setdefault(root, []).append(entry)
+
+    failed = set()
+
+    def stage_first(root: str) -> None:
+        report(root, f"Downloading {len(first[root])} file(s)...")
+        ok, message, _downloaded = stage_objects(first[root], repo_base_url, root, cancel=cancel)
+        if not ok:
+            failed.add(root)
+            rows[root].update(status=STATUS_FAILED, message=message)
+            report(root, message)
+
+    raise_if_cancelled(cancel)
+    if first and ObjectStore.default() is not None:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coopui-batch") as pool:
+            list(pool.map(_guarded(stage_first, rows, failed), list(first)))
+
+    # 3. one update per root, from the store. patch() and the default-config install
+    #    share a snapshot group; the group is opened here, on the worker thread, because
+    #    context variables do not follow work into a thread pool.
+    def finish(root: str) -> None:
+        to_update, defaults = plans[root]
+        if not to_update and not defaults:
+            return
+        message = "Update complete."
+        with transaction_group():
+            if to_update:
+                ok, message, _skipped = patch(
+                    to_update, repo_base_url, root,
+                    progress_callback=lambda c, t, p: report(root, f"Installing {c}/{t}: {p}"),
+                    cancel=cancel,
+                )
+                if not ok:
+                    rows[root].update(status=STATUS_FAILED, message=message)
+                    report(root, message)
+                    return
+            if defaults:
+                ok, dmsg = install_default_config(defaults, repo_base_url, root, cancel=cancel)
+                if not ok:
+                    rows[root].update(status=STATUS_FAILED, message=dmsg)
+                    report(root, dmsg)
+                    return
+        ensure_env_after_patch(root)
+        if release["version"]:
+            write_installed_version(root, release["version"])
+        rows[root].update(status=STATUS_UPDATED, message=message)
+        report(root, STATUS_UPDATED)
+
+    raise_if_cancelled(cancel)
+    todo = [r for r in roots if r in plans and r not in failed]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coopui-batch") as pool:
+        list(pool.map(_guarded(finish, rows), todo))
+
+    if default_err:
+        note = f"Note: {default_err} Skipped default config."
+        for row in rows.values():
+            if row["status"] in (STATUS_UP_TO_DATE, STATUS_UPDATED):
+                row["message"] = f"{row['message']} {note}".strip()
+    return [rows[r] for r in roots], None
+
+
+def _guarded(fn: Callable[[str], None], rows: dict, failed: set | None = None) -> Callable[[str], None]:
+    """Run fn(root) so an unexpected exception fails that root's row instead of the batch."""
+    def run(root: str) -> None:
+        try:
+            fn(root)
+        except Exception as e:
+            if failed is not None:
+                failed.add(root)
+            rows[root].update(status=STATUS_FAILED, message=f"Unexpected error: {e}")
+    return run
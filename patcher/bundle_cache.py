@@ -0,0 +1,177 @@
+"""
+Persistent cache of downloaded install bundles (the CoOpt EMU zip, the stock base zipball).
+
+Full Install / Repair used to download the ~1GB bundle into a temp file and delete it
+afterwards, so a failed repair, a retry after preflight_blockers() fired, or repairing a
+second install each downloaded it again. Bundles are now kept in bundle_cache/ next to
+the exe (like object_store/), keyed by what identifies their content:
+
+  release assets   "release:<tag>/<asset name>"  — a published asset never changes
+  the zipball      "etag:<ETag>"                 — the branch moves; its ETag says when
+
+A hit is only served after a central-directory check (the zip opens and every member
+lies inside the file), which catches truncated or foreign files without reading the
+body. Least-recently-used bundles are evicted above "bundle_cache_max_mb".
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+import zipfile
+
+import config
+
+CACHE_DIRNAME = "bundle_cache"
+INDEX_NAME = "index.json"
+# Two EMU bundles plus the base zipball, roughly.
+DEFAULT_MAX_MB = 3072
+
+
+def release_asset_key(url: str) -> str | None:
+    """Cache key for a GitHub release-asset URL (.../releases/download/<tag>/<name>),
+    or None if url is not one."""
+    parts = urllib.parse.urlsplit(url).path.split("/")
+    try:
+        i = parts.index("download")
+    except ValueError:
+        return None
+    if i < 1 or parts[i - 1] != "releases" or len(parts) != i + 3:
+        return None
+    tag, name = (urllib.parse.unquote(p) for p in parts[i + 1:i + 3])
+    return f"release:{tag}/{name}" if tag and name else None
+
+
+def etag_key(etag: str | None) -> str | None:
+    """Cache key for a download identified only by its (strong or weak) ETag."""
+    return f"etag:{etag.strip()}" if etag and etag.strip() else None
+
+
+def zip_intact(path: str) -> bool:
+    """
+    Central-directory integrity check: the zip opens, and every member's local header
+    and compressed data fall inside the file. Reads the directory only, never the body.
+    """
+    try:
+        size = os.path.getsize(path)
+        with zipfile.ZipFile(path) as zf:
+            infos = zf.infolist()
+    except (OSError, zipfile.BadZipFile, ValueError):
+        return False
+    if not infos:
+        return False
+    for info in infos:
+        # 30-byte local header + name + extra precede the data; the local extra field
+        # may differ from the central one, so only the fixed part is assumed.
+        if info.header_offset + 30 + len(info.filename) + info.compress_size > size:
+            return False
+    return True
+
+
+class BundleCache:
+    """
+    <cache>/<sha256(key)[:16]>.zip plus index.json {key: {"file", "last_used"}}.
+    Thread-safe within one process.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "BundleCache | None":
+        """The cache configured in patcher_config.json, or None if disabled
+        (bundle_cache_max_mb = 0)."""
+        try:
+            max_mb = int(config.load().get("bundle_cache_max_mb", DEFAULT_MAX_MB))
+        except (TypeError, ValueError):
+            max_mb = DEFAULT_MAX_MB
+        if max_mb <= 0:
+            return None
+        return cls(config.data_path(CACHE_DIRNAME), max_mb * 1024 * 1024)
+
+    def path_for(self, key: str) -> str:
+        """Where the bundle for key lives (and is downloaded to, resumably)."""
+        return os.path.join(self.path, hashlib.sha256(key.encode("utf-8")).hexdigest()[:16] + ".zip")
+
+    def _load(self) -> dict:
+        try:
+            with open(os.path.join(self.path, INDEX_NAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self, index: dict) -> None:
+        path = os.path.join(self.path, INDEX_NAME)
+        tmp = path + ".tmp"
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=1)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def lookup(self, key: str | None) -> str | None:
+        """Path of an intact cached bundle for key (marking it used), else None. A
+        cached file that fails the integrity check is deleted."""
+        if not key:
+            return None
+        path = self.path_for(key)
+        if not os.path.isfile(path):
+            return None
+        if not zip_intact(path):
+            self.discard(key)
+            return None
+        self._touch(key)
+        return path
+
+    def commit(self, key: str) -> None:
+        """Record the bundle just downloaded to path_for(key), then evict down to the cap
+        (never the bundle just committed)."""
+        self._touch(key)
+        self.evict(keep=key)
+
+    def discard(self, key: str) -> None:
+        try:
+            os.remove(self.path_for(key))
+        except OSError:
+            pass
+        with self._lock:
+            index = self._load()
+            if index.pop(key, None) is not None:
+                self._save(index)
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            index = self._load()
+            index[key] = {"file": os.path.basename(self.path_for(key)), "last_used": time.time()}
+            self._save(index)
+
+    def evict(self, keep: str | None = None) -> int:
+        """Delete least-recently-used bundles until the cache fits max_bytes. Returns the
+        number of bytes freed."""
+        with self._lock:
+            index = self._load()
+        entries = []
+        for key, meta in index.items():
+            try:
+                size = os.path.getsize(self.path_for(key))
+            except OSError:
+                size = 0
+            last_used = meta.get("last_used", 0) if isinstance(meta, dict) else 0
+            entries.append((last_used, key, size))
+        total = sum(size for _t, _k, size in entries)
+        freed = 0
+        for _t, key, size in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.discard(key)
+            freed += size
+        return freed
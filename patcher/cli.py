@@ -0,0 +1,337 @@
+"""
+Headless command line for the patcher — what the GUI does, scriptable across a fleet of
+installs or from a scheduled task:
+
+  python -m patcher check  [MQ root]   compare the install with the release manifest
+  python -m patcher patch  [MQ root]   update changed files + missing default config
+  python -m patcher verify [MQ root]   re-hash every manifest file, check critical files
+  python -m patcher repair [MQ root]   Full Install / Repair (installer.smart_install)
+  python -m patcher plan   [MQ root]   dry run of Full Install / Repair
+  python -m patcher watch  [MQ root]   stay running: stage updates, apply when MQ exits
+
+(run from the repository root, or `python cli.py ...` from patcher/). The MQ root
+defaults to the one the GUI last used (`watch` without one watches every known install).
+Output is a short text summary; --json prints one JSON object with the result, --ndjson
+streams progress events one JSON object per line and ends with a "result" event. The
+exit status is one of EXIT_*.
+
+Nothing here imports tkinter / customtkinter, and each command imports only the modules
+it drives, so `check` on a warm hash cache costs little more than the conditional
+manifest request and can run at every client launch.
+"""
+
+import json
+import os
+import sys
+import time
+
+import config
+
+EXIT_OK = 0          # done, up to date, verified, plan ready
+EXIT_FAILED = 1      # the command could not complete (network, write, bad bundle)
+EXIT_USAGE = 2       # bad arguments or not a MacroQuest folder (argparse uses 2 too)
+EXIT_BLOCKED = 3     # MacroQuest is running or files are locked (preflight_blockers)
+EXIT_MISMATCH = 4    # verify: files missing or different from the manifest
+EXIT_UPDATES = 10    # check: updates are available
+
+
+class _Output:
+    """Where progress and the result go: text (progress on stderr), json or ndjson."""
+
+    def __init__(self, command: str, mode: str, quiet: bool = False):
+        self.command = command
+        self.mode = mode
+        self.quiet = quiet
+        self.start = time.monotonic()
+
+    def _line(self, obj: dict) -> None:
+        sys.stdout.write(json.dumps(obj) + "\n")
+        sys.stdout.flush()
+
+    def event(self, kind: str, **fields) -> None:
+        if self.mode == "ndjson":
+            self._line({"event": kind, "t": round(time.monotonic() - self.start, 3), **fields})
+        elif self.mode == "text" and not self.quiet:
+            if "current" in fields:
+                text = f"  {fields['current']}/{fields['total']}: {fields['path']}"
+            elif "fraction" in fields:
+                text = f"  {fields['fraction'] * 100:3.0f}%  {fields['message']}"
+            else:
+                text = fields.get("message", kind)
+            print(text, file=sys.stderr, flush=True)
+
+    def result(self, code: int, message: str, lines=(), **fields) -> int:
+        fields = {"command": self.command, "ok": code in (EXIT_OK, EXIT_UPDATES), "exit": code,
+                  "message": message, **fields}
+        if self.mode == "ndjson":
+            self._line({"event": "result", "t": round(time.monotonic() - self.start, 3), **fields})
+        elif self.mode == "json":
+            print(json.dumps(fields, indent=1))
+        else:
+            for line in lines:
+                print(f"  {line}")
+            print(message)
+        return code
+
+
+def _resolve_root(arg: str | None, create_dirs: bool) -> tuple[str | None, str | None]:
+    """(MQ root, None) or (None, error). Falls back to the GUI's last folder; write
+    commands create lua/ and Macros/ like the GUI's setup does."""
+    from validator import ensure_directories, validate_mq_root
+    root = arg or config.load().get("mq_root") or ""
+    if not root:
+        return None, "No MacroQuest folder given and none saved by the patcher."
+    root = os.path.abspath(root)
+    is_valid, needs_setup, msg = validate_mq_root(root)
+    if not is_valid:
+        return None, f"{root}: {msg}"
+    if needs_setup and create_dirs:
+        ok, err = ensure_directories(root)
+        if not ok:
+            return None, err
+    return root, None
+
+
+def _recover(root: str, out: _Output) -> bool:
+    """Settle an interrupted transaction first, like the GUI at start. False while one
+    is still pending (files in use)."""
+    from transaction import pending, recover
+    note = recover(root)
+    if note:
+        out.event("note", message=note)
+    return not pending(root)
+
+
+def _check_release(args, root: str, out: _Output):
+    """(release, to_update, defaults, error) — what check and patch both need."""
+    from updater import check_for_default_config, compare_release, fetch_release_manifest
+    release, err = fetch_release_manifest(args.repo, config.MANIFEST_PATH)
+    if err:
+        return None, [], [], err
+    to_update = compare_release(release, root, rehash=args.rehash)
+    defaults, default_err = check_for_default_config(args.repo, root, config.DEFAULT_CONFIG_MANIFEST_PATH)
+    if default_err:
+        # Optional, as in the GUI: never blocks the update.
+        out.event("note", message=f"Note: {default_err} Skipping default config this run.")
+        defaults = []
+    return release, to_update, defaults, None
+
+
+def cmd_check(args, root: str, out: _Output) -> int:
+    from updater import get_installed_version
+    release, to_update, defaults, err = _check_release(args, root, out)
+    if err:
+        return out.result(EXIT_FAILED, err, root=root)
+    paths = [e.get("path") for e in to_update]
+    installed = [e["installPath"] for e in defaults]
+    if not paths and not installed:
+        return out.result(EXIT_OK, "Up to date.", root=root, installed=get_installed_version(root),
+                          available=release["version"], update=[], defaults=[])
+    return out.result(
+        EXIT_UPDATES, f"{len(paths)} file(s) to update, {len(installed)} default config file(s) to add.",
+        lines=paths + installed, root=root, installed=get_installed_version(root),
+        available=release["version"], update=paths, defaults=installed,
+    )
+
+
+def cmd_patch(args, root: str, out: _Output) -> int:
+    from installer import preflight_blockers
+    from migrate_itemui_to_coopui import ensure_env_after_patch
+    from transaction import group as transaction_group
+    from updater import install_default_config, patch, write_installed_version
+    if not _recover(root, out):
+        return out.result(EXIT_BLOCKED, "An interrupted update is still pending; files are in use.", root=root)
+    release, to_update, defaults, err = _check_release(args, root, out)
+    if err:
+        return out.result(EXIT_FAILED, err, root=root)
+    if not to_update and not defaults:
+        return out.result(EXIT_OK, "Up to date.", root=root, updated=[], skipped=[])
+    blocker = preflight_blockers(root, [e["path"] for e in to_update])
+    if blocker:
+        return out.result(EXIT_BLOCKED, blocker, root=root)
+
+    total = len(to_update) + len(defaults)
+    done = 0
+
+    def progress(current: int, _total: int, path: str) -> None:
+        if path and path != "Done":
+            out.event("progress", current=done + current, total=total, path=path)
+
+    skipped: list = []
+    message = "Update complete."
+    # One snapshot group, so one revert undoes the update and the default config together.
+    with transaction_group():
+        if to_update:
+            ok, message, skipped = patch(to_update, args.repo, root, progress_callback=progress)
+            if not ok:
+                return out.result(EXIT_FAILED, message, root=root)
+            done = len(to_update)
+        if defaults:
+            ok, message = install_default_config(defaults, args.repo, root, progress_callback=progress)
+            if not ok:
+                return out.result(EXIT_FAILED, message, root=root)
+    ensure_env_after_patch(root)
+    if release["version"]:
+        write_installed_version(root, release["version"])
+    return out.result(EXIT_OK, message, root=root, version=release["version"],
+                      updated=[e["path"] for e in to_update if e["path"] not in skipped],
+                      defaults=[e["installPath"] for e in defaults], skipped=skipped)
+
+
+def cmd_verify(args, root: str, out: _Output) -> int:
+    from installer import verify_install
+    from updater import compare_release, fetch_release_manifest
+    release, err = fetch_release_manifest(args.repo, config.MANIFEST_PATH)
+    if err:
+        return out.result(EXIT_FAILED, err, root=root)
+    out.event("note", message=f"Hashing {len(release['files'])} file(s)...")
+    modified = [e.get("path") for e in compare_release(release, root, rehash=True)]
+    missing = verify_install(root)
+    if modified or missing:
+        return out.result(
+            EXIT_MISMATCH,
+            f"{len(modified)} file(s) differ from the manifest, {len(missing)} critical file(s) missing.",
+            lines=modified + [f"missing: {rel}" for rel in missing], root=root,
+            modified=modified, missing=missing,
+        )
+    return out.result(EXIT_OK, f"All {len(release['files'])} file(s) verified.", root=root,
+                      modified=[], missing=[])
+
+
+def cmd_repair(args, root: str, out: _Output) -> int:
+    import http.client
+    import urllib.error
+    import zipfile
+    from fresh_install import get_latest_release_zip_url
+    from installer import plan_overlay, plan_write_paths, preflight_blockers, smart_install
+    from migrate_itemui_to_coopui import ensure_env_after_patch
+    from preserve_rules import refresh as refresh_preserve_rules
+    if not _recover(root, out):
+        return out.result(EXIT_BLOCKED, "An interrupted update is still pending; files are in use.", root=root)
+    refresh_preserve_rules(args.repo)
+    # Plan first, as the GUI's preview does: the preflight then scans every binary the
+    # bundle will write, and smart_install() executes this plan instead of re-planning.
+    plan = None
+    url, _ver, err = get_latest_release_zip_url()
+    if not err and url:
+        try:
+            plan = plan_overlay(url, root)
+        except (zipfile.BadZipFile, http.client.HTTPException, urllib.error.URLError, OSError) as e:
+            err = str(e)
+    if plan is None:
+        # As in the GUI: the install can still run (and may fall back to the base bundle).
+        out.event("note", message=f"Note: could not plan the install ({err or 'unknown error'}).")
+    blocker = preflight_blockers(root, plan_write_paths(plan) if plan else None)
+    if blocker:
+        return out.result(EXIT_BLOCKED, blocker, root=root)
+    ok, message = smart_install(
+        root, args.repo, lambda msg, frac: out.event("progress", fraction=round(frac, 4), message=msg),
+        plan=plan,
+    )
+    if not ok:
+        return out.result(EXIT_FAILED, message, root=root)
+    ensure_env_after_patch(root)
+    return out.result(EXIT_OK, message, root=root)
+
+
+def cmd_plan(args, root: str, out: _Output) -> int:
+    import http.client
+    import urllib.error
+    import zipfile
+    from fresh_install import get_latest_release_zip_url
+    from installer import format_plan, plan_overlay
+    from preserve_rules import refresh as refresh_preserve_rules
+    refresh_preserve_rules(args.repo)
+    source = args.bundle
+    if source == "latest":
+        source, _ver, err = get_latest_release_zip_url()
+        if err or not source:
+            return out.result(EXIT_FAILED, f"Could not find the latest release: {err}", root=root)
+    try:
+        plan = plan_overlay(source, root)
+    except (zipfile.BadZipFile, http.client.HTTPException, urllib.error.URLError, OSError) as e:
+        return out.result(EXIT_FAILED, f"Could not plan the install: {e}", root=root)
+    if not args.files:
+        plan = {k: v for k, v in plan.items() if k != "files"}
+    lines = [f"{f['action']:<9} {f['size']:>12}  {f['rel']}" for f in plan.get("files", [])]
+    return out.result(EXIT_BLOCKED if plan["locked"] else EXIT_OK, format_plan(plan), lines=lines,
+                      root=root, plan=plan)
+
+
+def cmd_watch(args, root: str | None, out: _Output) -> int:
+    from jobs import CancelToken
+    from watcher import Watcher, describe_event
+
+    def on_event(kind: str, **fields) -> None:
+        if out.mode == "text":
+            out.event(kind, message=describe_event(kind, **fields))
+        else:
+            out.event(kind, **fields)
+
+    watcher = Watcher(args.repo, roots=[root] if root else None, interval=args.interval * 60,
+                      poll=args.poll, on_event=on_event)
+    cancel = CancelToken()
+    try:
+        watcher.run(cancel, once=args.once)
+    except KeyboardInterrupt:
+        cancel.cancel()
+    if args.once and watcher.pending:
+        return out.result(EXIT_BLOCKED, f"{len(watcher.pending)} install(s) staged; MacroQuest is still running.",
+                          pending=sorted(watcher.pending))
+    return out.result(EXIT_OK, "Check complete." if args.once else "Watcher stopped.",
+                      pending=sorted(watcher.pending))
+
+
+COMMANDS = {"check": cmd_check, "patch": cmd_patch, "verify": cmd_verify, "repair": cmd_repair, "plan": cmd_plan,
+            "watch": cmd_watch}
+_WRITES = ("patch", "repair")
+
+
+def main(argv: list | None = None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m patcher", description="CoOpt UI patcher (headless).")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("root", nargs="?", help="MacroQuest folder (default: the patcher's saved folder)")
+    common.add_argument("--repo", default=config.REPO_BASE_URL, help="raw base URL the manifests come from")
+    output = common.add_mutually_exclusive_group()
+    output.add_argument("--json", dest="mode", action="store_const", const="json", help="print one JSON result object")
+    output.add_argument("--ndjson", dest="mode", action="store_const", const="ndjson",
+                        help="stream JSON progress events, one per line, ending with the result")
+    common.add_argument("-q", "--quiet", action="store_true", help="text mode: no progress lines")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("check", "compare with the release manifest (exit 10 when updates exist)"),
+                            ("patch", "download and apply updates"),
+                            ("verify", "re-hash every manifest file (exit 4 on differences)"),
+                            ("repair", "Full Install / Repair from the latest bundle"),
+                            ("plan", "dry run of Full Install / Repair (exit 3 when files are locked)"),
+                            ("watch", "keep checking; stage updates and apply them when MacroQuest exits")):
+        p = sub.add_parser(name, parents=[common], help=help_text)
+        if name in ("check", "patch"):
+            p.add_argument("--rehash", action="store_true", help="ignore the hash index and hash every file")
+        if name == "plan":
+            p.add_argument("--bundle", default="latest", help="bundle zip path or URL (default: latest release)")
+            p.add_argument("--files", action="store_true", help="include every file and its action")
+        if name == "watch":
+            p.add_argument("--interval", type=float, default=30.0, help="minutes between manifest checks (default 30)")
+            p.add_argument("--poll", type=float, default=15.0,
+                           help="seconds between checks for MacroQuest exiting while an update is staged (default 15)")
+            p.add_argument("--once", action="store_true",
+                           help="one check and apply attempt, then exit (3 while an update stays staged)")
+    args = parser.parse_args(argv)
+
+    out = _Output(args.command, args.mode or "text", args.quiet)
+    if args.command == "watch" and not args.root:
+        root = None  # every known install (batch.known_installs)
+    else:
+        root, err = _resolve_root(args.root, create_dirs=args.command in _WRITES)
+        if err:
+            return out.result(EXIT_USAGE, err)
+    try:
+        return COMMANDS[args.command](args, root, out)
+    except Exception as e:
+        # Same contract as the GUI's worker threads: report, never a bare traceback.
+        return out.result(EXIT_FAILED, f"{args.command} failed unexpectedly: {e}", root=root)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
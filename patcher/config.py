@@ -8,15 +8,39 @@ import sys
 
 CONFIG_FILENAME = "patcher_config.json"
 
+# Where updates come from (the GUI and the command line, cli.py).
+REPO_BASE_URL = "https://raw.githubusercontent.com/CooptGaming/CooptUI/master"
+MANIFEST_PATH = "release_manifest.json"
+DEFAULT_CONFIG_MANIFEST_PATH = "default_config_manifest.json"
+
 # Default config values
 DEFAULTS = {
     "mq_root": "",
     "recent_paths": [],
+    # Shared object store (object_store.py): size cap in MB (0 disables it), and whether
+    # to hardlink objects into installs instead of copying them.
+    "object_store_max_mb": 512,
+    "object_store_hardlinks": False,
+    # Downloaded install bundles kept for Full Install / Repair (bundle_cache.py), in MB.
+    "bundle_cache_max_mb": 3072,
+    # Full Install / Repair writer threads (installer.overlay_bundle); 0 = automatic,
+    # 1 = serial.
+    "overlay_workers": 0,
+    # Rollback snapshots under <MQ root>/.coopui/snapshots (transaction.py): total size
+    # cap in MB and maximum age in days. The newest snapshot is kept unless it alone is
+    # over the cap; then none is kept and Revert is unavailable until the next update.
+    "snapshot_max_mb": 512,
+    "snapshot_max_age_days": 30,
 }
 
 
 def _config_path() -> str:
     """Return path to patcher_config.json next to the exe/script."""
+    return data_path(CONFIG_FILENAME)
+
+
+def data_path(filename: str) -> str:
+    """Return path to a patcher data file (config, caches) next to the exe/script."""
     try:
         if hasattr(sys, "_MEIPASS"):
             # PyInstaller one-file: sys.executable is the real exe path
@@ -26,7 +50,7 @@ def _config_path() -> str:
             base = os.path.dirname(os.path.abspath(__file__))
     except Exception:
         base = os.path.abspath(".")
-    return os.path.join(base, CONFIG_FILENAME)
+    return os.path.join(base, filename)
 
 
 def load() -> dict:
@@ -0,0 +1,148 @@
+"""
+Binary delta patches (COPY/ADD instruction stream, VCDIFF-style) for large release assets.
+
+A new MQ2CoOptUI.dll usually shares most of its bytes with the previous build, so the
+release can ship small deltas against the last few released DLLs next to the full asset.
+generate_manifest.py builds them (--delta-base); updater.patch() applies one when the
+installed file's hash matches a delta's base, verifies the result against the manifest
+hash, and falls back to the full download on any failure.
+
+Format: MAGIC, then zlib-compressed
+    varint target_size
+    instructions until the end:
+        0x01 varint offset varint length   COPY  length bytes from the base at offset
+        0x02 varint length <bytes>         ADD   literal bytes
+"""
+
+import zlib
+
+MAGIC = b"CODELTA1"
+
+_OP_COPY = 0x01
+_OP_ADD = 0x02
+
+# Match granularity. Every BLOCK-aligned block of the base is indexed; the target is
+# scanned at every offset, so matches are found wherever code moved to.
+_BLOCK = 32
+# Matches shorter than this cost more to encode than the literal bytes they replace.
+_MIN_COPY = _BLOCK
+
+
+class DeltaError(ValueError):
+    """The delta is malformed or does not belong to the given base."""
+
+
+def _put_varint(out: bytearray, n: int) -> None:
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return
+
+
+def _get_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    n = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise DeltaError("truncated delta")
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, pos
+        shift += 7
+
+
+def _forward_match(a: bytes, ai: int, b: bytes, bi: int) -> int:
+    """Length of the common run a[ai:] / b[bi:], compared in slices for speed."""
+    n = 0
+    limit = min(len(a) - ai, len(b) - bi)
+    step = 4096
+    while n < limit:
+        m = min(step, limit - n)
+        if a[ai + n:ai + n + m] == b[bi + n:bi + n + m]:
+            n += m
+            continue
+        if m <= 8:
+            while n < limit and a[ai + n] == b[bi + n]:
+                n += 1
+            return n
+        step = max(8, m // 8)
+    return n
+
+
+def make_delta(base: bytes, target: bytes) -> bytes:
+    """Encode `target` as a delta against `base`."""
+    index: dict[bytes, int] = {}
+    for i in range(0, len(base) - _BLOCK + 1, _BLOCK):
+        index.setdefault(base[i:i + _BLOCK], i)
+
+    body = bytearray()
+    _put_varint(body, len(target))
+
+    def add(start: int, end: int) -> None:
+        if end > start:
+            body.append(_OP_ADD)
+            _put_varint(body, end - start)
+            body.extend(target[start:end])
+
+    lit_start = 0
+    pos = 0
+    last = len(target) - _BLOCK
+    while pos <= last:
+        j = index.get(target[pos:pos + _BLOCK])
+        if j is None:
+            pos += 1
+            continue
+        # Grow the match backwards into the pending literal run, then forwards.
+        back = 0
+        while pos - back > lit_start and j - back > 0 and target[pos - back - 1] == base[j - back - 1]:
+            back += 1
+        length = back + _forward_match(base, j, target, pos)
+        if length < _MIN_COPY:
+            pos += 1
+            continue
+        add(lit_start, pos - back)
+        body.append(_OP_COPY)
+        _put_varint(body, j - back)
+        _put_varint(body, length)
+        pos = pos - back + length
+        lit_start = pos
+    add(lit_start, len(target))
+    return MAGIC + zlib.compress(bytes(body), 9)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild the target from `base` and a make_delta() result. Raises DeltaError."""
+    if not delta.startswith(MAGIC):
+        raise DeltaError("not a CoOpt delta")
+    try:
+        body = zlib.decompress(delta[len(MAGIC):])
+    except zlib.error as e:
+        raise DeltaError(f"corrupt delta: {e}") from e
+    size, pos = _get_varint(body, 0)
+    out = bytearray()
+    while pos < len(body):
+        op = body[pos]
+        pos += 1
+        if op == _OP_COPY:
+            offset, pos = _get_varint(body, pos)
+            length, pos = _get_varint(body, pos)
+            if offset + length > len(base):
+                raise DeltaError("copy outside the base file")
+            out += base[offset:offset + length]
+        elif op == _OP_ADD:
+            length, pos = _get_varint(body, pos)
+            if pos + length > len(body):
+                raise DeltaError("truncated delta")
+            out += body[pos:pos + length]
+            pos += length
+        else:
+            raise DeltaError(f"unknown delta instruction {op}")
+    if len(out) != size:
+        raise DeltaError("delta produced the wrong size")
+    return bytes(out)
@@ -0,0 +1,517 @@
+"""
+Download engine for the updater: a bounded worker pool over persistent HTTP/1.1
+keep-alive connections.
+
+urllib.request.urlopen opens (and TLS-handshakes) a fresh connection for every call,
+which made a ~110-file update cost ~110 round-trip handshakes to raw.githubusercontent.com.
+Here each worker thread keeps one connection per host and reuses it for every file it
+fetches, so an update costs one handshake per worker per host.
+
+download_file() is the large-file path (bundle zips): parallel HTTP Range segments with a
+sidecar progress file, so an interrupted download resumes instead of restarting.
+RemoteFile is a seekable view of a remote file over Range requests, so zipfile can read a
+bundle's central directory without downloading it.
+
+Failures are raised as urllib.error.HTTPError / http.client.HTTPException / OSError —
+the same types urlopen raises — so callers keep their existing error handling.
+"""
+
+import http.client
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator
+
+# Concurrent downloads. GitHub's raw CDN is happy with a handful of parallel
+# connections from one client; more than this mostly adds rate-limit exposure.
+DEFAULT_WORKERS = 6
+USER_AGENT = "CoOptUIPatcher"
+
+# Release assets redirect github.com -> objects.githubusercontent.com.
+_MAX_REDIRECTS = 5
+_REDIRECT_CODES = frozenset({301, 302, 303, 307, 308})
+
+
+class Downloader:
+    """
+    Worker pool + per-thread connection cache. Use as a context manager so pooled
+    connections are closed when the batch is done.
+
+    get() may be called from any thread; the connection it uses belongs to that thread,
+    so no connection is ever shared between two in-flight requests.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, timeout: float = 30):
+        self.workers = max(1, int(workers or 1))
+        self.timeout = timeout
+        self._local = threading.local()
+        self._all_conns: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "Downloader":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._all_conns = self._all_conns, []
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # --- connections -----------------------------------------------------------------
+
+    def _conn(self, scheme: str, netloc: str, fresh: bool = False) -> http.client.HTTPConnection:
+        pool = getattr(self._local, "conns", None)
+        if pool is None:
+            pool = self._local.conns = {}
+        key = (scheme, netloc)
+        conn = pool.get(key)
+        if conn is not None and fresh:
+            conn.close()
+            conn = None
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = cls(netloc, timeout=self.timeout)
+            pool[key] = conn
+            with self._lock:
+                self._all_conns.append(conn)
+        return conn
+
+    def _request(self, url: str, headers: dict) -> http.client.HTTPResponse:
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        hdrs = {"User-Agent": USER_AGENT, "Connection": "keep-alive"}
+        hdrs.update(headers)
+        # A pooled connection the server has since closed only fails once we use it;
+        # retry exactly once on a fresh connection before treating it as a real error.
+        conn = self._conn(parts.scheme, parts.netloc)
+        try:
+            conn.request("GET", target, headers=hdrs)
+            return conn.getresponse()
+        except (http.client.RemoteDisconnected, http.client.ImproperConnectionState,
+                http.client.BadStatusLine, ConnectionResetError, BrokenPipeError):
+            conn.close()
+        conn = self._conn(parts.scheme, parts.netloc, fresh=True)
+        conn.request("GET", target, headers=hdrs)
+        return conn.getresponse()
+
+    def open(self, url: str, headers: dict | None = None) -> http.client.HTTPResponse:
+        """
+        GET url following redirects; return the open 2xx response for the caller to read
+        to the end (the connection is only reusable once the body is drained).
+        Raises urllib.error.HTTPError for any other final status.
+        """
+        for _ in range(_MAX_REDIRECTS + 1):
+            resp = self._request(url, headers or {})
+            if resp.status in _REDIRECT_CODES:
+                location = resp.getheader("Location")
+                resp.read()
+                if not location:
+                    raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if 200 <= resp.status < 300:
+                resp.url = url  # final URL after redirects, as urllib sets it
+                return resp
+            resp.read()
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+        raise http.client.HTTPException(f"Too many redirects fetching {url}")
+
+    def drop(self, url: str) -> None:
+        """Close this thread's pooled connection to url's host (e.g. after abandoning a
+        response mid-body, which leaves the connection unusable)."""
+        parts = urllib.parse.urlsplit(url)
+        conn = getattr(self._local, "conns", {}).pop((parts.scheme, parts.netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def get(self, url: str, headers: dict | None = None) -> bytes:
+        """GET url and return the whole body."""
+        resp = self.open(url, headers)
+        return resp.read()
+
+    # --- pool ------------------------------------------------------------------------
+
+    def run(self, fn: Callable, items: Iterable) -> Iterator[tuple]:
+        """
+        Run fn(item) for every item on the worker pool. Yields (item, result, exception)
+        on the CALLING thread as each one finishes, so progress callbacks stay
+        single-threaded. Closing the generator early (break / return) cancels every
+        item that has not started yet; items already in flight run to completion.
+        """
+        items = list(items)
+        stop = threading.Event()
+
+        def call(item):
+            if stop.is_set():
+                return None
+            return fn(item)
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, max(1, len(items))),
+                                thread_name_prefix="coopui-dl") as pool:
+            pending = {pool.submit(call, item): item for item in items}
+            try:
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        item = pending.pop(fut)
+                        exc = fut.exception()
+                        yield item, (None if exc else fut.result()), exc
+            finally:
+                stop.set()
+                for fut in pending:
+                    fut.cancel()
+
+
+# --- resumable, range-segmented downloads (large bundle zips) -----------------------
+
+# Parallel ranges per download, and the smallest range worth its own connection.
+DEFAULT_SEGMENTS = 4
+_MIN_SEGMENT = 8 * 1024 * 1024
+_RANGE_CHUNK = 65536
+# A segment that drops is re-requested from where it stopped this many times.
+_SEGMENT_RETRIES = 3
+# How often the sidecar is rewritten / progress is reported while downloading.
+_SIDECAR_INTERVAL = 1.0
+_PROGRESS_INTERVAL = 0.1
+_RESUMABLE_ERRORS = (http.client.HTTPException, urllib.error.URLError, OSError)
+
+
+class _RangeChanged(Exception):
+    """The server answered a ranged request with the whole (different) file."""
+
+
+def _content_range(resp: http.client.HTTPResponse) -> tuple[int, int] | None:
+    """(first_byte, total_size) from a 206's Content-Range, or None if absent / '*'."""
+    value = resp.getheader("Content-Range") or ""
+    try:
+        unit, rest = value.split(" ", 1)
+        span, total = rest.split("/", 1)
+        if unit.strip().lower() != "bytes" or total.strip() == "*":
+            return None
+        return int(span.split("-", 1)[0]), int(total)
+    except ValueError:
+        return None
+
+
+def _load_sidecar(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _save_sidecar(path: str, state: dict) -> None:
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # losing the sidecar only loses resumability
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def download_file(
+    url: str,
+    dest_path: str,
+    segments: int = DEFAULT_SEGMENTS,
+    progress: Callable[[int, int], None] | None = None,
+    timeout: float = 60,
+) -> str:
+    """
+    Download url to dest_path, resumably. Returns dest_path.
+
+    The body goes to <dest>.part with a <dest>.part.json sidecar recording which byte
+    ranges are done. When the server honours Range (GitHub release assets do) the file is
+    fetched as up to `segments` parallel ranges, and a later call for the same url and
+    dest_path resumes the missing ranges — provided size and ETag / Last-Modified still
+    match, otherwise it starts over. A server without Range support (the chunked GitHub
+    zipball) is streamed once, start to finish, as before.
+
+    progress(done_bytes, total_bytes_or_0) is called on the calling thread; an exception
+    it raises (e.g. a cancel) stops the download the same way a failure does. Raises the
+    usual urllib / http.client / OSError types; the .part and sidecar are kept for the
+    next attempt.
+    """
+    part = dest_path + ".part"
+    sidecar = part + ".json"
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    with Downloader(workers=max(1, segments), timeout=timeout) as dl:
+        probe = dl.open(url, {"Range": "bytes=0-0"})
+        span = _content_range(probe) if probe.status == 206 else None
+        if span is None:
+            # No usable Range support: stream the whole file once. A 200 to the probe
+            # already is the whole file; a 206 of unknown total size is not.
+            if probe.status == 206:
+                probe.read()
+                probe = dl.open(url)
+            _remove(sidecar)
+            _stream_single(probe, part, progress)
+            os.replace(part, dest_path)
+            return dest_path
+        probe.read()
+        size = span[1]
+        etag = probe.getheader("ETag") or ""
+        validator = {"url": url, "size": size, "etag": etag,
+                     "last_modified": probe.getheader("Last-Modified") or ""}
+
+        state = _load_sidecar(sidecar)
+        resumable = (
+            state is not None
+            and all(state.get(k) == v for k, v in validator.items())
+            and isinstance(state.get("segments"), list)
+            and os.path.isfile(part) and os.path.getsize(part) == size
+        )
+        if not resumable:
+            n = max(1, min(segments, size // _MIN_SEGMENT))
+            bounds = [size * i // n for i in range(n + 1)]
+            state = dict(validator, segments=[[bounds[i], bounds[i + 1], 0] for i in range(n)])
+            with open(part, "wb") as f:
+                f.truncate(size)
+            _save_sidecar(sidecar, state)
+
+        # Strong ETags pin every range to the same file; a weak one cannot be used for
+        # If-Range, so a changed file is then only caught by size / Content-Range.
+        if_range = etag if etag and not etag.startswith("W/") else ""
+        try:
+            _fetch_ranges(dl, url, part, sidecar, state, if_range, progress)
+        except _RangeChanged:
+            _remove(sidecar)
+            _remove(part)
+            raise http.client.HTTPException(f"{url} changed during the download; retry")
+    os.replace(part, dest_path)
+    _remove(sidecar)
+    return dest_path
+
+
+def _stream_single(resp: http.client.HTTPResponse, part: str,
+                   progress: Callable[[int, int], None] | None) -> None:
+    total = int(resp.getheader("Content-Length") or 0)
+    done = 0
+    last = 0.0
+    try:
+        with open(part, "wb") as out:
+            while True:
+                chunk = resp.read(_RANGE_CHUNK)
+                if not chunk:
+                    break
+                out.write(chunk)
+                done += len(chunk)
+                now = time.monotonic()
+                if progress and now - last >= _PROGRESS_INTERVAL:
+                    last = now
+                    progress(done, total)
+    except BaseException:
+        _remove(part)
+        raise
+    if total and done != total:
+        _remove(part)
+        raise http.client.IncompleteRead(b"", total - done)
+    if progress:
+        progress(done, total or done)
+
+
+def _fetch_ranges(dl: Downloader, url: str, part: str, sidecar: str, state: dict,
+                  if_range: str, progress: Callable[[int, int], None] | None) -> None:
+    segs = state["segments"]
+    size = state["size"]
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def fetch(i: int) -> None:
+        start, end, _ = segs[i]
+        attempts = 0
+        with open(part, "r+b") as out:
+            while True:
+                with lock:
+                    offset = start + segs[i][2]
+                if offset >= end or stop.is_set():
+                    return
+                headers = {"Range": f"bytes={offset}-{end - 1}"}
+                if if_range:
+                    headers["If-Range"] = if_range
+                resp = None
+                try:
+                    resp = dl.open(url, headers)
+                    if resp.status != 206 or _content_range(resp) != (offset, size):
+                        dl.drop(resp.url)
+                        raise _RangeChanged()
+                    out.seek(offset)
+                    while offset < end and not stop.is_set():
+                        chunk = resp.read(min(_RANGE_CHUNK, end - offset))
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        out.flush()
+                        offset += len(chunk)
+                        with lock:
+                            segs[i][2] = offset - start
+                    if offset < end:
+                        dl.drop(resp.url)  # body left unread: the connection is unusable
+                        if stop.is_set():
+                            return
+                        raise http.client.IncompleteRead(b"", end - offset)
+                    return
+                except _RESUMABLE_ERRORS:
+                    dl.drop(resp.url if resp is not None else url)
+                    attempts += 1
+                    if attempts > _SEGMENT_RETRIES:
+                        raise
+
+    def snapshot() -> tuple[int, dict]:
+        with lock:
+            return sum(s[2] for s in segs), dict(state, segments=[list(s) for s in segs])
+
+    todo = [i for i, (s, e, d) in enumerate(segs) if s + d < e]
+    last_save = time.monotonic()
+    error: BaseException | None = None
+    with ThreadPoolExecutor(max_workers=max(1, len(todo)), thread_name_prefix="coopui-range") as pool:
+        pending = {pool.submit(fetch, i) for i in todo}
+        try:
+            while pending:
+                finished, pending = wait(pending, timeout=_PROGRESS_INTERVAL,
+                                         return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    # A failed segment does not stop the others: everything they still
+                    # fetch is progress the next attempt resumes from.
+                    if fut.exception() is not None and error is None:
+                        error = fut.exception()
+                done, snap = snapshot()
+                if progress:
+                    progress(done, size)
+                now = time.monotonic()
+                if now - last_save >= _SIDECAR_INTERVAL:
+                    last_save = now
+                    _save_sidecar(sidecar, snap)
+        finally:
+            stop.set()
+            wait(pending)
+            done, snap = snapshot()
+            _save_sidecar(sidecar, snap)
+    if error is not None:
+        raise error
+    if done != size:
+        raise http.client.IncompleteRead(b"", size - done)
+
+
+# --- random access to a remote file (a bundle's zip central directory) --------------
+
+# Smallest range fetched per read: zipfile's small header reads then share one request,
+# and the first read at the end of the file brings the whole directory of a small zip.
+_READAHEAD = 256 * 1024
+
+
+class RemoteFile(io.RawIOBase):
+    """
+    Seekable, read-only view of a remote file over HTTP Range requests. Enough for
+    zipfile.ZipFile(RemoteFile(url)) to list a bundle — the end record and the central
+    directory, a few hundred KB of a ~1GB zip — without downloading the body.
+
+    Raises http.client.HTTPException when the server ignores Range (the GitHub zipball),
+    plus the usual urllib / OSError types. close() (or use as a context manager) when done;
+    ZipFile does not close a file object it was given.
+    """
+
+    def __init__(self, url: str, timeout: float = 30):
+        super().__init__()
+        self._dl = Downloader(workers=1, timeout=timeout)
+        try:
+            probe = self._dl.open(url, {"Range": "bytes=0-0"})
+            span = _content_range(probe) if probe.status == 206 else None
+            if span is None:
+                # Do not read a 200: that would be the whole file.
+                raise http.client.HTTPException(f"{url} does not support range requests")
+            probe.read()
+        except BaseException:
+            self._dl.close()
+            raise
+        # Later ranges go straight to the final (redirected) location.
+        self.url = probe.url
+        self.size = span[1]
+        self.requests = 1
+        self._pos = 0
+        self._block_start = 0
+        self._block = b""
+
+    def close(self) -> None:
+        self._dl.close()
+        super().close()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if pos < 0:
+            raise OSError("negative seek position")
+        self._pos = pos
+        return pos
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            n = self.size - self._pos
+        n = max(0, min(n, self.size - self._pos))
+        if not n:
+            return b""
+        end = self._pos + n
+        if not (self._block_start <= self._pos and end <= self._block_start + len(self._block)):
+            start = self._pos
+            stop = min(self.size, max(end, start + _READAHEAD))
+            if stop - start < _READAHEAD:
+                start = max(0, stop - _READAHEAD)  # near the end: read back, not past EOF
+            self._block = self._fetch(start, stop)
+            self._block_start = start
+        offset = self._pos - self._block_start
+        data = self._block[offset:offset + n]
+        self._pos += len(data)
+        return data
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def _fetch(self, start: int, stop: int) -> bytes:
+        self.requests += 1
+        resp = self._dl.open(self.url, {"Range": f"bytes={start}-{stop - 1}"})
+        if resp.status != 206 or _content_range(resp) != (start, self.size):
+            self._dl.drop(resp.url)
+            raise http.client.HTTPException(f"{self.url} did not honour the range request")
+        data = resp.read()
+        if len(data) != stop - start:
+            raise http.client.IncompleteRead(data, stop - start - len(data))
+        return data
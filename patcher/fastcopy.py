@@ -0,0 +1,210 @@
+"""
+Same-volume fast copies for build staging and the object store.
+
+build.py stages the full MQ tree (prebuilt -> build_*, dist_staging -> dist_staging_plugin)
+and the object store materializes files into installs; both used to copy every byte even
+when source and destination share a volume. copy_file() tries, in order:
+
+  reflink   a copy-on-write clone: FICLONE on Linux (btrfs, XFS), block cloning
+            (FSCTL_DUPLICATE_EXTENTS_TO_FILE) on Windows ReFS / Dev Drive. Metadata only,
+            and the copy is independent of the source — always safe.
+  hardlink  only with link=True, for read-only trees (build staging that is zipped and
+            deleted, object_store_hardlinks). An in-place edit of either name changes both.
+  copy      copy_file_range where the OS has it (kernel-side; NFS / SMB may copy
+            server-side), else a plain buffered copy.
+
+What a volume supports is probed on first use and cached per (source device, destination
+device), so a volume without reflinks costs one failed ioctl per process, not one per file.
+An existing destination is unlinked first, so a copy never writes through an old hardlink.
+"""
+
+import errno
+import os
+import shutil
+import sys
+import threading
+
+REFLINK = "reflink"
+HARDLINK = "hardlink"
+COPY = "copy"
+
+_COPY_CHUNK = 1024 * 1024
+_FICLONE = 0x40049409
+# Errors that say "not for this file" rather than "not on this volume".
+_PER_FILE_ERRNOS = {errno.EMLINK, errno.EEXIST, errno.ENOSPC, errno.EACCES, errno.ENOENT}
+
+_caps: dict = {}  # (src st_dev, dst st_dev) -> {REFLINK: bool | None, HARDLINK: bool | None}
+_caps_lock = threading.Lock()
+
+
+def _capability(key: tuple, kind: str):
+    with _caps_lock:
+        return _caps.setdefault(key, {REFLINK: None, HARDLINK: None})[kind]
+
+
+def _record(key: tuple, kind: str, ok: bool) -> None:
+    with _caps_lock:
+        entry = _caps.setdefault(key, {REFLINK: None, HARDLINK: None})
+        if entry[kind] is None:
+            entry[kind] = ok
+
+
+def capabilities() -> dict:
+    """A snapshot of what has been probed so far: {(src_dev, dst_dev): {kind: bool|None}}."""
+    with _caps_lock:
+        return {k: dict(v) for k, v in _caps.items()}
+
+
+def _volume_key(src: str, dst: str) -> tuple:
+    return os.stat(src).st_dev, os.stat(os.path.dirname(os.path.abspath(dst))).st_dev
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+if sys.platform == "win32":
+    def _reflink(src: str, dst: str) -> None:
+        """Block-clone src into dst (ReFS / Dev Drive). Raises OSError when unsupported."""
+        import ctypes
+        import msvcrt
+        from ctypes import wintypes
+
+        class _DuplicateExtentsData(ctypes.Structure):
+            _fields_ = [("FileHandle", wintypes.HANDLE), ("SourceFileOffset", ctypes.c_longlong),
+                        ("TargetFileOffset", ctypes.c_longlong), ("ByteCount", ctypes.c_longlong)]
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        volume = ctypes.create_unicode_buffer(261)
+        if not kernel32.GetVolumePathNameW(os.path.abspath(dst), volume, 261):
+            raise ctypes.WinError(ctypes.get_last_error())
+        sectors, sector_bytes, _free, _total = (wintypes.DWORD() for _ in range(4))
+        if not kernel32.GetDiskFreeSpaceW(volume.value, ctypes.byref(sectors), ctypes.byref(sector_bytes),
+                                          ctypes.byref(_free), ctypes.byref(_total)):
+            raise ctypes.WinError(ctypes.get_last_error())
+        cluster = sectors.value * sector_bytes.value
+        size = os.path.getsize(src)
+        # Clone ranges must be cluster-aligned; the final partial cluster is rounded up and
+        # the destination's length (set first) keeps the file its real size.
+        step = max(cluster, (1 << 30) // cluster * cluster)
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            d.truncate(size)
+            data = _DuplicateExtentsData(msvcrt.get_osfhandle(s.fileno()), 0, 0, 0)
+            returned = wintypes.DWORD()
+            offset = 0
+            while offset < size:
+                data.SourceFileOffset = data.TargetFileOffset = offset
+                data.ByteCount = min(step, -(-(size - offset) // cluster) * cluster)
+                if not kernel32.DeviceIoControl(
+                        wintypes.HANDLE(msvcrt.get_osfhandle(d.fileno())), 0x00098344,  # FSCTL_DUPLICATE_EXTENTS_TO_FILE
+                        ctypes.byref(data), ctypes.sizeof(data), None, 0, ctypes.byref(returned), None):
+                    raise ctypes.WinError(ctypes.get_last_error())
+                offset += data.ByteCount
+else:
+    def _reflink(src: str, dst: str) -> None:
+        """FICLONE src into dst (btrfs, XFS, bcachefs). Raises OSError when unsupported."""
+        import fcntl
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+
+
+_kernel_copy = getattr(os, "copy_file_range", None)
+
+
+def _buffered_copy(src: str, dst: str) -> None:
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        if _kernel_copy is not None:
+            try:
+                while _kernel_copy(s.fileno(), d.fileno(), _COPY_CHUNK):
+                    pass
+                return
+            except OSError:
+                s.seek(0)
+                d.seek(0)
+                d.truncate()
+        shutil.copyfileobj(s, d, _COPY_CHUNK)
+
+
+def _try(kind: str, key: tuple, fn, src: str, dst: str) -> bool:
+    if _capability(key, kind) is False:
+        return False
+    try:
+        fn(src, dst)
+    except OSError as e:
+        _unlink(dst)
+        if e.errno not in _PER_FILE_ERRNOS:
+            _record(key, kind, False)
+        return False
+    _record(key, kind, True)
+    return True
+
+
+def clone(src: str, dst: str, link: bool = False):
+    """
+    Put src at dst by metadata only — reflink, then (link=True) hardlink. Returns REFLINK,
+    HARDLINK, or None when neither is possible here (dst is then absent) and the caller
+    must copy the bytes itself.
+    """
+    _unlink(dst)
+    try:
+        key = _volume_key(src, dst)
+    except OSError:
+        return None
+    if key[0] != key[1]:
+        return None  # different volumes: neither a clone nor a link can work
+    if _try(REFLINK, key, _reflink, src, dst):
+        return REFLINK
+    if link and _try(HARDLINK, key, os.link, src, dst):
+        return HARDLINK
+    return None
+
+
+def copy_file(src, dst, link: bool = False, metadata: bool = True) -> str:
+    """
+    Copy src to dst (replacing it) the cheapest way the volume allows; see the module
+    docstring. metadata=True copies mode and times like shutil.copy2 (a hardlink shares
+    them already). Returns REFLINK, HARDLINK or COPY.
+    """
+    src, dst = os.fspath(src), os.fspath(dst)
+    method = clone(src, dst, link)
+    if method is None:
+        _buffered_copy(src, dst)
+        method = COPY
+    if metadata and method != HARDLINK:
+        shutil.copystat(src, dst)
+    return method
+
+
+def copytree(src, dst, link: bool = False, dirs_exist_ok: bool = False) -> dict:
+    """
+    shutil.copytree with copy_file() for every file (symlinks are followed, like the
+    default copytree). Returns {REFLINK: n, HARDLINK: n, COPY: n, "bytes": n} where bytes
+    counts only the data actually copied.
+    """
+    src, dst = os.fspath(src), os.fspath(dst)
+    counts = {REFLINK: 0, HARDLINK: 0, COPY: 0, "bytes": 0}
+    os.makedirs(dst, exist_ok=dirs_exist_ok)
+    dirs = [(src, dst)]
+    for root, subdirs, files in os.walk(src, followlinks=True):
+        out = os.path.join(dst, os.path.relpath(root, src))
+        for name in subdirs:
+            os.makedirs(os.path.join(out, name), exist_ok=True)
+            dirs.append((os.path.join(root, name), os.path.join(out, name)))
+        for name in files:
+            s = os.path.join(root, name)
+            method = copy_file(s, os.path.join(out, name), link=link)
+            counts[method] += 1
+            if method == COPY:
+                counts["bytes"] += os.path.getsize(s)
+    for s, d in reversed(dirs):
+        shutil.copystat(s, d)
+    return counts
+
+
+def describe(counts: dict) -> str:
+    """'120 reflinked, 0 hardlinked, 3 copied (1.2 MB)' for build logs."""
+    return (f"{counts[REFLINK]} reflinked, {counts[HARDLINK]} hardlinked, "
+            f"{counts[COPY]} copied ({counts['bytes'] / (1024 * 1024):.1f} MB)")
@@ -12,7 +12,8 @@ extraction are handled by installer.smart_install.
 
 import json
 import urllib.error
-import urllib.request
+
+import manifest_cache
 
 # The proven base environment: the E3NextAndMQNextBinary repo IS the binary
 # distribution (its main branch is the install), so the branch zipball is the
@@ -40,11 +41,13 @@ def get_latest_release_zip_url() -> tuple[str | None, str | None, str | None]:
     rate_limited = False
     for url in [GITHUB_API_RELEASES, GITHUB_API_ALL_RELEASES]:
         try:
-            req = urllib.request.Request(url)
-            req.add_header("Accept", "application/vnd.github+json")
-            req.add_header("User-Agent", "CoOptUIPatcher")
-            with urllib.request.urlopen(req, timeout=15) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
+            # Conditional request (manifest_cache.py): an unchanged release list is a 304,
+            # which does not count against the unauthenticated API rate limit, and the
+            # asset URL it yields is a bundle-cache hit — no body download at all.
+            body, _not_modified = manifest_cache.fetch(
+                url, timeout=15, headers={"Accept": "application/vnd.github+json"},
+            )
+            data = json.loads(body)
         except urllib.error.HTTPError as e:
             # 403/429 = GitHub API rate limit — remember it so we don't report the
             # misleading "no release found" when nothing could actually be queried.
@@ -2,13 +2,18 @@
 Generate default_config_manifest.json for the patcher (create-if-missing install of config templates).
 Run from repo root: python patcher/generate_default_config_manifest.py
 Writes default_config_manifest.json at repo root.
-Each entry maps a repo path (config_templates/...) to an install path (Macros/...) under the MQ root.
+Each entry maps a repo path (config_templates/...) to an install path (Macros/...) under the MQ root,
+with the file's hash.
 Patcher installs only when the install path does not exist.
 """
 
 import json
 import os
 
+# Same digest the patcher computes (CRLF-normalized sha256), so installs can be served
+# from its shared object store. Build-time only; sys.path[0] is patcher/.
+from hash_index import _sha256_file
+
 # Repo root (parent of patcher/)
 REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 CONFIG_TEMPLATES = os.path.join(REPO_ROOT, "config_templates")
@@ -46,7 +51,8 @@ def _collect_install_only_entries():
     for repo_path, install_path in DIRECT_CONFIG_FILES:
         full = os.path.join(REPO_ROOT, repo_path.replace("/", os.sep))
         if os.path.isfile(full):
-            entries.append({"repoPath": repo_path, "installPath": install_path})
+            entries.append({"repoPath": repo_path, "installPath": install_path,
+                            "hash": _sha256_file(full)})
 
     # --- Config templates (config_templates/ -> Macros/) ---
     if not os.path.isdir(CONFIG_TEMPLATES):
@@ -63,7 +69,8 @@ def _collect_install_only_entries():
                 continue
             repo_path = f"config_templates/{subdir}/{name}".replace("\\", "/")
             install_path = f"{macro_parent}/{macro_subdir}/{name}".replace("\\", "/")
-            entries.append({"repoPath": repo_path, "installPath": install_path})
+            entries.append({"repoPath": repo_path, "installPath": install_path,
+                            "hash": _sha256_file(src_path)})
     return sorted(entries, key=lambda e: (e["installPath"], e["repoPath"]))
 
 
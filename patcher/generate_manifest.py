@@ -3,8 +3,14 @@ Generate release_manifest.json for the patcher from the repo's release file list
 Run from repo root: python patcher/generate_manifest.py
 Writes release_manifest.json at repo root (so raw URL is .../main/release_manifest.json).
 Uses same "replace on update" list as build-release.ps1 / RELEASE_AND_DEPLOYMENT.md.
+
+The output is a v1 manifest ("files", each entry with its normalized "size"). --tree
+writes schema 2, adding the Merkle "tree" of manifest_tree.py. The tree only saves the
+patcher the index lookups for directories it has already seen match: every file under
+them is still stat-checked against the hash index. That is a small win, hence opt-in.
 """
 
+import hashlib
 import json
 import os
 import re
@@ -13,7 +19,9 @@ import re
 # manifest hashes always match what clients compute. The generator only runs at build
 # time from source (sys.path[0] is patcher/), so importing updater here is safe and
 # does not affect the frozen exe.
-from updater import _sha256_file
+from delta import make_delta
+from manifest_tree import SCHEMA_VERSION, build_tree
+from updater import _sha256_and_size, _sha256_file
 
 # Repo root (parent of patcher/)
 REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -125,11 +133,61 @@ def _read_changelog() -> list[str]:
     return entries
 
 
+def _build_deltas(dll_path: str, dll_hash: str, bases: list[str], out_dir: str,
+                  release_tag: str) -> list[dict]:
+    """
+    Write a delta from each previously released DLL in `bases` to dll_path into out_dir
+    (upload them as release assets next to MQ2CoOptUI.dll) and return the manifest
+    "deltas" list, keyed by the base file's hash. Deltas that would not save at least
+    20% over the full download are dropped.
+    """
+    with open(dll_path, "rb") as f:
+        target = f.read()
+    os.makedirs(out_dir, exist_ok=True)
+    deltas = []
+    for base_path in bases:
+        base_hash = _sha256_file(base_path)
+        if not base_hash:
+            raise RuntimeError(f"Could not hash delta base {base_path} — aborting manifest generation.")
+        if base_hash == dll_hash or any(d["base"] == base_hash for d in deltas):
+            continue
+        with open(base_path, "rb") as f:
+            patch_bytes = make_delta(f.read(), target)
+        if len(patch_bytes) > len(target) * 0.8:
+            print(f"  Skipped delta from {base_hash[:12]}... ({len(patch_bytes)} bytes, not worth it)")
+            continue
+        name = f"MQ2CoOptUI.dll.{base_hash[:16]}.delta"
+        with open(os.path.join(out_dir, name), "wb") as f:
+            f.write(patch_bytes)
+        deltas.append({
+            "base": base_hash,
+            "url": f"https://github.com/CooptGaming/CooptUI/releases/download/{release_tag}/{name}",
+            "hash": hashlib.sha256(patch_bytes).hexdigest(),
+            "size": len(patch_bytes),
+        })
+        print(f"  Delta from {base_hash[:12]}...: {len(patch_bytes)} bytes -> {name}")
+    return deltas
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Generate release_manifest.json")
     parser.add_argument("--plugin-dll", help="Path to MQ2CoOptUI.dll to include as release-asset entry")
     parser.add_argument("--release-tag", help="GitHub release tag for asset URLs (e.g. v0.9.5)")
+    parser.add_argument(
+        "--delta-base", action="append", default=[], metavar="OLD_DLL",
+        help="A previously released MQ2CoOptUI.dll to build a binary delta from "
+             "(repeat for the last N releases). Requires --plugin-dll and --release-tag.",
+    )
+    parser.add_argument(
+        "--delta-dir", default=os.path.join(REPO_ROOT, "dist_deltas"),
+        help="Where to write the .delta files to upload with the release (default: dist_deltas/)",
+    )
+    parser.add_argument(
+        "--tree", action="store_true",
+        help='Write a schema 2 manifest with the Merkle "tree" of directory digests '
+             "(see manifest_tree.py); default is schema 1",
+    )
     args = parser.parse_args()
 
     paths = _collect_release_paths()
@@ -137,27 +195,38 @@ def main():
     for path in paths:
         full = os.path.join(REPO_ROOT, path.replace("/", os.sep))
         if os.path.isfile(full):
-            h = _sha256_file(full)
+            h, size = _sha256_and_size(full)
             if not h:
                 raise RuntimeError(f"Could not hash {path} — aborting manifest generation.")
-            files.append({"path": path, "hash": h})
+            files.append({"path": path, "hash": h, "size": size})
 
     # Include MQ2CoOptUI.dll as a release-asset download (not in git repo)
     if args.plugin_dll and os.path.isfile(args.plugin_dll):
-        h = _sha256_file(args.plugin_dll)
+        h, size = _sha256_and_size(args.plugin_dll)
         if not h:
             raise RuntimeError(f"Could not hash {args.plugin_dll} — aborting manifest generation.")
-        entry = {"path": "plugins/MQ2CoOptUI.dll", "hash": h}
+        entry = {"path": "plugins/MQ2CoOptUI.dll", "hash": h, "size": size}
         if args.release_tag:
             entry["url"] = (
                 f"https://github.com/CooptGaming/CooptUI/releases/download/"
                 f"{args.release_tag}/MQ2CoOptUI.dll"
             )
+            if args.delta_base:
+                deltas = _build_deltas(args.plugin_dll, h, args.delta_base, args.delta_dir, args.release_tag)
+                if deltas:
+                    entry["deltas"] = deltas
+        elif args.delta_base:
+            print("  WARNING: --delta-base ignored without --release-tag (deltas need asset URLs).")
         files.append(entry)
         print(f"  Included plugins/MQ2CoOptUI.dll (release asset, {h[:12]}...)")
 
     version = _read_coopt_version()
+    # "files" is the v1 schema every patcher exe reads; per-file "size" and, with --tree,
+    # "schema"/"tree" are additions older exes ignore. See manifest_tree.py.
     manifest = {"version": version, "changelog": _read_changelog(), "files": files}
+    if args.tree:
+        manifest["schema"] = SCHEMA_VERSION
+        manifest["tree"] = build_tree(files)
     out_path = os.path.join(REPO_ROOT, "release_manifest.json")
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(manifest, f, indent=2)
@@ -0,0 +1,302 @@
+"""
+Normalized file hashing plus a persistent per-install hash index.
+
+The manifest hash of a file is the sha256 of its contents with CRLF normalized to LF for
+text files (so a git checkout on Windows hashes the same as GitHub raw content).
+Computing that for every manifest path on every launch means reading the whole install
+— including the multi-MB plugin DLL — just to say "Up to date". The index remembers the
+digest of each file together with its (size, mtime_ns, inode/file-id) stat tuple, and
+hands the cached digest back for as long as that tuple is unchanged.
+
+The index lives under the MQ root (.coopui/hash_index.json), so each install carries
+its own. It is a cache: deleting it, or passing rehash=True, only costs a full re-hash.
+
+CrcIndex is the same cache over raw-byte CRC32s (.coopui/crc_index.json) — the checksum a
+zip's central directory records — so Full Install / Repair can tell which bundle members
+are already on disk without re-reading them.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Patcher-private state under the MQ root (hash index, caches). Never shipped, never
+# part of the manifest or the bundle, safe to delete.
+STATE_DIR = ".coopui"
+INDEX_NAME = "hash_index.json"
+CRC_INDEX_NAME = "crc_index.json"
+_INDEX_VERSION = 1
+
+_TEXT_EXTS = frozenset({
+    '.lua', '.mac', '.ini', '.txt', '.cfg', '.xml', '.json', '.md',
+    '.py', '.ps1', '.bat', '.cmd', '.sh', '.csv', '.html', '.htm',
+    '.yml', '.yaml', '.toml', '.reg', '.config',
+})
+
+
+def state_path(root_path: str, name: str) -> str:
+    """Path of a patcher state file under <root>/.coopui/."""
+    return os.path.join(root_path, STATE_DIR, name)
+
+
+# Files are hashed in fixed-size chunks (peak memory = one chunk per worker, not a whole
+# DLL) on a small thread pool: hashlib releases the GIL while digesting, so cold-cache
+# hashing scales with cores/disk rather than running one file at a time.
+_CHUNK = 1024 * 1024
+DEFAULT_HASH_WORKERS = min(8, (os.cpu_count() or 2) + 2)
+
+
+def _is_text(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in _TEXT_EXTS
+
+
+class NormalizedSha256:
+    """
+    Incremental form of the manifest digest: sha256 over the stream with CRLF→LF applied
+    when `normalize` is set. A chunk ending in "\r" holds that byte back until the next
+    chunk shows whether it starts a CRLF, so the result is identical to normalizing the
+    whole file at once whatever the chunk boundaries are.
+    """
+
+    def __init__(self, normalize: bool):
+        self.normalize = normalize
+        self._h = hashlib.sha256()
+        self._held_cr = False
+        self._size = 0
+
+    def update(self, chunk: bytes) -> None:
+        if not self.normalize:
+            self._h.update(chunk)
+            self._size += len(chunk)
+            return
+        if self._held_cr:
+            chunk = b"\r" + chunk
+            self._held_cr = False
+        if chunk.endswith(b"\r"):
+            chunk = chunk[:-1]
+            self._held_cr = True
+        chunk = chunk.replace(b"\r\n", b"\n")
+        self._h.update(chunk)
+        self._size += len(chunk)
+
+    @property
+    def size(self) -> int:
+        """Length of the normalized content hashed so far (the manifest's "size")."""
+        return self._size + (1 if self._held_cr else 0)
+
+    def hexdigest(self) -> str:
+        h = self._h.copy()
+        if self._held_cr:
+            h.update(b"\r")
+        return h.hexdigest()
+
+
+def _sha256_bytes(content: bytes, path: str) -> str:
+    """Normalized digest of in-memory content that will live at `path` (ext decides CRLF)."""
+    if _is_text(path):
+        content = content.replace(b"\r\n", b"\n")
+    return hashlib.sha256(content).hexdigest()
+
+
+def _sha256_file(file_path: str, chunk_size: int = _CHUNK) -> str:
+    """Return SHA256 hex digest of file contents. Returns '' if file missing or unreadable.
+
+    Normalizes CRLF→LF for text files so hashes match GitHub raw content
+    regardless of local platform line endings. Streams the file in chunk_size pieces.
+    """
+    return _sha256_and_size(file_path, chunk_size)[0]
+
+
+def _sha256_and_size(file_path: str, chunk_size: int = _CHUNK) -> tuple[str, int]:
+    """(_sha256_file digest, normalized size). ('', 0) if missing or unreadable."""
+    h = NormalizedSha256(_is_text(file_path))
+    try:
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                h.update(chunk)
+    except OSError:
+        return "", 0
+    return h.hexdigest(), h.size
+
+
+def _crc32_file(file_path: str, chunk_size: int = _CHUNK) -> str:
+    """CRC32 of the raw bytes as 8 hex digits (no CRLF normalization: it is compared with
+    zip central-directory CRCs). '' if missing or unreadable."""
+    crc = 0
+    try:
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+    except OSError:
+        return ""
+    return f"{crc:08x}"
+
+
+def _stat_key(st: os.stat_result) -> list:
+    # st_ino is the NTFS file id on Windows. An os.replace'd file gets a new one, so a
+    # file rewritten inside the same mtime tick with the same size still misses.
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+class HashIndex:
+    """
+    Digest cache for one install, keyed by manifest-relative path (forward slashes).
+    Subclasses pick the file name and the digest (see CrcIndex).
+
+    rehash=True ignores every cached digest (repair mode) but still refreshes the index:
+    the stored entries are loaded and kept, and the paths hashed replace theirs, so the
+    next normal check is warm again. Thread-safe; call save() when done.
+    """
+
+    index_name = INDEX_NAME
+
+    def __init__(self, root_path: str, rehash: bool = False):
+        self.root_path = root_path
+        self.rehash = rehash
+        self._entries: dict[str, list] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _path(self) -> str:
+        return state_path(self.root_path, self.index_name)
+
+    def _hash_file(self, path: str) -> str:
+        return _sha256_file(path)
+
+    def _local(self, rel_path: str) -> str:
+        return os.path.join(self.root_path, rel_path.replace("/", os.sep))
+
+    def _load(self) -> None:
+        try:
+            with open(self._path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == _INDEX_VERSION:
+            entries = data.get("entries")
+            if isinstance(entries, dict):
+                self._entries = entries
+
+    def save(self) -> bool:
+        """Write the index if anything changed. Returns False if it could not be written
+        (read-only install, full disk) — the only cost of that is re-hashing next time."""
+        with self._lock:
+            if not self._dirty:
+                return True
+            data = {"version": _INDEX_VERSION, "entries": dict(self._entries)}
+            self._dirty = False
+        path = self._path()
+        tmp = path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, path)
+            return True
+        except OSError:
+            return False
+
+    def cached(self, rel_path: str) -> str | None:
+        """Digest from the index if the file's stat tuple still matches, else None."""
+        if self.rehash:
+            return None
+        rel_path = rel_path.replace("\\", "/")
+        try:
+            st = os.stat(self._local(rel_path))
+        except OSError:
+            return None
+        with self._lock:
+            hit = self._entries.get(rel_path)
+        if hit and hit[:3] == _stat_key(st):
+            return hit[3]
+        return None
+
+    def digest(self, rel_path: str) -> str:
+        """Normalized sha256 of the file at rel_path ('' if missing), from the index when
+        the stat tuple is unchanged, otherwise hashed and recorded."""
+        rel_path = rel_path.replace("\\", "/")
+        hit = self.cached(rel_path)
+        if hit is not None:
+            return hit
+        return self._hash_miss(rel_path)
+
+    def digests(self, rel_paths: list[str], workers: int = DEFAULT_HASH_WORKERS) -> dict[str, str]:
+        """
+        digest() for many paths: index hits are answered inline, the misses are hashed
+        concurrently on `workers` threads. Returns {rel_path: digest} ('' = missing).
+        """
+        out: dict[str, str] = {}
+        misses = []
+        for rel in rel_paths:
+            hit = self.cached(rel)
+            if hit is None:
+                misses.append(rel)
+            else:
+                out[rel] = hit
+        if len(misses) <= 1 or workers <= 1:
+            for rel in misses:
+                out[rel] = self.digest(rel)
+            return out
+        with ThreadPoolExecutor(max_workers=min(workers, len(misses)),
+                                thread_name_prefix="coopui-hash") as pool:
+            for rel, h in zip(misses, pool.map(self._hash_miss, misses)):
+                out[rel] = h
+        return out
+
+    def _hash_miss(self, rel_path: str) -> str:
+        # digest() without re-checking the index: the caller just saw it miss.
+        rel_path = rel_path.replace("\\", "/")
+        local = self._local(rel_path)
+        try:
+            st_before = os.stat(local)
+        except OSError:
+            self.forget(rel_path)
+            return ""
+        h = self._hash_file(local)
+        if h:
+            self._store(rel_path, st_before, h)
+        return h
+
+    def record(self, rel_path: str, digest: str) -> None:
+        """Record the digest of a file the patcher just wrote (its content is known, so no
+        re-read is needed)."""
+        rel_path = rel_path.replace("\\", "/")
+        try:
+            st = os.stat(self._local(rel_path))
+        except OSError:
+            self.forget(rel_path)
+            return
+        self._store(rel_path, st, digest)
+
+    def forget(self, rel_path: str) -> None:
+        with self._lock:
+            if self._entries.pop(rel_path.replace("\\", "/"), None) is not None:
+                self._dirty = True
+
+    def _store(self, rel_path: str, st: os.stat_result, digest: str) -> None:
+        with self._lock:
+            self._entries[rel_path] = _stat_key(st) + [digest]
+            self._dirty = True
+
+
+class CrcIndex(HashIndex):
+    """
+    HashIndex over raw-byte CRC32s ("%08x") in .coopui/crc_index.json. A zip member whose
+    size and CRC match the indexed target file is already installed; record() the CRC of
+    each member written so the next repair needs no re-read at all.
+    """
+
+    index_name = CRC_INDEX_NAME
+
+    def _hash_file(self, path: str) -> str:
+        return _crc32_file(path)
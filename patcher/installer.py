@@ -17,18 +17,33 @@ that protects user data, so they are deliberately conservative.
 """
 
 import errno
+import hashlib
 import http.client
 import os
+import queue
 import shutil
 import subprocess
+import sys
 import tempfile
+import threading
+import time
 import urllib.error
 import urllib.request
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Optional
 
+import bundle_cache
+import config
+import preserve_rules
+from downloader import USER_AGENT, RemoteFile, download_file
 from fresh_install import BASE_BUNDLE_NAME, BASE_BUNDLE_ZIP_URL, get_latest_release_zip_url
+from hash_index import CrcIndex
+from jobs import CancelToken, raise_if_cancelled
+from progress_bus import DEFAULT_HZ, Phase, ProgressBus, fraction_sink
+from transaction import Transaction, TransactionError, group as transaction_group, long_path as _long_path
 from updater import (
+    INSTALLED_VERSION_PATH,
     check_for_default_config,
     check_for_updates,
     install_default_config,
@@ -38,9 +53,6 @@ from updater import (
 
 ProgressCb = Optional[Callable[[str, float], None]]
 
-# Extensions that are always code / binaries / UI assets — never preserved, always refreshed.
-_CODE_EXTS = frozenset({".exe", ".dll", ".lua", ".mac", ".png", ".ico"})
-
 
 def should_preserve(rel_path: str) -> bool:
     """
@@ -49,44 +61,11 @@ def should_preserve(rel_path: str) -> bool:
     file already exists (callers check existence separately).
 
     Principle: never clobber the user's config or character data; always refresh code and
-    binaries. `rel_path` is a bundle-relative path (either separator).
+    binaries. `rel_path` is a bundle-relative path (either separator). The rules themselves
+    are a table (preserve_rules.json, built-in copy in preserve_rules.py); run
+    `python preserve_rules.py <path>` to see which rule decides a path.
     """
-    p = rel_path.replace("\\", "/").lstrip("/").lower()
-    ext = os.path.splitext(p)[1]
-    base = os.path.basename(p)
-
-    # Code, binaries, UI assets: always refresh.
-    if ext in _CODE_EXTS:
-        return False
-    if p.startswith("resources/"):
-        return False
-
-    # MacroQuest instance/plugin config: EQ path + server list (MacroQuest.ini), per-character
-    # MQ inis, overlay layouts, AutoLogin, and the e3 Macro Inis (the user's E3 char/server
-    # settings) all live under config/. Keep whatever the user already has.
-    if p.startswith("config/"):
-        return True
-
-    # CoOpt UI + macro user rules and state: sell/loot/shared rule inis, saved layout, the
-    # onboarding flag, filter presets. (.mac macro CODE is excluded above and gets refreshed.)
-    if p.startswith("macros/") and ext in (".ini", ".cfg"):
-        return True
-
-    # ScriptTracker user settings: the update path deliberately never ships this file
-    # (excluded from the release manifest), so Full Install / Repair must keep it too.
-    if p == "lua/scripttracker/scripttracker.ini":
-        return True
-
-    # Login / account databases.
-    if base.startswith("login.db"):
-        return True
-
-    # E3 per-character data lives under mono/macros/e3/<CharName>/ as small inis/txts.
-    if p.startswith("mono/macros/e3/") and ext in (".ini", ".txt"):
-        return True
-
-    # Everything else (MQ/Mono/E3 runtime binaries, CoOpt Lua, resources, …) -> refresh.
-    return False
+    return preserve_rules.active().preserve(rel_path)
 
 
 def ensure_plugin_keys(ini_path: str, enable_coopt_plugin: bool = True) -> bool:
@@ -156,157 +135,425 @@ def ensure_plugin_keys(ini_path: str, enable_coopt_plugin: bool = True) -> bool:
         return False
 
 
-def _download_zip(url: str, progress_cb: ProgressCb = None) -> str:
-    """Download a zip to a temp file and return its path. Raises on failure (caller cleans up)."""
-    tmp_fd, tmp_path = tempfile.mkstemp(suffix=".zip")
+# Partial bundle downloads live here between attempts, so a dropped connection (or a
+# closed patcher) resumes where it stopped instead of starting the ~1GB zip over.
+_DOWNLOAD_DIR = os.path.join(tempfile.gettempdir(), "coopui_downloads")
+
+
+def _download_creep(event: dict) -> float:
+    """Bar fraction for a download without a Content-Length (e.g. GitHub zipball streams
+    chunked): a slow creep sized against ~1GB, so a large download doesn't look hung."""
+    return min(0.04 + event["done"] / (1024 * 1048576) * 0.9, 0.96)
+
+
+def _download_zip(url: str, progress_cb: ProgressCb = None, dest: str | None = None,
+                  cancel: CancelToken | None = None, bus: ProgressBus | None = None) -> str:
+    """
+    Download a zip to dest (default: a per-url file in _DOWNLOAD_DIR, which the caller
+    deletes when done) and return its path. Raises on failure, keeping the partial
+    download for the next attempt at the same url and dest — Cancelled included, so a
+    cancelled bundle download resumes next time instead of starting over.
+
+    Release assets are fetched as parallel HTTP Range segments and resume after an
+    interruption; the GitHub zipball (no Range support) streams once. See
+    downloader.download_file.
+
+    Progress is a "Downloading" phase (bytes, with rate and ETA) on `bus`, and reaches
+    progress_cb over the first half of the bar.
+    """
+    if dest is None:
+        name = "bundle-" + hashlib.sha256(url.encode("utf-8")).hexdigest()[:16] + ".zip"
+        dest = os.path.join(_DOWNLOAD_DIR, name)
+
+    def progress(done: int, total: int) -> None:
+        # Called on this thread several times a second while the segments download;
+        # raising here stops them (download_file keeps the .part for the next attempt).
+        raise_if_cancelled(cancel)
+        phase.update(done, total)
+
+    bus = bus or ProgressBus()
+    with bus.phase("Downloading", unit="bytes",
+                   sinks=[fraction_sink(progress_cb, 0.0, 0.5, unknown=_download_creep)]) as phase:
+        return download_file(url, dest, progress=progress, timeout=120)
+
+
+def _remote_etag(url: str) -> str | None:
+    """ETag of url from a HEAD request (redirects followed), or None. Never raises."""
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "CoOptUIPatcher"})
-        with urllib.request.urlopen(req, timeout=120) as resp:
-            total = int(resp.headers.get("Content-Length", 0))
-            done = 0
-            with os.fdopen(tmp_fd, "wb") as out:
-                tmp_fd = -1  # owned by `out` now
-                while True:
-                    chunk = resp.read(65536)
-                    if not chunk:
-                        break
-                    out.write(chunk)
-                    done += len(chunk)
-                    if progress_cb:
-                        if total:
-                            progress_cb(
-                                f"Downloading... {done // 1048576}MB / {total // 1048576}MB",
-                                min(done / total * 0.5, 0.5),
-                            )
-                        elif done % (8 * 1048576) < 65536:
-                            # No Content-Length (e.g. GitHub zipball streams chunked):
-                            # show a byte counter with a slow creep so a large download
-                            # doesn't look hung. Sized against ~1GB; clamps below 0.5.
-                            progress_cb(
-                                f"Downloading... {done // 1048576}MB",
-                                min(0.02 + (done / (1024 * 1048576)) * 0.45, 0.48),
-                            )
-        return tmp_path
-    except BaseException:
-        if tmp_fd >= 0:
-            try:
-                os.close(tmp_fd)
-            except OSError:
-                pass
+        req = urllib.request.Request(url, method="HEAD", headers={"User-Agent": USER_AGENT})
+        with urllib.request.urlopen(req, timeout=15) as resp:
+            return resp.headers.get("ETag")
+    except Exception:
+        return None
+
+
+def _fetch_bundle(url: str, key: str | None, cache: "bundle_cache.BundleCache | None",
+                  progress_cb: ProgressCb = None, cancel: CancelToken | None = None,
+                  bus: ProgressBus | None = None) -> tuple[str, bool]:
+    """
+    Return (zip_path, is_temp) for a bundle: from the bundle cache when `key` is cached
+    and intact, otherwise downloaded (into the cache when there is a key and a cache).
+    The caller deletes the file only when is_temp.
+    """
+    if cache is None or not key:
+        return _download_zip(url, progress_cb, cancel=cancel, bus=bus), True
+    hit = cache.lookup(key)
+    if hit:
+        if progress_cb:
+            progress_cb("Using the cached bundle (already downloaded).", 0.5)
+        return hit, False
+    path = _download_zip(url, progress_cb, dest=cache.path_for(key), cancel=cancel, bus=bus)
+    if not bundle_cache.zip_intact(path):
+        cache.discard(key)
+        raise zipfile.BadZipFile(f"{url} did not download as a valid ZIP")
+    cache.commit(key)
+    return path, False
+
+
+def _bundle_prefix(names: list) -> str:
+    """
+    The EMU bundle normally has its files at the zip root (config/, lua/, MacroQuest.exe…),
+    but tolerate a single wrapping folder too (the GitHub zipball has one). Returns that
+    folder as "name/", or "" — decided from the central directory alone.
+    """
+    tops = {n.split("/", 1)[0] for n in names if n.strip("/")}
+    if len(tops) != 1:
+        return ""
+    prefix = tops.pop() + "/"
+    if prefix + "MacroQuest.exe" in names or any(n.startswith(prefix + "lua/") for n in names):
+        return prefix
+    return ""
+
+
+def _member_rel_path(name: str) -> str | None:
+    """
+    Target-relative path for a zip member, sanitized the way ZipFile.extract does it:
+    absolute paths, drive letters and ".." components are dropped, so a member can never
+    land outside the target. None for members that name no file.
+    """
+    name = name.replace("\\", "/")
+    parts = []
+    for part in name.split("/"):
+        if os.name == "nt":
+            part = os.path.splitdrive(part)[1]
+        if part in ("", ".", ".."):
+            continue
+        parts.append(part)
+    return "/".join(parts) or None
+
+
+# Chunk size for streaming a member from the zip into its .tmp file.
+_COPY_CHUNK = 1024 * 1024
+
+# Members are inflated and written by this many threads, each with its own ZipFile handle
+# (a ZipFile's file position is shared, so one handle cannot serve two threads). zlib
+# releases the GIL while inflating, and the per-file create/close latency that on-access
+# antivirus adds overlaps across threads. "overlay_workers" in patcher_config.json
+# overrides it; 1 is the serial path.
+DEFAULT_OVERLAY_WORKERS = min(8, os.cpu_count() or 2)
+# progress_cb is called at most this often while overlaying (plus at the start and end)
+# when overlay_bundle() is not given a bus.
+_OVERLAY_PROGRESS_INTERVAL = 1.0 / DEFAULT_HZ
+
+
+def _overlay_workers() -> int:
+    try:
+        workers = int(config.load().get("overlay_workers") or 0)
+    except (TypeError, ValueError):
+        workers = 0
+    return workers if workers > 0 else DEFAULT_OVERLAY_WORKERS
+
+
+def _write_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, dest_ext: str) -> None:
+    """
+    Atomic install of one member: stream to <dest>.tmp then os.replace, so a crash or a
+    bad CRC mid-member can never leave a truncated target (e.g. MacroQuest.exe).
+    """
+    tmp_dest = dest_ext + ".tmp"
+    try:
+        with zf.open(info) as src, open(tmp_dest, "wb") as out:
+            shutil.copyfileobj(src, out, _COPY_CHUNK)
+        os.replace(tmp_dest, dest_ext)
+    except (OSError, zipfile.BadZipFile):
         try:
-            os.unlink(tmp_path)
+            os.remove(tmp_dest)
         except OSError:
             pass
         raise
 
 
-def _long_path(p: str) -> str:
+def _write_members(zip_path: str, zf: zipfile.ZipFile, jobs: list, workers: int,
+                   progress: Phase, cancel: CancelToken | None = None) -> int:
     """
-    Extended-length form (\\\\?\\...) so file ops survive Windows' 260-char
-    MAX_PATH. The base bundle nests Mono files ~200 chars deep; add the temp
-    extract prefix and paths blow past the limit on stock systems (WinError 3).
-    Absolute-izes first ( \\\\?\\ requires absolute, backslash paths).
+    Write jobs [(info, rel, dest_ext)] (their directories already exist). Serial on `zf`
+    when workers <= 1; otherwise `workers` threads, each opening its own ZipFile, pull
+    from a shared queue while this thread reports each finished member to `progress`.
+    The first failure stops the other workers (members in flight finish) and is
+    re-raised here; so does a cancel (Cancelled). Returns the number of members written.
     """
-    if os.name != "nt":
-        return p
-    p = os.path.abspath(p)
-    if p.startswith("\\\\?\\"):
-        return p
-    if p.startswith("\\\\"):  # UNC share -> \\?\UNC\server\share\...
-        return "\\\\?\\UNC" + p[1:]
-    return "\\\\?\\" + p
-
-
-def _bundle_source_root(extract_dir: str) -> str:
+    if workers <= 1 or len(jobs) <= 1:
+        for info, rel, dest_ext in jobs:
+            raise_if_cancelled(cancel)
+            _write_member(zf, info, dest_ext)
+            progress.advance(item=rel)
+        return len(jobs)
+
+    todo = queue.SimpleQueue()
+    for job in jobs:
+        todo.put(job)
+    results = queue.SimpleQueue()
+    stop = threading.Event()
+    finished = object()
+
+    def worker() -> None:
+        try:
+            with zipfile.ZipFile(zip_path, "r") as own:
+                while not stop.is_set() and not (cancel is not None and cancel.cancelled):
+                    try:
+                        info, rel, dest_ext = todo.get_nowait()
+                    except queue.Empty:
+                        break
+                    _write_member(own, info, dest_ext)
+                    results.put((rel, None))
+        except Exception as e:
+            stop.set()
+            results.put((None, e))
+        finally:
+            results.put(finished)
+
+    workers = min(workers, len(jobs))
+    count = 0
+    error = None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coopui-overlay") as pool:
+        for _ in range(workers):
+            pool.submit(worker)
+        running = workers
+        while running:
+            item = results.get()
+            if item is finished:
+                running -= 1
+                continue
+            rel, exc = item
+            if exc is not None:
+                error = error or exc
+            else:
+                count += 1
+                progress.advance(item=rel)
+    if error is not None:
+        raise error
+    raise_if_cancelled(cancel)
+    return count
+
+
+# Plan actions for a bundle member (plan_overlay / overlay_bundle).
+PLAN_WRITE = "write"
+PLAN_PRESERVE = "preserve"
+PLAN_UNCHANGED = "unchanged"
+
+# Rough overlay throughput for plan estimates: a sustained write rate plus a fixed cost per
+# file (create, replace, antivirus scan), which dominates the Mono tree's small files.
+_EST_WRITE_BYTES_PER_SEC = 120 * 1024 * 1024
+_EST_SECONDS_PER_FILE = 0.003
+
+
+def _is_url(source: str) -> bool:
+    return source.lower().startswith(("http://", "https://"))
+
+
+def _plan_members(zf: zipfile.ZipFile, target_dir: str, incremental: bool) -> list:
+    """One plan entry per bundle file, decided from the central directory, the target's
+    existing files (through the active preserve rules) and (incremental) its CRC index."""
+    infos = zf.infolist()
+    prefix = _bundle_prefix([info.filename for info in infos])
+    rules = preserve_rules.active()
+    files = []
+    same_size = []
+    for info in infos:
+        if info.is_dir() or not info.filename.startswith(prefix):
+            continue
+        rel = _member_rel_path(info.filename[len(prefix):])
+        if not rel:
+            continue
+        try:
+            size = os.stat(_long_path(os.path.join(target_dir, rel.replace("/", os.sep)))).st_size
+        except OSError:
+            size = None
+        action = PLAN_WRITE
+        rule = rules.match(rel) if size is not None else None
+        if rule is not None and rule["action"] == preserve_rules.PRESERVE:
+            action = PLAN_PRESERVE
+        elif size is not None and incremental and size == info.file_size:
+            same_size.append(rel)
+        files.append({"name": info.filename, "rel": rel, "action": action,
+                      "size": info.file_size, "crc": f"{info.CRC:08x}",
+                      "rule": rule["id"] if action == PLAN_PRESERVE else None})
+    if same_size:
+        # Index hits are free; misses are hashed in parallel (and indexed for next time).
+        crc_index = CrcIndex(target_dir)
+        crcs = crc_index.digests(same_size)
+        crc_index.save()
+        for entry in files:
+            if entry["action"] == PLAN_WRITE and crcs.get(entry["rel"]) == entry["crc"]:
+                entry["action"] = PLAN_UNCHANGED
+    return files
+
+
+def plan_overlay(zip_path_or_url: str, target_dir: str, incremental: bool = True) -> dict:
     """
-    The EMU bundle normally extracts its files at the root (config/, lua/, MacroQuest.exe…),
-    but tolerate a single wrapping folder too.
+    Dry run of overlay_bundle(): what a Full Install / Repair with this bundle would do to
+    target_dir, from the zip's central directory only. A URL is read over HTTP Range
+    requests (downloader.RemoteFile) — or from the bundle cache when it already holds it —
+    so nothing is downloaded. Writes nothing to the install except the CRC index.
+
+    Returns {"source", "target", "files", "write", "preserve", "unchanged", "total",
+    "write_bytes", "preserve_bytes", "unchanged_bytes", "total_bytes", "download_bytes",
+    "est_seconds", "locked"}: files is [{"name", "rel", "action", "size", "crc", "rule"}]
+    with action one of PLAN_* and rule the id of the preserve rule behind a PLAN_PRESERVE;
+    the counts and byte totals are per action; download_bytes is what fetching the bundle
+    would cost (0 for a local or cached zip); locked is find_locked_files() over the
+    binaries the plan writes. overlay_bundle(plan=...) executes exactly this plan.
+
+    Raises zipfile.BadZipFile, http.client.HTTPException, urllib.error.URLError, OSError.
     """
-    entries = os.listdir(extract_dir)
-    if len(entries) == 1:
-        only = os.path.join(extract_dir, entries[0])
-        if os.path.isdir(only) and (
-            os.path.isfile(os.path.join(only, "MacroQuest.exe"))
-            or os.path.isdir(os.path.join(only, "lua"))
-        ):
-            return only
-    return extract_dir
+    path = zip_path_or_url
+    remote = None
+    download_bytes = 0
+    if _is_url(zip_path_or_url):
+        cache = bundle_cache.BundleCache.default()
+        path = cache.lookup(bundle_cache.release_asset_key(zip_path_or_url)) if cache else None
+        if path is None:
+            remote = RemoteFile(zip_path_or_url, timeout=30)
+            download_bytes = remote.size
+    try:
+        with zipfile.ZipFile(remote if remote is not None else path, "r") as zf:
+            files = _plan_members(zf, target_dir, incremental)
+    finally:
+        if remote is not None:
+            remote.close()
+
+    plan = {"source": zip_path_or_url, "target": target_dir, "files": files}
+    for action in (PLAN_WRITE, PLAN_PRESERVE, PLAN_UNCHANGED):
+        chosen = [f["size"] for f in files if f["action"] == action]
+        plan[action] = len(chosen)
+        plan[f"{action}_bytes"] = sum(chosen)
+    plan["total"] = len(files)
+    plan["total_bytes"] = sum(f["size"] for f in files)
+    plan["download_bytes"] = download_bytes
+    plan["est_seconds"] = round(
+        plan["write_bytes"] / _EST_WRITE_BYTES_PER_SEC + plan["write"] * _EST_SECONDS_PER_FILE, 1,
+    )
+    plan["locked"] = find_locked_files(target_dir, plan_write_paths(plan))
+    return plan
+
+
+def format_plan(plan: dict) -> str:
+    """Short user-facing summary of a plan_overlay() plan (GUI subtitle, CLI output)."""
+    mb = lambda n: f"{n / 1048576:.0f} MB" if n >= 1048576 else f"{n / 1024:.0f} KB"
+    lines = [
+        f"{plan['write']} file(s) to write ({mb(plan['write_bytes'])}), "
+        f"{plan['preserve']} user file(s) preserved, "
+        f"{plan['unchanged']} already up to date.",
+    ]
+    est = max(1, round(plan["est_seconds"]))
+    if plan["download_bytes"]:
+        lines.append(f"Download: {mb(plan['download_bytes'])}. Install time: about {est} s after the download.")
+    else:
+        lines.append(f"Install time: about {est} s.")
+    if plan["locked"]:
+        lines.append("Locked (close MacroQuest first): " + ", ".join(plan["locked"][:3]))
+    return "\n".join(lines)
 
 
 def overlay_bundle(zip_path: str, target_dir: str, progress_cb: ProgressCb = None,
-                   enable_coopt_plugin: bool = True) -> dict:
+                   enable_coopt_plugin: bool = True, incremental: bool = True,
+                   workers: int | None = None, plan: dict | None = None,
+                   cancel: CancelToken | None = None, bus: ProgressBus | None = None) -> dict:
     """
-    Extract `zip_path` to a temp dir, then copy each file into `target_dir`, skipping user
-    config/data that already exists (per should_preserve). Finally make sure MacroQuest.ini
-    loads our plugins. Returns {written, preserved, total}.
+    Stream every file in `zip_path` into `target_dir`, skipping user config/data that
+    already exists (per should_preserve). Finally make sure MacroQuest.ini loads our
+    plugins. Returns {written, preserved, unchanged, total}.
+
+    No temp extraction tree: each member is decompressed from ZipFile.open() into its
+    place in a Transaction's staging tree (transaction.py, on the install's volume) and
+    the whole set is committed at the end — the replaced files saved to a rollback
+    snapshot, then a batch of renames. Any failure before or during the commit leaves the
+    install exactly as it was (TransactionError for a file that could not be replaced).
+    Preserve decisions use the central-directory name, so a preserved file is never
+    decompressed.
+
+    incremental: a member whose size and CRC32 (from the central directory) match the
+    existing file is left alone and counted as unchanged. Target CRCs come from the
+    install's CrcIndex, so a repair of a healthy install reads and writes almost nothing.
+
+    workers: parallel writer threads (default: _overlay_workers()); 1 = serial. All
+    members are staged (directories created) on the calling thread before any writer runs.
+
+    plan: a plan_overlay() result for this bundle and target (e.g. the one the user was
+    shown); its decisions are executed as-is. Computed here when omitted. A plan whose
+    write entries are not in this zip raises zipfile.BadZipFile.
+
+    cancel (jobs.CancelToken): checked between members and once more before the commit;
+    a cancel aborts the transaction (staging discarded, install untouched) and raises
+    Cancelled.
+
+    Progress is an "Installing" phase over the plan's members on `bus` (default: one
+    emitting every _OVERLAY_PROGRESS_INTERVAL), reaching progress_cb over the second
+    half of the bar (the download took the first).
     """
+    if bus is None:
+        bus = ProgressBus(hz=1.0 / _OVERLAY_PROGRESS_INTERVAL)
+    if workers is None:
+        workers = _overlay_workers()
+    if plan is None:
+        plan = plan_overlay(zip_path, target_dir, incremental=incremental)
     os.makedirs(target_dir, exist_ok=True)
-    written = 0
     preserved = 0
-    # Manual temp dir + extended-path rmtree: TemporaryDirectory's own cleanup walks
-    # the SHORT path and dies on the deep Mono tree (same MAX_PATH problem).
-    tmp = tempfile.mkdtemp(prefix="coopui_bundle_")
+    unchanged = 0
+    macroquest_ini = None
+    total = len(plan["files"])
+    txn = Transaction(target_dir, "repair", also_snapshot=(INSTALLED_VERSION_PATH,))
     try:
-        # Extract member-by-member so the UI shows progress instead of freezing on one
-        # big extractall. Extraction covers 0.5→0.75 of the bar; the copy pass 0.75→1.0.
-        # All paths go through _long_path: the temp prefix + the bundle's deep Mono
-        # tree exceed MAX_PATH otherwise.
-        tmp_ext = _long_path(tmp)
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            members = zf.namelist()
-            n_members = len(members)
-            for i, member in enumerate(members):
-                if member.endswith("/"):
-                    continue
-                zf.extract(member, tmp_ext)
-                if progress_cb and n_members:
-                    progress_cb(
-                        f"Extracting: {member}",
-                        0.5 + 0.25 * (i + 1) / n_members,
-                    )
-        src_root = _bundle_source_root(tmp_ext)
-
-        files = []
-        for dirpath, _dirs, filenames in os.walk(src_root):
-            for fn in filenames:
-                full = os.path.join(dirpath, fn)
-                rel = os.path.relpath(full, src_root)
-                files.append((full, rel))
-
-        total = len(files)
-        macroquest_ini = None
-        for i, (full, rel) in enumerate(files):
-            rel_norm = rel.replace("\\", "/")
-            dest = os.path.join(target_dir, rel)
-            dest_ext = _long_path(dest)
-            if rel_norm.lower() == "config/macroquest.ini":
-                macroquest_ini = dest
-            if os.path.exists(dest_ext) and should_preserve(rel_norm):
-                preserved += 1
-            else:
-                os.makedirs(os.path.dirname(dest_ext), exist_ok=True)
-                # Atomic install: copy to <dest>.tmp then os.replace, so a crash
-                # mid-copy can never leave a truncated target (e.g. MacroQuest.exe).
-                tmp_dest = dest_ext + ".tmp"
-                try:
-                    shutil.copy2(full, tmp_dest)
-                    os.replace(tmp_dest, dest_ext)
-                except OSError:
+        with (zipfile.ZipFile(zip_path, "r") as zf,
+              bus.phase("Installing", total, sinks=[fraction_sink(progress_cb, 0.5, 1.0)]) as progress):
+            jobs = []
+            for entry in plan["files"]:
+                rel = entry["rel"]
+                if rel.lower() == "config/macroquest.ini":
+                    macroquest_ini = _long_path(os.path.join(target_dir, rel.replace("/", os.sep)))
+                if entry["action"] == PLAN_PRESERVE:
+                    preserved += 1
+                elif entry["action"] == PLAN_UNCHANGED:
+                    unchanged += 1
+                else:
                     try:
-                        os.remove(tmp_dest)
-                    except OSError:
-                        pass
-                    raise
-                written += 1
-            if progress_cb and total:
-                progress_cb(f"Installing: {rel_norm}", 0.75 + 0.25 * (i + 1) / total)
-
-        if macroquest_ini and os.path.isfile(_long_path(macroquest_ini)):
-            ensure_plugin_keys(macroquest_ini, enable_coopt_plugin=enable_coopt_plugin)
-    finally:
-        shutil.rmtree(_long_path(tmp), ignore_errors=True)
+                        info = zf.getinfo(entry["name"])
+                    except KeyError:
+                        info = None
+                    if info is None or f"{info.CRC:08x}" != entry["crc"]:
+                        raise zipfile.BadZipFile(
+                            f"{zip_path} does not match its install plan ({entry['name']})"
+                        )
+                    jobs.append((info, rel, txn.stage(rel)))
+                    continue
+                progress.advance(item=rel)
+            written = _write_members(zip_path, zf, jobs, workers, progress, cancel)
+        raise_if_cancelled(cancel)
+    except BaseException:
+        txn.abort()
+        raise
+    txn.commit()
+
+    if incremental and jobs:
+        crc_index = CrcIndex(target_dir)
+        for info, rel, _staged in jobs:
+            # ZipFile verified the CRC while streaming: no need to re-read.
+            crc_index.record(rel, f"{info.CRC:08x}")
+        crc_index.save()
 
-    return {"written": written, "preserved": preserved, "total": total}
+    if macroquest_ini and os.path.isfile(macroquest_ini):
+        ensure_plugin_keys(macroquest_ini, enable_coopt_plugin=enable_coopt_plugin)
+
+    return {"written": written, "preserved": preserved, "unchanged": unchanged, "total": total}
 
 
 # Critical CoOpt UI lua entrypoints. If any is missing/empty after an install the scripts
@@ -392,9 +639,41 @@ _LOCK_PROBE_FILES = (
     "plugins/MQ2Lua.dll",
     "plugins/MQ2CoOptUI.dll",
 )
+_LOCK_PROBE_EXTS = (".exe", ".dll")
+_LOCK_PROBE_WORKERS = 16
+# A probe that has not answered in this long (a stalled network share, an AV filter
+# holding the open) counts as a blocker: the install's write would stall the same way.
+LOCK_PROBE_TIMEOUT = 2.0
+
+
+def _lock_probe_list(paths) -> list:
+    """_LOCK_PROBE_FILES plus every .exe / .dll in paths, deduplicated case-insensitively
+    (Windows paths), in a stable order."""
+    rels, seen = [], set()
+    for rel in (*_LOCK_PROBE_FILES, *(paths or ())):
+        rel = rel.replace("\\", "/").lstrip("/")
+        key = rel.lower()
+        if key in seen or not key.endswith(_LOCK_PROBE_EXTS):
+            continue
+        seen.add(key)
+        rels.append(rel)
+    return rels
 
 
-def find_locked_files(target_dir: str) -> list:
+def _is_locked(path: str) -> bool:
+    try:
+        if not os.path.isfile(path):
+            return False
+        with open(path, "r+b"):
+            pass
+    except OSError:
+        return True
+    except Exception:
+        pass
+    return False
+
+
+def find_locked_files(target_dir: str, paths=None, timeout: float = LOCK_PROBE_TIMEOUT) -> list:
     """
     Return the names of install files that cannot currently be opened for writing.
 
@@ -404,45 +683,96 @@ def find_locked_files(target_dir: str) -> list:
     part-way through the install and leaves a half-written instance — the user closes MQ,
     retries, and it works, which is exactly how this bug reaches us as "it failed the first
     time". Also catches read-only files. Never raises.
+
+    Always probes _LOCK_PROBE_FILES. paths (install-relative, e.g. the manifest entries or
+    the plan's writes) adds every .exe / .dll the upcoming install will overwrite, so a
+    Mono or plugin binary held by something else is reported before the first write
+    instead of failing the install on it. Probes run concurrently on daemon threads; one
+    that does not answer within timeout seconds is reported as locked, and a stuck probe
+    never holds up the others or the caller. Missing files are skipped.
     """
-    locked = []
-    for rel in _LOCK_PROBE_FILES:
-        path = os.path.join(target_dir, rel.replace("/", os.sep))
+    rels = _lock_probe_list(paths)
+    if not rels or not os.path.isdir(target_dir):
+        return []
+    todo = queue.SimpleQueue()
+    for rel in rels:
+        todo.put(rel)
+    answers = queue.SimpleQueue()
+    started: dict[str, float] = {}
+    started_lock = threading.Lock()
+
+    def probe() -> None:
+        while True:
+            try:
+                rel = todo.get_nowait()
+            except queue.Empty:
+                return
+            with started_lock:
+                started[rel] = time.monotonic()
+            answers.put((rel, _is_locked(os.path.join(target_dir, rel.replace("/", os.sep)))))
+
+    def spawn() -> None:
+        threading.Thread(target=probe, daemon=True, name="coopui-lockprobe").start()
+
+    for _ in range(min(_LOCK_PROBE_WORKERS, len(rels))):
+        spawn()
+    locked, settled = set(), set()
+    while len(settled) < len(rels):
         try:
-            if not os.path.isfile(path):
-                continue
-            with open(path, "r+b"):
-                pass
-        except OSError:
-            locked.append(rel)
-        except Exception:
-            pass
-    return locked
+            rel, is_locked = answers.get(timeout=0.05)
+        except queue.Empty:
+            now = time.monotonic()
+            with started_lock:
+                stuck = [r for r, t in started.items() if r not in settled and now - t > timeout]
+            for rel in stuck:
+                settled.add(rel)
+                locked.add(rel)
+                spawn()  # replace the stuck worker so the remaining probes still run
+            continue
+        if rel not in settled:
+            settled.add(rel)
+            if is_locked:
+                locked.add(rel)
+    return [rel for rel in rels if rel in locked]
+
 
+def _describe_locked(locked: list) -> str:
+    shown = ", ".join(locked[:5])
+    return shown + (f" and {len(locked) - 5} more" if len(locked) > 5 else "")
 
-def preflight_blockers(target_dir: str) -> Optional[str]:
+
+def preflight_blockers(target_dir: str, paths=None) -> Optional[str]:
     """
     Return a user-facing reason the install/update must not start, or None when clear.
 
     Every write path (update, full install/repair, fresh install) must call this first.
     Starting a write over a live install is not recoverable mid-flight: os.replace fails on
     the first locked binary and the install aborts having already written everything before
-    it.
+    it. Pass the paths the write will touch (manifest entries, plan writes) when they are
+    known: every binary among them is probed too, and all blockers are named at once, so
+    the user fixes everything before the first write rather than one retry at a time.
     """
     if is_macroquest_running():
         return "Close MacroQuest and EverQuest, then retry."
-    locked = find_locked_files(target_dir)
+    locked = find_locked_files(target_dir, paths)
     if locked:
         return (
             "These files are locked by another program (MacroQuest may still be running in "
             "the system tray, possibly under a different name): "
-            + ", ".join(locked[:3])
+            + _describe_locked(locked)
             + ". Exit MacroQuest completely, then retry."
         )
     return None
 
 
-def smart_install(target_dir: str, repo_base_url: str, progress_cb: ProgressCb = None) -> tuple[bool, str]:
+def plan_write_paths(plan: dict) -> list:
+    """Install-relative paths a plan_overlay() plan will write (for preflight_blockers)."""
+    return [f["rel"] for f in plan["files"] if f["action"] == PLAN_WRITE]
+
+
+def smart_install(target_dir: str, repo_base_url: str, progress_cb: ProgressCb = None,
+                  plan: dict | None = None, cancel: CancelToken | None = None,
+                  bus: ProgressBus | None = None) -> tuple[bool, str]:
     """
     Full install / repair in two phases — the same layering every working install in
     the field has. progress_cb(message, fraction_0_to_1).
@@ -463,7 +793,27 @@ def smart_install(target_dir: str, repo_base_url: str, progress_cb: ProgressCb =
 
     Works for an empty folder, a vanilla MQ, the E3 distro, or an existing CoOpt
     install (preserve rules keep user config in all cases).
+
+    plan: a plan_overlay() of the latest release's bundle the user was shown; Phase 1
+    executes it when that is the bundle actually installed (otherwise it re-plans).
+
+    Each phase commits as one transaction (transaction.py) in a shared snapshot group,
+    so "Revert to previous version" undoes the whole install / repair.
+
+    cancel (jobs.CancelToken) reaches the bundle download, the overlay and the Phase 2
+    patch, and raises Cancelled. A phase that has committed stays committed (Revert
+    undoes it); the phase in progress leaves nothing behind.
+
+    bus (progress_bus.ProgressBus): every step reports a phase on it — Downloading,
+    Installing, Updating, Defaults — e.g. for a JSON log; progress_cb gets the same
+    events, rate-limited, as (message, fraction).
     """
+    with transaction_group():
+        return _smart_install(target_dir, repo_base_url, progress_cb, plan, cancel, bus or ProgressBus())
+
+
+def _smart_install(target_dir: str, repo_base_url: str, progress_cb: ProgressCb,
+                   plan: dict | None, cancel: CancelToken | None, bus: ProgressBus) -> tuple[bool, str]:
     def seg(lo: float, hi: float) -> ProgressCb:
         def cb(msg: str, frac: float):
             if progress_cb:
@@ -479,21 +829,30 @@ def smart_install(target_dir: str, repo_base_url: str, progress_cb: ProgressCb =
     # ensure_plugin_keys) and CoOpt runs in Lua mode.
     base_note = ""
     zip_path = None
+    zip_is_temp = False
+    zip_key = None
     stock_base = False
+    # Bundles are kept between runs (bundle_cache.py): a retry or a second install's
+    # repair reuses the download instead of fetching ~1GB again.
+    cache = bundle_cache.BundleCache.default()
+    # Preserve rules ship next to the manifests; the built-in copy covers a failed fetch.
+    preserve_rules.refresh(repo_base_url)
     try:
         url, _ver, err = get_latest_release_zip_url()
         if not err and url and "emu" in (url or "").lower():
             if progress_cb:
                 progress_cb("Downloading CoOpt EMU bundle...", 0.0)
+            zip_key = bundle_cache.release_asset_key(url)
             try:
-                zip_path = _download_zip(url, seg(0.0, 0.7))
-            except (http.client.HTTPException, urllib.error.URLError, OSError) as e:
+                zip_path, zip_is_temp = _fetch_bundle(url, zip_key, cache, seg(0.0, 0.7), cancel, bus)
+            except (http.client.HTTPException, urllib.error.URLError, OSError,
+                    zipfile.BadZipFile) as e:
                 if getattr(e, "errno", None) == errno.ENOSPC:
                     return False, "Not enough disk space."
                 zip_path = None
         if zip_path is None:
             # The stock-E3 fallback is a DIFFERENT MacroQuest family. Overlaying it replaces
-            # every .exe/.dll in the target (they are in _CODE_EXTS) and force-disables
+            # every .exe/.dll in the target (the code-and-binaries preserve rule) and force-disables
             # MQ2CoOptUI, so applying it to a working CoOpt install silently downgrades that
             # install and turns off the plugin — while reporting success. The trigger does not
             # even need a failed download: get_latest_release_zip_url() returns an error on a
@@ -521,46 +880,75 @@ def smart_install(target_dir: str, repo_base_url: str, progress_cb: ProgressCb =
             )
             if progress_cb:
                 progress_cb(f"Downloading base environment: {BASE_BUNDLE_NAME}...", 0.0)
-            zip_path = _download_zip(BASE_BUNDLE_ZIP_URL, seg(0.0, 0.7))
+            # The zipball is a moving branch: only its ETag identifies the content.
+            zip_key = bundle_cache.etag_key(_remote_etag(BASE_BUNDLE_ZIP_URL)) if cache else None
+            zip_path, zip_is_temp = _fetch_bundle(BASE_BUNDLE_ZIP_URL, zip_key, cache, seg(0.0, 0.7), cancel, bus)
+        zip_url = BASE_BUNDLE_ZIP_URL if stock_base else url
         summary = overlay_bundle(zip_path, target_dir, seg(0.0, 0.7),
-                                 enable_coopt_plugin=not stock_base)
+                                 enable_coopt_plugin=not stock_base,
+                                 plan=plan if plan and plan.get("source") == zip_url else None,
+                                 cancel=cancel, bus=bus)
     except zipfile.BadZipFile:
+        if cache is not None and zip_key and not zip_is_temp:
+            cache.discard(zip_key)
         return False, "Downloaded bundle is not a valid ZIP (the download may be corrupted)."
+    except TransactionError as e:
+        # The overlay commits as one transaction: a file that cannot be replaced rolls
+        # back the ones already moved, so the install is exactly as it was.
+        if e.errno == errno.ENOSPC:
+            return False, "Not enough disk space."
+        if not e.rolled_back:
+            return False, (
+                f"Install stopped: {e}\n\nSome files could not be put back yet. Exit "
+                "MacroQuest completely and start the patcher again — it finishes the "
+                "rollback before doing anything else."
+            )
+        return False, (
+            f"Install stopped: {e}\n\nNothing was changed — the install is exactly as it "
+            "was. This almost always means MacroQuest or EverQuest is still running (the "
+            "MacroQuest tray can run under a different name). Exit both completely and "
+            "run the install again."
+        )
     except (http.client.HTTPException, urllib.error.URLError, OSError) as e:
         if getattr(e, "errno", None) == errno.ENOSPC:
             return False, "Not enough disk space."
-        # A write failure part-way through the overlay leaves a partially-updated folder.
-        # Say so plainly and name the usual cause, rather than surfacing a bare WinError:
-        # re-running after closing MacroQuest completes the install (the overlay is
-        # idempotent), but the user has to be told that.
+        # A write failure while staging the overlay leaves the install untouched (nothing
+        # is moved in before the commit). Name the usual cause rather than surfacing a
+        # bare WinError.
         if isinstance(e, OSError) and getattr(e, "errno", None) in (errno.EACCES, errno.EPERM, errno.EBUSY):
             return False, (
-                f"Install stopped part-way through — a file could not be replaced: {e}\n\n"
-                "This almost always means MacroQuest or EverQuest is still running (the "
-                "MacroQuest tray can run under a different name). Exit both completely and "
-                "run the install again — it will pick up where it left off."
+                f"Install stopped — a file could not be written: {e}\n\n"
+                "Nothing was changed. This usually means MacroQuest or EverQuest is still "
+                "running (the MacroQuest tray can run under a different name) or the folder "
+                "is read-only. Exit both completely and run the install again."
             )
         return False, f"Install failed: {e}"
     finally:
-        if zip_path:
+        if zip_path and zip_is_temp:
             try:
                 os.unlink(zip_path)
             except OSError:
                 pass
 
     # --- Phase 2: CoOpt overlay from the release manifest ---
+    raise_if_cancelled(cancel)
     p2 = seg(0.7, 0.95)
     if progress_cb:
         progress_cb("Applying CoOpt UI (release manifest)...", 0.7)
-    to_update, manifest_version, _changelog, err = check_for_updates(repo_base_url, target_dir)
+    # rehash: a repair must not trust the hash index — it is exactly the tool for an
+    # install whose files changed behind the patcher's back.
+    to_update, manifest_version, _changelog, err = check_for_updates(
+        repo_base_url, target_dir, rehash=True,
+    )
     if err:
         return False, "Base environment installed, but the CoOpt overlay failed: " + err
     coopt_written = 0
     if to_update:
-        ok, msg, _skipped = patch(
-            to_update, repo_base_url, target_dir,
-            progress_callback=lambda i, t, p: p2(f"CoOpt: {p}", (i / t) if t else 1.0),
-        )
+        with bus.phase("Updating", len(to_update), sinks=[fraction_sink(p2)]) as phase:
+            ok, msg, _skipped = patch(
+                to_update, repo_base_url, target_dir,
+                progress_callback=phase.callback(), cancel=cancel,
+            )
         if not ok:
             return False, "Base environment installed, but the CoOpt overlay failed: " + msg
         coopt_written = len(to_update)
@@ -570,10 +958,11 @@ def smart_install(target_dir: str, repo_base_url: str, progress_cb: ProgressCb =
     defaults_note = ""
     defaults, derr = check_for_default_config(repo_base_url, target_dir)
     if not derr and defaults:
-        ok, dmsg = install_default_config(
-            defaults, repo_base_url, target_dir,
-            progress_callback=lambda i, t, p: p3(f"Defaults: {p}", (i / t) if t else 1.0),
-        )
+        with bus.phase("Defaults", len(defaults), sinks=[fraction_sink(p3)]) as phase:
+            ok, dmsg = install_default_config(
+                defaults, repo_base_url, target_dir,
+                progress_callback=phase.callback(), cancel=cancel,
+            )
         if not ok:
             defaults_note = f"\n\nNOTE: default config install had a problem ({dmsg}) - the UI creates critical files on first run."
     if manifest_version:
@@ -605,8 +994,50 @@ def smart_install(target_dir: str, repo_base_url: str, progress_cb: ProgressCb =
             'on "loop or previous error" until a restart.'
         )
     return True, (
-        f"Install/repair complete{vtag}: {summary['written']} base files written, "
-        f"{coopt_written} CoOpt file(s) applied, {summary['preserved']} user config file(s) preserved."
+        f"Install/repair complete{vtag}: {summary['written']} base files written "
+        f"({summary['unchanged']} already up to date), {coopt_written} CoOpt file(s) applied, {summary['preserved']} user config file(s) preserved."
         "\n\nNext: start MacroQuest fresh, then in-game run  /lua run itemui  "
         "(and /lua run scripttracker)." + plugin_note + base_note + defaults_note + mq_note
     )
+
+
+def main(argv: list | None = None) -> int:
+    """Dry-run CLI: python installer.py <zip | url | latest> <MQ root> [--json | --files].
+    Exit status 0, 1 when the plan could not be made, 2 when target files are locked."""
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(
+        description="Show what a Full Install / Repair would write, preserve and skip "
+                    "(reads only the bundle's zip directory; changes nothing).",
+    )
+    parser.add_argument("bundle", help="bundle zip path or URL, or 'latest' for the latest CoOpt release")
+    parser.add_argument("target", help="MacroQuest folder to plan against")
+    parser.add_argument("--json", action="store_true", help="print the whole plan as JSON")
+    parser.add_argument("--files", action="store_true", help="also list every file and its action")
+    args = parser.parse_args(argv)
+
+    source = args.bundle
+    if source == "latest":
+        source, _ver, err = get_latest_release_zip_url()
+        if err or not source:
+            print(f"Could not find the latest release: {err}", file=sys.stderr)
+            return 1
+    try:
+        plan = plan_overlay(source, args.target)
+    except (zipfile.BadZipFile, http.client.HTTPException, urllib.error.URLError, OSError) as e:
+        print(f"Could not plan the install: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(plan, indent=1))
+    else:
+        print(f"{source} -> {args.target}")
+        if args.files:
+            for entry in plan["files"]:
+                rule = f"  [{entry['rule']}]" if entry.get("rule") else ""
+                print(f"  {entry['action']:<9} {entry['size']:>12}  {entry['rel']}{rule}")
+        print(format_plan(plan))
+    return 2 if plan["locked"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Background jobs for the patcher window: cooperative cancellation, a small priority
+scheduler, and the one channel worker threads use to reach Tk.
+
+  CancelToken   handed to the long operations (updater.patch, installer._download_zip,
+                overlay_bundle, smart_install, batch.update_all) as `cancel`. They call
+                raise_if_cancelled() between files / chunks and raise Cancelled after
+                aborting their transaction, so a cancelled update leaves the install
+                exactly as it was and stops using the network and the disk.
+  JobScheduler  a few worker threads over a priority queue: update checks (PRIORITY_CHECK)
+                run before queued writes (PRIORITY_WRITE), background work last.
+  UiChannel     results and progress from workers, drained on the Tk thread by one
+                after() poll. Progress posted under a key is coalesced: only the latest
+                update per key is applied, however fast a worker reports.
+
+Cancelled derives from BaseException, like asyncio.CancelledError: the `except
+Exception` guards around every worker must not turn a cancel into an error message.
+A commit that has started is never interrupted — cancellation only takes effect at the
+next check, and every operation checks one last time before it commits.
+"""
+
+import heapq
+import itertools
+import threading
+import traceback
+from typing import Any, Callable
+
+# Job priorities: lower runs first.
+PRIORITY_CHECK = 0
+PRIORITY_WRITE = 10
+PRIORITY_BACKGROUND = 20
+
+DEFAULT_JOB_WORKERS = 2
+# How often the UI channel is drained on the Tk thread.
+UI_POLL_MS = 50
+
+# Job states.
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+
+class Cancelled(BaseException):
+    """The operation was cancelled through its CancelToken. Nothing was committed."""
+
+
+class CancelToken:
+    """One job's cancellation flag; thread-safe, set once."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """Raise Cancelled if the token was cancelled."""
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Sleep up to timeout; True as soon as the token is cancelled."""
+        return self._event.wait(timeout)
+
+
+def raise_if_cancelled(cancel: CancelToken | None) -> None:
+    """cancel.check() for the optional `cancel` parameters (None: never cancelled)."""
+    if cancel is not None:
+        cancel.check()
+
+
+class UiChannel:
+    """
+    Thread-safe queue of callables for the Tk thread. post() may be called from any
+    thread; drain() runs everything pending, in order, on the thread that calls it —
+    attach() polls it from the Tk event loop. A post with a key replaces the pending one
+    with the same key (moving it to the end), so a flood of progress updates costs one
+    widget update per poll. Callables posted with a widget are dropped once that widget
+    has been destroyed (the view was closed while its job finished).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: dict = {}
+        self._seq = itertools.count()
+
+    def post(self, fn: Callable[[], Any], key: Any = None, widget=None) -> None:
+        with self._lock:
+            if key is None:
+                key = ("_", next(self._seq))
+            self._pending.pop(key, None)
+            self._pending[key] = (fn, widget)
+
+    def drain(self) -> int:
+        """Run the pending callables; returns how many ran."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        ran = 0
+        for fn, widget in pending.values():
+            try:
+                if widget is not None and not widget.winfo_exists():
+                    continue
+                fn()
+                ran += 1
+            except Exception:
+                # One broken callback must not drop the rest of the batch.
+                traceback.print_exc()
+        return ran
+
+    def attach(self, tk_root, interval_ms: int = UI_POLL_MS) -> None:
+        """Drain every interval_ms on tk_root's event loop, for as long as it exists."""
+        def tick():
+            self.drain()
+            tk_root.after(interval_ms, tick)
+        tk_root.after(interval_ms, tick)
+
+
+class Job:
+    """A submitted unit of work. fn(token) runs on a scheduler thread."""
+
+    def __init__(self, name: str, fn: Callable[[CancelToken], Any], priority: int, owner: Any):
+        self.name = name
+        self.fn = fn
+        self.priority = priority
+        self.owner = owner
+        self.token = CancelToken()
+        self.state = QUEUED
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self._done = threading.Event()
+        self._callbacks: list[Callable[["Job"], None]] = []
+
+    def cancel(self) -> None:
+        self.token.cancel()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+
+class JobScheduler:
+    """
+    Priority queue + `workers` daemon threads (started on first use). submit() returns
+    the Job; its outcome reaches the UI through `channel`:
+
+      on_done(result)   fn returned (even if a cancel arrived after its last check —
+                        the work was done, e.g. the commit had started)
+      on_cancel()       fn raised Cancelled, or the job was cancelled before it started
+      on_error(exc)     anything else; printed when there is no on_error
+
+    Without a channel the callbacks run on the worker thread (tests, headless use).
+    """
+
+    def __init__(self, workers: int = DEFAULT_JOB_WORKERS, channel: UiChannel | None = None):
+        self.workers = max(1, int(workers))
+        self.channel = channel
+        self._cond = threading.Condition()
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._active: list[Job] = []
+        self._threads: list[threading.Thread] = []
+
+    def submit(self, name: str, fn: Callable[[CancelToken], Any], priority: int = PRIORITY_WRITE,
+               on_done: Callable[[Any], None] | None = None,
+               on_cancel: Callable[[], None] | None = None,
+               on_error: Callable[[BaseException], None] | None = None,
+               owner: Any = None) -> Job:
+        """Queue fn(token). owner (typically the view) groups jobs for cancel(owner=...)
+        and is the widget whose callbacks are dropped once it is destroyed."""
+        job = Job(name, fn, priority, owner)
+        job._callbacks.append(lambda j: self._deliver(j, on_done, on_cancel, on_error))
+        with self._cond:
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self._active.append(job)
+            if len(self._threads) < self.workers:
+                t = threading.Thread(target=self._worker, daemon=True, name="coopui-job")
+                self._threads.append(t)
+                t.start()
+            self._cond.notify()
+        return job
+
+    def jobs(self, owner: Any = None, min_priority: int | None = None) -> list[Job]:
+        """Queued and running jobs (of one owner / at min_priority or later, when given)."""
+        with self._cond:
+            return [j for j in self._active if (owner is None or j.owner is owner)
+                    and (min_priority is None or j.priority >= min_priority)]
+
+    def busy(self, owner: Any = None, min_priority: int | None = None) -> bool:
+        return bool(self.jobs(owner, min_priority))
+
+    def cancel(self, owner: Any = None) -> list[Job]:
+        """Cancel every queued and running job (of one owner). Queued ones never start;
+        running ones stop at their next check. Returns the jobs cancelled."""
+        jobs = self.jobs(owner)
+        for job in jobs:
+            job.cancel()
+        with self._cond:
+            queued = [entry[2] for entry in self._heap if entry[2].token.cancelled]
+            if queued:
+                self._heap = [entry for entry in self._heap if not entry[2].token.cancelled]
+                heapq.heapify(self._heap)
+        for job in queued:
+            job.state = CANCELLED
+            self._finish(job)
+        return jobs
+
+    def wait_idle(self, timeout: float | None = None, owner: Any = None) -> bool:
+        """Block until no job (of owner) is queued or running; False on timeout."""
+        for job in self.jobs(owner):
+            if not job.wait(timeout):
+                return False
+        return True
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _prio, _seq, job = heapq.heappop(self._heap)
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        if job.token.cancelled:
+            job.state = CANCELLED
+        else:
+            job.state = RUNNING
+            try:
+                job.result = job.fn(job.token)
+                job.state = DONE
+            except Cancelled:
+                job.state = CANCELLED
+            except BaseException as e:
+                job.error = e
+                job.state = FAILED
+        self._finish(job)
+
+    def _finish(self, job: Job) -> None:
+        with self._cond:
+            self._active.remove(job)
+        job._done.set()
+        for callback in job._callbacks:
+            callback(job)
+
+    def _deliver(self, job: Job, on_done, on_cancel, on_error) -> None:
+        if job.state == DONE:
+            call = (lambda: on_done(job.result)) if on_done else None
+        elif job.state == CANCELLED:
+            call = on_cancel
+        elif on_error:
+            call = lambda: on_error(job.error)
+        else:
+            err = job.error
+            call = lambda: traceback.print_exception(type(err), err, err.__traceback__)
+        if call is None:
+            return
+        if self.channel is None:
+            call()
+        else:
+            self.channel.post(call, widget=_widget(job.owner))
+
+
+def _widget(owner: Any):
+    """owner when it is a Tk widget (has winfo_exists), else None."""
+    return owner if hasattr(owner, "winfo_exists") else None
@@ -0,0 +1,134 @@
+"""
+The patcher window's patch log, kept off the widget: a full install logs thousands of
+lines, and one CTkTextbox insert per line re-lays out the whole widget every time.
+
+Workers append() lines from any thread; the view calls flush() on a timer, which moves
+everything pending into a bounded ring (the last `capacity` lines) and appends it to the
+spill file in one write — the file has the complete log, memory only the tail. The view
+asks for window(start, count) of the lines that pass the current filter and draws just
+those rows, so its cost per flush does not grow with the log.
+
+Lines are classified as they arrive: ERROR (a failure), SKIP (a file patch() skipped),
+INFO otherwise. set_filter(ERROR) / set_filter(SKIP) narrows the view to one kind.
+"""
+
+import itertools
+import os
+import threading
+from collections import deque
+
+# Lines kept in memory; older ones are only in the spill file.
+DEFAULT_LOG_CAPACITY = 5000
+
+# Line kinds.
+INFO = "info"
+ERROR = "error"
+SKIP = "skip"
+
+_SKIP_MARKERS = ("(skipped", "skipped:")
+_ERROR_MARKERS = ("error", "failed", "could not", "not enough disk", "mismatch", "incomplete")
+
+
+def classify(line: str) -> str:
+    """ERROR, SKIP or INFO for a log line (SKIP wins: "(skipped: x)" is not a failure)."""
+    lower = line.lower()
+    if any(m in lower for m in _SKIP_MARKERS):
+        return SKIP
+    if any(m in lower for m in _ERROR_MARKERS):
+        return ERROR
+    return INFO
+
+
+class LogBuffer:
+    """Bounded, filterable log with the full text spilled to a file (see module doc)."""
+
+    def __init__(self, capacity: int = DEFAULT_LOG_CAPACITY, spill_path: str | None = None):
+        self.capacity = max(1, int(capacity))
+        self._lock = threading.Lock()
+        self._pending: list = []
+        self._spill = None
+        self.reset(spill_path)
+
+    def reset(self, spill_path: str | None = None) -> None:
+        """Start a new log (the next operation's), spilling to spill_path (truncated).
+        Call on the flushing thread."""
+        self.close()
+        with self._lock:
+            self._pending = []
+        self._ring: deque = deque(maxlen=self.capacity)  # (seq, kind, text)
+        self._view: deque = deque()  # the ring entries passing the filter
+        self._seq = itertools.count()
+        self.filter: str | None = None
+        self.total = 0
+        self.counts = {INFO: 0, ERROR: 0, SKIP: 0}
+        self.spill_path = None
+        if spill_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(spill_path)), exist_ok=True)
+                self._spill = open(spill_path, "w", encoding="utf-8")
+                self.spill_path = spill_path
+            except OSError:
+                self._spill = None  # the log still shows; only the file is missing
+
+    def append(self, line: str, kind: str | None = None) -> None:
+        """Queue a line (any thread); a multi-line message becomes one line per row, all
+        of the same kind. kind defaults to classify(line)."""
+        text = line.rstrip("\n")
+        kind = kind or classify(text)
+        with self._lock:
+            self._pending.extend((kind, part) for part in text.split("\n"))
+
+    def flush(self) -> int:
+        """Move pending lines into the ring and the spill file; returns how many."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        for kind, text in batch:
+            entry = (next(self._seq), kind, text)
+            self._ring.append(entry)
+            self.counts[kind] += 1
+            if self.filter is None or kind == self.filter:
+                self._view.append(entry)
+        self.total += len(batch)
+        # Entries that fell out of the ring leave the filtered view too.
+        oldest = self._ring[0][0]
+        while self._view and self._view[0][0] < oldest:
+            self._view.popleft()
+        if self._spill is not None:
+            try:
+                self._spill.write("".join(text + "\n" for _kind, text in batch))
+                self._spill.flush()
+            except OSError:
+                self._spill = None
+        return len(batch)
+
+    def set_filter(self, kind: str | None) -> None:
+        """Show only lines of one kind (ERROR / SKIP); None shows everything."""
+        self.filter = kind
+        self._view = deque(e for e in self._ring if kind is None or e[1] == kind)
+
+    @property
+    def dropped(self) -> int:
+        """Lines no longer in memory (still in the spill file)."""
+        return self.total - len(self._ring)
+
+    def __len__(self) -> int:
+        """Lines in memory that pass the filter."""
+        return len(self._view)
+
+    def window(self, start: int, count: int) -> list:
+        """[(kind, text)] for filtered lines start .. start+count-1."""
+        # Indexing a deque walks its blocks from the nearer end: cheap at either end of
+        # the log, which is where the view almost always is.
+        view = self._view
+        start = max(0, start)
+        return [view[i][1:] for i in range(start, min(len(view), start + max(0, count)))]
+
+    def close(self) -> None:
+        if self._spill is not None:
+            try:
+                self._spill.close()
+            except OSError:
+                pass
+            self._spill = None
@@ -0,0 +1,115 @@
+"""
+Conditional (ETag / Last-Modified) fetches for the manifests, cached next to
+patcher_config.json as manifest_cache.json.
+
+Every launch used to download release_manifest.json and default_config_manifest.json in
+full. Now the last body of each URL is kept with its validators and the next request sends
+If-None-Match / If-Modified-Since: a 304 reuses the cached body. raw.githubusercontent.com
+answers those without a body, and conditional requests that come back 304 do not count
+against the GitHub API rate limit — which shared-NAT households hit often.
+
+fresh_install.get_latest_release_zip_url() uses the same cache for the GitHub Releases API.
+
+The cache also remembers, per install, a digest of the local state at the last check
+that found it up to date (see updater._local_state_digest), so a 304 plus an unchanged
+local state is "Up to date" without comparing a single file hash.
+"""
+
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import config
+
+CACHE_FILENAME = "manifest_cache.json"
+USER_AGENT = "CoOptUIPatcher"
+
+_lock = threading.Lock()
+
+
+def _cache_path() -> str:
+    return config.data_path(CACHE_FILENAME)
+
+
+def _load() -> dict:
+    try:
+        with open(_cache_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {"urls": {}, "states": {}}
+    if not isinstance(data, dict):
+        return {"urls": {}, "states": {}}
+    for key in ("urls", "states"):
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+    return data
+
+
+def _save(data: dict) -> None:
+    path = _cache_path()
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # a cache we cannot write just means a full fetch next time
+
+
+def fetch(url: str, timeout: float = 15, headers: dict | None = None) -> tuple[str, bool]:
+    """
+    GET url, conditionally when a cached copy exists. Returns (body_text, not_modified);
+    not_modified=True means the server answered 304 and body_text is the cached body.
+
+    Raises exactly what urllib.request.urlopen raises (HTTPError, URLError, OSError, ...),
+    so callers keep their status-code handling. A 304 with nothing cached is re-raised
+    as the HTTPError it is.
+    """
+    with _lock:
+        entry = _load()["urls"].get(url)
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, **(headers or {})})
+    if isinstance(entry, dict) and isinstance(entry.get("body"), str):
+        if entry.get("etag"):
+            req.add_header("If-None-Match", entry["etag"])
+        if entry.get("last_modified"):
+            req.add_header("If-Modified-Since", entry["last_modified"])
+    else:
+        entry = None
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = resp.read().decode("utf-8", errors="replace")
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and entry is not None:
+            return entry["body"], True
+        raise
+    if etag or last_modified:
+        with _lock:
+            data = _load()
+            data["urls"][url] = {"etag": etag, "last_modified": last_modified, "body": body}
+            _save(data)
+    return body, False
+
+
+def get_state(key: str) -> str | None:
+    """Local-state digest recorded by remember_state(key, ...), or None."""
+    with _lock:
+        value = _load()["states"].get(key)
+    return value if isinstance(value, str) else None
+
+
+def remember_state(key: str, digest: str | None) -> None:
+    """Record (or with digest=None, clear) the up-to-date local-state digest for key."""
+    with _lock:
+        data = _load()
+        if digest is None:
+            if data["states"].pop(key, None) is None:
+                return
+        else:
+            if data["states"].get(key) == digest:
+                return
+            data["states"][key] = digest
+        _save(data)
@@ -0,0 +1,123 @@
+"""
+Merkle directory digests for release_manifest.json (schema 2).
+
+A v2 manifest keeps the flat v1 "files" array (older patcher exes read only that) and
+adds a "tree" object: {directory: digest} for every directory that holds a manifest
+file, "" being the root. A directory's digest is the sha256 over its sorted children —
+one line per file ("f <name> <hash>") and per subdirectory ("d <name> <digest>") — so
+it changes exactly when something below it changes.
+
+The updater keeps the tree it last saw an install fully match in
+<MQ root>/.coopui/manifest_tree.json. On the next check it walks the new tree from the
+root and only descends into directories whose digest differs, so a one-file hotfix
+hashes a handful of files instead of every file in the release. The tree says nothing
+about the files on disk: the updater still stats every skipped file against the hash
+index, so one deleted or edited under an unchanged directory is compared too.
+"""
+
+import hashlib
+import json
+import os
+
+from hash_index import state_path
+
+SCHEMA_VERSION = 2
+LOCAL_TREE_NAME = "manifest_tree.json"
+
+
+def _parent(path: str) -> str:
+    return path.rsplit("/", 1)[0] if "/" in path else ""
+
+
+def _name(path: str) -> str:
+    return path.rsplit("/", 1)[-1]
+
+
+def build_tree(files: list) -> dict[str, str]:
+    """Directory digests for a list of {"path", "hash"} entries (see module docstring)."""
+    children: dict[str, list[str]] = {"": []}
+    for entry in files:
+        if not isinstance(entry, dict) or not entry.get("path") or not entry.get("hash"):
+            continue
+        path = entry["path"].replace("\\", "/").strip("/")
+        d = _parent(path)
+        children.setdefault(d, []).append(f"f {_name(path)} {entry['hash'].lower()}")
+        # Register every ancestor so empty intermediate levels (lua/ holding only lua/x/)
+        # still get a digest.
+        while d:
+            children.setdefault(_parent(d), [])
+            d = _parent(d)
+    tree: dict[str, str] = {}
+    # Deepest directories first, so a child's digest exists before its parent's.
+    for d in sorted(children, key=lambda p: (-(p.count("/") + (1 if p else 0)), p)):
+        lines = list(children[d])
+        for sub in children:
+            if sub and _parent(sub) == d:
+                lines.append(f"d {_name(sub)} {tree[sub]}")
+        tree[d] = hashlib.sha256("\n".join(sorted(lines)).encode("utf-8")).hexdigest()
+    return tree
+
+
+def changed_files(files: list, remote_tree: dict, local_tree: dict) -> list:
+    """
+    Entries of `files` under directories whose remote digest differs from the cached
+    local one. Subtrees with equal digests are skipped without looking inside.
+    """
+    if remote_tree.get("") and remote_tree.get("") == local_tree.get(""):
+        return []
+    by_dir: dict[str, list] = {}
+    for entry in files:
+        if isinstance(entry, dict) and entry.get("path"):
+            by_dir.setdefault(_parent(entry["path"].replace("\\", "/").strip("/")), []).append(entry)
+    subdirs: dict[str, list[str]] = {}
+    for d in remote_tree:
+        if d:
+            subdirs.setdefault(_parent(d), []).append(d)
+
+    out = []
+    stack = [""]
+    while stack:
+        d = stack.pop()
+        if d in local_tree and local_tree[d] == remote_tree.get(d):
+            continue
+        out.extend(by_dir.get(d, []))
+        stack.extend(subdirs.get(d, []))
+    return out
+
+
+def matched_tree(remote_tree: dict, stale_paths: list) -> dict[str, str]:
+    """
+    The part of remote_tree an install now provably matches: every directory except those
+    containing (at any depth) one of stale_paths.
+    """
+    dirty = set()
+    for path in stale_paths:
+        d = _parent(path.replace("\\", "/").strip("/"))
+        while True:
+            dirty.add(d)
+            if not d:
+                break
+            d = _parent(d)
+    return {d: h for d, h in remote_tree.items() if d not in dirty}
+
+
+def load_local_tree(root_path: str) -> dict:
+    try:
+        with open(state_path(root_path, LOCAL_TREE_NAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    tree = data.get("tree") if isinstance(data, dict) else None
+    return tree if isinstance(tree, dict) else {}
+
+
+def save_local_tree(root_path: str, tree: dict) -> None:
+    path = state_path(root_path, LOCAL_TREE_NAME)
+    tmp = path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"tree": tree}, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # cache only: the next check just compares more files
@@ -0,0 +1,228 @@
+"""
+Content-addressed object store shared by every MQ root on the machine.
+
+Multi-boxers keep several MacroQuest roots and used to download every release file once
+per root. The patcher now keeps each file it has verified in object_store/ next to the
+exe (the same place as patcher_config.json), named by its normalized sha256 — the
+manifest "hash". patch() and install_default_config() materialize a file from here
+before touching the network, so updating five installs costs one download, not five.
+
+Objects are copied into installs by default, as a copy-on-write clone where the volume
+supports it (fastcopy). With "object_store_hardlinks" set in patcher_config.json they are
+hardlinked when they cannot be cloned (same volume only), which saves disk but means an
+in-place edit of an installed file changes the object and every other install linked to
+it — acceptable for the read-only Lua/DLL payload, not for config files a user edits.
+Every materialization re-hashes the object, so a corrupted object is dropped and
+downloaded again rather than installed.
+
+The store is a cache: least-recently-used objects are evicted above
+"object_store_max_mb", and deleting the directory only costs downloads.
+"""
+
+import json
+import os
+import threading
+import time
+
+import config
+import fastcopy
+from hash_index import _CHUNK, NormalizedSha256, _is_text
+
+STORE_DIRNAME = "object_store"
+INDEX_NAME = "index.json"
+DEFAULT_MAX_MB = 512
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ObjectStore:
+    """
+    Objects live at <store>/<hash[:2]>/<hash>. index.json records {hash: last_used} for
+    LRU; objects missing from it (written by another patcher process) fall back to their
+    mtime. Thread-safe; call save() when done (it also evicts down to the size cap).
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 hardlink: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hardlink = hardlink
+        self._used: dict[str, float] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def default(cls) -> "ObjectStore | None":
+        """The machine-wide store configured in patcher_config.json, or None if disabled
+        (object_store_max_mb = 0)."""
+        cfg = config.load()
+        try:
+            max_mb = int(cfg.get("object_store_max_mb", DEFAULT_MAX_MB))
+        except (TypeError, ValueError):
+            max_mb = DEFAULT_MAX_MB
+        if max_mb <= 0:
+            return None
+        return cls(config.data_path(STORE_DIRNAME), max_mb * 1024 * 1024,
+                   bool(cfg.get("object_store_hardlinks")))
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.path, digest[:2], digest)
+
+    def _read_index(self) -> dict[str, float]:
+        try:
+            with open(os.path.join(self.path, INDEX_NAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        used = data.get("used") if isinstance(data, dict) else None
+        if not isinstance(used, dict):
+            return {}
+        return {k: v for k, v in used.items() if isinstance(v, (int, float))}
+
+    def _load(self) -> None:
+        self._used = self._read_index()
+
+    def _touch(self, digest: str) -> None:
+        with self._lock:
+            self._used[digest] = time.time()
+            self._dirty = True
+
+    def has(self, digest: str) -> bool:
+        return bool(digest) and os.path.isfile(self._object_path(digest))
+
+    def materialize(self, digest: str, dest: str, rel_path: str,
+                    link: bool | None = None) -> bool:
+        """
+        Install the object for `digest` at dest (atomically, via dest.tmp). The object
+        is re-hashed as it is read (normalized per rel_path's extension) and only
+        committed if it still matches; a corrupt object is deleted. Returns True if dest
+        now holds the content, False if the caller must download it. Raises OSError only
+        when dest itself cannot be written. link overrides self.hardlink (False for files
+        a user edits, so dest is never the object itself).
+        """
+        if not self.has(digest):
+            return False
+        obj = self._object_path(digest)
+        tmp = dest + ".tmp"
+        h = NormalizedSha256(_is_text(rel_path))
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        _remove(tmp)
+        if link is None:
+            link = self.hardlink
+        linked = fastcopy.clone(obj, tmp, link=link) is not None
+        try:
+            with open(obj, "rb") as src:
+                if linked:
+                    while chunk := src.read(_CHUNK):
+                        h.update(chunk)
+                else:
+                    with open(tmp, "wb") as out:
+                        while chunk := src.read(_CHUNK):
+                            h.update(chunk)
+                            out.write(chunk)
+        except OSError:
+            _remove(tmp)
+            if not os.path.exists(obj):
+                return False  # evicted by another process meanwhile
+            raise
+        if h.hexdigest() != digest:
+            _remove(tmp)
+            self.discard(digest)
+            return False
+        try:
+            os.replace(tmp, dest)
+        except OSError:
+            _remove(tmp)
+            raise
+        self._touch(digest)
+        return True
+
+    def add(self, src: str, digest: str, link: bool | None = None) -> None:
+        """Store the verified file at src under digest (no-op if already present).
+        Failures are ignored: the store is only a cache. link overrides self.hardlink."""
+        if not digest:
+            return
+        obj = self._object_path(digest)
+        if os.path.isfile(obj):
+            self._touch(digest)
+            return
+        tmp = f"{obj}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            link = self.hardlink if link is None else link
+            fastcopy.copy_file(src, tmp, link=link, metadata=False)
+            os.replace(tmp, obj)
+        except OSError:
+            _remove(tmp)
+            return
+        self._touch(digest)
+
+    def discard(self, digest: str) -> None:
+        _remove(self._object_path(digest))
+        with self._lock:
+            if self._used.pop(digest, None) is not None:
+                self._dirty = True
+
+    def _objects(self) -> list[tuple[str, int, float]]:
+        """(digest, size, mtime) of every object on disk."""
+        out = []
+        try:
+            buckets = [e for e in os.scandir(self.path) if e.is_dir() and len(e.name) == 2]
+        except OSError:
+            return out
+        for bucket in buckets:
+            try:
+                for e in os.scandir(bucket.path):
+                    if e.is_file() and not e.name.endswith(".tmp"):
+                        st = e.stat()
+                        out.append((e.name, st.st_size, st.st_mtime))
+            except OSError:
+                continue
+        return out
+
+    def evict(self) -> int:
+        """Delete least-recently-used objects until the store fits max_bytes. Returns
+        the number of bytes freed."""
+        objects = self._objects()
+        total = sum(size for _d, size, _m in objects)
+        if total <= self.max_bytes:
+            return 0
+        with self._lock:
+            used = dict(self._used)
+        freed = 0
+        for digest, size, mtime in sorted(objects, key=lambda o: used.get(o[0], o[2])):
+            if total - freed <= self.max_bytes:
+                break
+            self.discard(digest)
+            freed += size
+        return freed
+
+    def save(self) -> None:
+        """Evict down to the size cap and persist the LRU index."""
+        self.evict()
+        with self._lock:
+            if not self._dirty:
+                return
+            # Merge with what other patcher processes recorded since we loaded.
+            merged = self._read_index()
+            for d, t in self._used.items():
+                merged[d] = max(t, merged.get(d, 0))
+            present = {d for d, _s, _m in self._objects()}
+            self._used = {d: t for d, t in merged.items() if d in present}
+            data = {"used": dict(self._used)}
+            self._dirty = False
+        path = os.path.join(self.path, INDEX_NAME)
+        tmp = path + ".tmp"
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError:
+            pass  # LRU order only; objects fall back to their mtime
@@ -2,47 +2,63 @@
 CoOpt UI Patcher v2 — Desktop app to update CoOpt UI project files in a MacroQuest root.
 Two-state GUI: Setup (first-run / folder selection) and Main (update / patch).
 Can be launched from anywhere — no longer requires running from the MQ root directory.
+
+Startup paints the window before anything heavy runs: only customtkinter, config and
+validator are imported at module load — updater, installer, transaction, batch,
+path_finder, PIL and the rest are imported where first used — and install detection
+streams into the Setup view from a background thread. COOPUI_STARTUP_PROFILE=1 prints
+the startup timings as JSON on stderr (=exit then closes the window); see
+scripts/tests/test_patcher_startup.py.
+
+Checks, updates and installs run as jobs (jobs.py): update checks are queued ahead of
+writes, every write takes a cancel token, and workers reach the widgets only through
+the app's UiChannel, drained on the Tk thread. Cancel, "Change", "All installs" and
+closing the window cancel the running job and wait for it to stop — its transaction
+is aborted, so nothing is left half-applied. Their progress goes through a
+progress_bus.ProgressBus: the bar and label move at most DEFAULT_HZ times a second with
+throughput and ETA, and every event is also logged to <root>/.coopui/last_operation.jsonl.
+The patch log (LogView) keeps its lines in a bounded log_buffer.LogBuffer, flushed on a
+timer, and draws only the rows that fit; the full text goes to last_patch_log.txt.
 """
 
+import json
 import os
 import sys
 import threading
+import time
 import tkinter.filedialog as filedialog
 
 import customtkinter as ctk
-from PIL import Image
 
+from config import DEFAULT_CONFIG_MANIFEST_PATH, MANIFEST_PATH, REPO_BASE_URL
 from config import load as load_config, save as save_config, add_recent_path
-from installer import preflight_blockers, smart_install
-# NOTE: the itemui→coopui tree rename is postponed — the patcher must NOT auto-migrate.
-# migrate_itemui_to_coopui.migrate_itemui_to_coopui stays available for manual use only.
-from migrate_itemui_to_coopui import ensure_env_after_patch
-from path_finder import find_mq_installations
-from updater import (
-    check_for_default_config,
-    check_for_updates,
-    get_installed_version,
-    install_default_config,
-    patch,
-    verify_installation,
-    write_installed_version,
-)
+from jobs import PRIORITY_CHECK, PRIORITY_WRITE, JobScheduler, UiChannel
+from log_buffer import ERROR, INFO, SKIP, LogBuffer
+from progress_bus import JsonLogSink, ProgressBus, fraction_sink
 from validator import ensure_directories, validate_mq_root
 
+# Modules the startup path must not import (checked by test_patcher_startup.py).
+DEFERRED_IMPORTS = (
+    "PIL", "batch", "fresh_install", "installer", "migrate_itemui_to_coopui", "path_finder",
+    "preserve_rules", "transaction", "updater",
+)
+STARTUP_PROFILE_ENV = "COOPUI_STARTUP_PROFILE"
+_MODULE_LOADED = time.perf_counter()
+
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
 
-REPO_BASE_URL = "https://raw.githubusercontent.com/CooptGaming/CooptUI/master"
-MANIFEST_PATH = "release_manifest.json"
-DEFAULT_CONFIG_MANIFEST_PATH = "default_config_manifest.json"
-
 # Window
 WIDTH = 520
 HEIGHT = 620
 MIN_WIDTH = 460
 MIN_HEIGHT = 480
 
+# Setup view: installs listed, and how long detection may keep adding to the list
+MAX_SHOWN_INSTALLS = 6
+DETECT_TIMEOUT = 20.0
+
 # Brand colours
 NAVY = "#1a2332"
 ORANGE = "#e86a1b"
@@ -53,6 +69,23 @@ BODY_BG = "#2b2b2b"
 CARD_BG = "#363636"
 TEXT_DIM = "#999999"
 
+# Progress events of the last update / install, per install (see _operation_log).
+OPERATION_LOG_NAME = "last_operation.jsonl"
+# The full patch log of the last update / install, per install (LogView spills it here),
+# and how often LogView moves new lines onto the screen.
+PATCH_LOG_NAME = "last_patch_log.txt"
+LOG_FLUSH_MS = 100
+
+
+def _operation_log(root: str) -> JsonLogSink | None:
+    """JSON log of this run's progress events in the install's state folder (None when
+    it cannot be written — progress still shows)."""
+    from hash_index import state_path
+    try:
+        return JsonLogSink(state_path(root, OPERATION_LOG_NAME))
+    except OSError:
+        return None
+
 
 def resource_path(relative_path: str) -> str:
     """Absolute path to resource; works as script or PyInstaller one-file exe."""
@@ -96,42 +129,79 @@ class SetupView(ctk.CTkFrame):
             command=self._on_fresh_install,
         )
 
-        # --- Detected installs ---
-        detected = find_mq_installations()
-        recent = app.config.get("recent_paths", [])
-        # Merge detected + recent, dedup, limit
-        shown = []
-        seen = set()
-        for p in detected + recent:
-            norm = os.path.normpath(p)
-            if norm not in seen and os.path.isdir(p):
-                seen.add(norm)
-                shown.append(p)
-        shown = shown[:6]
-
-        if shown:
-            sep = ctk.CTkFrame(self, fg_color=TEXT_DIM, height=1)
-            sep.pack(fill="x", padx=24, pady=(20, 8))
+        # --- Detected & recent installs ---
+        # Filled in by a background thread as installs are found: detection probes the
+        # registry and drives C–G, and a sleeping network / optical drive can take seconds
+        # to answer — the window must not wait for it.
+        sep = ctk.CTkFrame(self, fg_color=TEXT_DIM, height=1)
+        sep.pack(fill="x", padx=24, pady=(20, 8))
+        ctk.CTkLabel(
+            self, text="Detected & recent installs",
+            font=ctk.CTkFont(size=12, weight="bold"), text_color=TEXT_DIM,
+            anchor="w",
+        ).pack(fill="x", padx=28, pady=(4, 4))
+        self.installs_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.installs_frame.pack(fill="x")
+        self.searching_label = ctk.CTkLabel(
+            self, text="Searching for MacroQuest installs...",
+            font=ctk.CTkFont(size=11), text_color=TEXT_DIM, anchor="w",
+        )
+        self.searching_label.pack(fill="x", padx=28, pady=2)
+        self.update_all_btn = ctk.CTkButton(
+            self, text="Update all installs...",
+            font=ctk.CTkFont(size=12, weight="bold"),
+            fg_color=ORANGE, hover_color=ORANGE_HOVER,
+            command=self.app.show_batch,
+        )
+        self._shown: list[str] = []
+        threading.Thread(
+            target=self._detect, args=(list(app.config.get("recent_paths", [])),), daemon=True,
+        ).start()
+
+    def _detect(self, recent: list):
+        """Worker: recent folders, then detected installs as path_finder finds them.
+        Its own thread rather than a job: a hung drive would hold a job worker for up
+        to DETECT_TIMEOUT, and detection writes nothing there is to cancel."""
+        from path_finder import iter_mq_installations
+        try:
+            for path in recent:
+                if os.path.isdir(path):
+                    self.app.ui.post(lambda p=path: self._add_install(p), widget=self)
+            for path in iter_mq_installations(timeout=DETECT_TIMEOUT):
+                self.app.ui.post(lambda p=path: self._add_install(p), widget=self)
+        except Exception:
+            pass  # detection is a convenience; Browse... always works
+        self.app.ui.post(self._on_detect_done)
+
+    def _add_install(self, path: str):
+        norm = os.path.normcase(os.path.normpath(path))
+        if (not self.winfo_exists() or len(self._shown) >= MAX_SHOWN_INSTALLS
+                or norm in (os.path.normcase(os.path.normpath(p)) for p in self._shown)):
+            return
+        self._shown.append(path)
+        row = ctk.CTkFrame(self.installs_frame, fg_color="transparent")
+        row.pack(fill="x", padx=28, pady=2)
+        ctk.CTkLabel(
+            row, text=path, font=ctk.CTkFont(size=12),
+            anchor="w", text_color="#cccccc",
+        ).pack(side="left", fill="x", expand=True)
+        ctk.CTkButton(
+            row, text="Select", width=60,
+            font=ctk.CTkFont(size=11),
+            fg_color=NAVY, hover_color="#2a3a4f",
+            command=lambda p=path: self._on_select_path(p),
+        ).pack(side="right", padx=(8, 0))
+        if len(self._shown) == 2:
+            self.update_all_btn.pack(fill="x", padx=28, pady=(10, 0))
 
-            ctk.CTkLabel(
-                self, text="Detected & recent installs",
-                font=ctk.CTkFont(size=12, weight="bold"), text_color=TEXT_DIM,
-                anchor="w",
-            ).pack(fill="x", padx=28, pady=(4, 4))
-
-            for path in shown:
-                row = ctk.CTkFrame(self, fg_color="transparent")
-                row.pack(fill="x", padx=28, pady=2)
-                ctk.CTkLabel(
-                    row, text=path, font=ctk.CTkFont(size=12),
-                    anchor="w", text_color="#cccccc",
-                ).pack(side="left", fill="x", expand=True)
-                ctk.CTkButton(
-                    row, text="Select", width=60,
-                    font=ctk.CTkFont(size=11),
-                    fg_color=NAVY, hover_color="#2a3a4f",
-                    command=lambda p=path: self._on_select_path(p),
-                ).pack(side="right", padx=(8, 0))
+    def _on_detect_done(self):
+        self.app.mark_startup("detection")
+        if not self.winfo_exists():
+            return
+        if self._shown:
+            self.searching_label.pack_forget()
+        else:
+            self.searching_label.configure(text="No installs found — use Browse... above.")
 
     def _make_card(self, title: str, subtitle: str, command):
         card = ctk.CTkFrame(self, fg_color=CARD_BG, corner_radius=8)
@@ -179,6 +249,139 @@ class SetupView(ctk.CTkFrame):
         self.app.show_main(path)
 
 
+# ---------------------------------------------------------------------------
+# LogView — the patch log, drawn one screenful at a time
+# ---------------------------------------------------------------------------
+
+class LogView(ctk.CTkFrame):
+    """
+    Patch log backed by a log_buffer.LogBuffer. Workers append to the buffer; every
+    LOG_FLUSH_MS this view flushes it and, if anything changed, redraws only the rows
+    that fit — one delete + one insert however long the log is. It follows the end of
+    the log until scrolled up. All / Errors / Skipped filter the lines shown.
+    """
+
+    FILTERS = {"All": None, "Errors": ERROR, "Skipped": SKIP}
+
+    def __init__(self, parent, buffer: LogBuffer):
+        super().__init__(parent, fg_color="#1e1e1e", corner_radius=6)
+        self.buffer = buffer
+        self._top = 0
+        self._follow = True
+        self._dirty = True
+        self._font = ctk.CTkFont(size=11)
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=6, pady=(6, 0))
+        self.filter_btn = ctk.CTkSegmentedButton(
+            bar, values=list(self.FILTERS), command=self._on_filter,
+            font=ctk.CTkFont(size=11), height=22,
+        )
+        self.filter_btn.set("All")
+        self.filter_btn.pack(side="left")
+        self.count_label = ctk.CTkLabel(bar, text="", font=ctk.CTkFont(size=11), text_color=TEXT_DIM)
+        self.count_label.pack(side="right")
+
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(fill="both", expand=True, padx=(6, 0), pady=(0, 6))
+        self.scrollbar = ctk.CTkScrollbar(body, command=self._on_yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text = ctk.CTkTextbox(
+            body, height=100, font=self._font, fg_color="transparent",
+            wrap="none", activate_scrollbars=False, state="disabled",
+        )
+        self.text.pack(side="left", fill="both", expand=True)
+        self.text.tag_config(ERROR, foreground=ERROR_RED)
+        self.text.tag_config(SKIP, foreground=TEXT_DIM)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.text.bind(sequence, self._on_wheel)
+        self.text.bind("<Configure>", lambda _e: self._mark_dirty())
+        self._tick_id = self.after(LOG_FLUSH_MS, self._tick)
+
+    def reset(self, spill_path: str | None = None):
+        """Empty the log for a new operation (the full text goes to spill_path)."""
+        self.buffer.reset(spill_path)
+        self.filter_btn.set("All")
+        self._top = 0
+        self._follow = True
+        self._mark_dirty()
+
+    def destroy(self):
+        self.after_cancel(self._tick_id)
+        self.buffer.close()
+        super().destroy()
+
+    def _mark_dirty(self):
+        self._dirty = True
+
+    def _tick(self):
+        if self.buffer.flush() or self._dirty:
+            self._dirty = False
+            self._render()
+        self._tick_id = self.after(LOG_FLUSH_MS, self._tick)
+
+    def _rows(self) -> int:
+        return max(1, self.text.winfo_height() // max(1, self._font.metrics("linespace")))
+
+    def _render(self):
+        total = len(self.buffer)
+        rows = self._rows()
+        if self._follow:
+            self._top = max(0, total - rows)
+        self._top = max(0, min(self._top, max(0, total - rows)))
+        lines = self.buffer.window(self._top, rows + 1)
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", "\n".join(text for _kind, text in lines))
+        for row, (kind, _text) in enumerate(lines, start=1):
+            if kind != INFO:
+                self.text.tag_add(kind, f"{row}.0", f"{row}.end")
+        self.text.configure(state="disabled")
+        self.text.see("end" if self._follow else "1.0")
+        if total:
+            self.scrollbar.set(self._top / total, min(1.0, (self._top + rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self._update_counts()
+
+    def _update_counts(self):
+        counts = self.buffer.counts
+        parts = [f"{self.buffer.total} lines"]
+        if counts[ERROR]:
+            parts.append(f"{counts[ERROR]} errors")
+        if counts[SKIP]:
+            parts.append(f"{counts[SKIP]} skipped")
+        if self.buffer.dropped and self.buffer.spill_path:
+            parts.append(f"full log: .coopui/{os.path.basename(self.buffer.spill_path)}")
+        self.count_label.configure(text=" · ".join(parts))
+
+    def _scroll_to(self, top: int):
+        rows = self._rows()
+        last = max(0, len(self.buffer) - rows)
+        self._top = max(0, min(top, last))
+        self._follow = self._top >= last
+        self._render()
+
+    def _on_yview(self, action: str, amount: str, unit: str | None = None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.buffer)))
+        else:
+            step = self._rows() if unit == "pages" else 1
+            self._scroll_to(self._top + int(amount) * step)
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self._scroll_to(self._top - 3)
+        else:
+            self._scroll_to(self._top + 3)
+        return "break"
+
+    def _on_filter(self, choice: str):
+        self.buffer.set_filter(self.FILTERS[choice])
+        self._follow = True
+        self._render()
+
+
 # ---------------------------------------------------------------------------
 # MainView — normal update / patch flow
 # ---------------------------------------------------------------------------
@@ -222,6 +425,12 @@ class MainView(ctk.CTkFrame):
             fg_color=NAVY, hover_color="#2a3a4f",
             command=self._on_change_folder,
         ).pack(side="right", padx=(8, 0))
+        ctk.CTkButton(
+            path_row, text="All installs", width=80,
+            font=ctk.CTkFont(size=11),
+            fg_color=NAVY, hover_color="#2a3a4f",
+            command=self._on_all_installs,
+        ).pack(side="right", padx=(8, 0))
 
         # Validation status
         self.valid_label = ctk.CTkLabel(
@@ -241,6 +450,19 @@ class MainView(ctk.CTkFrame):
         )
         self.full_install_btn.pack(fill="x", padx=20, pady=(8, 0))
 
+        # Revert: every update / repair snapshots the files it replaces (transaction.py);
+        # this restores the newest snapshot offline. Shown only when one exists (disabled,
+        # with the reason, when the last update was too large to keep one).
+        self.revert_btn = ctk.CTkButton(
+            self, text="Revert to previous version",
+            font=ctk.CTkFont(size=11), height=26,
+            fg_color="transparent", border_width=1, border_color="#555555",
+            hover_color="#2a3a4f", text_color=TEXT_DIM,
+            command=self._on_revert,
+        )
+        # Reading the snapshots' metadata waits until the view is on screen.
+        self.after_idle(self._refresh_revert_btn)
+
         # --- Update info panel (fixed-height card, does NOT expand) ---
         self.update_frame = ctk.CTkFrame(self, fg_color=CARD_BG, corner_radius=8)
         self.update_frame.pack(fill="x", padx=16, pady=(12, 0))
@@ -285,11 +507,7 @@ class MainView(ctk.CTkFrame):
         )
 
         # --- Patch log (fills remaining space, scrolls internally) ---
-        self.patch_log = ctk.CTkTextbox(
-            self, height=120,
-            font=ctk.CTkFont(size=11), fg_color="#1e1e1e",
-            state="disabled", wrap="word",
-        )
+        self.patch_log = LogView(self, LogBuffer())
         # Hidden until patching starts
         self._patchlog_visible = False
 
@@ -302,25 +520,33 @@ class MainView(ctk.CTkFrame):
         self._start_update_check()
 
     def _start_update_check(self):
-        """Show installed version, then check for updates."""
-        installed = get_installed_version(self.mq_root)
-        ver_text = "Valid install"
-        if installed:
-            ver_text += f" · CoOpt UI v{installed}"
-        self.valid_label.configure(text=f"  {ver_text}", text_color=SUCCESS_GREEN)
+        """Show installed version, then check for updates (both in a job, so the view
+        paints before updater is even imported)."""
+        self.valid_label.configure(text="  Valid install", text_color=SUCCESS_GREEN)
+        self._submit_check()
+
+    def _submit_check(self):
+        self.app.jobs.submit(
+            "check", self._check_updates, priority=PRIORITY_CHECK, owner=self,
+            on_done=lambda result: self._on_check_done(*result),
+        )
 
-        threading.Thread(target=self._check_updates, daemon=True).start()
+    def _show_installed_version(self, installed: str | None):
+        if installed and self.winfo_exists():
+            self.valid_label.configure(text=f"  Valid install · CoOpt UI v{installed}")
 
-    def _check_updates(self):
+    def _check_updates(self, _cancel) -> tuple:
+        """Job: the arguments for _on_check_done."""
+        from updater import check_for_default_config, check_for_updates, get_installed_version
         try:
+            installed_version = get_installed_version(self.mq_root)
+            self.app.ui.post(lambda: self._show_installed_version(installed_version), widget=self)
             to_update, manifest_version, changelog, err = check_for_updates(
                 REPO_BASE_URL, self.mq_root, MANIFEST_PATH
             )
-            installed_version = get_installed_version(self.mq_root)
 
             if err:
-                self.after(0, lambda: self._on_check_done(to_update, [], err, manifest_version, installed_version, changelog))
-                return
+                return to_update, [], err, manifest_version, installed_version, changelog
 
             # The default-config manifest is optional — a failure here must not block
             # the main update flow. Surface it as a status note and continue.
@@ -329,17 +555,14 @@ class MainView(ctk.CTkFrame):
             )
             if default_err:
                 note = f"Note: {default_err} Skipping default config this run."
-                self.after(0, lambda: self.app.set_status(note))
+                self.app.ui.post(lambda: self.app.set_status(note), widget=self)
                 to_install_defaults = []
-            self.after(0, lambda: self._on_check_done(
-                to_update, to_install_defaults or [], None,
-                manifest_version, installed_version, changelog
-            ))
+            return (to_update, to_install_defaults or [], None,
+                    manifest_version, installed_version, changelog)
         except Exception as e:
             # Never let the worker die silently — the UI would sit on
             # "Checking for updates..." forever with no console to see the traceback.
-            msg = f"Unexpected error while checking for updates: {e}"
-            self.after(0, lambda: self._on_check_done([], [], msg, None, None, []))
+            return [], [], f"Unexpected error while checking for updates: {e}", None, None, []
 
     def _on_check_done(
         self,
@@ -405,20 +628,10 @@ class MainView(ctk.CTkFrame):
         self.update_title.configure(text="Checking for updates...")
         self.update_subtitle.configure(text="", text_color=TEXT_DIM)
         self.app.set_primary_button("Update", None, enabled=False, color=ORANGE)
-        threading.Thread(target=self._check_updates, daemon=True).start()
+        self._submit_check()
 
-    def _on_patch(self):
-        if self._patch_in_progress or (not self.files_to_update and not self.files_to_install_defaults):
-            return
-        blocker = preflight_blockers(self.mq_root)
-        if blocker:
-            self.app.set_status(blocker, error=True)
-            return
-        self._patch_in_progress = True
-        self.app.in_progress = True
-        self.app.set_primary_button("Updating...", None, enabled=False, color=ORANGE)
-
-        # Show progress UI
+    def _show_progress_ui(self):
+        """Progress bar + an empty patch log (the update and the full install share them)."""
         if not self._progress_visible:
             self.progress_bar.pack(in_=self.progress_frame, fill="x")
             self.progress_label.pack(in_=self.progress_frame, fill="x", pady=(4, 0))
@@ -429,180 +642,476 @@ class MainView(ctk.CTkFrame):
             self._bottom_spacer.pack_forget()
             self.patch_log.pack(fill="both", expand=True, padx=16, pady=(8, 8))
             self._patchlog_visible = True
-        self.patch_log.configure(state="normal")
-        self.patch_log.delete("0.0", "end")
-        self.patch_log.configure(state="disabled")
+        from hash_index import state_path
+        self.patch_log.reset(state_path(self.mq_root, PATCH_LOG_NAME))
+
+    def _post_progress(self, frac: float, label: str, log_line: str | None = None):
+        """Worker side: queue the log line (LogView draws it on its next flush) and post
+        the latest bar / label state under one key, so however fast files complete the
+        view is updated once per UI poll."""
+        if log_line:
+            self.patch_log.buffer.append(log_line, INFO)
+        self.app.ui.post(lambda: self._apply_progress(frac, label),
+                         key=("progress", id(self)), widget=self)
+
+    def _apply_progress(self, frac: float, label: str):
+        self.progress_bar.set(max(0.0, min(frac, 1.0)))
+        self.progress_label.configure(text=label)
+
+    def _start_job(self, name: str, run, on_done, cancellable: bool = True):
+        """Run a write job for this view; while it runs the primary button cancels it."""
+        self._patch_in_progress = True
+        self.app.in_progress = True
+        if cancellable:
+            self.app.set_primary_button("Cancel", self._on_cancel, enabled=True, color=NAVY)
+        self.app.jobs.submit(name, run, priority=PRIORITY_WRITE, owner=self,
+                             on_done=on_done, on_cancel=lambda: self._on_cancelled(name))
 
-        total_ops = len(self.files_to_update) + len(self.files_to_install_defaults)
+    def _on_cancel(self):
+        if self.app.jobs.cancel(owner=self):
+            self.app.set_primary_button("Cancelling...", None, enabled=False, color=NAVY)
+            self.progress_label.configure(text="Cancelling — stopping after the current file...")
 
-        def progress_cb(current: int, total: int, path_or_msg: str):
-            def update():
-                frac = current / total_ops if total_ops else 0
-                self.progress_bar.set(frac)
-                self.progress_label.configure(text=f"{current}/{total_ops}: {path_or_msg}")
+    def _on_cancelled(self, name: str):
+        self._patch_in_progress = False
+        self.app.in_progress = False
+        self.full_install_btn.configure(state="normal")
+        self.revert_btn.configure(state="normal")
+        message = {
+            "update": "Update cancelled. No files were changed.",
+            "revert": "Revert cancelled. No files were changed.",
+        }.get(name, "Install / Repair cancelled. The step in progress was rolled back; "
+                    "a step that had already finished can be undone with Revert.")
+        self.patch_log.buffer.append(message, INFO)
+        self.update_subtitle.configure(text=message, text_color=TEXT_DIM)
+        self.progress_label.configure(text=message[:90])
+        self._refresh_revert_btn()
+        self.app.set_primary_button("Check again", self._retry_check, enabled=True, color=ORANGE)
+
+    def _on_patch(self):
+        if self._patch_in_progress or (not self.files_to_update and not self.files_to_install_defaults):
+            return
+        from installer import preflight_blockers
+        from updater import install_default_config, patch
+        blocker = preflight_blockers(self.mq_root, [f["path"] for f in self.files_to_update])
+        if blocker:
+            self.app.set_status(blocker, error=True)
+            return
+        # NOTE: the itemui→coopui tree rename is postponed — the patcher must NOT auto-migrate.
+        # migrate_itemui_to_coopui.migrate_itemui_to_coopui stays available for manual use only.
+        from migrate_itemui_to_coopui import ensure_env_after_patch
+        from transaction import group as transaction_group
+        from updater import write_installed_version
+        self._show_progress_ui()
+
+        files_to_update = list(self.files_to_update)
+        defaults = list(self.files_to_install_defaults)
+        manifest_version = self.manifest_version
+        total_ops = len(files_to_update) + len(defaults)
+
+        log = _operation_log(self.mq_root)
+        bus = ProgressBus(fraction_sink(lambda msg, frac: self._post_progress(frac, msg[:90])),
+                          *([log] if log else []))
+
+        def run(cancel) -> tuple:
+            phase = bus.phase("Updating", total_ops)
+
+            def file_done(current: int, path_or_msg: str):
+                # Every file gets its log line; the bar and label follow the bus's events.
                 if path_or_msg and path_or_msg != "Done":
-                    self.patch_log.configure(state="normal")
-                    self.patch_log.insert("end", f"  {current}/{total_ops}: {path_or_msg}\n")
-                    self.patch_log.see("end")
-                    self.patch_log.configure(state="disabled")
-            self.after(0, update)
+                    self.patch_log.buffer.append(f"  {current}/{total_ops}: {path_or_msg}",
+                                                 SKIP if path_or_msg.startswith("(skipped") else INFO)
+                phase.update(current, item=path_or_msg)
 
-        def run():
             try:
-                done = 0
-                skipped: list[str] = []
-                message = "Update complete."
-                if self.files_to_update:
-                    success, message, skipped = patch(
-                        self.files_to_update, REPO_BASE_URL, self.mq_root,
-                        progress_callback=lambda c, t, p: progress_cb(done + c, total_ops, p),
-                    )
-                    if not success:
-                        self.after(0, lambda: self._on_patch_done(False, message, skipped))
-                        return
-                    done = len(self.files_to_update)
-                if self.files_to_install_defaults:
-                    success, message = install_default_config(
-                        self.files_to_install_defaults, REPO_BASE_URL, self.mq_root,
-                        progress_callback=lambda c, t, p: progress_cb(done + c, total_ops, p),
-                    )
-                    self.after(0, lambda: self._on_patch_done(success, message, skipped))
-                else:
-                    self.after(0, lambda: self._on_patch_done(True, message, skipped))
+                # One snapshot group, so Revert undoes the update and the default config
+                # together. Opened here: the group is a context variable of this thread.
+                with phase, transaction_group():
+                    done = 0
+                    skipped: list[str] = []
+                    message = "Update complete."
+                    if files_to_update:
+                        success, message, skipped = patch(
+                            files_to_update, REPO_BASE_URL, self.mq_root,
+                            progress_callback=lambda c, t, p: file_done(done + c, p),
+                            cancel=cancel,
+                        )
+                        if not success:
+                            return False, message, skipped
+                        done = len(files_to_update)
+                    if defaults:
+                        success, message = install_default_config(
+                            defaults, REPO_BASE_URL, self.mq_root,
+                            progress_callback=lambda c, t, p: file_done(done + c, p),
+                            cancel=cancel,
+                        )
+                        if not success:
+                            return False, message, skipped
+                # Finished here, not on the Tk thread: once the files are committed the
+                # install is updated even if the view is gone by the time this returns.
+                ensure_env_after_patch(self.mq_root)
+                if manifest_version:
+                    write_installed_version(self.mq_root, manifest_version)
+                return True, message, skipped
             except Exception as e:
                 # An uncaught exception here (e.g. a dropped connection mid-read) would
-                # kill the thread and leave the UI stuck on "Updating..." forever.
-                msg = f"Update failed unexpectedly: {e}"
-                self.after(0, lambda: self._on_patch_done(False, msg))
+                # leave the UI stuck on "Updating..." forever.
+                return False, f"Update failed unexpectedly: {e}", []
+            finally:
+                if log:
+                    log.close()
 
-        threading.Thread(target=run, daemon=True).start()
+        self._start_job("update", run, lambda result: self._on_patch_done(*result))
 
     def _on_patch_done(self, success: bool, message: str, skipped: list[str] | None = None):
+        from updater import get_installed_version
         self._patch_in_progress = False
         self.app.in_progress = False
         self.progress_bar.set(1.0 if success else self.progress_bar.get())
 
         if success:
-            ensure_env_after_patch(self.mq_root)
-            # Post-patch verification. Files skipped as 404 (removed from repo) were
-            # never downloaded, so they must not count as verification failures.
+            # No separate verification pass: patch() hashes every file as it downloads and
+            # only commits it when it matches the manifest, so success means verified.
+            # (Files skipped as 404 — removed from the repo — were never expected to land.)
             if self.files_to_update:
-                skipped_set = {p.replace("\\", "/") for p in (skipped or [])}
-                to_verify = [
-                    e for e in self.files_to_update
-                    if (e.get("path") or "").replace("\\", "/") not in skipped_set
-                ]
-                all_ok, failed = verify_installation(to_verify, self.mq_root)
-                if not all_ok:
-                    # Verification failure is a FAILURE: no green banner, no version
-                    # stamp, and a Retry that re-checks so the user can run it again.
-                    fail_msg = (
-                        f"{len(failed)} file(s) failed verification after the update. "
-                        f"Check permissions or antivirus: {', '.join(failed[:3])}"
-                    )
-                    self.update_title.configure(text="Update verification failed")
-                    self.update_subtitle.configure(text=fail_msg, text_color=ERROR_RED)
-                    self.progress_label.configure(text=fail_msg)
-                    self.app.set_primary_button("Retry", self._retry_check, enabled=True, color=ORANGE)
-                    return
                 message += " All files verified."
-            if self.manifest_version:
-                write_installed_version(self.mq_root, self.manifest_version)
             self.files_to_update = []
             self.files_to_install_defaults = []
             self.update_title.configure(text="Update complete")
             self.update_subtitle.configure(text=message, text_color=SUCCESS_GREEN)
             self.progress_label.configure(text=message)
             self.app.set_primary_button("Up to Date", None, enabled=False, color=SUCCESS_GREEN)
+            self._refresh_revert_btn()
             # Refresh validation label
             installed = get_installed_version(self.mq_root)
             if installed:
                 self.valid_label.configure(text=f"  Valid install · CoOpt UI v{installed}")
         else:
+            self.patch_log.buffer.append(message, ERROR)
             self.update_subtitle.configure(text=message, text_color=ERROR_RED)
             self.progress_label.configure(text=message)
             self.app.set_primary_button("Retry", self._on_patch, enabled=True, color=ORANGE)
 
     def _on_full_install(self):
-        """Download the complete EMU bundle and overlay it (base + plugin + CoOpt UI),
-        preserving the user's config. Turns a vanilla / E3 / partial MQ into a working
-        instance — and repairs/refreshes an existing one."""
+        """Preview a Full Install / Repair: plan the latest bundle against this install
+        (central directory only, nothing downloaded) and show what it would write and
+        preserve, with an Install button that executes exactly that plan."""
         if self._patch_in_progress:
             return
+        from fresh_install import get_latest_release_zip_url
+        from installer import plan_overlay, preflight_blockers
+        from preserve_rules import refresh as refresh_preserve_rules
         blocker = preflight_blockers(self.mq_root)
         if blocker:
             self.app.set_status(blocker, error=True)
             return
         self._patch_in_progress = True
         self.app.in_progress = True
-        self.app.set_primary_button("Installing...", None, enabled=False, color=ORANGE)
+        self.full_install_btn.configure(state="disabled")
+        self.app.set_primary_button("Planning...", None, enabled=False, color=ORANGE)
+        self.update_title.configure(text="Full Install / Repair")
+        self.update_subtitle.configure(text="Reading the bundle's file list...", text_color="#ffffff")
+
+        def run(_cancel) -> tuple:
+            plan, err = None, None
+            try:
+                refresh_preserve_rules(REPO_BASE_URL)
+                url, _ver, err = get_latest_release_zip_url()
+                if not err and url:
+                    plan = plan_overlay(url, self.mq_root)
+            except Exception as e:
+                err = str(e)
+            return plan, err
+
+        # Reads only (the bundle's central directory): queued like an update check.
+        self.app.jobs.submit("plan", run, priority=PRIORITY_CHECK, owner=self,
+                             on_done=lambda result: self._on_plan_ready(*result))
+
+    def _on_plan_ready(self, plan: dict | None, err: str | None):
+        from installer import format_plan
+        self._patch_in_progress = False
+        self.app.in_progress = False
+        self.full_install_btn.configure(state="normal")
+        if plan is None:
+            # The preview is a convenience: the install itself still works (and may fall
+            # back to the base bundle), so offer it anyway.
+            self.update_subtitle.configure(
+                text=f"Could not preview the install ({err or 'unknown error'}). "
+                     "It can still run: the complete bundle is downloaded and your config is preserved.",
+                text_color=TEXT_DIM,
+            )
+        else:
+            self.update_subtitle.configure(
+                text=format_plan(plan), text_color=ERROR_RED if plan["locked"] else "#ffffff",
+            )
+        self.app.set_primary_button(
+            "Install / Repair", lambda: self._run_full_install(plan), enabled=True, color=ORANGE,
+        )
+
+    def _run_full_install(self, plan: dict | None = None):
+        """Download the complete EMU bundle and overlay it (base + plugin + CoOpt UI),
+        preserving the user's config. Turns a vanilla / E3 / partial MQ into a working
+        instance — and repairs/refreshes an existing one. Executes `plan` (the preview
+        the user just saw) when it matches the bundle installed."""
+        if self._patch_in_progress:
+            return
+        from installer import plan_write_paths, preflight_blockers, smart_install
+        blocker = preflight_blockers(self.mq_root, plan_write_paths(plan) if plan else None)
+        if blocker:
+            self.app.set_status(blocker, error=True)
+            return
+        from migrate_itemui_to_coopui import ensure_env_after_patch
         self.full_install_btn.configure(state="disabled")
         self.update_title.configure(text="Full Install / Repair")
         self.update_subtitle.configure(
             text="Downloading the complete bundle and overlaying it. Your config is preserved.",
             text_color="#ffffff",
         )
-
-        # Show progress + log UI (same widgets the update flow uses).
-        if not self._progress_visible:
-            self.progress_bar.pack(in_=self.progress_frame, fill="x")
-            self.progress_label.pack(in_=self.progress_frame, fill="x", pady=(4, 0))
-            self._progress_visible = True
-        self.progress_bar.set(0)
-        if not self._patchlog_visible:
-            self._bottom_spacer.pack_forget()
-            self.patch_log.pack(fill="both", expand=True, padx=16, pady=(8, 8))
-            self._patchlog_visible = True
-        self.patch_log.configure(state="normal")
-        self.patch_log.delete("0.0", "end")
-        self.patch_log.configure(state="disabled")
+        # Same progress + log widgets the update flow uses.
+        self._show_progress_ui()
 
         def progress_cb(msg: str, frac: float):
-            def update():
-                self.progress_bar.set(max(0.0, min(frac, 1.0)))
-                self.progress_label.configure(text=msg[:90])
-                self.patch_log.configure(state="normal")
-                self.patch_log.insert("end", f"  {msg}\n")
-                self.patch_log.see("end")
-                self.patch_log.configure(state="disabled")
-            self.after(0, update)
-
-        def run():
+            self._post_progress(frac, msg[:90], f"  {msg}\n")
+
+        log = _operation_log(self.mq_root)
+
+        def run(cancel) -> tuple:
             try:
-                success, message = smart_install(self.mq_root, REPO_BASE_URL, progress_cb)
+                success, message = smart_install(self.mq_root, REPO_BASE_URL, progress_cb,
+                                                 plan=plan, cancel=cancel,
+                                                 bus=ProgressBus(*([log] if log else [])))
+                if success:
+                    ensure_env_after_patch(self.mq_root)
             except Exception as e:
                 # Keep the UI alive even if the installer raises something unexpected.
                 success, message = False, f"Install failed unexpectedly: {e}"
-            self.after(0, lambda: self._on_full_install_done(success, message))
+            finally:
+                if log:
+                    log.close()
+            return success, message
 
-        threading.Thread(target=run, daemon=True).start()
+        self._start_job("install", run, lambda result: self._on_full_install_done(*result))
 
     def _on_full_install_done(self, success: bool, message: str):
+        from updater import get_installed_version
         self._patch_in_progress = False
         self.app.in_progress = False
         self.full_install_btn.configure(state="normal")
         if success:
-            ensure_env_after_patch(self.mq_root)
             self.progress_bar.set(1.0)
             self.update_title.configure(text="Install / Repair complete")
             self.update_subtitle.configure(text=message, text_color=SUCCESS_GREEN)
             self.progress_label.configure(text=message[:90])
             self.app.set_primary_button("Done", None, enabled=False, color=SUCCESS_GREEN)
+            self._refresh_revert_btn()
             installed = get_installed_version(self.mq_root)
             if installed:
                 self.valid_label.configure(text=f"  Valid install · CoOpt UI v{installed}")
         else:
+            self.patch_log.buffer.append(message, ERROR)
             self.update_subtitle.configure(text=message, text_color=ERROR_RED)
             self.progress_label.configure(text=message[:90])
             self.app.set_primary_button("Retry", self._on_full_install, enabled=True, color=ORANGE)
 
+    def _refresh_revert_btn(self):
+        from transaction import latest_snapshot, skipped_snapshot
+        snap = latest_snapshot(self.mq_root)
+        if snap is not None:
+            self.revert_btn.configure(text=f"Revert to previous version  (before the {snap['label']})",
+                                      state="normal")
+        elif (skipped := skipped_snapshot(self.mq_root)) is not None:
+            # Over snapshot_max_mb: say why instead of silently hiding the button.
+            self.revert_btn.configure(text=f"Revert unavailable  (the {skipped.get('label')} was "
+                                           "larger than snapshot_max_mb)", state="disabled")
+        else:
+            self.revert_btn.pack_forget()
+            return
+        self.revert_btn.pack(in_=self, fill="x", padx=20, pady=(6, 0), after=self.full_install_btn)
+
+    def _on_revert(self):
+        """Restore the files the last update / repair replaced (no network needed)."""
+        if self._patch_in_progress:
+            return
+        from installer import preflight_blockers
+        from transaction import latest_snapshot, revert
+        snap = latest_snapshot(self.mq_root)
+        meta = snap["meta"] if snap else {}
+        blocker = preflight_blockers(self.mq_root, meta.get("replaced", []) + meta.get("created", []))
+        if blocker:
+            self.app.set_status(blocker, error=True)
+            return
+        self.full_install_btn.configure(state="disabled")
+        self.revert_btn.configure(state="disabled")
+        self.app.set_primary_button("Reverting...", None, enabled=False, color=ORANGE)
+        self.update_title.configure(text="Revert to previous version")
+        self.update_subtitle.configure(text="Restoring the previous files...", text_color="#ffffff")
+
+        def run(_cancel) -> tuple:
+            # Offline and one transaction: not cancellable — a cancel waits for it.
+            try:
+                return revert(self.mq_root)
+            except Exception as e:
+                return False, f"Revert failed unexpectedly: {e}"
+
+        self._start_job("revert", run, lambda result: self._on_revert_done(*result), cancellable=False)
+
+    def _on_revert_done(self, success: bool, message: str):
+        self._patch_in_progress = False
+        self.app.in_progress = False
+        self.full_install_btn.configure(state="normal")
+        self.revert_btn.configure(state="normal")
+        self._refresh_revert_btn()
+        if not success:
+            self.update_subtitle.configure(text=message, text_color=ERROR_RED)
+            self.app.set_primary_button("Retry", self._retry_check, enabled=True, color=ORANGE)
+            return
+        self.app.set_status(message)
+        self._start_update_check()
+
     def _on_change_folder(self):
-        # Switching views destroys this MainView under a live worker thread —
-        # a silent mid-patch abort. Refuse while an operation is running.
-        if self.app.in_progress:
-            self.app.set_status("Please wait for the current update/install to finish.")
+        # Switching views destroys this MainView: cancel its job first and switch once
+        # it has stopped (its transaction aborted), never under a live worker.
+        self.app.cancel_then(self, self.app.show_setup)
+
+    def _on_all_installs(self):
+        self.app.cancel_then(self, self.app.show_batch)
+
+
+# ---------------------------------------------------------------------------
+# BatchView — update every known install in one pass
+# ---------------------------------------------------------------------------
+
+class BatchView(ctk.CTkFrame):
+    """Per-root status table for batch.update_all()."""
+
+    def __init__(self, parent, app: "PatcherApp", roots: list[str]):
+        super().__init__(parent, fg_color="transparent")
+        self.app = app
+        self.roots = roots
+        self._checks: dict[str, ctk.BooleanVar] = {}
+        self._status: dict[str, ctk.CTkLabel] = {}
+
+        top = ctk.CTkFrame(self, fg_color="transparent")
+        top.pack(fill="x", padx=16, pady=(16, 0))
+        ctk.CTkLabel(
+            top, text="Update all installs",
+            font=ctk.CTkFont(size=16, weight="bold"), anchor="w",
+        ).pack(side="left")
+        self.back_btn = ctk.CTkButton(
+            top, text="Back", width=70,
+            font=ctk.CTkFont(size=11),
+            fg_color=NAVY, hover_color="#2a3a4f",
+            command=self._on_back,
+        )
+        self.back_btn.pack(side="right")
+
+        self.subtitle = ctk.CTkLabel(
+            self, text="Each file is downloaded once and shared by every selected install.",
+            font=ctk.CTkFont(size=12), text_color=TEXT_DIM, anchor="w", wraplength=460,
+        )
+        self.subtitle.pack(fill="x", padx=20, pady=(4, 8))
+
+        table = ctk.CTkScrollableFrame(self, fg_color=CARD_BG, corner_radius=8)
+        table.pack(fill="both", expand=True, padx=16, pady=(0, 8))
+        if not roots:
+            ctk.CTkLabel(
+                table, text="No MacroQuest installs found.",
+                font=ctk.CTkFont(size=12), text_color=TEXT_DIM,
+            ).pack(pady=12)
+        for root in roots:
+            row = ctk.CTkFrame(table, fg_color="transparent")
+            row.pack(fill="x", padx=8, pady=(6, 0))
+            var = ctk.BooleanVar(value=True)
+            self._checks[root] = var
+            ctk.CTkCheckBox(
+                row, text=root, variable=var, font=ctk.CTkFont(size=12),
+            ).pack(fill="x")
+            status = ctk.CTkLabel(
+                row, text="", font=ctk.CTkFont(size=11),
+                text_color=TEXT_DIM, anchor="w", wraplength=440,
+            )
+            status.pack(fill="x", padx=(28, 0))
+            self._status[root] = status
+
+        self.app.set_primary_button("Update All", self._on_update_all if roots else None,
+                                    enabled=bool(roots), color=ORANGE)
+
+    def _on_back(self):
+        self.app.cancel_then(self, self._show_previous)
+
+    def _show_previous(self):
+        saved_root = self.app.config.get("mq_root", "")
+        if saved_root and validate_mq_root(saved_root)[0]:
+            self.app.show_main(saved_root, save=False)
+        else:
+            self.app.show_setup()
+
+    def _on_update_all(self):
+        selected = [r for r in self.roots if self._checks[r].get()]
+        if not selected or self.app.in_progress:
             return
-        self.app.show_setup()
+        self.app.in_progress = True
+        self.app.set_primary_button("Cancel", self._on_cancel, enabled=True, color=NAVY)
+        for root in self.roots:
+            self._status[root].configure(
+                text="Waiting..." if root in selected else "Skipped", text_color=TEXT_DIM,
+            )
+
+        def progress_cb(root: str, message: str):
+            # One pending update per root: a busy root cannot flood the Tk thread.
+            self.app.ui.post(lambda: self._status[root].configure(text=message[:120], text_color=TEXT_DIM),
+                             key=("batch", root), widget=self)
+
+        from batch import update_all
+
+        def run(cancel) -> tuple:
+            try:
+                return update_all(selected, REPO_BASE_URL, MANIFEST_PATH,
+                                  DEFAULT_CONFIG_MANIFEST_PATH, progress_cb, cancel=cancel)
+            except Exception as e:
+                return [], f"Batch update failed unexpectedly: {e}"
+
+        self.app.jobs.submit("batch", run, priority=PRIORITY_WRITE, owner=self,
+                             on_done=lambda result: self._on_done(*result),
+                             on_cancel=self._on_cancelled)
+
+    def _on_cancel(self):
+        if self.app.jobs.cancel(owner=self):
+            self.app.set_primary_button("Cancelling...", None, enabled=False, color=NAVY)
+
+    def _on_cancelled(self):
+        self.app.in_progress = False
+        self.subtitle.configure(
+            text="Cancelled. Installs already updated stay updated; the others were not changed.",
+            text_color=TEXT_DIM,
+        )
+        self.app.set_primary_button("Update All", self._on_update_all, enabled=True, color=ORANGE)
+
+    def _on_done(self, rows: list[dict], err: str | None):
+        from batch import STATUS_BLOCKED, STATUS_FAILED
+        self.app.in_progress = False
+        if err:
+            self.subtitle.configure(text=err, text_color=ERROR_RED)
+            self.app.set_primary_button("Retry", self._on_update_all, enabled=True, color=ORANGE)
+            return
+        bad = 0
+        for row in rows:
+            text = row["status"]
+            if row["files"] or row["defaults"]:
+                text += f" · {row['files']} file(s), {row['defaults']} default config"
+            if row["message"]:
+                text += f" · {row['message']}"
+            color = SUCCESS_GREEN
+            if row["status"] in (STATUS_BLOCKED, STATUS_FAILED):
+                color = ERROR_RED
+                bad += 1
+            self._status[row["root"]].configure(text=text, text_color=color)
+        if bad:
+            self.subtitle.configure(text=f"{bad} install(s) could not be updated.", text_color=ERROR_RED)
+            self.app.set_primary_button("Retry", self._on_update_all, enabled=True, color=ORANGE)
+        else:
+            self.subtitle.configure(text="All selected installs are up to date.", text_color=SUCCESS_GREEN)
+            self.app.set_primary_button("Done", None, enabled=False, color=SUCCESS_GREEN)
 
 
 # ---------------------------------------------------------------------------
@@ -617,9 +1126,15 @@ class PatcherApp(ctk.CTk):
         self.minsize(MIN_WIDTH, MIN_HEIGHT)
         self.resizable(True, True)
         self.config = load_config()
-        # True while an update / full install / fresh install thread is running.
-        # Guards Change-folder, Close and window-close from aborting a live worker.
+        # Every worker result and progress update reaches the widgets through self.ui,
+        # drained on this (the Tk) thread; self.jobs runs the workers (jobs.py).
+        self.ui = UiChannel()
+        self.ui.attach(self)
+        self.jobs = JobScheduler(channel=self.ui)
+        # True while an update / full install / fresh install job is running: the view's
+        # other buttons stay inert until it finishes or is cancelled.
         self.in_progress = False
+        self._closing = False
         self.protocol("WM_DELETE_WINDOW", self._on_close_request)
 
         # --- Header bar (navy) — packed first (top) ---
@@ -627,30 +1142,14 @@ class PatcherApp(ctk.CTk):
         self.header.pack(fill="x", side="top")
         self.header.pack_propagate(False)
 
-        # Logo icon
+        # Logo icon: loaded once the window is up (PIL + decoding is not free)
         self.logo_image = None
-        banner_path = resource_path(os.path.join("assets", "banner.png"))
-        if os.path.isfile(banner_path):
-            try:
-                pil_img = Image.open(banner_path).convert("RGBA")
-                self.logo_image = ctk.CTkImage(
-                    light_image=pil_img, dark_image=pil_img,
-                    size=(36, 36),
-                )
-            except Exception:
-                pass
-
-        if self.logo_image:
-            ctk.CTkLabel(
-                self.header, text="", image=self.logo_image,
-                fg_color="transparent",
-            ).pack(side="left", padx=(12, 4))
-
-        ctk.CTkLabel(
+        self.title_label = ctk.CTkLabel(
             self.header, text="CoOpt UI Patcher",
             font=ctk.CTkFont(size=16, weight="bold"),
             text_color="#ffffff",
-        ).pack(side="left", padx=(4, 0))
+        )
+        self.title_label.pack(side="left", padx=(4, 0))
 
         self.version_label = ctk.CTkLabel(
             self.header, text="",
@@ -691,6 +1190,11 @@ class PatcherApp(ctk.CTk):
         self.body = ctk.CTkFrame(self, fg_color=BODY_BG, corner_radius=0)
         self.body.pack(fill="both", expand=True)
 
+        self._startup_marks: dict[str, float] = {}
+        self._startup_profile = os.environ.get(STARTUP_PROFILE_ENV, "")
+        self._detecting = False  # the Setup view is streaming detected installs
+        self.after_idle(self._on_first_paint)
+
         # --- Decide initial state ---
         saved_root = self.config.get("mq_root", "")
         if saved_root and os.path.isdir(saved_root):
@@ -702,13 +1206,69 @@ class PatcherApp(ctk.CTk):
                 return
         self.show_setup()
 
+    def _on_first_paint(self):
+        """Idle after the first layout: the window is on screen. Load the logo now."""
+        self.mark_startup("first_paint")
+        banner_path = resource_path(os.path.join("assets", "banner.png"))
+        if os.path.isfile(banner_path):
+            try:
+                from PIL import Image
+                pil_img = Image.open(banner_path).convert("RGBA")
+                self.logo_image = ctk.CTkImage(
+                    light_image=pil_img, dark_image=pil_img,
+                    size=(36, 36),
+                )
+                ctk.CTkLabel(
+                    self.header, text="", image=self.logo_image,
+                    fg_color="transparent",
+                ).pack(side="left", padx=(12, 4), before=self.title_label)
+            except Exception:
+                pass
+        self.mark_startup("logo")
+
+    def mark_startup(self, name: str):
+        """Record a startup milestone (seconds since the module loaded). With
+        COOPUI_STARTUP_PROFILE set, print them all once the window has painted and
+        detection (when the Setup view runs it) has finished; =exit then closes."""
+        if name in self._startup_marks:
+            return
+        self._startup_marks[name] = round(time.perf_counter() - _MODULE_LOADED, 4)
+        if not self._startup_profile or "logo" not in self._startup_marks:
+            return
+        if self._detecting and "detection" not in self._startup_marks:
+            return
+        print(json.dumps({"startup": self._startup_marks}), file=sys.stderr, flush=True)
+        self._startup_profile = ""
+        if os.environ.get(STARTUP_PROFILE_ENV) == "exit" and not self.in_progress:
+            self.after(0, self.destroy)
+
     def _on_close_request(self):
-        """Close button / window X: ignore while a worker thread is mid-operation,
-        so the app can't exit under a half-applied update or install."""
-        if self.in_progress:
-            self.set_status("An update/install is running — please wait for it to finish.", error=True)
+        """Close button / window X: cancel a running update / install and close once it
+        has stopped, so the app never exits under a half-applied one."""
+        if self._closing:
             return
-        self.destroy()
+        if not self.jobs.busy(min_priority=PRIORITY_WRITE):
+            self.destroy()
+            return
+        self._closing = True
+        self.set_primary_button("Closing...", None, enabled=False, color=NAVY)
+        self.cancel_then(None, self.destroy)
+
+    def cancel_then(self, owner, then):
+        """Cancel owner's jobs (every job when owner is None) and call then() once the
+        writes among them have stopped — each aborts its transaction at its next check,
+        a commit already under way finishes first. Update checks are not waited for:
+        their results are dropped with the view."""
+        if self.jobs.cancel(owner):
+            self.set_status("Cancelling — waiting for the current step to stop...")
+
+        def poll():
+            if self.jobs.busy(owner, min_priority=PRIORITY_WRITE):
+                self.after(100, poll)
+                return
+            self.in_progress = False
+            then()
+        poll()
 
     def set_status(self, text: str, error: bool = False):
         """Update the inline status label."""
@@ -741,6 +1301,7 @@ class PatcherApp(ctk.CTk):
         self.set_status("")
         self.set_primary_button("Update", None, enabled=False)
         self.version_label.configure(text="")
+        self._detecting = True
         view = SetupView(self.body, self)
         view.pack(fill="both", expand=True)
 
@@ -755,14 +1316,30 @@ class PatcherApp(ctk.CTk):
         if not saved_ok:
             # Non-blocking: patching still works, the folder just won't be remembered.
             self.set_status("Warning: could not save settings — this folder won't be remembered next launch.")
+        # Settle an update a crash or a locked file interrupted (replay or roll back)
+        # before anything reads the install.
+        from transaction import pending as transaction_pending, recover as recover_transaction
+        note = recover_transaction(mq_root)
+        if note:
+            self.set_status(note, error=transaction_pending(mq_root))
         view = MainView(self.body, self, mq_root)
         view.pack(fill="both", expand=True)
 
+    def show_batch(self):
+        """Show the batch view for every known install (recent + detected)."""
+        self._clear_body()
+        self.set_status("")
+        self.version_label.configure(text="")
+        from batch import known_installs
+        view = BatchView(self.body, self, known_installs(self.config))
+        view.pack(fill="both", expand=True)
+
     def show_fresh_install(self, target_dir: str):
         """Run the fresh install flow, then transition to Main view."""
         # Fresh Install accepts any folder the user picks, and picking an EXISTING install to
         # "reinstall" is common. Without this it was the one write path with no live-install
         # guard: the overlay would abort on the first locked binary, part-written.
+        from installer import preflight_blockers, smart_install
         blocker = preflight_blockers(target_dir)
         if blocker:
             self.set_status(blocker, error=True)
@@ -796,15 +1373,21 @@ class PatcherApp(ctk.CTk):
         )
         detail_label.pack(fill="x", padx=24)
 
-        self.set_primary_button("Installing...", None, enabled=False)
+        def on_cancel():
+            if self.jobs.cancel(owner=progress_frame):
+                self.set_primary_button("Cancelling...", None, enabled=False, color=NAVY)
+
+        self.set_primary_button("Cancel", on_cancel, enabled=True, color=NAVY)
         self.in_progress = True
 
-        def run():
+        def run(cancel):
             def progress_cb(msg: str, frac: float):
-                self.after(0, lambda: (
+                self.ui.post(lambda: (
                     progress_bar.set(frac),
                     detail_label.configure(text=msg),
-                ))
+                ), key="fresh_install", widget=progress_frame)
+
+            log = _operation_log(target_dir)
 
             # Fresh install uses the same preserve-aware overlay as Full Install / Repair:
             # smart_install downloads CoOpt's EMU bundle (MacroQuest + Mono + E3 + the whole
@@ -813,20 +1396,28 @@ class PatcherApp(ctk.CTk):
             # scratch in an empty folder, or safely overlaying onto an existing MacroQuest
             # while keeping the user's config.
             try:
-                success, message = smart_install(target_dir, REPO_BASE_URL, progress_cb)
+                return smart_install(target_dir, REPO_BASE_URL, progress_cb, cancel=cancel,
+                                     bus=ProgressBus(*([log] if log else [])))
             except Exception as e:
                 # Keep the UI alive even if the installer raises something unexpected.
-                success, message = False, f"Install failed unexpectedly: {e}"
+                return False, f"Install failed unexpectedly: {e}"
+            finally:
+                if log:
+                    log.close()
+
+        def done(result: tuple):
+            success, message = result
             if not success:
-                self.after(0, lambda: self._fresh_install_error(message))
+                self._fresh_install_error(message)
                 return
+            self.in_progress = False
+            self.show_main(target_dir)
 
-            def finish():
-                self.in_progress = False
-                self.show_main(target_dir)
-            self.after(0, finish)
-
-        threading.Thread(target=run, daemon=True).start()
+        self.jobs.submit(
+            "fresh_install", run, priority=PRIORITY_WRITE, owner=progress_frame, on_done=done,
+            on_cancel=lambda: self._fresh_install_error(
+                "Fresh install cancelled. The step in progress was rolled back."),
+        )
 
     def _fresh_install_error(self, message: str):
         """Handle fresh install failure."""
@@ -3,7 +3,13 @@ Auto-detect MacroQuest installations via Windows registry and common filesystem
 """
 
 import os
-import winreg
+import queue
+import threading
+import time
+from typing import Callable, Iterator
+
+MQ_NAMES = ("MacroQuest", "MQ2", "MQ", "MQNext", "MacroQuest2")
+DRIVES = "CDEFG"
 
 
 def find_mq_installations() -> list[str]:
@@ -11,22 +17,48 @@ def find_mq_installations() -> list[str]:
     Return list of candidate MQ root paths, ordered by likelihood.
     Each path has been verified to contain MacroQuest.exe or config/.
     """
-    candidates = set()
-
-    # Strategy 1: Check registry for EverQuest install paths
-    _check_registry(candidates)
+    return sorted(set(iter_mq_installations()))
 
-    # Strategy 2: Scan common filesystem locations
-    _check_common_paths(candidates)
 
-    # Validate each candidate
-    valid = []
-    for path in candidates:
-        path = os.path.normpath(path)
-        if _looks_like_mq_root(path):
-            valid.append(path)
+def iter_mq_installations(timeout: float | None = None) -> Iterator[str]:
+    """
+    Yield verified MQ roots as they are found, each once. The registry, the home folders
+    and every drive letter are searched on their own daemon threads: a sleeping network
+    or optical drive can take seconds to answer os.path.isdir, and now delays only its
+    own results. With a timeout, stop waiting for the slow ones after that many seconds.
+    """
+    found = queue.SimpleQueue()
+    scopes = _search_scopes()
 
-    return sorted(set(valid))
+    def run(scope: Callable[[set], None]) -> None:
+        candidates: set = set()
+        try:
+            scope(candidates)
+            for path in candidates:
+                path = os.path.normpath(path)
+                if _looks_like_mq_root(path):
+                    found.put(path)
+        except OSError:
+            pass
+        finally:
+            found.put(None)
+
+    for scope in scopes:
+        threading.Thread(target=run, args=(scope,), daemon=True, name="coopui-detect").start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    seen = set()
+    remaining = len(scopes)
+    while remaining:
+        try:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            path = found.get(timeout=wait)
+        except queue.Empty:
+            return
+        if path is None:
+            remaining -= 1
+        elif os.path.normcase(path) not in seen:
+            seen.add(os.path.normcase(path))
+            yield path
 
 
 def _looks_like_mq_root(path: str) -> bool:
@@ -38,8 +70,22 @@ def _looks_like_mq_root(path: str) -> bool:
     return has_exe or has_config
 
 
+def _search_scopes() -> list[Callable[[set], None]]:
+    """Independent searches, one per thread in iter_mq_installations()."""
+    home = os.path.expanduser("~")
+    scopes = [_check_registry,
+              lambda c: _check_parents([os.path.join(home, "Documents"), os.path.join(home, "Desktop")], c)]
+    for letter in DRIVES:
+        scopes.append(lambda c, drive=letter + ":\\": _check_drive(drive, c))
+    return scopes
+
+
 def _check_registry(candidates: set):
     """Check Windows registry for EQ/MQ related install paths."""
+    try:
+        import winreg
+    except ImportError:
+        return  # not Windows
     registry_keys = [
         (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\WOW6432Node\Daybreak Game Company\EverQuest"),
         (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Daybreak Game Company\EverQuest"),
@@ -62,26 +108,19 @@ def _check_registry(candidates: set):
             pass
 
 
-def _check_common_paths(candidates: set):
-    """Check common filesystem locations where users install MQ."""
-    home = os.path.expanduser("~")
-    drives = [d + ":\\" for d in "CDEFG" if os.path.isdir(d + ":\\")]
-
-    mq_names = ["MacroQuest", "MQ2", "MQ", "MQNext", "MacroQuest2"]
+def _check_drive(drive: str, candidates: set):
+    """Common install locations on one drive (the drive root, Games, EQ, EverQuest)."""
+    if not os.path.isdir(drive):
+        return
+    _check_parents([drive, *(os.path.join(drive, d) for d in ("Games", "EQ", "EverQuest"))], candidates)
 
-    parents = [
-        *drives,
-        *[os.path.join(d, "Games") for d in drives],
-        *[os.path.join(d, "EQ") for d in drives],
-        *[os.path.join(d, "EverQuest") for d in drives],
-        os.path.join(home, "Documents"),
-        os.path.join(home, "Desktop"),
-    ]
 
+def _check_parents(parents: list, candidates: set):
+    """Each parent folder itself, and the usual MQ folder names inside it."""
     for parent in parents:
         if not os.path.isdir(parent):
             continue
-        for name in mq_names:
+        for name in MQ_NAMES:
             candidate = os.path.join(parent, name)
             if os.path.isdir(candidate):
                 candidates.add(candidate)
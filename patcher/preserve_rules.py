@@ -0,0 +1,270 @@
+"""
+Declarative preserve rules for Full Install / Repair (installer.should_preserve).
+
+The rules used to be a hand-coded chain of startswith / extension checks, so every new
+rule meant a patcher release. They are now a table — preserve_rules.json at the repo root,
+fetched next to the manifests (conditionally, via manifest_cache) — with DEFAULT_RULES
+below as the built-in copy used when it cannot be fetched or does not validate.
+
+Each rule has an "id", an "action" ("preserve" or "refresh"), a "priority" (the highest
+matching rule wins; ties go to the earlier rule), a "why" for support, and one or more
+conditions that must all hold:
+
+  "prefix"  a directory prefix ("config/")        "path"  one exact path
+  "ext"     a list of extensions ([".ini"])       "glob"  fnmatch pattern; without a "/"
+                                                          it matches the file name only
+Paths are compared lower-cased with forward slashes. A path no rule matches is refreshed.
+
+RuleSet compiles a table into a prefix trie over path components, an exact-path map and
+an extension map, so classifying a path is one walk down its directories.
+"""
+
+import fnmatch
+import json
+import posixpath
+import sys
+
+import manifest_cache
+
+RULES_FILENAME = "preserve_rules.json"
+SCHEMA_VERSION = 1
+PRESERVE = "preserve"
+REFRESH = "refresh"
+
+# Keep identical to preserve_rules.json at the repo root (the tests check).
+DEFAULT_RULES = {
+    "schema": 1,
+    "rules": [
+        {
+            "id": "code-and-binaries",
+            "action": "refresh",
+            "priority": 100,
+            "ext": [".exe", ".dll", ".lua", ".mac", ".png", ".ico"],
+            "why": "Code, binaries and UI assets are always refreshed.",
+        },
+        {
+            "id": "resources",
+            "action": "refresh",
+            "priority": 90,
+            "prefix": "resources/",
+            "why": "Game UI resources ship with the bundle and are always refreshed.",
+        },
+        {
+            "id": "mq-config",
+            "action": "preserve",
+            "priority": 80,
+            "prefix": "config/",
+            "why": "MacroQuest config: EQ path, server list, per-character inis, overlay "
+                   "layouts, AutoLogin and the e3 Macro Inis.",
+        },
+        {
+            "id": "macro-user-config",
+            "action": "preserve",
+            "priority": 70,
+            "prefix": "macros/",
+            "ext": [".ini", ".cfg"],
+            "why": "CoOpt UI and macro user rules and state (sell/loot/shared inis, layout, "
+                   "filter presets). Macro code (.mac) is refreshed.",
+        },
+        {
+            "id": "scripttracker-settings",
+            "action": "preserve",
+            "priority": 60,
+            "path": "lua/scripttracker/scripttracker.ini",
+            "why": "ScriptTracker user settings; the update path never ships this file either.",
+        },
+        {
+            "id": "login-db",
+            "action": "preserve",
+            "priority": 50,
+            "glob": "login.db*",
+            "why": "Login / account databases.",
+        },
+        {
+            "id": "e3-character-data",
+            "action": "preserve",
+            "priority": 40,
+            "prefix": "mono/macros/e3/",
+            "ext": [".ini", ".txt"],
+            "why": "E3 per-character data (mono/macros/e3/<CharName>/).",
+        },
+    ],
+}
+
+
+def _normalize(rel_path: str) -> str:
+    return rel_path.replace("\\", "/").lstrip("/").lower()
+
+
+class RuleSet:
+    """
+    A compiled rule table. Raises ValueError for a table that does not validate, so a
+    broken preserve_rules.json can never half-apply.
+    """
+
+    def __init__(self, table: dict, source: str = "built-in"):
+        if not isinstance(table, dict) or table.get("schema") != SCHEMA_VERSION:
+            raise ValueError("unsupported preserve rules schema")
+        rules = table.get("rules")
+        if not isinstance(rules, list) or not rules:
+            raise ValueError("preserve rules table has no rules")
+        self.source = source
+        self.rules = []
+        self._trie: dict = {}           # component -> [child trie, [rules]]
+        self._root_rules: list = []     # rules without a prefix / path / ext anchor
+        self._paths: dict = {}          # exact path -> [rules]
+        self._by_ext: dict = {}         # ext -> [rules] (ext-only rules)
+        seen = set()
+        for order, raw in enumerate(rules):
+            rule = self._compile(raw, order)
+            if rule["id"] in seen:
+                raise ValueError(f"duplicate preserve rule id {rule['id']!r}")
+            seen.add(rule["id"])
+            self.rules.append(rule)
+            if rule["path"] is not None:
+                self._paths.setdefault(rule["path"], []).append(rule)
+            elif rule["prefix"] is not None:
+                node = [self._trie, None]
+                for part in rule["prefix"].rstrip("/").split("/"):
+                    node = node[0].setdefault(part, [{}, []])
+                node[1].append(rule)
+            elif rule["ext"] is not None and rule["glob"] is None:
+                for ext in rule["ext"]:
+                    self._by_ext.setdefault(ext, []).append(rule)
+            else:
+                self._root_rules.append(rule)
+
+    @staticmethod
+    def _compile(raw: dict, order: int) -> dict:
+        if not isinstance(raw, dict) or not isinstance(raw.get("id"), str) or not raw["id"]:
+            raise ValueError(f"preserve rule #{order + 1} has no id")
+        rid = raw["id"]
+        if raw.get("action") not in (PRESERVE, REFRESH):
+            raise ValueError(f"preserve rule {rid!r}: action must be preserve or refresh")
+        priority = raw.get("priority", 0)
+        if not isinstance(priority, int):
+            raise ValueError(f"preserve rule {rid!r}: priority must be an integer")
+        prefix, path, glob, exts = raw.get("prefix"), raw.get("path"), raw.get("glob"), raw.get("ext")
+        if prefix is not None and (not isinstance(prefix, str) or not prefix.endswith("/")
+                                   or not prefix.strip("/")):
+            raise ValueError(f"preserve rule {rid!r}: prefix must be a directory ending in /")
+        if path is not None and (not isinstance(path, str) or not path.strip("/")):
+            raise ValueError(f"preserve rule {rid!r}: path must be a file path")
+        if glob is not None and (not isinstance(glob, str) or not glob):
+            raise ValueError(f"preserve rule {rid!r}: glob must be a pattern")
+        if exts is not None and (not isinstance(exts, list) or not exts or not all(
+                isinstance(e, str) and e.startswith(".") for e in exts)):
+            raise ValueError(f"preserve rule {rid!r}: ext must be a list like [\".ini\"]")
+        if prefix is None and path is None and glob is None and exts is None:
+            raise ValueError(f"preserve rule {rid!r} has no condition")
+        if prefix is not None and path is not None:
+            raise ValueError(f"preserve rule {rid!r}: use prefix or path, not both")
+        return {
+            "id": rid,
+            "action": raw["action"],
+            "priority": priority,
+            "order": order,
+            "why": raw.get("why") or "",
+            "prefix": _normalize(prefix) if prefix is not None else None,
+            "path": _normalize(path) if path is not None else None,
+            "glob": glob.lower() if glob is not None else None,
+            "ext": frozenset(e.lower() for e in exts) if exts is not None else None,
+        }
+
+    def match(self, rel_path: str) -> dict | None:
+        """The winning rule for rel_path (bundle-relative, either separator), or None."""
+        p = _normalize(rel_path)
+        parts = p.split("/")
+        base = parts[-1]
+        ext = posixpath.splitext(base)[1]
+        best = None
+
+        def consider(rules: list) -> None:
+            nonlocal best
+            for rule in rules:
+                if best is not None and (rule["priority"], -rule["order"]) <= (best["priority"], -best["order"]):
+                    continue
+                if rule["ext"] is not None and ext not in rule["ext"]:
+                    continue
+                if rule["glob"] is not None and not fnmatch.fnmatchcase(
+                        base if "/" not in rule["glob"] else p, rule["glob"]):
+                    continue
+                best = rule
+
+        consider(self._by_ext.get(ext, ()))
+        consider(self._paths.get(p, ()))
+        consider(self._root_rules)
+        node = self._trie
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is None:
+                break
+            consider(child[1])
+            node = child[0]
+        return best
+
+    def preserve(self, rel_path: str) -> bool:
+        rule = self.match(rel_path)
+        return rule is not None and rule["action"] == PRESERVE
+
+    def explain(self, rel_path: str) -> str:
+        """One line for support: the decision and the rule that made it."""
+        rule = self.match(rel_path)
+        if rule is None:
+            return f"{rel_path}: refresh (no rule matched; bundle files are refreshed by default)"
+        return f"{rel_path}: {rule['action']} (rule {rule['id']!r}, {self.source}) - {rule['why']}"
+
+
+BUILTIN = RuleSet(DEFAULT_RULES)
+_active = BUILTIN
+
+
+def active() -> RuleSet:
+    """The rule set installs use right now: the last refresh()ed table, else built-in."""
+    return _active
+
+
+def set_active(rules: RuleSet) -> None:
+    global _active
+    _active = rules
+
+
+def refresh(repo_base_url: str, path: str = RULES_FILENAME) -> str | None:
+    """
+    Fetch preserve_rules.json next to the manifests and make it the active rule set.
+    Returns an error message and keeps the built-in rules when it cannot be fetched or
+    does not validate. Never raises.
+    """
+    url = f"{repo_base_url.rstrip('/')}/{path}"
+    try:
+        text, _not_modified = manifest_cache.fetch(url, timeout=15)
+        set_active(RuleSet(json.loads(text), source=path))
+        return None
+    except Exception as e:
+        set_active(BUILTIN)
+        return f"Using the built-in preserve rules ({e})."
+
+
+def main(argv: list | None = None) -> int:
+    """Explain mode: python preserve_rules.py [--rules FILE] PATH... prints, per path, the
+    decision and the rule behind it."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Explain which preserve rule decides each path.")
+    parser.add_argument("paths", nargs="+", help="bundle-relative paths, e.g. config/MacroQuest.ini")
+    parser.add_argument("--rules", help=f"a {RULES_FILENAME} to use instead of the built-in rules")
+    args = parser.parse_args(argv)
+    rules = BUILTIN
+    if args.rules:
+        try:
+            with open(args.rules, "r", encoding="utf-8") as f:
+                rules = RuleSet(json.load(f), source=args.rules)
+        except (OSError, ValueError) as e:
+            print(f"Could not load {args.rules}: {e}", file=sys.stderr)
+            return 1
+    for rel in args.paths:
+        print(rules.explain(rel))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
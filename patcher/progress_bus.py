@@ -0,0 +1,293 @@
+"""
+Progress bus for long-running operations: updates, bundle downloads, overlays, builds.
+
+Producers report into phases as often as they like — once per zip member is fine:
+
+    bus = ProgressBus(ConsoleSink(), JsonLogSink("build_progress.jsonl"))
+    with bus.phase("Installing", total=len(members)) as phase:
+        for m in members:
+            ...
+            phase.advance(item=m)
+
+and the bus emits at most `hz` times a second (DEFAULT_HZ), plus every phase start and
+end, with a smoothed throughput and an ETA computed. Every event goes to every sink:
+
+  ConsoleSink      one status line on a terminal, redrawn in place (a line every few
+                   seconds when stderr is a CI log)
+  JsonLogSink      NDJSON, one object per event (build logs, the GUI's last-operation log)
+  channel_sink     the GUI: posts onto a jobs.UiChannel under one key, so the Tk thread
+                   applies only the latest
+  fraction_sink    the installer's ProgressCb(message, fraction) contract; usually a
+                   phase's own sink (bus.phase(..., sinks=[...])), mapping that phase onto
+                   its stretch of the bar
+
+An event is a dict: {"event": "start" | "progress" | "end" | "note", "phase", "done",
+"total", "unit", "item", "fraction", "rate", "eta", "elapsed", "t"}; fraction and eta are
+None while the total is unknown, rate is per second in `unit`. describe() renders one as
+a status line.
+"""
+
+from __future__ import annotations  # build/build.py imports this module too (Python 3.9+)
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable
+
+DEFAULT_HZ = 20.0
+# ConsoleSink writing to a log file or pipe: at most one progress line this often.
+CONSOLE_LOG_INTERVAL = 5.0
+# Weight of the newest interval in the smoothed rate (the rest is the previous rate).
+_RATE_SMOOTHING = 0.3
+
+Sink = Callable[[dict], None]
+
+
+class ProgressBus:
+    """Aggregates phase progress and emits rate-limited events to its sinks. Thread-safe:
+    phases may be advanced from any thread; sinks are called one event at a time."""
+
+    def __init__(self, *sinks: Sink, hz: float = DEFAULT_HZ, clock: Callable[[], float] = time.monotonic):
+        self.sinks = list(sinks)
+        self.interval = 1.0 / hz if hz > 0 else 0.0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._start = clock()
+        self._last_emit: float | None = None
+
+    def add_sink(self, sink: Sink) -> None:
+        self.sinks.append(sink)
+
+    def phase(self, name: str, total: int = 0, unit: str = "files", sinks=()) -> "Phase":
+        """Start a phase (emitted at once). total 0 = not known yet. sinks: extra sinks
+        for this phase's events only (e.g. a fraction_sink onto one stretch of a bar)."""
+        phase = Phase(self, name, total, unit, sinks)
+        with self._lock:
+            self._emit(phase._event("start", self._clock()), phase.sinks, throttle=False)
+        return phase
+
+    def note(self, message: str) -> None:
+        """An informational line (not rate-limited)."""
+        with self._lock:
+            self._emit({"event": "note", "message": message, "t": round(self._clock() - self._start, 3)},
+                       throttle=False)
+
+    def _due(self, now: float) -> bool:
+        return self._last_emit is None or now - self._last_emit >= self.interval
+
+    def _emit(self, event: dict, extra=(), throttle: bool = True) -> None:
+        # Called with self._lock held, so sinks see events in order, one at a time. A
+        # phase start does not hold back that phase's first progress event.
+        if throttle:
+            self._last_emit = self._clock()
+        for sink in (*self.sinks, *extra):
+            sink(event)
+
+
+class Phase:
+    """One stage of an operation (e.g. "Downloading" in bytes, "Installing" in files)."""
+
+    def __init__(self, bus: ProgressBus, name: str, total: int, unit: str, sinks=()):
+        self.bus = bus
+        self.sinks = tuple(sinks)
+        self.name = name
+        self.total = max(0, int(total or 0))
+        self.unit = unit
+        self.done = 0
+        self.item: str | None = None
+        self.started = bus._clock()
+        self.ended = False
+        self._rate: float | None = None
+        self._mark = (self.started, 0)
+
+    def advance(self, n: int = 1, item: str | None = None) -> None:
+        """n more units done (item: what was just done, shown in the status line)."""
+        with self.bus._lock:
+            self.done += n
+            self._changed(item)
+
+    def update(self, done: int, total: int | None = None, item: str | None = None) -> None:
+        """Absolute progress (e.g. bytes so far); total may become known late."""
+        with self.bus._lock:
+            self.done = done
+            if total:
+                self.total = total
+            self._changed(item)
+
+    def end(self, ok: bool = True) -> None:
+        """Finish the phase: always emitted, with the phase's average rate. ok=False
+        (an exception left the `with` block) ends it where it stopped."""
+        with self.bus._lock:
+            if self.ended:
+                return
+            self.ended = True
+            event = self._event("end", self.bus._clock())
+            event["ok"] = ok
+            if not ok:
+                event["fraction"] = min(1.0, self.done / self.total) if self.total else None
+                event["eta"] = None
+            self.bus._emit(event, self.sinks)
+
+    def callback(self, offset: int = 0) -> Callable[[int, int, str], None]:
+        """An updater-style progress_callback(done, total, path) feeding this phase; done
+        is shifted by offset (phases spanning several patch() calls)."""
+        return lambda done, _total, path: self.update(offset + done, item=path)
+
+    def __enter__(self) -> "Phase":
+        return self
+
+    def __exit__(self, exc_type, _exc, _tb) -> None:
+        self.end(ok=exc_type is None)
+
+    def _changed(self, item: str | None) -> None:
+        if item is not None:
+            self.item = item
+        now = self.bus._clock()
+        if self.bus._due(now):
+            self.bus._emit(self._event("progress", now), self.sinks)
+
+    def _event(self, kind: str, now: float) -> dict:
+        elapsed = now - self.started
+        if kind == "end":
+            rate = self.done / elapsed if elapsed > 0 else None
+        else:
+            mark_t, mark_done = self._mark
+            if now - mark_t > 0 and self.done > mark_done:
+                instant = (self.done - mark_done) / (now - mark_t)
+                self._rate = instant if self._rate is None else (
+                    _RATE_SMOOTHING * instant + (1 - _RATE_SMOOTHING) * self._rate)
+                self._mark = (now, self.done)
+            rate = self._rate
+        total = self.total or None
+        fraction = min(1.0, self.done / total) if total else (1.0 if kind == "end" else None)
+        eta = None
+        if kind == "end":
+            eta = 0.0
+        elif total and rate:
+            eta = max(0.0, (total - self.done) / rate)
+        return {
+            "event": kind, "phase": self.name, "done": self.done, "total": total,
+            "unit": self.unit, "item": self.item, "fraction": fraction,
+            "rate": round(rate, 3) if rate else None,
+            "eta": round(eta, 1) if eta is not None else None,
+            "elapsed": round(elapsed, 3), "t": round(now - self.bus._start, 3),
+        }
+
+
+# --- formatting -----------------------------------------------------------------------
+
+def format_eta(seconds: float) -> str:
+    seconds = int(round(seconds))
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
+
+
+def _amount(n: float, unit: str) -> str:
+    return f"{n / 1048576:.1f}" if unit == "bytes" else str(int(n))
+
+
+def describe(event: dict) -> str:
+    """One status line: "Installing: lua/x.lua  (1200/20000 files · 850 files/s · ETA 0:20)"."""
+    if event["event"] == "note":
+        return event["message"]
+    unit = event["unit"]
+    shown_unit = "MB" if unit == "bytes" else unit
+    if event["total"]:
+        stats = [f"{_amount(event['done'], unit)}/{_amount(event['total'], unit)} {shown_unit}"]
+    else:
+        stats = [f"{_amount(event['done'], unit)} {shown_unit}"]
+    if event["rate"]:
+        stats.append(f"{event['rate'] / 1048576:.1f} MB/s" if unit == "bytes"
+                     else f"{event['rate']:.0f} {unit}/s")
+    if event["event"] == "end":
+        stats.append(f"{event['elapsed']:.1f}s" if event.get("ok", True) else "stopped")
+    elif event["eta"] is not None:
+        stats.append(f"ETA {format_eta(event['eta'])}")
+    if event["item"]:
+        return f"{event['phase']}: {event['item']}  ({' · '.join(stats)})"
+    return f"{event['phase']}: {' · '.join(stats)}"
+
+
+# --- sinks ----------------------------------------------------------------------------
+
+class ConsoleSink:
+    """Status line on a terminal, redrawn in place and closed at each phase end. When the
+    stream is not a terminal (CI logs) each event is its own line, so progress lines are
+    thinned to one per log_interval seconds."""
+
+    def __init__(self, stream=None, log_interval: float = CONSOLE_LOG_INTERVAL):
+        self.stream = stream or sys.stderr
+        self.tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.log_interval = log_interval
+        self._width = 0
+        self._last_line: float | None = None
+
+    def __call__(self, event: dict) -> None:
+        line = "  " + describe(event)
+        if not self.tty:
+            if event["event"] == "progress":
+                if self._last_line is not None and event["t"] - self._last_line < self.log_interval:
+                    return
+                self._last_line = event["t"]
+            self.stream.write(line + "\n")
+        else:
+            pad = max(0, self._width - len(line))
+            self._width = len(line)
+            end = "\n" if event["event"] in ("end", "note") else ""
+            if end:
+                self._width = 0
+            self.stream.write("\r" + line + " " * pad + end)
+        self.stream.flush()
+
+
+class JsonLogSink:
+    """NDJSON log, one event per line. path is created (with its folder) and truncated;
+    close() when done (or use as a context manager)."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._f = open(path, "w", encoding="utf-8")
+
+    def __call__(self, event: dict) -> None:
+        if self._f.closed:
+            return
+        self._f.write(json.dumps(event) + "\n")
+        if event["event"] != "progress":
+            self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "JsonLogSink":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+
+def channel_sink(channel, apply: Callable[[dict], None], key="progress", widget=None) -> Sink:
+    """GUI sink: apply(event) on the Tk thread via a jobs.UiChannel, coalesced under key."""
+    return lambda event: channel.post(lambda: apply(event), key=key, widget=widget)
+
+
+def fraction_sink(progress_cb: Callable[[str, float], None] | None, lo: float = 0.0, hi: float = 1.0,
+                  unknown: Callable[[dict], float] | None = None) -> Sink:
+    """The installer's ProgressCb(message, fraction): each event's fraction mapped onto
+    lo..hi. unknown(event) supplies a phase fraction while the total is unknown (default:
+    hold the last one). Phase starts are not forwarded: the bar has not moved yet, and
+    the caller's own "Downloading ..." label stays up until there is progress to show."""
+    last = [0.0]
+
+    def sink(event: dict) -> None:
+        if not progress_cb or event["event"] in ("start", "note"):
+            return
+        frac = event["fraction"]
+        if frac is None:
+            frac = unknown(event) if unknown else last[0]
+        last[0] = frac
+        progress_cb(describe(event), lo + (hi - lo) * frac)
+    return sink
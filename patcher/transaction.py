@@ -0,0 +1,717 @@
+"""
+Journaled multi-file transactions for patch() and Full Install / Repair, with rollback
+snapshots.
+
+Each file used to be replaced atomically on its own, so a run that stopped half-way (a
+crash, or a DLL locked on the 40th file) left the install a mix of old and new files —
+the state that reaches users as "loop or previous error". A Transaction instead:
+
+  1. stages every new file under <root>/.coopui/txn/staging/ (the install's own volume);
+  2. writes the journal, <root>/.coopui/txn/journal.json ("prepared");
+  3. deflates the files it is about to replace or delete into a rollback snapshot,
+     <root>/.coopui/snapshots/<time>-<label>.zip, and marks the journal "committing";
+  4. moves every staged file into place (a batch of renames) and deletes the journal.
+
+A commit that fails part-way (a file locked after the preflight) is rolled back from the
+snapshot before commit() raises. recover() — run by every new Transaction and by the GUI
+when it opens an install — settles what a crash interrupted: a "prepared" journal is
+discarded (nothing had been touched), a "committing" one is replayed (every staged file
+was verified before the journal was written) or, when that fails too, rolled back.
+
+Snapshots are pruned after "snapshot_max_age_days" and, oldest first, down to
+"snapshot_max_mb"; the newest group is kept, because it is what revert() restores:
+"Revert to previous version" puts the snapshotted files back and deletes the files that
+update created, without any network access. Transactions opened inside one group() (the
+overlay and manifest phases of smart_install) are snapshotted and reverted together. A
+newest group larger than "snapshot_max_mb" on its own (a full repair) only guards its
+commit: once that settles it is deleted, and every older snapshot with it — they no
+longer lead back to a consistent install — and revert() says why there is nothing to
+restore.
+
+Staging, journal and snapshot paths are fixed per install, so a Transaction holds the
+install's InstallLock (<root>/.coopui/txn/lock) from start to commit() / abort(): the
+window, `python -m patcher` and the background watcher can then never stage into or
+recover over one another's update. The lock is an OS file lock, released when its
+process exits, so a crash cannot leave it stuck.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+import zipfile
+
+import config
+from hash_index import state_path
+
+TXN_DIRNAME = "txn"
+SNAPSHOT_DIRNAME = "snapshots"
+JOURNAL_NAME = "journal.json"
+LOCK_NAME = "lock"
+# Written into every snapshot zip next to the saved files.
+SNAPSHOT_META = ".coopui-snapshot.json"
+# In the snapshot directory after an update too large to keep a snapshot of.
+SKIPPED_NAME = "skipped.json"
+DEFAULT_SNAPSHOT_MAX_MB = 512
+DEFAULT_SNAPSHOT_MAX_AGE_DAYS = 30
+
+PREPARED = "prepared"
+COMMITTING = "committing"
+ROLLING_BACK = "rolling-back"
+
+_group: contextvars.ContextVar = contextvars.ContextVar("coopui_txn_group", default=None)
+# Groups whose snapshots went over snapshot_max_mb: their later transactions keep none.
+_oversize_groups: set = set()
+
+
+def long_path(p: str) -> str:
+    """
+    Extended-length form (\\\\?\\...) so file ops survive Windows' 260-char
+    MAX_PATH. The base bundle nests Mono files ~200 chars deep; under a deep MQ
+    root (plus the .tmp suffix) paths blow past the limit on stock systems (WinError 3).
+    Absolute-izes first ( \\\\?\\ requires absolute, backslash paths).
+    """
+    if os.name != "nt":
+        return p
+    p = os.path.abspath(p)
+    if p.startswith("\\\\?\\"):
+        return p
+    if p.startswith("\\\\"):  # UNC share -> \\?\UNC\server\share\...
+        return "\\\\?\\UNC" + p[1:]
+    return "\\\\?\\" + p
+
+
+class TransactionError(OSError):
+    """
+    A transaction could not commit (or could not start: an earlier one is still unsettled).
+    rel is the file that failed, if any. rolled_back is False only when the install could
+    not be put back either; the journal is then left for recover() on the next start.
+    """
+
+    def __init__(self, message: str, rel: str | None = None, rolled_back: bool = True,
+                 errno_: int | None = None):
+        super().__init__(errno_, message)
+        self.message = message
+        self.rel = rel
+        self.rolled_back = rolled_back
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class _FileError(Exception):
+    def __init__(self, rel: str, error: OSError):
+        super().__init__(f"{rel}: {error}")
+        self.rel = rel
+        self.error = error
+
+
+@contextlib.contextmanager
+def group():
+    """Transactions started inside share a snapshot group and are reverted as one."""
+    token = _group.set(uuid.uuid4().hex[:12])
+    try:
+        yield
+    finally:
+        _group.reset(token)
+
+
+def _txn_dir(root: str) -> str:
+    return state_path(root, TXN_DIRNAME)
+
+
+def _lock_path(root: str) -> str:
+    return os.path.join(_txn_dir(root), LOCK_NAME)
+
+
+class InstallLock:
+    """Exclusive lock on one install, across threads and processes (see module doc)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._f = None
+
+    def acquire(self) -> bool:
+        """Take the lock without waiting; False while someone else holds it. Raises
+        OSError if the lock file cannot be created (read-only install)."""
+        if self._f is not None:
+            return True
+        os.makedirs(_txn_dir(self.root), exist_ok=True)
+        f = open(_lock_path(self.root), "a+b")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._f = f
+        return True
+
+    def release(self) -> None:
+        f, self._f = self._f, None
+        if f is None:
+            return
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        f.close()  # closing drops a flock()
+
+
+def locked(root: str) -> bool:
+    """True while another Transaction (in this process or another) holds root's lock."""
+    lock = InstallLock(root)
+    try:
+        if not lock.acquire():
+            return True
+    except OSError:
+        return False
+    lock.release()
+    return False
+
+
+def _staging_dir(root: str) -> str:
+    return os.path.join(_txn_dir(root), "staging")
+
+
+def _journal_path(root: str) -> str:
+    return os.path.join(_txn_dir(root), JOURNAL_NAME)
+
+
+def _snapshot_dir(root: str) -> str:
+    return state_path(root, SNAPSHOT_DIRNAME)
+
+
+def _target(root: str, rel: str) -> str:
+    return long_path(os.path.join(root, rel.replace("/", os.sep)))
+
+
+def _staged(root: str, rel: str) -> str:
+    return long_path(os.path.join(_staging_dir(root), rel.replace("/", os.sep)))
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _read_journal(root: str) -> dict | None:
+    try:
+        with open(_journal_path(root), "r", encoding="utf-8") as f:
+            journal = json.load(f)
+        return journal if isinstance(journal, dict) else {}
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        return {}  # damaged: treated as a journal that never committed
+
+
+def _write_journal(root: str, journal: dict) -> None:
+    path = _journal_path(root)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(journal, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _finish(root: str, journal: dict, drop_snapshot: bool = False) -> None:
+    """Forget a settled transaction: staging, journal, and (rolled back) its snapshot."""
+    shutil.rmtree(long_path(_staging_dir(root)), ignore_errors=True)
+    if drop_snapshot and journal.get("snapshot"):
+        _remove(os.path.join(_snapshot_dir(root), journal["snapshot"]))
+    _remove(_journal_path(root))
+
+
+def pending(root: str) -> bool:
+    """True while a journal is waiting for recover() (e.g. files were locked)."""
+    return os.path.isfile(_journal_path(root))
+
+
+def _apply(root: str, journal: dict) -> None:
+    """Move staged files into place and delete removed ones. Idempotent: a file whose
+    staged copy is gone was already moved, so a replay continues where a crash stopped."""
+    for rel in journal.get("files", []):
+        staged = _staged(root, rel)
+        if not os.path.isfile(staged):
+            continue
+        target = _target(root, rel)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(staged, target)
+        except OSError as e:
+            raise _FileError(rel, e) from e
+    for rel in journal.get("removed", []):
+        try:
+            _remove(_target(root, rel))
+        except OSError as e:
+            raise _FileError(rel, e) from e
+
+
+def _restore_member(zf: zipfile.ZipFile, rel: str, dest: str) -> None:
+    tmp = dest + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with zf.open(rel) as src, open(tmp, "wb") as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            _remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _roll_back(root: str, journal: dict) -> bool:
+    """Undo what _apply() already did, from the snapshot. False when that is impossible
+    (no snapshot) or a file still cannot be written."""
+    name = journal.get("snapshot")
+    if not name:
+        return False
+    try:
+        with zipfile.ZipFile(os.path.join(_snapshot_dir(root), name), "r") as zf:
+            meta = json.loads(zf.read(SNAPSHOT_META))
+            saved = set(meta.get("replaced", []))
+            for rel in journal.get("files", []):
+                if os.path.isfile(_staged(root, rel)):
+                    continue  # never moved in
+                if rel in saved:
+                    _restore_member(zf, rel, _target(root, rel))
+                else:
+                    _remove(_target(root, rel))
+            for rel in journal.get("removed", []):
+                if rel in saved and not os.path.exists(_target(root, rel)):
+                    _restore_member(zf, rel, _target(root, rel))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return False
+    return True
+
+
+def recover(root: str) -> str | None:
+    """
+    Settle a transaction a crash or a locked file left behind. Returns a message saying
+    what was done, or None when there was nothing to do. Never raises; if the files are
+    still locked the journal stays (see pending()) and the next call tries again. While
+    another patcher holds the install lock its transaction is live, not interrupted:
+    nothing is touched and None is returned.
+    """
+    lock = InstallLock(root)
+    try:
+        if not lock.acquire():
+            return None
+    except OSError:
+        pass  # read-only install: nothing can be staged there, so nothing can race
+    try:
+        return _recover(root)
+    finally:
+        lock.release()
+
+
+def _recover(root: str) -> str | None:
+    # recover() with the install lock already held.
+    journal = _read_journal(root)
+    if journal is None:
+        if os.path.isdir(_staging_dir(root)):
+            shutil.rmtree(long_path(_staging_dir(root)), ignore_errors=True)
+        return None
+    label = journal.get("label") or "update"
+    state = journal.get("state")
+    try:
+        if state not in (COMMITTING, ROLLING_BACK):
+            _finish(root, journal, drop_snapshot=True)
+            return f"An interrupted {label} was discarded before it changed any file."
+        if state == COMMITTING:
+            try:
+                _apply(root, journal)
+                _finish(root, journal)
+                return f"Finished an interrupted {label}."
+            except _FileError:
+                journal["state"] = ROLLING_BACK
+                _write_journal(root, journal)
+        if _roll_back(root, journal):
+            _finish(root, journal, drop_snapshot=True)
+            return f"Rolled back an interrupted {label}; the install is as it was before it."
+    except OSError:
+        pass
+    return (f"An interrupted {label} could not be finished or rolled back because files are "
+            "still in use. Exit MacroQuest completely and try again.")
+
+
+def _snapshot_limits() -> tuple[int, float]:
+    cfg = config.load()
+    try:
+        max_mb = int(cfg.get("snapshot_max_mb", DEFAULT_SNAPSHOT_MAX_MB))
+    except (TypeError, ValueError):
+        max_mb = DEFAULT_SNAPSHOT_MAX_MB
+    try:
+        max_days = float(cfg.get("snapshot_max_age_days", DEFAULT_SNAPSHOT_MAX_AGE_DAYS))
+    except (TypeError, ValueError):
+        max_days = DEFAULT_SNAPSHOT_MAX_AGE_DAYS
+    return max(0, max_mb) * 1024 * 1024, max_days
+
+
+def _write_snapshot(root: str, label: str, group_id: str | None, rels: list,
+                    also: tuple) -> str:
+    """Deflate the current copies of rels (plus `also`) into a new snapshot; returns its
+    file name. Files that do not exist yet are recorded as created."""
+    directory = _snapshot_dir(root)
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = f"{stamp}-{label}.zip"
+    n = 1
+    while os.path.exists(os.path.join(directory, name)):
+        n += 1
+        name = f"{stamp}-{label}-{n}.zip"
+    path = os.path.join(directory, name)
+    meta = {"schema": 1, "label": label, "time": time.time(), "group": group_id,
+            "replaced": [], "created": [], "kept": [], "kept_missing": []}
+    tmp = path + ".tmp"
+    try:
+        # Level 1: a snapshot is written on every update; speed matters more than ratio.
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            for rel in rels:
+                target = _target(root, rel)
+                if os.path.isfile(target):
+                    zf.write(target, rel)
+                    meta["replaced"].append(rel)
+                else:
+                    meta["created"].append(rel)
+            for rel in also:
+                if rel in rels:
+                    continue
+                target = _target(root, rel)
+                if os.path.isfile(target):
+                    zf.write(target, rel)
+                    meta["kept"].append(rel)
+                else:
+                    meta["kept_missing"].append(rel)
+            zf.writestr(SNAPSHOT_META, json.dumps(meta))
+        os.replace(tmp, path)
+    except BaseException:
+        _remove(tmp)
+        raise
+    return name
+
+
+class Transaction:
+    """
+    Stage files with stage(rel) (write the new content to the returned path; workers may
+    call it concurrently), mark deletions with remove(rel), then commit() or abort().
+
+    snapshot=False skips the rollback snapshot (and with it the ability to undo a failed
+    commit); keep_snapshot=False deletes it once the commit settles (revert() itself).
+    also_snapshot: paths the caller rewrites right after committing (e.g. the
+    installed-version marker) — saved into the snapshot so a revert restores them too.
+    Raises TransactionError if an earlier transaction on this install is still unsettled,
+    or while another one holds the install lock (see locked()); the lock is held until
+    commit() returns or raises, or abort().
+    """
+
+    def __init__(self, root: str, label: str, snapshot: bool = True,
+                 also_snapshot: tuple = (), keep_snapshot: bool = True):
+        self.root = root
+        self.label = label
+        self.snapshot = snapshot
+        self.keep_snapshot = keep_snapshot
+        self.also_snapshot = tuple(a.replace("\\", "/") for a in also_snapshot)
+        self.group = _group.get()
+        self._install_lock = InstallLock(root)
+        try:
+            acquired = self._install_lock.acquire()
+        except OSError as e:
+            raise TransactionError(f"Could not prepare the {label}: {e}", errno_=e.errno) from e
+        if not acquired:
+            raise TransactionError("Another patcher (the window, the command line or `watch`) is "
+                                   "updating this install. Wait for it to finish and retry.")
+        self.recovered = _recover(root)
+        if pending(root):
+            self._install_lock.release()
+            raise TransactionError(self.recovered or "An earlier update is still unsettled.",
+                                   rolled_back=False)
+        self._staged: set = set()
+        self._removed: set = set()
+        self._lock = threading.Lock()
+        shutil.rmtree(long_path(_staging_dir(root)), ignore_errors=True)
+
+    def stage(self, rel: str) -> str:
+        """Where to write the new content of rel (its directory exists). It reaches the
+        install only on commit()."""
+        rel = rel.replace("\\", "/")
+        path = _staged(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            self._staged.add(rel)
+            self._removed.discard(rel)
+        return path
+
+    def remove(self, rel: str) -> None:
+        """Delete rel from the install on commit() (saved in the snapshot first)."""
+        rel = rel.replace("\\", "/")
+        with self._lock:
+            self._removed.add(rel)
+            self._staged.discard(rel)
+        _remove(_staged(self.root, rel))
+
+    def abort(self) -> None:
+        """Drop everything staged; the install is untouched."""
+        _finish(self.root, {})
+        self._install_lock.release()
+
+    def commit(self) -> dict:
+        """
+        Journal, snapshot and move everything staged into place. Staged paths that were
+        never written (a skipped download) are ignored. Returns {committed, removed,
+        snapshot}. Raises TransactionError when a file cannot be replaced — after putting
+        back the files already moved (rolled_back=False if even that failed).
+        """
+        try:
+            return self._commit()
+        finally:
+            self._install_lock.release()
+
+    def _commit(self) -> dict:
+        root = self.root
+        with self._lock:
+            files = sorted(rel for rel in self._staged if os.path.isfile(_staged(root, rel)))
+            removed = sorted(rel for rel in self._removed if os.path.lexists(_target(root, rel)))
+        result = {"committed": len(files), "removed": len(removed), "snapshot": None}
+        if not files and not removed:
+            self.abort()
+            return result
+        journal = {"schema": 1, "label": self.label, "state": PREPARED, "time": time.time(),
+                   "group": self.group, "files": files, "removed": removed, "snapshot": None}
+        try:
+            os.makedirs(_txn_dir(root), exist_ok=True)
+            _write_journal(root, journal)
+            if self.snapshot:
+                journal["snapshot"] = _write_snapshot(root, self.label, self.group,
+                                                      files + removed, self.also_snapshot)
+            journal["state"] = COMMITTING
+            _write_journal(root, journal)
+        except OSError as e:
+            _finish(root, journal, drop_snapshot=True)
+            raise TransactionError(f"Could not prepare the {self.label}: {e}",
+                                   errno_=e.errno) from e
+        try:
+            _apply(root, journal)
+        except _FileError as e:
+            journal["state"] = ROLLING_BACK
+            try:
+                _write_journal(root, journal)
+            except OSError:
+                pass
+            rolled_back = _roll_back(root, journal)
+            if rolled_back:
+                _finish(root, journal, drop_snapshot=True)
+            raise TransactionError(f"Could not replace {e.rel}: {e.error}", rel=e.rel,
+                                   rolled_back=rolled_back, errno_=e.error.errno) from e.error
+        _finish(root, journal)
+        if journal["snapshot"]:
+            if not self.keep_snapshot:
+                _remove(os.path.join(_snapshot_dir(root), journal["snapshot"]))
+            elif not _drop_oversize(root, journal["snapshot"], self.label, self.group):
+                result["snapshot"] = journal["snapshot"]
+        prune_snapshots(root)
+        return result
+
+
+def list_snapshots(root: str) -> list:
+    """[{name, path, label, time, group, size, files}] newest first; unreadable snapshot
+    files are skipped."""
+    directory = _snapshot_dir(root)
+    try:
+        names = [n for n in os.listdir(directory) if n.endswith(".zip")]
+    except OSError:
+        return []
+    snaps = []
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            with zipfile.ZipFile(path, "r") as zf:
+                meta = json.loads(zf.read(SNAPSHOT_META))
+            size = os.path.getsize(path)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            continue
+        snaps.append({
+            "name": name, "path": path, "label": meta.get("label") or "update",
+            "time": float(meta.get("time") or 0), "group": meta.get("group"), "size": size,
+            "files": len(meta.get("replaced", [])) + len(meta.get("created", [])),
+            "meta": meta,
+        })
+    snaps.sort(key=lambda s: (s["time"], s["name"]), reverse=True)
+    return snaps
+
+
+def _newest_group(snaps: list) -> list:
+    """The newest snapshot and the snapshots of its group (newest first)."""
+    if not snaps:
+        return []
+    gid = snaps[0]["group"]
+    if gid is None:
+        return snaps[:1]
+    return [s for s in snaps if s["group"] == gid]
+
+
+def _drop_oversize(root: str, name: str, label: str, group_id: str | None) -> bool:
+    """Enforce snapshot_max_mb on the group the just-committed snapshot `name` belongs
+    to. Over the cap, every snapshot is deleted and SKIPPED_NAME records why; otherwise
+    an earlier SKIPPED_NAME is cleared. Returns True when the snapshots were dropped."""
+    max_bytes, _days = _snapshot_limits()
+    snaps = list_snapshots(root)
+    size = sum(s["size"] for s in snaps
+               if s["name"] == name or (group_id is not None and s["group"] == group_id))
+    skipped = os.path.join(_snapshot_dir(root), SKIPPED_NAME)
+    if group_id not in _oversize_groups and size <= max_bytes:
+        _remove(skipped)
+        return False
+    previous = skipped_snapshot(root)
+    if group_id is not None:
+        _oversize_groups.add(group_id)
+        if previous and previous.get("group") == group_id:
+            size += previous.get("size") or 0  # the group's earlier, already dropped phases
+    for snap in snaps:
+        try:
+            os.remove(snap["path"])
+        except OSError:
+            pass
+    _remove(os.path.join(_snapshot_dir(root), name))  # in case list_snapshots skipped it
+    note = {"label": label, "time": time.time(), "group": group_id, "size": size,
+            "max_bytes": max_bytes}
+    try:
+        with open(skipped, "w", encoding="utf-8") as f:
+            json.dump(note, f)
+    except OSError:
+        pass
+    return True
+
+
+def skipped_snapshot(root: str) -> dict | None:
+    """{label, time, group, size, max_bytes} of the update whose snapshot was over
+    snapshot_max_mb, while no newer snapshot exists; else None."""
+    try:
+        with open(os.path.join(_snapshot_dir(root), SKIPPED_NAME), "r", encoding="utf-8") as f:
+            note = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return note if isinstance(note, dict) else None
+
+
+def prune_snapshots(root: str, max_bytes: int | None = None,
+                    max_age_days: float | None = None) -> int:
+    """Delete snapshots older than max_age_days, then oldest first down to max_bytes
+    (config defaults). The newest group stays (_drop_oversize() caps it at commit).
+    Returns the number deleted."""
+    cfg_bytes, cfg_days = _snapshot_limits()
+    max_bytes = cfg_bytes if max_bytes is None else max_bytes
+    max_age_days = cfg_days if max_age_days is None else max_age_days
+    snaps = list_snapshots(root)
+    keep = {s["name"] for s in _newest_group(snaps)}
+    total = sum(s["size"] for s in snaps)
+    cutoff = time.time() - max_age_days * 86400
+    deleted = 0
+    for snap in reversed(snaps):  # oldest first
+        if snap["name"] in keep:
+            continue
+        if snap["time"] < cutoff or total > max_bytes:
+            try:
+                os.remove(snap["path"])
+            except OSError:
+                continue
+            total -= snap["size"]
+            deleted += 1
+    return deleted
+
+
+def latest_snapshot(root: str) -> dict | None:
+    """What revert() would restore: the newest snapshot (its group's label and time)."""
+    snaps = list_snapshots(root)
+    return snaps[0] if snaps else None
+
+
+def revert(root: str) -> tuple[bool, str]:
+    """
+    Restore the newest snapshot group: the files it saved go back, the files that update
+    created are deleted. Runs as one journaled transaction, so a failure part-way leaves
+    the install as it was. The reverted snapshots are deleted, so reverting again steps
+    one update further back. Offline. Returns (success, message).
+    """
+    batch = _newest_group(list_snapshots(root))
+    if not batch:
+        note = skipped_snapshot(root)
+        if note:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(float(note.get("time") or 0)))
+            return False, (f"There is no previous version to revert to: the {note.get('label')} "
+                           f"of {when} needed a {(note.get('size') or 0) / 2**20:.1f} MB snapshot, "
+                           f"more than snapshot_max_mb ({(note.get('max_bytes') or 0) // 2**20}), "
+                           "so none was kept.")
+        return False, "There is no previous version to revert to."
+    try:
+        txn = Transaction(root, "revert", keep_snapshot=False)
+        # Newest first: where two updates touched the same file, the older snapshot holds
+        # the version from before both, so its decision is the one left standing.
+        for snap in batch:
+            meta = snap["meta"]
+            with zipfile.ZipFile(snap["path"], "r") as zf:
+                for rel in meta.get("replaced", []) + meta.get("kept", []):
+                    with zf.open(rel) as src, open(txn.stage(rel), "wb") as out:
+                        shutil.copyfileobj(src, out, 1024 * 1024)
+            for rel in meta.get("created", []) + meta.get("kept_missing", []):
+                txn.remove(rel)
+        result = txn.commit()
+    except TransactionError as e:
+        return False, f"Revert failed: {e}" + (
+            "" if e.rolled_back else " Exit MacroQuest completely and start the patcher again.")
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        txn.abort()
+        return False, f"Revert failed, nothing was changed: {e}"
+    for snap in batch:
+        _remove(snap["path"])
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(batch[-1]["time"]))
+    return True, (f"Reverted to the version before the {batch[-1]['label']} of {when}: "
+                  f"{result['committed']} file(s) restored, {result['removed']} removed.")
+
+
+def main(argv: list | None = None) -> int:
+    """python transaction.py ROOT [--revert]: list the rollback snapshots of an install
+    (settling an interrupted update first), or revert to the newest."""
+    import argparse
+    parser = argparse.ArgumentParser(description="List or restore CoOpt UI rollback snapshots.")
+    parser.add_argument("root", help="MacroQuest root")
+    parser.add_argument("--revert", action="store_true", help="restore the newest snapshot")
+    args = parser.parse_args(argv)
+    note = recover(args.root)
+    if note:
+        print(note)
+    if args.revert:
+        ok, message = revert(args.root)
+        print(message, file=sys.stdout if ok else sys.stderr)
+        return 0 if ok else 1
+    snaps = list_snapshots(args.root)
+    if not snaps:
+        print("No rollback snapshots.")
+    for snap in snaps:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(snap["time"]))
+        print(f"{when}  {snap['label']:<14} {snap['files']:>5} file(s) "
+              f"{snap['size'] / (1024 * 1024):8.1f} MB  {snap['name']}")
+    return 0 if not pending(args.root) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
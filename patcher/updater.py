@@ -13,6 +13,23 @@ import urllib.parse
 import urllib.request
 from typing import Callable
 
+import manifest_cache
+from delta import DeltaError, apply_delta
+import manifest_tree
+from downloader import DEFAULT_WORKERS, Downloader
+from jobs import Cancelled, CancelToken, raise_if_cancelled
+from object_store import ObjectStore
+from transaction import Transaction, TransactionError
+# _sha256_and_size / _sha256_file are re-exported: generate_manifest.py imports them from here.
+from hash_index import (  # noqa: F401
+    HashIndex,
+    NormalizedSha256,
+    _is_text,
+    _sha256_and_size,
+    _sha256_bytes,
+    _sha256_file,
+)
+
 # Relative to MQ root; patcher writes after successful patch so in-game can show version.
 INSTALLED_VERSION_PATH = "Macros/coopui_installed_version.txt"
 
@@ -33,94 +50,173 @@ def _raw_url(base_url: str, path: str) -> str:
     return f"{base_url.rstrip('/')}/{encoded}"
 
 
-_TEXT_EXTS = frozenset({
-    '.lua', '.mac', '.ini', '.txt', '.cfg', '.xml', '.json', '.md',
-    '.py', '.ps1', '.bat', '.cmd', '.sh', '.csv', '.html', '.htm',
-    '.yml', '.yaml', '.toml', '.reg', '.config',
-})
-
+def _stale_entries(files: list, root_path: str, rehash: bool = False) -> list[dict]:
+    """
+    Manifest entries whose local file does not hash to the entry's "hash". Digests come
+    from the install's hash index; cold entries are hashed in parallel (hash_index.py).
+    """
+    wanted: list[tuple[dict, str, str]] = []
+    stale: list[dict] = []
+    for entry in files:
+        if not isinstance(entry, dict):
+            continue
+        path = entry.get("path")
+        expected_hash = (entry.get("hash") or "").strip().lower()
+        if not path or not expected_hash:
+            continue
+        # v2 manifests carry the normalized size. For binaries that is the on-disk size,
+        # so a size mismatch is stale without reading the file (text files may hold CRLF
+        # and differ in size while still matching).
+        size = entry.get("size")
+        if isinstance(size, int) and not _is_text(path):
+            try:
+                if os.path.getsize(os.path.join(root_path, path.replace("/", os.sep))) != size:
+                    stale.append(entry)
+                    continue
+            except OSError:
+                stale.append(entry)
+                continue
+        wanted.append((entry, path, expected_hash))
+    index = HashIndex(root_path, rehash=rehash)
+    local = index.digests([path for _e, path, _h in wanted])
+    index.save()
+    stale.extend(entry for entry, path, expected in wanted if local.get(path) != expected)
+    return stale
 
-def _sha256_file(file_path: str) -> str:
-    """Return SHA256 hex digest of file contents. Returns '' if file missing or unreadable.
 
-    Normalizes CRLF→LF for text files so hashes match GitHub raw content
-    regardless of local platform line endings.
+def _local_state_digest(root_path: str, files: list, manifest_text: str) -> str:
     """
-    try:
-        with open(file_path, "rb") as f:
-            content = f.read()
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext in _TEXT_EXTS:
-            content = content.replace(b"\r\n", b"\n")
-        return hashlib.sha256(content).hexdigest()
-    except OSError:
-        return ""
+    Cheap fingerprint of an install as seen by one manifest: the manifest body plus the
+    (size, mtime_ns, file id) of every path it lists. Any write to a tracked file, or a
+    different manifest, changes it. Costs one stat per file — no reads.
+    """
+    h = hashlib.sha256(manifest_text.encode("utf-8"))
+    for entry in files:
+        if not isinstance(entry, dict) or not entry.get("path"):
+            continue
+        path = entry["path"]
+        try:
+            st = os.stat(os.path.join(root_path, path.replace("/", os.sep)))
+            stamp = f"{st.st_size}:{st.st_mtime_ns}:{st.st_ino}"
+        except OSError:
+            stamp = "-"
+        h.update(f"{path}\t{stamp}\n".encode("utf-8"))
+    return h.hexdigest()
 
 
-def check_for_updates(
+def fetch_release_manifest(
     repo_base_url: str,
-    root_path: str,
     manifest_path: str = "release_manifest.json",
-) -> tuple[list[dict], str | None, list[str], str | None]:
+) -> tuple[dict | None, str | None]:
     """
-    Fetch manifest from repo, compare each file to local; return list of entries that need update.
-
-    repo_base_url: e.g. https://raw.githubusercontent.com/owner/repo/main
-    root_path: validated MacroQuest root directory
-    manifest_path: path to manifest in repo (e.g. "release_manifest.json" or "patcher/release_manifest.json")
-
-    Returns:
-        (list of manifest file entries to update, manifest version string or None,
-         changelog entries, error_message or None)
-        Each file entry is a dict with "path" and "hash".
+    Fetch and parse the release manifest once (conditionally, see manifest_cache.py).
+    Returns (release, error_message). `release` is what compare_release() takes for any
+    number of roots: {"url", "text", "not_modified", "files", "version", "changelog",
+    "tree"} — "tree" is None unless it is a valid schema-2 tree of "files".
     """
     manifest_url = _raw_url(repo_base_url, manifest_path)
     try:
-        req = urllib.request.Request(manifest_url)
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            data = resp.read().decode("utf-8", errors="replace")
+        data, not_modified = manifest_cache.fetch(manifest_url, timeout=15)
     except urllib.error.HTTPError as e:
         if e.code == 404:
-            return [], None, [], (
+            return None, (
                 "Manifest not found (404). Check that release_manifest.json is in the repo "
-                "and that the repo URL and branch in patcher.py are correct."
+                "and that the repo URL and branch in config.py are correct."
             )
         if e.code in (403, 429):
-            return [], None, [], (
+            return None, (
                 f"GitHub is rate-limiting requests (HTTP {e.code}). Wait a few minutes and retry."
             )
-        return [], None, [], f"Could not reach GitHub (HTTP {e.code}). Check your connection."
+        return None, f"Could not reach GitHub (HTTP {e.code}). Check your connection."
     except (http.client.HTTPException, urllib.error.URLError, OSError):
-        return [], None, [], "Could not reach GitHub. Check your connection."
+        return None, "Could not reach GitHub. Check your connection."
 
     try:
         manifest = json.loads(data)
     except json.JSONDecodeError:
-        return [], None, [], "Update list from repo is not valid JSON. Check release_manifest.json format."
+        return None, "Update list from repo is not valid JSON. Check release_manifest.json format."
 
     files = manifest.get("files")
     if not isinstance(files, list):
-        return [], None, [], "Update list has no 'files' array. Check release_manifest.json format."
+        return None, "Update list has no 'files' array. Check release_manifest.json format."
 
     version = (manifest.get("version") or "").strip() or None
     changelog = manifest.get("changelog") or []
     if not isinstance(changelog, list):
         changelog = []
 
-    to_update: list[dict] = []
-    for entry in files:
-        if not isinstance(entry, dict):
-            continue
-        path = entry.get("path")
-        expected_hash = (entry.get("hash") or "").strip().lower()
-        if not path or not expected_hash:
-            continue
-        local_path = os.path.join(root_path, path.replace("/", os.sep))
-        local_hash = _sha256_file(local_path)
-        if local_hash != expected_hash:
-            to_update.append(entry)
+    # v2 manifests: the shipped tree is trusted only if it really is the tree of
+    # `files`; otherwise every file is compared.
+    tree = manifest.get("tree")
+    if not (isinstance(tree, dict) and tree and tree == manifest_tree.build_tree(files)):
+        tree = None
+    return {
+        "url": manifest_url, "text": data, "not_modified": not_modified, "files": files,
+        "version": version, "changelog": changelog, "tree": tree,
+    }, None
+
+
+def compare_release(release: dict, root_path: str, rehash: bool = False) -> list[dict]:
+    """Manifest entries of a fetch_release_manifest() result that root_path needs updated."""
+    files = release["files"]
+    # Short-circuit: the manifest is unchanged (304) and no manifest file under the
+    # install has been touched since the last check that found it up to date.
+    state_key = f"{os.path.normcase(os.path.abspath(root_path))}|{release['url']}"
+    state = _local_state_digest(root_path, files, release["text"])
+    if not rehash and release["not_modified"] and manifest_cache.get_state(state_key) == state:
+        return []
+
+    # v2 manifests: only hash files under directories whose Merkle digest differs
+    # from the tree this install last fully matched (manifest_tree.py).
+    tree = release["tree"]
+    candidates = files
+    if tree and not rehash:
+        candidates = manifest_tree.changed_files(files, tree, manifest_tree.load_local_tree(root_path))
+        # The tree only says the manifest is unchanged there, not the files: one stat
+        # each against the hash index catches a file deleted or edited since.
+        listed = {id(e) for e in candidates}
+        index = HashIndex(root_path)
+        candidates = candidates + [
+            e for e in files
+            if isinstance(e, dict) and id(e) not in listed and e.get("path") and e.get("hash")
+            and index.cached(e["path"]) != (e.get("hash") or "").strip().lower()
+        ]
+
+    to_update = _stale_entries(candidates, root_path, rehash)
+    if tree:
+        manifest_tree.save_local_tree(
+            root_path, manifest_tree.matched_tree(tree, [e.get("path") or "" for e in to_update]),
+        )
+    # Only an up-to-date result is remembered; anything left to update clears it. The
+    # state was taken BEFORE hashing, so a file edited mid-check just misses next time.
+    manifest_cache.remember_state(state_key, None if to_update else state)
+    return to_update
 
-    return to_update, version, changelog, None
+
+def check_for_updates(
+    repo_base_url: str,
+    root_path: str,
+    manifest_path: str = "release_manifest.json",
+    rehash: bool = False,
+) -> tuple[list[dict], str | None, list[str], str | None]:
+    """
+    Fetch manifest from repo, compare each file to local; return list of entries that need update.
+
+    repo_base_url: e.g. https://raw.githubusercontent.com/owner/repo/main
+    root_path: validated MacroQuest root directory
+    manifest_path: path to manifest in repo (e.g. "release_manifest.json" or "patcher/release_manifest.json")
+    rehash: ignore the local hash index and hash every file (repair); see hash_index.py
+
+    Returns:
+        (list of manifest file entries to update, manifest version string or None,
+         changelog entries, error_message or None)
+        Each file entry is a dict with "path" and "hash".
+    """
+    release, err = fetch_release_manifest(repo_base_url, manifest_path)
+    if err:
+        return [], None, [], err
+    to_update = compare_release(release, root_path, rehash)
+    return to_update, release["version"], release["changelog"], None
 
 
 def get_installed_version(root_path: str) -> str | None:
@@ -147,17 +243,184 @@ def write_installed_version(root_path: str, version: str) -> bool:
         return False
 
 
+def _download_error(e: Exception, path_norm: str, entry: dict) -> str | None:
+    """
+    Map a download failure to patch()'s user-facing message, or None when the file
+    should be skipped instead (a repo path that returns 404).
+    """
+    if isinstance(e, urllib.error.HTTPError):
+        if e.code == 404:
+            # A repo-path 404 means the file was removed from the repo (e.g. plugin
+            # paused) — skipping is right. An entry carrying an explicit "url" is a
+            # RELEASE ASSET, and a 404 there means the asset is missing, not retired.
+            # That happens whenever the manifest reaches raw master before the GitHub
+            # release is published (Build-Smart pushes the manifest commit first, and
+            # creates the release as a draft afterwards). Treating it as a skip made the
+            # patcher report "Update complete" while the plugin DLL was never downloaded,
+            # leaving the client on a stale DLL beside freshly updated Lua.
+            if entry.get("url"):
+                return (
+                    f"{path_norm} is listed in the update but is not available for "
+                    "download yet (the release asset is missing or not published). "
+                    "Wait a few minutes and retry."
+                )
+            return None
+        if e.code in (403, 429):
+            return (
+                f"GitHub is rate-limiting requests (HTTP {e.code}). "
+                "Wait a few minutes and retry."
+            )
+        return f"Could not reach GitHub (HTTP {e.code}). Check your connection."
+    return "Could not reach GitHub. Check your connection."
+
+
+class _WriteError(Exception):
+    """A downloaded file could not be written into the install (locked / permissions)."""
+
+
+class _HashMismatch(Exception):
+    """A download kept arriving with content that does not match the manifest hash."""
+
+
+# Streamed downloads: peak memory is one chunk per worker, not a whole DLL.
+_DOWNLOAD_CHUNK = 65536
+# A mismatch is usually raw.githubusercontent.com's CDN still serving the previous
+# revision for a few minutes after a release push; a short retry often clears it.
+_VERIFY_ATTEMPTS = 3
+
+
+def _download_verified(dl: Downloader, url: str, local_path: str, path_norm: str,
+                       expected_hash: str, cancel: CancelToken | None = None) -> str:
+    """
+    Stream url into <target>.tmp while computing the normalized sha256, and os.replace it
+    over the target only when that digest matches expected_hash. A mismatch discards the
+    .tmp and downloads again (up to _VERIFY_ATTEMPTS), so a bad file never lands and no
+    separate verification read is needed. Returns the digest of the committed file.
+
+    Raises _WriteError (local disk), _HashMismatch, or the downloader's network errors;
+    Cancelled between chunks once `cancel` is set (the .tmp is discarded).
+    """
+    tmp_path = local_path + ".tmp"
+    normalize = _is_text(path_norm)
+    for _attempt in range(_VERIFY_ATTEMPTS):
+        resp = dl.open(url)
+        h = NormalizedSha256(normalize)
+        try:
+            try:
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                f = open(tmp_path, "wb")
+            except OSError as e:
+                resp.close()
+                raise _WriteError(str(e)) from e
+            with f:
+                while True:
+                    if cancel is not None and cancel.cancelled:
+                        resp.close()
+                        raise Cancelled()
+                    chunk = resp.read(_DOWNLOAD_CHUNK)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    try:
+                        f.write(chunk)
+                    except OSError as e:
+                        resp.close()
+                        raise _WriteError(str(e)) from e
+            digest = h.hexdigest()
+            if expected_hash and digest != expected_hash:
+                os.remove(tmp_path)
+                continue
+            # Atomic install: a crash mid-download can never leave a truncated target
+            # file (e.g. a half-written DLL) — only a stray .tmp.
+            try:
+                os.replace(tmp_path, local_path)
+            except OSError as e:
+                raise _WriteError(str(e)) from e
+            return digest
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    raise _HashMismatch(path_norm)
+
+
+def _delta_update(dl: Downloader, entry: dict, index: HashIndex, local_path: str,
+                  dest_path: str, path_norm: str, expected_hash: str) -> str | None:
+    """
+    Update a file through one of its manifest "deltas" (see delta.py) when the installed
+    copy (local_path) has a known base hash. The rebuilt file must hash to expected_hash
+    before it is written to dest_path (the staged copy). Returns its digest, or None to
+    fall back to the full download —
+    any delta problem (missing asset, corrupt delta, wrong result) is just a fallback.
+    Raises _WriteError only if the verified result cannot be written.
+    """
+    deltas = entry.get("deltas")
+    if not isinstance(deltas, list) or not expected_hash:
+        return None
+    local_hash = index.digest(path_norm)
+    match = next((d for d in deltas if isinstance(d, dict) and d.get("url")
+                  and local_hash and d.get("base") == local_hash), None)
+    if match is None:
+        return None
+    try:
+        patch_bytes = dl.get(match["url"])
+        if match.get("hash") and hashlib.sha256(patch_bytes).hexdigest() != match["hash"]:
+            return None
+        with open(local_path, "rb") as f:
+            content = apply_delta(f.read(), patch_bytes)
+    except (DeltaError, urllib.error.HTTPError, http.client.HTTPException, OSError):
+        return None
+    if _sha256_bytes(content, path_norm) != expected_hash:
+        return None
+    tmp_path = dest_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, dest_path)
+    except OSError as e:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise _WriteError(str(e)) from e
+    return expected_hash
+
+
 def patch(
     files_to_download: list[dict],
     repo_base_url: str,
     root_path: str,
     progress_callback: Callable[[int, int, str], None] | None = None,
+    workers: int = DEFAULT_WORKERS,
+    use_store: bool = True,
+    cancel: CancelToken | None = None,
 ) -> tuple[bool, str, list[str]]:
     """
     Download each file from raw GitHub and write to root_path. Creates parent dirs as needed.
     Skips files that return 404 (e.g. removed from repo) instead of failing the whole patch.
 
-    progress_callback(current_1based_index, total, path_or_message)
+    Files are fetched `workers` at a time over pooled keep-alive connections (see
+    downloader.py); workers=1 is the old one-at-a-time behaviour. Everything is staged and
+    committed as one transaction (transaction.py): the first hard failure stops the batch
+    and leaves the install untouched, and a commit that cannot replace a file is rolled
+    back. The replaced files (and the installed-version marker) go to a rollback snapshot.
+
+    A file whose hash is already in the machine-wide object store (object_store.py, fed
+    by every install this patcher updates) is copied from there without any request;
+    use_store=False bypasses the store entirely.
+    Entries with "deltas" (large release assets) are patched from the installed copy
+    when its hash is a delta's base, falling back to the full download otherwise.
+    Each file is hashed as it streams in and only replaces the target once it matches the
+    entry's "hash" (retried on mismatch), so a successful patch() is already verified —
+    there is no need to run verify_installation() over what it wrote.
+
+    progress_callback(completed_count, total, path_or_message) — called on the calling
+    thread as each file finishes, in completion order.
+    cancel (jobs.CancelToken): checked before each file and between download chunks;
+    once set, the transaction is aborted and Cancelled raised — the install is untouched.
+    A commit already under way is not interrupted.
     Returns (success, message, skipped_paths). Message is user-friendly; skipped_paths
     lists repo paths (forward-slash) skipped because the repo no longer has them (404),
     so callers can exclude them from post-patch verification.
@@ -167,8 +430,8 @@ def patch(
         return True, "Nothing to update.", []
 
     skipped: list[str] = []
-
-    for i, entry in enumerate(files_to_download):
+    jobs = []
+    for entry in files_to_download:
         path = entry.get("path")
         if not path:
             continue
@@ -176,60 +439,87 @@ def patch(
         # Use explicit URL if provided (e.g. release-asset DLLs), otherwise raw GitHub
         url = entry.get("url") or _raw_url(repo_base_url, path_norm)
         local_path = os.path.join(root_path, path_norm.replace("/", os.sep))
+        jobs.append((entry, path_norm, url, local_path))
 
-        if progress_callback:
-            progress_callback(i + 1, total, path_norm)
-
-        try:
-            req = urllib.request.Request(url)
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                content = resp.read()
-        except urllib.error.HTTPError as e:
-            if e.code == 404:
-                # A repo-path 404 means the file was removed from the repo (e.g. plugin
-                # paused) — skipping is right. An entry carrying an explicit "url" is a
-                # RELEASE ASSET, and a 404 there means the asset is missing, not retired.
-                # That happens whenever the manifest reaches raw master before the GitHub
-                # release is published (Build-Smart pushes the manifest commit first, and
-                # creates the release as a draft afterwards). Treating it as a skip made the
-                # patcher report "Update complete" while the plugin DLL was never downloaded,
-                # leaving the client on a stale DLL beside freshly updated Lua.
-                if entry.get("url"):
+    try:
+        txn = Transaction(root_path, "update", also_snapshot=(INSTALLED_VERSION_PATH,))
+    except TransactionError as e:
+        return False, str(e), []
+    committing = False
+    digests: dict[str, str] = {}
+    index = HashIndex(root_path)
+    store = ObjectStore.default() if use_store else None
+    try:
+        with Downloader(workers=workers, timeout=30) as dl:
+            def fetch(job):
+                entry, path_norm, url, local_path = job
+                raise_if_cancelled(cancel)
+                expected = (entry.get("hash") or "").strip().lower()
+                try:
+                    dest = txn.stage(path_norm)
+                except OSError as e:
+                    raise _WriteError(str(e)) from e
+                if store is not None and expected:
+                    try:
+                        if store.materialize(expected, dest, path_norm):
+                            digests[path_norm] = expected
+                            return
+                    except OSError as e:
+                        raise _WriteError(str(e)) from e
+                digest = _delta_update(dl, entry, index, local_path, dest, path_norm, expected)
+                if digest is None:
+                    digest = _download_verified(dl, url, dest, path_norm, expected, cancel)
+                digests[path_norm] = digest
+                if store is not None and expected:
+                    store.add(dest, digest)
+
+            done = 0
+            for (entry, path_norm, _url, _local), _result, exc in dl.run(fetch, jobs):
+                raise_if_cancelled(cancel)
+                done += 1
+                if isinstance(exc, _HashMismatch):
                     return False, (
-                        f"{path_norm} is listed in the update but is not available for "
-                        "download yet (the release asset is missing or not published). "
-                        "Wait a few minutes and retry."
+                        f"{path_norm} did not match the release manifest after "
+                        f"{_VERIFY_ATTEMPTS} download attempts (GitHub may still be publishing "
+                        "the release). Wait a few minutes and retry."
                     ), skipped
-                skipped.append(path_norm)
+                if isinstance(exc, _WriteError):
+                    return False, (
+                        f"Could not write to {path_norm}. Check permissions. "
+                        "If MacroQuest is running, close it and retry."
+                    ), skipped
+                if isinstance(exc, (urllib.error.HTTPError, http.client.HTTPException,
+                                    urllib.error.URLError, OSError)):
+                    message = _download_error(exc, path_norm, entry)
+                    if message:
+                        return False, message, skipped
+                    skipped.append(path_norm)
+                    if progress_callback:
+                        progress_callback(done, total, f"(skipped: {path_norm})")
+                    continue
+                if exc is not None:
+                    raise exc
                 if progress_callback:
-                    progress_callback(i + 1, total, f"(skipped: {path_norm})")
-                continue
-            if e.code in (403, 429):
-                return False, (
-                    f"GitHub is rate-limiting requests (HTTP {e.code}). "
-                    "Wait a few minutes and retry."
-                ), skipped
-            return False, f"Could not reach GitHub (HTTP {e.code}). Check your connection.", skipped
-        except (http.client.HTTPException, urllib.error.URLError, OSError):
-            return False, "Could not reach GitHub. Check your connection.", skipped
-
-        # Atomic write: download to <target>.tmp, then os.replace so a crash mid-write
-        # can never leave a truncated target file (e.g. a half-written DLL).
-        tmp_path = local_path + ".tmp"
+                    progress_callback(done, total, path_norm)
+        raise_if_cancelled(cancel)
+        committing = True
         try:
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            with open(tmp_path, "wb") as f:
-                f.write(content)
-            os.replace(tmp_path, local_path)
-        except OSError:
-            try:
-                os.remove(tmp_path)
-            except OSError:
-                pass
+            txn.commit()
+        except TransactionError as e:
             return False, (
-                f"Could not write to {path_norm}. Check permissions. "
+                f"Could not write to {e.rel or 'the install'}. Check permissions. "
                 "If MacroQuest is running, close it and retry."
+                + (" No files were changed." if e.rolled_back else
+                   " Some files could not be put back yet: restart the patcher once MacroQuest is closed.")
             ), skipped
+        for path_norm, digest in digests.items():
+            index.record(path_norm, digest)
+    finally:
+        if not committing:
+            txn.abort()
+        index.save()
+        if store is not None:
+            store.save()
 
     if progress_callback:
         progress_callback(total, total, "Done")
@@ -238,41 +528,113 @@ def patch(
     return True, "Update complete.", skipped
 
 
+def stage_objects(
+    entries: list[dict],
+    repo_base_url: str,
+    root_path: str,
+    workers: int = DEFAULT_WORKERS,
+    cancel: CancelToken | None = None,
+) -> tuple[bool, str, int]:
+    """
+    Download what `entries` (release manifest entries, or default-config entries with
+    repoPath / installPath) would need into the shared object store, without touching
+    root_path: a later patch() / install_default_config() then takes every file from
+    the store — local copies and renames, no network. Files already in the store are
+    skipped, deltas apply against the installed copies (only read) as in patch(), and
+    each download is hash-verified before it is stored. Used by watcher.py while
+    MacroQuest is still running.
+
+    Returns (success, message, downloaded). Repo paths that 404 are skipped as in
+    patch(); entries without a hash cannot be stored and are left to the update itself.
+    Cancelled between files and chunks.
+    """
+    store = ObjectStore.default()
+    if store is None:
+        return False, "The object store is disabled (object_store_max_mb = 0); nothing can be staged.", 0
+    jobs = []
+    seen = set()
+    for entry in entries:
+        expected = (entry.get("hash") or "").strip().lower()
+        rel = (entry.get("path") or entry.get("installPath") or "").replace("\\", "/")
+        if not expected or not rel or expected in seen or store.has(expected):
+            continue
+        seen.add(expected)
+        url = entry.get("url") or _raw_url(repo_base_url, entry.get("repoPath") or rel)
+        jobs.append((entry, rel, url, expected))
+    if not jobs:
+        return True, "Nothing to stage.", 0
+
+    incoming = os.path.join(store.path, "incoming")
+    try:
+        os.makedirs(incoming, exist_ok=True)
+    except OSError as e:
+        return False, f"Could not write to the object store ({e}).", 0
+    index = HashIndex(root_path)
+    downloaded = 0
+    try:
+        with Downloader(workers=workers, timeout=30) as dl:
+            def fetch(job):
+                entry, rel, url, expected = job
+                raise_if_cancelled(cancel)
+                tmp = os.path.join(incoming, f"{expected}.{os.getpid()}")
+                try:
+                    local_path = os.path.join(root_path, rel.replace("/", os.sep))
+                    digest = _delta_update(dl, entry, index, local_path, tmp, rel, expected)
+                    if digest is None:
+                        digest = _download_verified(dl, url, tmp, rel, expected, cancel)
+                    store.add(tmp, digest)
+                finally:
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+
+            for (entry, rel, _url, _expected), _result, exc in dl.run(fetch, jobs):
+                raise_if_cancelled(cancel)
+                if isinstance(exc, _HashMismatch):
+                    return False, f"{rel} did not match the release manifest; not staged.", downloaded
+                if isinstance(exc, _WriteError):
+                    return False, f"Could not write to the object store ({exc}).", downloaded
+                if isinstance(exc, (urllib.error.HTTPError, http.client.HTTPException,
+                                    urllib.error.URLError, OSError)):
+                    message = _download_error(exc, rel, entry)
+                    if message:
+                        return False, message, downloaded
+                    continue
+                if exc is not None:
+                    raise exc
+                downloaded += 1
+    finally:
+        store.save()
+    return True, f"Staged {downloaded} file(s).", downloaded
+
+
 def verify_installation(
     files_patched: list[dict],
     root_path: str,
+    rehash: bool = False,
 ) -> tuple[bool, list[str]]:
     """
     Post-patch verification: re-hash each patched file and compare to expected hash.
+    Files patch() just wrote are answered from the hash index; rehash=True reads every
+    file from disk regardless.
     Returns (all_ok, list_of_failed_paths). Empty list means all files verified.
     """
-    failed: list[str] = []
-    for entry in files_patched:
-        path = entry.get("path")
-        expected_hash = (entry.get("hash") or "").strip().lower()
-        if not path or not expected_hash:
-            continue
-        local_path = os.path.join(root_path, path.replace("/", os.sep))
-        local_hash = _sha256_file(local_path)
-        if local_hash != expected_hash:
-            failed.append(path)
+    failed = [e.get("path") for e in _stale_entries(files_patched, root_path, rehash)]
     return len(failed) == 0, failed
 
 
-def check_for_default_config(
+def fetch_default_config_manifest(
     repo_base_url: str,
-    root_path: str,
     manifest_path: str = "default_config_manifest.json",
-) -> tuple[list[dict], str | None]:
+) -> tuple[list, str | None]:
     """
-    Fetch default config manifest; return list of entries where install path is missing (create-if-missing).
-    Each entry has "repoPath" and "installPath". Only includes entries for which the file does not exist.
+    Fetch the default config manifest's "files" list. A missing manifest (404) is an
+    empty list, not an error. Returns (files, error_message).
     """
     manifest_url = _raw_url(repo_base_url, manifest_path)
     try:
-        req = urllib.request.Request(manifest_url)
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            data = resp.read().decode("utf-8", errors="replace")
+        data, _not_modified = manifest_cache.fetch(manifest_url, timeout=15)
     except urllib.error.HTTPError as e:
         if e.code == 404:
             return [], None  # No default config manifest is OK; skip install-only
@@ -286,9 +648,14 @@ def check_for_default_config(
         return [], "default_config_manifest.json is not valid JSON."
 
     files = manifest.get("files")
-    if not isinstance(files, list):
-        return [], None
+    return (files if isinstance(files, list) else []), None
+
 
+def missing_default_config(files: list, root_path: str) -> list[dict]:
+    """
+    Entries of a fetch_default_config_manifest() list whose install path is missing under
+    root_path (create-if-missing): {"repoPath", "installPath"} plus "hash" when listed.
+    """
     to_install: list[dict] = []
     for entry in files:
         if not isinstance(entry, dict):
@@ -299,9 +666,28 @@ def check_for_default_config(
             continue
         local_path = os.path.join(root_path, install_path.replace("/", os.sep))
         if not os.path.isfile(local_path):
-            to_install.append({"repoPath": repo_path, "installPath": install_path})
+            item = {"repoPath": repo_path, "installPath": install_path}
+            if entry.get("hash"):
+                item["hash"] = str(entry["hash"]).strip().lower()
+            to_install.append(item)
+
+    return to_install
+
 
-    return to_install, None
+def check_for_default_config(
+    repo_base_url: str,
+    root_path: str,
+    manifest_path: str = "default_config_manifest.json",
+) -> tuple[list[dict], str | None]:
+    """
+    Fetch default config manifest; return list of entries where install path is missing (create-if-missing).
+    Each entry has "repoPath" and "installPath" (plus "hash" when the manifest lists one).
+    Only includes entries for which the file does not exist.
+    """
+    files, err = fetch_default_config_manifest(repo_base_url, manifest_path)
+    if err:
+        return [], err
+    return missing_default_config(files, root_path), None
 
 
 def install_default_config(
@@ -309,25 +695,82 @@ def install_default_config(
     repo_base_url: str,
     root_path: str,
     progress_callback: Callable[[int, int, str], None] | None = None,
+    use_store: bool = True,
+    cancel: CancelToken | None = None,
 ) -> tuple[bool, str]:
     """
     Download each file from repo (repoPath) and write to root_path/installPath. Creates parent dirs.
     Only call with entries where the file is missing (create-if-missing).
+    Entries carrying a "hash" are taken from the shared object store when present there.
+    The files are staged and committed as one transaction, like patch(): a failure part-way
+    (or cancel, which raises Cancelled) installs none of them, and Revert removes them.
     """
     total = len(entries)
     if total == 0:
         return True, "No default config to install."
 
+    try:
+        txn = Transaction(root_path, "defaults")
+    except TransactionError as e:
+        return False, str(e)
+    committed = False
+    digests: dict[str, str] = {}
+    store = ObjectStore.default() if use_store else None
+    try:
+        ok, message = _install_default_config(entries, repo_base_url, txn, progress_callback,
+                                              digests, store, cancel)
+        if not ok:
+            return False, message
+        raise_if_cancelled(cancel)
+        committed = True
+        try:
+            txn.commit()
+        except TransactionError as e:
+            return False, (
+                f"Could not write {e.rel or 'the default config'}. Check permissions."
+                + ("" if e.rolled_back else
+                   " Some files could not be put back yet: restart the patcher once MacroQuest is closed.")
+            )
+        index = HashIndex(root_path)
+        for install_path, digest in digests.items():
+            index.record(install_path, digest)
+        index.save()
+    finally:
+        if not committed:
+            txn.abort()
+        if store is not None:
+            store.save()
+    if progress_callback:
+        progress_callback(total, total, "Done")
+    return True, message
+
+
+def _install_default_config(entries, repo_base_url, txn: Transaction, progress_callback,
+                            digests: dict, store: ObjectStore | None,
+                            cancel: CancelToken | None = None) -> tuple[bool, str]:
+    # Stages every entry into txn; digests[installPath] = what was staged.
+    total = len(entries)
     for i, entry in enumerate(entries):
+        raise_if_cancelled(cancel)
         repo_path = (entry.get("repoPath") or "").replace("\\", "/")
         install_path = (entry.get("installPath") or "").replace("\\", "/")
         if not repo_path or not install_path:
             continue
-        local_path = os.path.join(root_path, install_path.replace("/", os.sep))
 
         if progress_callback:
             progress_callback(i + 1, total, install_path)
 
+        expected = (entry.get("hash") or "").strip().lower()
+        try:
+            dest = txn.stage(install_path)
+            # link=False: users edit these, so never share one file with the store
+            if store is not None and expected and store.materialize(expected, dest, install_path,
+                                                                    link=False):
+                digests[install_path] = expected
+                continue
+        except OSError:
+            return False, f"Could not write {install_path}. Check permissions."
+
         try:
             url = _raw_url(repo_base_url, repo_path)
             req = urllib.request.Request(url)
@@ -346,12 +789,12 @@ def install_default_config(
             return False, "Could not reach GitHub."
 
         try:
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            with open(local_path, "wb") as f:
+            with open(dest, "wb") as f:
                 f.write(content)
         except OSError:
             return False, f"Could not write {install_path}. Check permissions."
-
-    if progress_callback:
-        progress_callback(total, total, "Done")
+        digest = _sha256_bytes(content, install_path)
+        digests[install_path] = digest
+        if store is not None and expected and digest == expected:
+            store.add(dest, digest, link=False)
     return True, "Default config installed."
@@ -0,0 +1,174 @@
+"""
+Background update watcher: `python -m patcher watch` (see cli.py), meant to run from
+logon (a Task Scheduler entry or the Startup folder) so updates are waiting for the
+player instead of the player waiting for the download.
+
+Each check (every `interval`, CHECK_INTERVAL by default):
+
+  1. fetches the release and default-config manifests conditionally (manifest_cache.py):
+     an unchanged manifest is a 304 — no body, and it does not count against GitHub's
+     rate limit;
+  2. compares every known install (batch.known_installs(), or the roots given) —
+     unchanged installs on a 304 cost no hashing at all (updater.compare_release);
+  3. stages what each install needs into the shared object store
+     (updater.stage_objects) on STAGE_WORKERS connections, leaving the install
+     untouched: MacroQuest can keep running, and the game keeps most of the bandwidth.
+
+An install with staged work is "pending". Every `poll` seconds the watcher asks
+installer.preflight_blockers() about each pending install's files; once it clears —
+MacroQuest has exited — the update is applied with batch.update_all(), whose every file
+now comes from the store: a clone or copy and a batch of renames, seconds instead of a
+download. An install whose files are still locked, or that another patcher is updating
+right now (transaction.locked), simply stays pending.
+
+Watcher.run(cancel) takes a jobs.CancelToken, so the same loop can run as a
+PRIORITY_BACKGROUND job in the window. Events go to on_event(kind, **fields).
+"""
+
+import os
+import time
+from typing import Callable
+
+import config
+from batch import STATUS_BLOCKED, STATUS_UP_TO_DATE, STATUS_UPDATED, known_installs, update_all
+from installer import preflight_blockers
+from jobs import Cancelled, CancelToken, raise_if_cancelled
+from transaction import locked as transaction_locked, pending as transaction_pending
+from transaction import recover as transaction_recover
+from updater import compare_release, fetch_default_config_manifest, fetch_release_manifest, missing_default_config
+from updater import stage_objects
+
+# Seconds between manifest checks, and between blocker polls of pending installs.
+CHECK_INTERVAL = 30 * 60
+BLOCKER_POLL = 15
+# Download connections while staging (patch() uses downloader.DEFAULT_WORKERS).
+STAGE_WORKERS = 2
+
+# on_event(kind, **fields): kind is one of these.
+EVENT_CHECKED = "checked"    # root, files, defaults, staged
+EVENT_STAGED = "staged"      # root, files, defaults, downloaded — waiting for MQ to exit
+EVENT_APPLIED = "applied"    # root, status, message, seconds
+EVENT_ERROR = "error"        # message (and root when it concerns one)
+
+
+class Watcher:
+    """Periodic conditional checks, staging, and apply-on-exit for a set of installs."""
+
+    def __init__(self, repo_base_url: str, roots: list[str] | None = None,
+                 interval: float = CHECK_INTERVAL, poll: float = BLOCKER_POLL,
+                 on_event: Callable[..., None] | None = None,
+                 manifest_path: str = config.MANIFEST_PATH,
+                 default_config_manifest_path: str = config.DEFAULT_CONFIG_MANIFEST_PATH):
+        self.repo_base_url = repo_base_url
+        self.roots = roots
+        self.interval = interval
+        self.poll = poll
+        self.on_event = on_event
+        self.manifest_path = manifest_path
+        self.default_config_manifest_path = default_config_manifest_path
+        # root -> the paths its staged update will write (for preflight_blockers)
+        self.pending: dict[str, list[str]] = {}
+
+    def _event(self, kind: str, **fields) -> None:
+        if self.on_event:
+            self.on_event(kind, **fields)
+
+    def _roots(self) -> list[str]:
+        return list(self.roots) if self.roots is not None else known_installs(config.load())
+
+    def check(self, cancel: CancelToken | None = None) -> dict[str, list[str]]:
+        """One check of every root: compare, stage, mark pending. Returns self.pending."""
+        release, err = fetch_release_manifest(self.repo_base_url, self.manifest_path)
+        if err:
+            self._event(EVENT_ERROR, message=err)
+            return self.pending
+        default_files, default_err = fetch_default_config_manifest(
+            self.repo_base_url, self.default_config_manifest_path,
+        )
+        if default_err:
+            default_files = []
+        for root in self._roots():
+            raise_if_cancelled(cancel)
+            to_update = compare_release(release, root)
+            defaults = missing_default_config(default_files, root)
+            if not to_update and not defaults:
+                self.pending.pop(root, None)
+                self._event(EVENT_CHECKED, root=root, files=0, defaults=0, staged=False)
+                continue
+            ok, message, downloaded = stage_objects(to_update + defaults, self.repo_base_url, root,
+                                                    workers=STAGE_WORKERS, cancel=cancel)
+            if not ok:
+                # Not pending: applying would download on the spot. The next check retries.
+                self.pending.pop(root, None)
+                self._event(EVENT_ERROR, root=root, message=message)
+                continue
+            self.pending[root] = [e["path"] for e in to_update] + [e["installPath"] for e in defaults]
+            self._event(EVENT_STAGED, root=root, files=len(to_update), defaults=len(defaults),
+                        downloaded=downloaded)
+        return self.pending
+
+    def apply_ready(self, cancel: CancelToken | None = None) -> list[dict]:
+        """Apply every pending root whose files are free now; returns their batch rows."""
+        ready = []
+        for root, paths in list(self.pending.items()):
+            if transaction_locked(root):
+                continue  # the window or the command line is updating it; next poll
+            if transaction_pending(root):
+                transaction_recover(root)
+                if transaction_pending(root):
+                    continue
+            if preflight_blockers(root, paths) is None:
+                ready.append(root)
+        if not ready:
+            return []
+        t0 = time.monotonic()
+        rows, err = update_all(ready, self.repo_base_url, self.manifest_path,
+                               self.default_config_manifest_path, cancel=cancel)
+        if err:
+            self._event(EVENT_ERROR, message=err)
+            return []
+        seconds = round(time.monotonic() - t0, 2)
+        for row in rows:
+            # Blocked again between the poll and the apply: stays pending. Failed: the
+            # next check stages again.
+            if row["status"] != STATUS_BLOCKED:
+                self.pending.pop(row["root"], None)
+            self._event(EVENT_APPLIED, root=row["root"], status=row["status"],
+                        message=row["message"], seconds=seconds)
+        return rows
+
+    def run(self, cancel: CancelToken, once: bool = False) -> None:
+        """Check now and every `interval`; between checks apply pending installs as they
+        become free. once: one check, one apply attempt, return. Returns when cancelled;
+        an unexpected error is reported as an EVENT_ERROR and the loop carries on."""
+        next_check = 0.0
+        while not cancel.cancelled:
+            try:
+                if time.monotonic() >= next_check:
+                    next_check = time.monotonic() + self.interval
+                    self.check(cancel)
+                if self.pending:
+                    self.apply_ready(cancel)
+            except Cancelled:
+                return
+            except Exception as e:
+                self._event(EVENT_ERROR, message=f"Update check failed unexpectedly: {e}")
+            if once:
+                return
+            cancel.wait(self.poll if self.pending else max(0.0, next_check - time.monotonic()))
+
+
+def describe_event(kind: str, **fields) -> str:
+    """One line for a watcher event (the CLI's text output)."""
+    root = os.path.basename(os.path.normpath(fields["root"])) if fields.get("root") else ""
+    if kind == EVENT_CHECKED:
+        return f"{root}: {STATUS_UP_TO_DATE.lower()}"
+    if kind == EVENT_STAGED:
+        return (f"{root}: {fields['files']} file(s), {fields['defaults']} default config file(s) ready "
+                f"({fields['downloaded']} downloaded); applying when MacroQuest exits")
+    if kind == EVENT_APPLIED:
+        status = fields["status"]
+        if status == STATUS_UPDATED:
+            return f"{root}: updated in {fields['seconds']}s"
+        return f"{root}: {status} — {fields['message']}"
+    return f"{root + ': ' if root else ''}{fields.get('message', kind)}"
@@ -0,0 +1,122 @@
+import hashlib, http.server, json, os, shutil, sys, tempfile, threading
+sys.path.insert(0, 'patcher')
+import config
+import batch
+import transaction
+
+# ---------------------------------------------------------------------------
+# Batch "update all installs": one manifest fetch, one download per distinct file across
+# all roots, a per-root status row, and a blocked root left untouched.
+# ---------------------------------------------------------------------------
+FILES = {f"/lua/coopui/m{i}.lua": f"-- coopui {i}\n".encode() * 30 for i in range(15)}
+FILES["/config_templates/loot.ini"] = b"[Settings]\n"
+release = {
+    "version": "9.9.9", "changelog": [],
+    "files": [{"path": p.lstrip("/"), "hash": hashlib.sha256(b).hexdigest()}
+              for p, b in FILES.items() if p.endswith(".lua")],
+}
+defaults = {"files": [{"repoPath": "config_templates/loot.ini", "installPath": "Macros/loot.ini",
+                       "hash": hashlib.sha256(FILES["/config_templates/loot.ini"]).hexdigest()}]}
+FILES["/release_manifest.json"] = json.dumps(release).encode()
+FILES["/default_config_manifest.json"] = json.dumps(defaults).encode()
+requests_seen = []
+lock = threading.Lock()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        with lock:
+            requests_seen.append(self.path)
+        body = FILES.get(self.path)
+        self.send_response(200 if body is not None else 404)
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+data_dir = tempfile.mkdtemp(prefix="coopt_batch_data_")
+config.data_path = lambda name: os.path.join(data_dir, name)
+
+
+def make_root(i):
+    root = tempfile.mkdtemp(prefix=f"coopt_batch_{i}_")
+    for d in ("config", "lua", "Macros"):
+        os.makedirs(os.path.join(root, d))
+    return root
+
+
+roots = [make_root(i) for i in range(5)]
+# root 1 already has half the files
+for p, body in list(FILES.items())[:7]:
+    dest = os.path.join(roots[1], p.lstrip("/"))
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with open(dest, "wb") as f:
+        f.write(body)
+# root 4 is "running": preflight blocks it
+real_preflight = batch.preflight_blockers
+batch.preflight_blockers = lambda r, paths=None: "Close MacroQuest and EverQuest, then retry." if r == roots[4] else None
+
+# 0. known_installs: recent paths, deduplicated, only valid set-up roots
+not_mq = tempfile.mkdtemp(prefix="coopt_batch_notmq_")
+found = batch.known_installs({"recent_paths": [roots[0], roots[0] + os.sep, not_mq, roots[2]]})
+assert found == [os.path.normpath(roots[0]), os.path.normpath(roots[2])], found
+print("PASS: known_installs dedups and drops non-MQ folders")
+
+# 1. one pass over every root
+progress = []
+rows, err = batch.update_all(roots, base, progress_callback=lambda r, m: progress.append((r, m)))
+assert err is None, err
+by_root = {row["root"]: row for row in rows}
+for root in roots[:4]:
+    assert by_root[root]["status"] == batch.STATUS_UPDATED, by_root[root]
+    for p, body in FILES.items():
+        if p.endswith(".lua"):
+            assert open(os.path.join(root, p.lstrip("/")), "rb").read() == body, (root, p)
+    assert os.path.isfile(os.path.join(root, "Macros", "loot.ini"))
+    assert open(os.path.join(root, "Macros", "coopui_installed_version.txt")).read() == "9.9.9"
+assert by_root[roots[1]]["files"] == 15 - 7
+assert by_root[roots[4]]["status"] == batch.STATUS_BLOCKED
+assert not os.listdir(os.path.join(roots[4], "lua"))
+assert requests_seen.count("/release_manifest.json") == 1
+assert requests_seen.count("/default_config_manifest.json") == 1
+downloads = [p for p in requests_seen if not p.endswith("manifest.json")]
+assert sorted(downloads) == sorted(set(downloads)), "a file was downloaded twice"
+assert len(downloads) == 16, downloads
+assert any(r == roots[0] for r, _m in progress)
+print(f"PASS: {len(rows)} roots, {len(downloads)} downloads for {len(downloads)} distinct files")
+
+# 2. a second pass is all "Up to date" and downloads nothing
+requests_seen.clear()
+batch.preflight_blockers = lambda r, paths=None: None
+rows, err = batch.update_all(roots[:4], base)
+assert err is None and all(r["status"] == batch.STATUS_UP_TO_DATE for r in rows), rows
+assert [p for p in requests_seen if not p.endswith("manifest.json")] == []
+print("PASS: second pass is up to date with no downloads")
+
+# 3. each root's update is one snapshot group: Revert undoes all of it
+for root in roots[:4]:
+    snaps = transaction.list_snapshots(root)
+    assert snaps and len({s["group"] for s in snaps}) == 1 and snaps[0]["group"], snaps
+ok, msg = transaction.revert(roots[0])
+assert ok, msg
+assert not [f for _d, _s, fs in os.walk(os.path.join(roots[0], "lua")) for f in fs], "revert left files behind"
+print("PASS: one snapshot group per root; revert ->", msg)
+
+# 4. manifest failure is reported once, not per root
+rows, err = batch.update_all(roots, base, manifest_path="missing.json")
+assert rows == [] and "404" in err, err
+print("PASS: manifest error ->", err)
+
+batch.preflight_blockers = real_preflight
+server.shutdown()
+for d in roots + [data_dir, not_mq]:
+    shutil.rmtree(d, ignore_errors=True)
+print("\nALL BATCH TESTS PASSED")
@@ -0,0 +1,133 @@
+import http.server, io, json, os, shutil, sys, tempfile, threading, zipfile
+sys.path.insert(0, 'patcher')
+import config
+import bundle_cache
+import fresh_install
+import installer
+
+# ---------------------------------------------------------------------------
+# Bundle cache: keys, central-directory integrity, LRU under the cap, and a second
+# Full Install / Repair resolving the latest release to a cache hit with no body download.
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_bundle_")
+config.data_path = lambda name: os.path.join(work, name)
+
+
+def make_zip(n_files, fill=b"x"):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(n_files):
+            zf.writestr(f"lua/coopui/f{i}.lua", fill * 2000 + bytes([i % 256]))
+    return buf.getvalue()
+
+
+# 1. keys
+assert bundle_cache.release_asset_key(
+    "https://github.com/CooptGaming/CooptUI/releases/download/v1.2.3/CoOptUI-EMU-v1.2.3.zip"
+) == "release:v1.2.3/CoOptUI-EMU-v1.2.3.zip"
+assert bundle_cache.release_asset_key(fresh_install.BASE_BUNDLE_ZIP_URL) is None
+assert bundle_cache.etag_key('W/"abc"') == 'etag:W/"abc"' and bundle_cache.etag_key(None) is None
+print("PASS: release-asset and ETag keys")
+
+# 2. central-directory integrity
+good = os.path.join(work, "good.zip")
+with open(good, "wb") as f:
+    f.write(make_zip(20))
+assert bundle_cache.zip_intact(good)
+data = open(good, "rb").read()
+for name, content in [("trunc.zip", data[:len(data) // 2]), ("junk.zip", b"not a zip" * 100),
+                      ("cut_body.zip", data[:100] + data[-400:])]:
+    p = os.path.join(work, name)
+    with open(p, "wb") as f:
+        f.write(content)
+    assert not bundle_cache.zip_intact(p), name
+print("PASS: truncated / foreign zips fail the central-directory check")
+
+# 3. LRU eviction under the cap keeps the newest (and the one just committed)
+cache = bundle_cache.BundleCache(os.path.join(work, "lru"), max_bytes=len(data) * 2 + 10)
+for i, key in enumerate(["release:a/x.zip", "release:b/x.zip", "release:c/x.zip"]):
+    os.makedirs(cache.path, exist_ok=True)
+    shutil.copyfile(good, cache.path_for(key))
+    if i == 2:
+        assert cache.lookup("release:a/x.zip")  # touch a: b is now least recently used
+    cache.commit(key)
+assert cache.lookup("release:a/x.zip") and cache.lookup("release:c/x.zip")
+assert cache.lookup("release:b/x.zip") is None
+print("PASS: LRU eviction to the size cap")
+
+# 4. get_latest_release_zip_url + _fetch_bundle: the second repair downloads nothing
+BUNDLE = make_zip(50)
+requests_seen = []
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        requests_seen.append((self.path, self.headers.get("If-None-Match"), self.headers.get("Range")))
+        if self.path == "/releases/latest":
+            if self.headers.get("If-None-Match") == '"rel1"':
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps({"tag_name": "v9.9.9", "assets": [{
+                "name": "CoOptUI-EMU-v9.9.9.zip",
+                "browser_download_url": f"{base}/releases/download/v9.9.9/CoOptUI-EMU-v9.9.9.zip",
+            }]}).encode()
+            self.send_response(200)
+            self.send_header("ETag", '"rel1"')
+        elif self.path.endswith("CoOptUI-EMU-v9.9.9.zip"):
+            body = BUNDLE
+            self.send_response(200)
+        else:
+            body = b""
+            self.send_response(404)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+fresh_install.GITHUB_API_RELEASES = base + "/releases/latest"
+
+cache = bundle_cache.BundleCache.default()
+for attempt in (1, 2):
+    requests_seen.clear()
+    url, ver, err = fresh_install.get_latest_release_zip_url()
+    assert err is None and ver == "9.9.9", err
+    path, is_temp = installer._fetch_bundle(url, bundle_cache.release_asset_key(url), cache)
+    assert not is_temp and open(path, "rb").read() == BUNDLE
+    downloads = [r for r in requests_seen if r[0].endswith(".zip")]
+    if attempt == 1:
+        assert downloads, requests_seen
+    else:
+        assert downloads == [], requests_seen
+        assert requests_seen == [("/releases/latest", '"rel1"', None)], requests_seen
+print("PASS: second repair: API answered 304, bundle served from the cache")
+
+# 5. a damaged cached bundle is dropped and downloaded again
+with open(path, "r+b") as f:
+    f.truncate(len(BUNDLE) // 3)
+requests_seen.clear()
+path, _ = installer._fetch_bundle(url, bundle_cache.release_asset_key(url), cache)
+assert open(path, "rb").read() == BUNDLE
+assert [r for r in requests_seen if r[0].endswith(".zip")]
+print("PASS: damaged cache entry re-downloaded")
+
+# 6. bundle_cache_max_mb = 0 disables the cache (temp download, caller deletes it)
+config.save({"bundle_cache_max_mb": 0})
+assert bundle_cache.BundleCache.default() is None
+installer._DOWNLOAD_DIR = os.path.join(work, "tmpdl")
+path, is_temp = installer._fetch_bundle(url, "release:v9.9.9/x.zip", None)
+assert is_temp and path.startswith(installer._DOWNLOAD_DIR)
+print("PASS: cache disabled by config")
+
+server.shutdown()
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL BUNDLE CACHE TESTS PASSED")
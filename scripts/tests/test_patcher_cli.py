@@ -0,0 +1,184 @@
+import contextlib, hashlib, http.server, io, json, os, shutil, subprocess, sys, tempfile, threading, zipfile
+sys.path.insert(0, 'patcher')
+import config
+import cli
+import fresh_install
+import installer
+import transaction
+
+# ---------------------------------------------------------------------------
+# Headless CLI (python -m patcher): check / patch / verify / plan against a local repo,
+# JSON and NDJSON output, exit codes, and no Tk anywhere on the import path.
+# ---------------------------------------------------------------------------
+FILES = {f"/{rel}": f"-- {rel}\n".encode() * 20 for rel in installer._CRITICAL_FILES}
+FILES.update({f"/lua/coopui/m{i}.lua": f"-- coopui {i}\n".encode() * 30 for i in range(10)})
+FILES["/config_templates/loot.ini"] = b"[Settings]\n"
+release = {
+    "version": "9.9.9", "changelog": [],
+    "files": [{"path": p.lstrip("/"), "hash": hashlib.sha256(b).hexdigest()}
+              for p, b in FILES.items() if p.endswith(".lua")],
+}
+defaults = {"files": [{"repoPath": "config_templates/loot.ini", "installPath": "Macros/loot.ini",
+                       "hash": hashlib.sha256(FILES["/config_templates/loot.ini"]).hexdigest()}]}
+FILES["/release_manifest.json"] = json.dumps(release).encode()
+FILES["/default_config_manifest.json"] = json.dumps(defaults).encode()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        body = FILES.get(self.path)
+        self.send_response(200 if body is not None else 404)
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+work = tempfile.mkdtemp(prefix="coopt_cli_")
+config.data_path = lambda name: os.path.join(work, name)
+root = os.path.join(work, "MQ")
+os.makedirs(os.path.join(root, "config"))
+installer.is_macroquest_running = lambda: False
+
+
+def run(*argv):
+    out, err = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        code = cli.main(list(argv) + ["--repo", base])
+    return code, out.getvalue(), err.getvalue()
+
+
+# 1. check --json: updates available -> exit 10; read-only (lua/ Macros/ not created)
+code, out, _ = run("check", root, "--json")
+result = json.loads(out)
+assert code == cli.EXIT_UPDATES and result["exit"] == code and result["ok"], result
+assert len(result["update"]) == len(release["files"]) and result["defaults"] == ["Macros/loot.ini"], result
+assert result["available"] == "9.9.9" and result["installed"] is None
+assert not os.path.isdir(os.path.join(root, "lua"))
+print(f"PASS: check --json -> exit {code}, {len(result['update'])} file(s) to update")
+
+# 2. patch --ndjson: progress events, then one result event
+code, out, _ = run("patch", root, "--ndjson")
+events = [json.loads(line) for line in out.splitlines()]
+progress = [e for e in events if e["event"] == "progress"]
+assert code == cli.EXIT_OK, events[-1]
+assert events[-1]["event"] == "result" and events[-1]["exit"] == 0 and events[-1]["version"] == "9.9.9"
+assert len(progress) == len(release["files"]) + 1, progress
+assert progress[-1]["current"] == progress[-1]["total"] == len(release["files"]) + 1
+assert all("t" in e for e in events)
+assert open(os.path.join(root, "Macros", "coopui_installed_version.txt")).read() == "9.9.9"
+assert os.path.isfile(os.path.join(root, "Macros", "loot.ini"))
+print(f"PASS: patch --ndjson -> {len(progress)} progress events, exit {code}")
+
+# 3. check (text) is now up to date -> exit 0
+code, out, _ = run("check", root)
+assert code == cli.EXIT_OK and out.strip() == "Up to date.", (code, out)
+print("PASS: check text ->", out.strip())
+
+# 4. verify: clean -> 0; an edited file (same size and mtime, so the index would trust
+#    it) and a deleted critical file -> exit 4
+code, out, _ = run("verify", root, "--json")
+assert code == cli.EXIT_OK and json.loads(out)["modified"] == [], out
+edited = os.path.join(root, "lua", "coopui", "m3.lua")
+st = os.stat(edited)
+with open(edited, "r+b") as f:
+    f.write(b"XX")
+os.utime(edited, ns=(st.st_atime_ns, st.st_mtime_ns))
+os.remove(os.path.join(root, "lua", "itemui", "app.lua"))
+code, out, _ = run("verify", root, "--json")
+result = json.loads(out)
+assert code == cli.EXIT_MISMATCH and not result["ok"], result
+assert "lua/coopui/m3.lua" in result["modified"] and result["missing"] == ["lua/itemui/app.lua"], result
+print("PASS: verify -> exit", code, result["message"])
+
+# 5. patch blocked by a running MacroQuest -> exit 3, nothing written; then repaired
+installer.is_macroquest_running = lambda: True
+code, out, _ = run("patch", root, "--json")
+assert code == cli.EXIT_BLOCKED and "Close MacroQuest" in json.loads(out)["message"], out
+assert not os.path.isfile(os.path.join(root, "lua", "itemui", "app.lua"))
+installer.is_macroquest_running = lambda: False
+code, out, err = run("patch", root, "--rehash")
+assert code == cli.EXIT_OK and "Update complete." in out and "app.lua" in err, (code, out, err)
+assert run("verify", root)[0] == cli.EXIT_OK
+print("PASS: blocked patch -> exit 3; patch --rehash repairs, verify clean")
+
+# 6. plan against a local bundle
+bundle = os.path.join(work, "bundle.zip")
+with zipfile.ZipFile(bundle, "w") as zf:
+    zf.writestr("MQ/MQ2Main.dll", b"MZ" * 100)
+    zf.writestr("MQ/config/MacroQuest.ini", b"[x]\n")
+    zf.writestr("MQ/lua/coopui/m0.lua", FILES["/lua/coopui/m0.lua"])
+code, out, _ = run("plan", root, "--bundle", bundle, "--json")
+result = json.loads(out)
+assert code == cli.EXIT_OK and result["plan"]["write"] == 2 and "files" not in result["plan"], result
+code, out, _ = run("plan", root, "--bundle", bundle, "--json", "--files")
+assert len(json.loads(out)["plan"]["files"]) == 3
+code, out, _ = run("plan", root, "--bundle", os.path.join(work, "missing.zip"), "--json")
+assert code == cli.EXIT_FAILED and "Could not plan" in json.loads(out)["message"], out
+print("PASS: plan --json / --files / missing bundle")
+
+# 6b. repair plans the bundle first: the preflight scans the binaries it writes, and
+#     smart_install() gets the same plan
+real = (fresh_install.get_latest_release_zip_url, installer.preflight_blockers, installer.smart_install)
+fresh_install.get_latest_release_zip_url = lambda: (bundle, "9.9.9", None)
+seen = {}
+installer.preflight_blockers = lambda r, paths=None: seen.update(paths=paths) or "MQ2Main.dll is locked."
+code, out, _ = run("repair", root, "--json")
+assert code == cli.EXIT_BLOCKED and seen["paths"] == ["MQ2Main.dll", "config/MacroQuest.ini"], (out, seen)
+installer.preflight_blockers = lambda r, paths=None: None
+installer.smart_install = lambda r, repo, cb=None, plan=None, **_k: seen.update(plan=plan) or (True, "Installed.")
+code, out, _ = run("repair", root, "--json")
+assert code == cli.EXIT_OK and seen["plan"]["source"] == bundle and seen["plan"]["write"] == 2, (out, seen)
+fresh_install.get_latest_release_zip_url, installer.preflight_blockers, installer.smart_install = real
+print("PASS: repair preflights the plan's writes and hands the plan to smart_install")
+
+# 7. usage errors: not an MQ folder, or no folder and none saved -> exit 2
+code, out, _ = run("check", work, "--json")
+assert code == cli.EXIT_USAGE and "Not a MacroQuest root" in json.loads(out)["message"], out
+code, out, _ = run("check", "--json")
+assert code == cli.EXIT_USAGE and "none saved" in json.loads(out)["message"], out
+config.save({"mq_root": root})
+assert run("check", "--json")[0] == cli.EXIT_OK
+print("PASS: usage errors -> exit 2; saved folder used by default")
+
+# 8. never Tk: not in this process, and not when started as python -m patcher
+assert not {"tkinter", "customtkinter", "PIL"} & set(sys.modules), "a Tk module was imported"
+proc = subprocess.run([sys.executable, "-X", "importtime", "-m", "patcher", "--help"],
+                      capture_output=True, text=True, timeout=60)
+assert proc.returncode == 0 and "check" in proc.stdout, proc
+assert "tkinter" not in proc.stderr, "python -m patcher imported tkinter"
+print("PASS: no tkinter / customtkinter / PIL imported")
+
+# 9. a patch that also installs default config is one snapshot group: one revert brings
+#    back the old file and version marker and removes the new default config
+FILES["/lua/coopui/m0.lua"] = b"-- coopui 0, v2\n"
+FILES["/config_templates/bank.ini"] = b"[Bank]\n"
+release["version"] = "9.9.10"
+next(e for e in release["files"] if e["path"] == "lua/coopui/m0.lua")["hash"] = \
+    hashlib.sha256(FILES["/lua/coopui/m0.lua"]).hexdigest()
+defaults["files"].append({"repoPath": "config_templates/bank.ini", "installPath": "Macros/bank.ini",
+                          "hash": hashlib.sha256(FILES["/config_templates/bank.ini"]).hexdigest()})
+FILES["/release_manifest.json"] = json.dumps(release).encode()
+FILES["/default_config_manifest.json"] = json.dumps(defaults).encode()
+old_m0 = open(os.path.join(root, "lua", "coopui", "m0.lua"), "rb").read()
+marker = os.path.join(root, "Macros", "coopui_installed_version.txt")
+code, out, _ = run("patch", root, "--json")
+assert code == cli.EXIT_OK and json.loads(out)["defaults"] == ["Macros/bank.ini"], out
+assert open(marker).read() == "9.9.10" and os.path.isfile(os.path.join(root, "Macros", "bank.ini"))
+ok, msg = transaction.revert(root)
+assert ok, msg
+assert open(os.path.join(root, "lua", "coopui", "m0.lua"), "rb").read() == old_m0
+assert not os.path.exists(os.path.join(root, "Macros", "bank.ini"))
+assert open(marker).read() == "9.9.9"
+print("PASS: patch + default config reverted in one step ->", msg)
+
+server.shutdown()
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL CLI TESTS PASSED")
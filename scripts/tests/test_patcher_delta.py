@@ -0,0 +1,117 @@
+import hashlib, http.server, os, random, shutil, sys, tempfile, threading
+sys.path.insert(0, 'patcher')
+import config
+import delta
+import updater
+
+# ---------------------------------------------------------------------------
+# delta.make_delta / apply_delta roundtrips, and patch() taking the delta path for a DLL
+# whose installed hash is a delta base — with fallback to the full asset on any problem.
+# ---------------------------------------------------------------------------
+rng = random.Random(7)
+OLD = bytes(rng.getrandbits(8) for _ in range(300_000))
+NEW = bytearray(OLD)
+for _ in range(40):
+    at = rng.randrange(len(NEW) - 64)
+    NEW[at:at + 16] = bytes(rng.getrandbits(8) for _ in range(16))
+NEW[100_000:100_000] = b"inserted code" * 50
+NEW = bytes(NEW)
+
+# 1. roundtrips, including degenerate inputs
+for base, target in [(OLD, NEW), (b"", NEW[:1000]), (OLD, b""), (b"abc", b"abc"), (OLD[:31], OLD[:40])]:
+    assert delta.apply_delta(base, delta.make_delta(base, target)) == target
+d = delta.make_delta(OLD, NEW)
+assert len(d) < len(NEW) // 20, f"delta too large: {len(d)} bytes"
+print(f"PASS: roundtrips; {len(NEW)} byte target -> {len(d)} byte delta")
+
+# 2. a corrupt or foreign delta raises DeltaError
+for bad in [b"nope", d[:len(d) // 2], delta.MAGIC + b"\x00garbage"]:
+    try:
+        delta.apply_delta(OLD, bad)
+    except delta.DeltaError:
+        pass
+    else:
+        raise AssertionError("corrupt delta accepted")
+try:
+    delta.apply_delta(OLD[:1000], d)
+except delta.DeltaError:
+    pass
+else:
+    raise AssertionError("delta applied to the wrong base")
+print("PASS: corrupt / wrong-base deltas rejected")
+
+# 3. patch() applies a matching delta instead of downloading the full DLL
+SERVED = {"/full/MQ2CoOptUI.dll": NEW, "/delta/good.delta": d, "/delta/bad.delta": d[:-10] + b"x" * 10}
+requests_seen = []
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        requests_seen.append(self.path)
+        body = SERVED.get(self.path)
+        self.send_response(200 if body is not None else 404)
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+root = tempfile.mkdtemp(prefix="coopt_delta_")
+data_dir = tempfile.mkdtemp(prefix="coopt_delta_data_")
+config.data_path = lambda name: os.path.join(data_dir, name)
+dll = os.path.join(root, "plugins", "MQ2CoOptUI.dll")
+old_hash = hashlib.sha256(OLD).hexdigest()
+new_hash = hashlib.sha256(NEW).hexdigest()
+
+
+def install_old():
+    os.makedirs(os.path.dirname(dll), exist_ok=True)
+    with open(dll, "wb") as f:
+        f.write(OLD)
+
+
+def entry(delta_path, delta_hash=None, base_hash=old_hash):
+    info = {"base": base_hash, "url": base + delta_path, "size": len(d)}
+    if delta_hash:
+        info["hash"] = delta_hash
+    return {"path": "plugins/MQ2CoOptUI.dll", "hash": new_hash,
+            "url": base + "/full/MQ2CoOptUI.dll", "deltas": [info]}
+
+
+install_old()
+requests_seen.clear()
+ok, msg, _ = updater.patch([entry("/delta/good.delta", hashlib.sha256(d).hexdigest())], base, root,
+                          use_store=False)
+assert ok, msg
+assert open(dll, "rb").read() == NEW
+assert requests_seen == ["/delta/good.delta"], requests_seen
+print("PASS: delta applied, full asset never requested")
+
+# 4. fallbacks: corrupt delta, delta hash mismatch, missing delta, installed file not a base
+cases = [
+    ("corrupt delta", entry("/delta/bad.delta")),
+    ("delta hash mismatch", entry("/delta/good.delta", "0" * 64)),
+    ("missing delta", entry("/delta/gone.delta")),
+    ("unknown base", entry("/delta/good.delta", base_hash="f" * 64)),
+]
+for name, e in cases:
+    install_old()
+    requests_seen.clear()
+    ok, msg, _ = updater.patch([e], base, root, use_store=False)
+    assert ok, (name, msg)
+    assert open(dll, "rb").read() == NEW, name
+    assert requests_seen[-1] == "/full/MQ2CoOptUI.dll", (name, requests_seen)
+    assert not os.path.exists(dll + ".tmp"), name
+    print(f"PASS: {name} -> full download")
+
+server.shutdown()
+shutil.rmtree(root, ignore_errors=True)
+shutil.rmtree(data_dir, ignore_errors=True)
+print("\nALL DELTA TESTS PASSED")
@@ -0,0 +1,128 @@
+import hashlib, http.server, os, shutil, sys, tempfile, threading
+sys.path.insert(0, 'patcher')
+import config
+import updater
+
+# ---------------------------------------------------------------------------
+# patch() against a local HTTP/1.1 server: pooled keep-alive connections, and the
+# 404-skip / release-asset-404-fail / 403 semantics the GUI relies on.
+# ---------------------------------------------------------------------------
+FILES = {f"/lua/itemui/f{i}.lua": f"-- file {i}\n".encode() * 50 for i in range(40)}
+FILES["/plugins/MQ2CoOptUI.dll"] = b"MZ" + bytes(range(256)) * 64
+connections = set()
+requests_seen = []
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        connections.add(self.client_address)
+        requests_seen.append(self.path)
+        if self.path.startswith("/limited/"):
+            self.send_response(429)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/redirect/"):
+            self.send_response(302)
+            self.send_header("Location", self.path[len("/redirect"):])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = FILES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+root = tempfile.mkdtemp(prefix="coopt_dl_")
+# Keep the machine-wide object store (next to patcher_config.json) out of the repo.
+data_dir = tempfile.mkdtemp(prefix="coopt_dl_data_")
+config.data_path = lambda name: os.path.join(data_dir, name)
+
+
+def digest(p):
+    return hashlib.sha256(FILES.get(p, b"")).hexdigest()
+
+
+def entries(paths):
+    return [{"path": p.lstrip("/"), "hash": digest(p)} for p in paths]
+
+
+# 1. every file lands, progress reaches total, and connections are reused
+calls = []
+ok, msg, skipped = updater.patch(
+    entries(p for p in FILES if p.endswith(".lua")), base, root,
+    progress_callback=lambda c, t, p: calls.append((c, t, p)), workers=4,
+)
+assert ok and skipped == [], msg
+for p, body in FILES.items():
+    if p.endswith(".lua"):
+        assert open(os.path.join(root, p.lstrip("/")), "rb").read() == body, p
+assert calls[-1] == (40, 40, "Done"), calls[-1]
+assert sorted(c for c, _t, p in calls if p != "Done") == list(range(1, 41))
+assert len(connections) <= 4, f"expected <= 4 pooled connections, saw {len(connections)}"
+assert not [f for f in os.listdir(os.path.join(root, "lua", "itemui")) if f.endswith(".tmp")]
+print(f"PASS: 40 files over {len(connections)} keep-alive connection(s)")
+
+# 2. a repo path that 404s is skipped, not fatal
+ok, msg, skipped = updater.patch(entries(["/lua/itemui/f0.lua", "/lua/gone.lua"]), base, root)
+assert ok and skipped == ["lua/gone.lua"], (ok, msg, skipped)
+print("PASS: repo-path 404 is skipped ->", msg)
+
+# 3. a release asset (explicit url) that 404s FAILS the patch
+asset = {"path": "plugins/MQ2CoOptUI.dll", "hash": digest("/plugins/MQ2CoOptUI.dll"),
+         "url": base + "/missing/MQ2CoOptUI.dll"}
+ok, msg, _ = updater.patch([asset], base, root)
+assert not ok and "not available" in msg, msg
+print("PASS: release-asset 404 fails ->", msg)
+
+# 4. release assets follow redirects (github.com -> objects.githubusercontent.com)
+asset["url"] = base + "/redirect/plugins/MQ2CoOptUI.dll"
+ok, msg, _ = updater.patch([asset], base, root)
+assert ok, msg
+assert open(os.path.join(root, "plugins", "MQ2CoOptUI.dll"), "rb").read() == FILES["/plugins/MQ2CoOptUI.dll"]
+print("PASS: redirected release asset downloaded")
+
+# 5. rate limiting is reported as such
+ok, msg, _ = updater.patch([{"path": "x.lua", "hash": "0" * 64, "url": base + "/limited/x.lua"}], base, root)
+assert not ok and "rate-limiting" in msg, msg
+print("PASS: 429 reported as rate limiting ->", msg)
+
+# 6. content that does not match the manifest hash never replaces the target: it is
+#    re-downloaded, and the patch fails once the retries are exhausted.
+target = os.path.join(root, "lua", "itemui", "f1.lua")
+before = open(target, "rb").read()
+requests_before = len(requests_seen)
+ok, msg, _ = updater.patch([{"path": "lua/itemui/f1.lua", "hash": "0" * 64}], base, root)
+assert not ok and "did not match" in msg, msg
+assert open(target, "rb").read() == before
+assert not os.path.exists(target + ".tmp")
+assert len(requests_seen) - requests_before == updater._VERIFY_ATTEMPTS
+print(f"PASS: hash mismatch retried {updater._VERIFY_ATTEMPTS}x, target untouched ->", msg)
+
+# 7. what patch() wrote is recorded in the hash index, so verification needs no re-read.
+import hash_index
+idx = hash_index.HashIndex(root)
+assert idx.cached("lua/itemui/f2.lua") == digest("/lua/itemui/f2.lua")
+ok, failed = updater.verify_installation(entries(["/lua/itemui/f2.lua"]), root)
+assert ok and failed == []
+print("PASS: patched files are pre-verified in the hash index")
+
+server.shutdown()
+shutil.rmtree(root, ignore_errors=True)
+shutil.rmtree(data_dir, ignore_errors=True)
+print("\nALL DOWNLOAD TESTS PASSED")
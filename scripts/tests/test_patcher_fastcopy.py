@@ -0,0 +1,119 @@
+import errno, os, shutil, stat, sys, tempfile
+sys.path.insert(0, 'patcher')
+import fastcopy
+
+# ---------------------------------------------------------------------------
+# fastcopy: reflink -> hardlink (link=True only) -> copy, each volume probed once and the
+# answer cached; metadata like copy2; an existing destination is replaced, never written
+# through; copytree counts per method.
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_fastcopy_")
+src_dir = os.path.join(work, "src")
+for i in range(30):
+    p = os.path.join(src_dir, f"d{i % 3}", "sub" if i % 2 else "", f"f{i}.dll")
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    with open(p, "wb") as f:
+        f.write(os.urandom(1000 + i))
+os.makedirs(os.path.join(src_dir, "empty"))
+one = os.path.join(src_dir, "d0", "f0.dll")
+os.utime(one, (1_000_000_000, 1_000_000_000))
+os.chmod(one, 0o640)
+
+
+def tree(root):
+    return {os.path.relpath(os.path.join(d, f), root): open(os.path.join(d, f), "rb").read()
+            for d, _s, fs in os.walk(root) for f in fs}
+
+
+def reset():
+    fastcopy._caps.clear()
+
+
+# 1. a plain copy: content, mode and mtime like copy2; the method reported
+reset()
+dst = os.path.join(work, "one.dll")
+method = fastcopy.copy_file(one, dst)
+assert method in (fastcopy.REFLINK, fastcopy.COPY), method
+assert open(dst, "rb").read() == open(one, "rb").read()
+assert os.stat(dst).st_mtime == 1_000_000_000 and stat.S_IMODE(os.stat(dst).st_mode) == 0o640
+assert os.stat(dst).st_ino != os.stat(one).st_ino, "link=False must never hardlink"
+print(f"PASS: copy_file -> {method}, metadata kept")
+
+# 2. reflink unsupported: probed once per volume, then skipped; link=True hardlinks
+reset()
+probes = []
+real_reflink = fastcopy._reflink
+
+
+def no_reflink(s, d):
+    probes.append(s)
+    raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+
+fastcopy._reflink = no_reflink
+out = os.path.join(work, "linked")
+counts = fastcopy.copytree(src_dir, out, link=True)
+assert len(probes) == 1, probes
+assert counts[fastcopy.HARDLINK] == 30 and counts[fastcopy.COPY] == 0 and counts["bytes"] == 0, counts
+assert tree(out) == tree(src_dir) and os.path.isdir(os.path.join(out, "empty"))
+assert os.stat(os.path.join(out, "d0", "f0.dll")).st_ino == os.stat(one).st_ino
+(caps,) = fastcopy.capabilities().values()
+assert caps == {fastcopy.REFLINK: False, fastcopy.HARDLINK: True}, caps
+try:
+    fastcopy.copytree(src_dir, out)
+    raise AssertionError("copytree onto an existing tree without dirs_exist_ok")
+except FileExistsError:
+    pass
+print(f"PASS: one reflink probe for 30 files, then hardlinks ({fastcopy.describe(counts)})")
+
+# 3. an existing destination is replaced, not written through (out/ is hardlinked to src/)
+victim = os.path.join(out, "d1", "sub", "f1.dll")
+before = open(os.path.join(src_dir, "d1", "sub", "f1.dll"), "rb").read()
+fastcopy.copy_file(one, victim)
+assert open(victim, "rb").read() == open(one, "rb").read()
+assert open(os.path.join(src_dir, "d1", "sub", "f1.dll"), "rb").read() == before
+print("PASS: copying over a hardlinked destination leaves the other name alone")
+
+# 4. hardlinks refused by the volume (FAT32 / EXDEV): probed once, everything copied
+reset()
+link_calls = []
+real_link = os.link
+
+
+def no_link(s, d):
+    link_calls.append(s)
+    raise OSError(errno.EPERM, "Operation not permitted")
+
+
+fastcopy.os.link = no_link
+counts = fastcopy.copytree(src_dir, os.path.join(work, "copied"), link=True)
+assert len(link_calls) == 1 and len(probes) == 2, (link_calls, probes)
+assert counts[fastcopy.COPY] == 30 and counts["bytes"] == sum(len(b) for b in tree(src_dir).values())
+assert tree(os.path.join(work, "copied")) == tree(src_dir)
+# a per-file failure (too many links) does not disable hardlinks for the volume
+reset()
+fastcopy.os.link = lambda s, d: (_ for _ in ()).throw(OSError(errno.EMLINK, "Too many links"))
+assert fastcopy.copy_file(one, os.path.join(work, "emlink.dll"), link=True) == fastcopy.COPY
+assert list(fastcopy.capabilities().values())[0][fastcopy.HARDLINK] is None
+fastcopy.os.link = real_link
+print("PASS: hardlink failure cached per volume; EMLINK stays per file")
+
+# 5. the buffered copy still works without copy_file_range
+reset()
+real_kernel = fastcopy._kernel_copy
+fastcopy._kernel_copy = None
+assert fastcopy.copy_file(one, os.path.join(work, "buffered.dll")) == fastcopy.COPY
+assert open(os.path.join(work, "buffered.dll"), "rb").read() == open(one, "rb").read()
+fastcopy._kernel_copy = real_kernel
+fastcopy._reflink = real_reflink
+print("PASS: buffered fallback")
+
+# 6. real reflink where this machine's filesystem supports it
+reset()
+method = fastcopy.copy_file(one, os.path.join(work, "real.dll"), link=True)
+assert open(os.path.join(work, "real.dll"), "rb").read() == open(one, "rb").read()
+(caps,) = fastcopy.capabilities().values()
+print(f"PASS: on this volume -> {method} (reflink supported: {caps[fastcopy.REFLINK]})")
+
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL FASTCOPY TESTS PASSED")
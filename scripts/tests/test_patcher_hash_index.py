@@ -0,0 +1,128 @@
+import hashlib, os, shutil, sys, tempfile
+sys.path.insert(0, 'patcher')
+import hash_index
+from hash_index import HashIndex
+
+# ---------------------------------------------------------------------------
+# The per-install hash index must answer from cache only while the file's stat
+# tuple is unchanged, and rehash=True must ignore it entirely (repair).
+# ---------------------------------------------------------------------------
+root = tempfile.mkdtemp(prefix="coopt_hi_")
+rel = "lua/itemui/init.lua"
+path = os.path.join(root, rel.replace("/", os.sep))
+os.makedirs(os.path.dirname(path))
+open(path, "wb").write(b"local a = 1\r\nreturn a\r\n")
+expected = hashlib.sha256(b"local a = 1\nreturn a\n").hexdigest()
+
+idx = HashIndex(root)
+assert idx.digest(rel) == expected
+assert idx.save()
+assert os.path.isfile(hash_index.state_path(root, hash_index.INDEX_NAME))
+print("PASS: CRLF-normalized digest computed and index written")
+
+# Same size, same mtime, same inode -> served from the index without reading the file.
+st = os.stat(path)
+with open(path, "r+b") as f:
+    f.write(b"LOCAL")
+os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+assert HashIndex(root).digest(rel) == expected
+print("PASS: unchanged stat tuple answers from the index")
+
+# rehash=True reads the file regardless.
+fresh = HashIndex(root, rehash=True).digest(rel)
+assert fresh != expected, fresh
+print("PASS: rehash mode ignores the index")
+
+# A real change (new mtime) is picked up by a normal lookup.
+open(path, "wb").write(b"changed\n")
+assert HashIndex(root).digest(rel) == hashlib.sha256(b"changed\n").hexdigest()
+print("PASS: modified file is re-hashed")
+
+# Missing file -> '' and the entry is dropped.
+os.remove(path)
+idx = HashIndex(root)
+assert idx.digest(rel) == ""
+idx.save()
+assert rel not in HashIndex(root)._entries
+print("PASS: missing file hashes to '' and is forgotten")
+
+# record() stores a digest for a file the patcher just wrote, without hashing it.
+open(path, "wb").write(b"x")
+idx = HashIndex(root)
+idx.record(rel, "f" * 64)
+idx.save()
+assert HashIndex(root).digest(rel) == "f" * 64
+print("PASS: record() seeds the index for freshly written files")
+
+# A rehash of some files refreshes theirs and keeps every other entry.
+other = "lua/itemui/other.lua"
+open(os.path.join(root, other.replace("/", os.sep)), "wb").write(b"other\n")
+idx = HashIndex(root)
+idx.digest(other)
+idx.save()
+idx = HashIndex(root, rehash=True)
+assert idx.digest(rel) == hashlib.sha256(b"x").hexdigest()
+idx.save()
+entries = HashIndex(root)._entries
+assert entries[rel][3] == hashlib.sha256(b"x").hexdigest() and other in entries, entries
+print("PASS: a subset rehash keeps the rest of the index")
+
+# A corrupt index is ignored, not fatal.
+open(hash_index.state_path(root, hash_index.INDEX_NAME), "w").write("{not json")
+assert HashIndex(root).digest(rel) == hashlib.sha256(b"x").hexdigest()
+print("PASS: corrupt index falls back to hashing")
+
+shutil.rmtree(root, ignore_errors=True)
+print("\nALL HASH INDEX TESTS PASSED")
+
+# ---------------------------------------------------------------------------
+# Streaming hasher: the chunked digest must be byte-identical to normalizing the
+# whole file at once (what generate_manifest.py shipped), wherever a "\r" lands
+# relative to a chunk boundary.
+# ---------------------------------------------------------------------------
+import random
+
+
+def whole_file_digest(data: bytes, path: str) -> str:
+    if os.path.splitext(path)[1].lower() in hash_index._TEXT_EXTS:
+        data = data.replace(b"\r\n", b"\n")
+    return hashlib.sha256(data).hexdigest()
+
+
+root = tempfile.mkdtemp(prefix="coopt_hs_")
+rng = random.Random(1234)
+samples = [b"", b"\r", b"\r\n", b"\r\r\n", b"a\r", b"\n\r", b"\r\n" * 7 + b"\r"]
+samples += [bytes(rng.choice(b"ab\r\n") for _ in range(rng.randint(1, 200))) for _ in range(200)]
+for i, data in enumerate(samples):
+    for ext in (".lua", ".dll"):
+        p = os.path.join(root, f"s{i}{ext}")
+        open(p, "wb").write(data)
+        want = whole_file_digest(data, p)
+        for chunk in (1, 2, 3, 7, 64):
+            got = hash_index._sha256_file(p, chunk_size=chunk)
+            assert got == want, (data, ext, chunk)
+print(f"PASS: chunked hashing matches whole-file hashing for {len(samples)} samples x 5 chunk sizes")
+
+# Repo files hash exactly as the manifest generator always hashed them.
+checked = 0
+for base in ("lua/coopui", "lua/itemui", "uifiles/coopt"):
+    for dirpath, _dirs, names in os.walk(base):
+        for n in names:
+            p = os.path.join(dirpath, n)
+            assert hash_index._sha256_file(p) == whole_file_digest(open(p, "rb").read(), p), p
+            checked += 1
+print(f"PASS: {checked} repo files hash identically streamed and whole")
+
+# Parallel lookups agree with serial ones and populate the index.
+for i in range(30):
+    open(os.path.join(root, f"p{i}.txt"), "wb").write(f"line {i}\r\n".encode() * (i + 1))
+rels = [f"p{i}.txt" for i in range(30)] + ["absent.lua"]
+idx = HashIndex(root)
+par = idx.digests(rels, workers=8)
+assert par == {r: HashIndex(root).digest(r) for r in rels}
+assert par["absent.lua"] == ""
+assert all(idx.cached(r) == par[r] for r in rels[:-1])
+print("PASS: parallel digests() agrees with serial digest()")
+
+shutil.rmtree(root, ignore_errors=True)
+print("\nALL STREAMING HASH TESTS PASSED")
@@ -0,0 +1,132 @@
+import contextlib, http.server, io, json, os, re, shutil, sys, tempfile, threading, zipfile
+sys.path.insert(0, 'patcher')
+import config
+import installer
+
+# ---------------------------------------------------------------------------
+# Dry-run install planner: plan_overlay() from a local zip and from a URL (central
+# directory over Range requests, body never downloaded), the executor consuming the same
+# plan, and the CLI.
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_plan_")
+config.data_path = lambda name: os.path.join(work, name)
+
+buf = io.BytesIO()
+with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+    zf.writestr("MacroQuest.exe", os.urandom(200_000))
+    zf.writestr("config/MacroQuest.ini", b"[Plugins]\n")
+    zf.writestr("Macros/sell_flags.ini", b"bundle flags")
+    zf.writestr("lua/itemui/init.lua", b"-- itemui\n" * 100)
+    for i in range(200):
+        zf.writestr(f"mono/lib/f{i}.dll", os.urandom(20_000))
+BUNDLE = buf.getvalue()
+zip_path = os.path.join(work, "bundle.zip")
+with open(zip_path, "wb") as f:
+    f.write(BUNDLE)
+
+target = os.path.join(work, "mq")
+for rel, body in {"config/MacroQuest.ini": b"[MacroQuest]\n", "Macros/sell_flags.ini": b"user",
+                  "lua/itemui/init.lua": b"-- itemui\n" * 100}.items():
+    os.makedirs(os.path.dirname(os.path.join(target, rel)), exist_ok=True)
+    with open(os.path.join(target, rel), "wb") as f:
+        f.write(body)
+
+# 1. local plan: per-action counts, bytes, estimate
+plan = installer.plan_overlay(zip_path, target)
+assert (plan["write"], plan["preserve"], plan["unchanged"], plan["total"]) == (201, 2, 1, 204), plan
+assert plan["write_bytes"] == 200_000 + 200 * 20_000 and plan["download_bytes"] == 0
+assert plan["total_bytes"] == plan["write_bytes"] + plan["preserve_bytes"] + plan["unchanged_bytes"]
+assert plan["est_seconds"] > 0 and plan["locked"] == []
+by_rel = {f["rel"]: f["action"] for f in plan["files"]}
+assert by_rel["Macros/sell_flags.ini"] == installer.PLAN_PRESERVE
+assert by_rel["lua/itemui/init.lua"] == installer.PLAN_UNCHANGED
+assert not os.path.exists(os.path.join(target, "MacroQuest.exe")), "a dry run wrote a file"
+assert "201 file(s) to write" in installer.format_plan(plan)
+print("PASS: local plan ->", installer.format_plan(plan).replace("\n", " | "))
+
+# 2. URL plan reads only the central directory over Range requests
+served = [0]
+ranges = []
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        m = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range") or "")
+        if self.path == "/noranges.zip" or not m:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(BUNDLE)))
+            self.end_headers()
+            try:
+                self.wfile.write(BUNDLE)
+            except ConnectionError:
+                pass  # the planner hangs up rather than download the body
+            return
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else len(BUNDLE) - 1
+        part = BUNDLE[start:end + 1]
+        ranges.append((start, end))
+        served[0] += len(part)
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(BUNDLE)}")
+        self.send_header("Content-Length", str(len(part)))
+        self.end_headers()
+        self.wfile.write(part)
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+url_plan = installer.plan_overlay(base + "/releases/download/v1/CoOptUI-EMU-v1.zip", target)
+assert url_plan["files"] == plan["files"]
+assert url_plan["download_bytes"] == len(BUNDLE)
+assert served[0] < len(BUNDLE) // 4, (served[0], len(BUNDLE))
+assert len(ranges) <= 3, ranges
+try:
+    installer.plan_overlay(base + "/noranges.zip", target)
+    raise AssertionError("planned a server without Range support")
+except installer.http.client.HTTPException:
+    pass
+print(f"PASS: URL plan read {served[0]} of {len(BUNDLE)} bytes in {len(ranges)} range request(s)")
+
+# 3. the executor runs the plan it is given, without re-deciding
+os.remove(os.path.join(target, "Macros/sell_flags.ini"))  # changed after the preview
+summary = installer.overlay_bundle(zip_path, target, plan=url_plan)
+assert summary == {"written": 201, "preserved": 2, "unchanged": 1, "total": 204}, summary
+assert not os.path.exists(os.path.join(target, "Macros/sell_flags.ini"))
+assert os.path.getsize(os.path.join(target, "MacroQuest.exe")) == 200_000
+other = os.path.join(work, "other.zip")
+with zipfile.ZipFile(other, "w") as zf:
+    zf.writestr("MacroQuest.exe", b"different")
+try:
+    installer.overlay_bundle(other, target, plan=url_plan)
+    raise AssertionError("a plan for another bundle was executed")
+except zipfile.BadZipFile:
+    pass
+print("PASS: overlay_bundle executes the previewed plan; a mismatched plan is refused")
+
+# 4. CLI: JSON plan, exit status 2 when target files are locked
+out = io.StringIO()
+with contextlib.redirect_stdout(out):
+    assert installer.main([zip_path, target, "--json"]) == 0
+cli_plan = json.loads(out.getvalue())
+# the preserved flags file deleted above is now simply missing: the only write left
+assert (cli_plan["write"], cli_plan["unchanged"]) == (1, 202), {k: cli_plan[k] for k in ("write", "unchanged")}
+real_locked = installer.find_locked_files
+installer.find_locked_files = lambda root, paths=None: ["MQ2Main.dll"]
+out = io.StringIO()
+with contextlib.redirect_stdout(out):
+    assert installer.main([zip_path, target, "--files"]) == 2
+assert "Locked" in out.getvalue() and "unchanged" in out.getvalue(), out.getvalue()
+installer.find_locked_files = real_locked
+with contextlib.redirect_stderr(io.StringIO()):
+    assert installer.main([os.path.join(work, "missing.zip"), target]) == 1
+print("PASS: CLI --json / --files / exit codes")
+
+server.shutdown()
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL INSTALL PLAN TESTS PASSED")
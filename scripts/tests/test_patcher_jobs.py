@@ -0,0 +1,255 @@
+import contextlib, hashlib, http.server, io, os, re, shutil, sys, tempfile, threading, time, zipfile
+sys.path.insert(0, 'patcher')
+import config
+import downloader
+import installer
+import jobs
+import transaction
+import updater
+
+# ---------------------------------------------------------------------------
+# Jobs: priority order (checks before writes), cancelling queued and running jobs, the
+# coalescing UI channel, and cancel tokens threaded through patch(), _download_zip() and
+# overlay_bundle() — a cancel stops the network and the disk and leaves the install as
+# it was.
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_jobs_")
+config.data_path = lambda name: os.path.join(work, name)
+
+# 1. priority: with the only worker busy, a check queued after a write runs first
+sched = jobs.JobScheduler(workers=1)
+gate = threading.Event()
+order = []
+sched.submit("gate", lambda t: gate.wait())
+sched.submit("patch", lambda t: order.append("patch"), priority=jobs.PRIORITY_WRITE)
+sched.submit("background", lambda t: order.append("background"), priority=jobs.PRIORITY_BACKGROUND)
+sched.submit("check", lambda t: order.append("check"), priority=jobs.PRIORITY_CHECK)
+gate.set()
+assert sched.wait_idle(5)
+assert order == ["check", "patch", "background"], order
+print("PASS: run order", order)
+
+# 2. cancel: a queued job never starts (on_cancel at once); a running one stops at its
+#    next check; on_done still gets results, on_error gets failures
+gate.clear()
+started = threading.Event()
+events = []
+running = sched.submit("running", lambda t: (started.set(), gate.wait(), t.check()), owner="view",
+                       on_cancel=lambda: events.append("running cancelled"))
+queued = sched.submit("queued", lambda t: events.append("queued ran"), owner="view",
+                      on_cancel=lambda: events.append("queued cancelled"))
+other = sched.submit("other", lambda t: 42, owner="elsewhere", on_done=lambda r: events.append(f"other {r}"))
+assert started.wait(5)
+assert len(sched.cancel(owner="view")) == 2
+assert queued.finished and queued.state == jobs.CANCELLED and events == ["queued cancelled"], events
+assert sched.busy(owner="view")
+gate.set()
+assert sched.wait_idle(5)
+assert running.state == jobs.CANCELLED and other.state == jobs.DONE, (running.state, other.state)
+assert events == ["queued cancelled", "running cancelled", "other 42"], events
+failed = sched.submit("boom", lambda t: 1 / 0, on_error=lambda e: events.append(type(e).__name__))
+failed.wait(5)
+assert failed.state == jobs.FAILED and events[-1] == "ZeroDivisionError"
+# Cancelled is not an Exception: a worker's `except Exception` guard cannot swallow it
+assert not issubclass(jobs.Cancelled, Exception)
+print("PASS: queued cancel immediate, running cancel cooperative, results and errors delivered")
+
+# 3. UI channel: keyed posts coalesce to the latest, plain posts keep order, callbacks for a
+#    destroyed widget are dropped, one failing callback does not drop the rest
+ui = jobs.UiChannel()
+seen = []
+
+
+class Widget:
+    alive = True
+
+    def winfo_exists(self):
+        return self.alive
+
+
+gone = Widget()
+gone.alive = False
+for i in range(1000):
+    ui.post(lambda i=i: seen.append(("progress", i)), key="progress")
+ui.post(lambda: seen.append("line 1"))
+ui.post(lambda: seen.append("line 2"))
+ui.post(lambda: seen.append("dropped"), widget=gone)
+ui.post(lambda: 1 / 0)
+ui.post(lambda: seen.append(("progress", "last")), key="progress")
+with contextlib.redirect_stderr(io.StringIO()):
+    ran = ui.drain()
+assert seen == ["line 1", "line 2", ("progress", "last")], seen
+assert ran == 3 and ui.drain() == 0
+print("PASS: 1002 progress posts ->", len(seen), "widget updates")
+
+# A scheduler with a channel delivers on the draining thread only
+ui_sched = jobs.JobScheduler(channel=ui)
+tid = []
+ui_sched.submit("x", lambda t: None, on_done=lambda r: tid.append(threading.get_ident()))
+ui_sched.wait_idle(5)
+time.sleep(0.05)
+assert tid == [] and ui.drain() == 1 and tid == [threading.get_ident()]
+print("PASS: results reach the UI only through the channel")
+
+# --- a slow local server: files trickle out so a cancel lands mid-transfer -------------
+FILES = {f"/lua/coopui/m{i}.lua": (f"-- module {i}\n" * 6000).encode() for i in range(24)}
+BIG = os.urandom(4 * 1024 * 1024)
+served = [0]
+lock = threading.Lock()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        if self.path == "/bundle.zip":
+            body = BIG
+            m = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range") or "")
+            start, end = (int(m.group(1)), int(m.group(2) or len(body) - 1)) if m else (0, len(body) - 1)
+            part = body[start:end + 1]
+            self.send_response(206 if m else 200)
+            self.send_header("ETag", '"big"')
+            if m:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        else:
+            part = FILES.get(self.path)
+            if part is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(part)))
+        self.end_headers()
+        try:
+            for i in range(0, len(part), 16384):
+                self.wfile.write(part[i:i + 16384])
+                with lock:
+                    served[0] += len(part[i:i + 16384])
+                time.sleep(0.01)
+        except OSError:
+            pass  # the client went away (cancelled)
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+
+OLD = {"lua/coopui/m0.lua": b"-- old", "Macros/coopui_installed_version.txt": b"1.0.0"}
+
+
+def make_root():
+    root = tempfile.mkdtemp(prefix="coopt_jobs_root_", dir=work)
+    for rel, body in OLD.items():
+        p = os.path.join(root, rel.replace("/", os.sep))
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(p, "wb") as f:
+            f.write(body)
+    return root
+
+
+def tree(root):
+    return {os.path.relpath(os.path.join(d, f), root).replace(os.sep, "/"): open(os.path.join(d, f), "rb").read()
+            for d, _s, fs in os.walk(root) for f in fs
+            if ".coopui" not in os.path.relpath(d, root).split(os.sep)}
+
+
+def staged(root):
+    txn_dir = os.path.join(root, ".coopui", transaction.TXN_DIRNAME)
+    return [f for _d, _s, fs in os.walk(txn_dir) for f in fs if f != transaction.LOCK_NAME]
+
+
+# 4. patch(): cancelled after a few files — Cancelled raised promptly, install untouched,
+#    nothing staged, most of the bytes never requested
+root = make_root()
+entries = [{"path": p.lstrip("/"), "hash": hashlib.sha256(b).hexdigest()} for p, b in FILES.items()]
+token = jobs.CancelToken()
+progress = []
+
+
+def cancel_after_three(done, total, path):
+    progress.append(path)
+    if done == 3:
+        token.cancel()
+
+
+t0 = time.monotonic()
+try:
+    updater.patch(entries, base, root, cancel_after_three, workers=2, use_store=False, cancel=token)
+    raise AssertionError("patch() was not cancelled")
+except jobs.Cancelled:
+    pass
+elapsed = time.monotonic() - t0
+total_bytes = sum(len(b) for b in FILES.values())
+assert tree(root) == OLD and not staged(root) and not transaction.pending(root), tree(root)
+assert len(progress) <= 4 and served[0] < total_bytes / 2, (len(progress), served[0], total_bytes)
+print(f"PASS: patch cancelled after {len(progress)} file(s) in {elapsed:.2f}s; "
+      f"{served[0] * 100 // total_bytes}% of the bytes sent, install untouched")
+
+# the same update, not cancelled, then completes
+ok, msg, _ = updater.patch(entries, base, root, workers=4, use_store=False, cancel=jobs.CancelToken())
+assert ok and tree(root)["lua/coopui/m5.lua"] == FILES["/lua/coopui/m5.lua"], msg
+print("PASS: an uncancelled token changes nothing:", msg)
+
+# 5. _download_zip(): cancelled mid-download — the .part and its sidecar stay, and the next
+#    attempt resumes from them
+dest = os.path.join(work, "dl", "bundle.zip")
+downloader._MIN_SEGMENT = 512 * 1024
+token = jobs.CancelToken()
+served[0] = 0
+try:
+    installer._download_zip(base + "/bundle.zip",
+                            lambda msg, frac: token.cancel() if frac > 0.05 else None,
+                            dest=dest, cancel=token)
+    raise AssertionError("download was not cancelled")
+except jobs.Cancelled:
+    pass
+first = served[0]
+assert os.path.isfile(dest + ".part") and os.path.isfile(dest + ".part.json") and not os.path.exists(dest)
+assert first < len(BIG) * 0.8, first
+served[0] = 0
+installer._download_zip(base + "/bundle.zip", dest=dest)
+assert open(dest, "rb").read() == BIG and served[0] < len(BIG), served[0]
+print(f"PASS: bundle download cancelled at {first * 100 // len(BIG)}%, resumed for the remaining "
+      f"{served[0] * 100 // len(BIG)}%")
+
+# 6. overlay_bundle(): cancelled between members, serial and parallel — nothing committed
+zip_path = os.path.join(work, "overlay.zip")
+with zipfile.ZipFile(zip_path, "w") as zf:
+    for i in range(300):
+        zf.writestr(f"lua/coopui/gen/f{i:03d}.lua", f"-- generated {i}\n" * 200)
+    zf.writestr("lua/coopui/m0.lua", "-- new m0\n")
+for workers in (1, 4):
+    root = make_root()
+    token = jobs.CancelToken()
+    try:
+        installer.overlay_bundle(zip_path, root, lambda msg, frac: token.cancel(),
+                                 incremental=False, workers=workers, cancel=token)
+        raise AssertionError("overlay was not cancelled")
+    except jobs.Cancelled:
+        pass
+    assert tree(root) == OLD and not staged(root) and not transaction.pending(root), workers
+    assert transaction.latest_snapshot(root) is None
+print("PASS: overlay cancelled (serial and parallel), install untouched, no snapshot")
+
+# 7. end to end: a patch job cancelled from the UI side reports on_cancel, not on_done
+root = make_root()
+ui = jobs.UiChannel()
+sched = jobs.JobScheduler(channel=ui)
+outcome = []
+job = sched.submit("update", lambda cancel: updater.patch(entries, base, root, workers=2,
+                                                          use_store=False, cancel=cancel),
+                   on_done=lambda r: outcome.append(("done", r)), on_cancel=lambda: outcome.append("cancelled"))
+time.sleep(0.15)
+sched.cancel()
+assert sched.wait_idle(10)
+ui.drain()
+assert outcome == ["cancelled"] and tree(root) == OLD, outcome
+print("PASS: cancelled update job -> on_cancel; install untouched")
+
+server.shutdown()
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL JOBS TESTS PASSED")
@@ -0,0 +1,81 @@
+import os, shutil, sys, tempfile, threading, time
+sys.path.insert(0, 'patcher')
+import installer
+
+# ---------------------------------------------------------------------------
+# Whole-install lock scan: every .exe / .dll the upcoming write touches is probed (plus the
+# fixed core list), concurrently, with a per-probe timeout; every blocker comes back in one
+# call and one message. Locks are simulated through installer._is_locked so this runs
+# anywhere (a real Windows image lock is covered by test_patcher_preflight.py).
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_lockscan_")
+plan_paths = ["MacroQuest.exe", "MQ2Main.dll"]
+plan_paths += [f"plugins/MQ2Plugin{i:03d}.dll" for i in range(250)]
+plan_paths += [f"mono/libs/Lib{i:02d}.dll" for i in range(40)]
+plan_paths += ["lua/itemui/init.lua", "config/MacroQuest.ini", "resources/UIFiles/Default/EQUI.xml"]
+for rel in plan_paths:
+    p = os.path.join(work, rel.replace("/", os.sep))
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    with open(p, "wb") as f:
+        f.write(b"MZ")
+
+# 1. candidates: core list first, binaries only, case-insensitive dedup, backslashes normalised
+rels = installer._lock_probe_list(plan_paths + ["MQ2MAIN.DLL", "plugins\\MQ2Plugin000.dll"])
+assert rels[:6] == list(installer._LOCK_PROBE_FILES), rels[:6]
+assert len(rels) == 6 + 250 + 40, len(rels)  # MacroQuest.exe / MQ2Main.dll are core probes
+assert all(r.lower().endswith((".exe", ".dll")) for r in rels)
+print(f"PASS: {len(rels)} binaries to probe, non-binaries and duplicates dropped")
+
+# 2. a clean install of ~300 binaries is scanned well under a second (real probes)
+t0 = time.perf_counter()
+assert installer.find_locked_files(work, plan_paths) == []
+elapsed = time.perf_counter() - t0
+assert elapsed < 1.0, elapsed
+print(f"PASS: {len(rels)} real probes in {elapsed * 1000:.0f} ms")
+
+# 3. every blocker in one call, in probe order; missing files are not reported
+real_is_locked = installer._is_locked
+LOCKED = {"MQ2Main.dll", "plugins/MQ2Plugin017.dll", "mono/libs/Lib33.dll", "plugins/MQ2Plugin249.dll"}
+installer._is_locked = lambda path: os.path.relpath(path, work).replace(os.sep, "/") in LOCKED
+found = installer.find_locked_files(work, plan_paths + ["plugins/NotInstalled.dll"])
+assert found == ["MQ2Main.dll", "plugins/MQ2Plugin017.dll", "plugins/MQ2Plugin249.dll", "mono/libs/Lib33.dll"], found
+# without paths only the core list is probed (the quick check before a plan exists)
+assert installer.find_locked_files(work) == ["MQ2Main.dll"]
+print("PASS: all blockers returned at once ->", found)
+
+# 4. a probe that hangs counts as locked after the timeout and does not stall the others
+release = threading.Event()
+hung = os.path.join(work, "plugins", "MQ2Plugin100.dll")
+installer._is_locked = lambda path: release.wait() if path == hung else False
+t0 = time.perf_counter()
+found = installer.find_locked_files(work, plan_paths, timeout=0.3)
+elapsed = time.perf_counter() - t0
+release.set()
+assert found == ["plugins/MQ2Plugin100.dll"], found
+assert elapsed < 1.5, elapsed
+print(f"PASS: stuck probe reported after its timeout ({elapsed * 1000:.0f} ms)")
+
+# 5. preflight names every blocker in one message; plan_write_paths feeds it from a plan
+installer._is_locked = lambda path: os.path.relpath(path, work).replace(os.sep, "/") in LOCKED
+real_running = installer.is_macroquest_running
+installer.is_macroquest_running = lambda: False
+try:
+    LOCKED = {f"plugins/MQ2Plugin{i:03d}.dll" for i in range(8)}
+    msg = installer.preflight_blockers(work, plan_paths)
+    assert "MQ2Plugin000.dll" in msg and "MQ2Plugin004.dll" in msg and "and 3 more" in msg, msg
+    assert installer.preflight_blockers(work) is None  # the core list alone is clear
+    plan = {"files": [{"rel": r, "action": installer.PLAN_WRITE if r.endswith("7.dll") else installer.PLAN_UNCHANGED}
+                      for r in plan_paths]}
+    msg = installer.preflight_blockers(work, installer.plan_write_paths(plan))
+    assert msg and "MQ2Plugin007.dll" in msg and "MQ2Plugin000.dll" not in msg, msg
+    print("PASS: preflight message ->", msg)
+finally:
+    installer.is_macroquest_running = real_running
+    installer._is_locked = real_is_locked
+
+# 6. a missing target folder probes nothing
+assert installer.find_locked_files(os.path.join(work, "nope"), plan_paths) == []
+print("PASS: missing target dir handled")
+
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL LOCK SCAN TESTS PASSED")
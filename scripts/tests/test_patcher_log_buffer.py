@@ -0,0 +1,117 @@
+import os, shutil, sys, tempfile, threading, time
+sys.path.insert(0, 'patcher')
+import log_buffer
+from log_buffer import ERROR, INFO, SKIP, LogBuffer
+
+# ---------------------------------------------------------------------------
+# Patch log buffer: lines from many threads flushed in batches, memory bounded to the
+# last `capacity` lines with the full log in the spill file, Errors / Skipped filters,
+# and a visible window whose cost does not grow with the length of the log.
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_logbuf_")
+
+# 1. 100000 lines from 4 threads, flushed while they write: memory keeps the last 5000,
+#    the spill file has every line, each thread's lines in order
+spill = os.path.join(work, ".coopui", "last_patch_log.txt")
+buf = LogBuffer(capacity=5000, spill_path=spill)
+PER_THREAD = 25000
+
+
+def writer(t):
+    for i in range(PER_THREAD):
+        if i % 1000 == 999:
+            buf.append(f"  t{t} {i}: lua/x{i}.lua could not be replaced", ERROR)
+        elif i % 500 == 7:
+            buf.append(f"  t{t} {i}: (skipped: lua/gone{i}.lua)")
+        else:
+            buf.append(f"  t{t} {i}: lua/coopui/f{i}.lua")
+
+
+threads = [threading.Thread(target=writer, args=(t,)) for t in range(4)]
+for th in threads:
+    th.start()
+flushes = 0
+while any(th.is_alive() for th in threads):
+    flushes += bool(buf.flush())
+    time.sleep(0.01)
+buf.flush()
+assert buf.total == 4 * PER_THREAD and len(buf) == 5000 and buf.dropped == 4 * PER_THREAD - 5000
+assert buf.counts == {INFO: 99700, ERROR: 100, SKIP: 200}, buf.counts
+buf.close()
+lines = open(spill, encoding="utf-8").read().splitlines()
+assert len(lines) == 4 * PER_THREAD
+for t in range(4):
+    mine = [int(line.split()[1].rstrip(":")) for line in lines if line.startswith(f"  t{t} ")]
+    assert mine == list(range(PER_THREAD)), t
+print(f"PASS: 100000 lines in {flushes} flushes; {len(buf)} in memory, all {len(lines)} in the spill file")
+
+# 2. filters: Errors / Skipped show only lines of that kind still in memory; lines that
+#    leave the ring leave the filtered view too
+buf = LogBuffer(capacity=100)
+for i in range(250):
+    buf.append(f"{i}: failed" if i % 10 == 0 else f"{i}: ok")
+buf.set_filter(ERROR)
+buf.flush()
+assert len(buf) == 10 and buf.window(0, 3) == [(ERROR, "150: failed"), (ERROR, "160: failed"), (ERROR, "170: failed")]
+for i in range(250, 300):
+    buf.append(f"{i}: failed" if i % 10 == 0 else f"{i}: ok")
+buf.flush()
+assert [text for _k, text in buf.window(0, 100)][0] == "200: failed" and len(buf) == 10
+buf.set_filter(None)
+assert len(buf) == 100 and buf.window(98, 10) == [(INFO, "298: ok"), (INFO, "299: ok")]
+buf.set_filter(SKIP)
+assert len(buf) == 0 and buf.window(0, 10) == []
+print("PASS: Errors / Skipped filters, evicted lines leave the filtered view")
+
+# 3. classification and multi-line messages: one row per line, same kind
+assert log_buffer.classify("  3/40: (skipped: lua/old.lua)") == SKIP
+assert log_buffer.classify("Update failed unexpectedly: timed out") == ERROR
+assert log_buffer.classify("  3/40: lua/itemui/app.lua") == INFO
+buf = LogBuffer()
+buf.append("Install stopped: locked\n\nExit MacroQuest and try again.\n", ERROR)
+buf.flush()
+assert buf.window(0, 10) == [(ERROR, "Install stopped: locked"), (ERROR, ""), (ERROR, "Exit MacroQuest and try again.")]
+print("PASS: classification, multi-line messages split into rows")
+
+# 4. reset(): a new operation truncates its spill file; an unwritable spill path still logs
+buf = LogBuffer(spill_path=spill)
+buf.append("next operation")
+buf.flush()
+buf.reset(spill)
+buf.append("and the one after")
+buf.flush()
+buf.close()
+assert open(spill, encoding="utf-8").read() == "and the one after\n"
+blocker = os.path.join(work, "file")
+open(blocker, "w").close()
+buf = LogBuffer(spill_path=os.path.join(blocker, "log.txt"))
+buf.append("still shown")
+assert buf.flush() == 1 and buf.spill_path is None and buf.window(0, 1) == [(INFO, "still shown")]
+print("PASS: reset truncates the spill file; unwritable spill path tolerated")
+
+
+# 5. flat cost: one flush of 50 new lines + the visible 30 rows at the end of the log
+#    costs the same for a 1000-line log and a 200000-line one
+def per_refresh(total_lines):
+    buf = LogBuffer(spill_path=os.path.join(work, f"spill_{total_lines}.txt"))
+    for i in range(total_lines):
+        buf.append(f"  {i}/{total_lines}: lua/coopui/some/module_{i}.lua")
+    buf.flush()
+    samples = []
+    for r in range(200):
+        for i in range(50):
+            buf.append(f"  more {r}.{i}")
+        t0 = time.perf_counter()
+        buf.flush()
+        buf.window(len(buf) - 30, 30)
+        samples.append(time.perf_counter() - t0)
+    buf.close()
+    return sorted(samples)[len(samples) // 2]
+
+
+small, large = per_refresh(1000), per_refresh(200000)
+assert large < small * 4 + 0.0005, (small, large)
+print(f"PASS: refresh {small * 1e6:.0f} µs at 1000 lines, {large * 1e6:.0f} µs at 200000 lines")
+
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL LOG BUFFER TESTS PASSED")
@@ -0,0 +1,81 @@
+import hashlib, http.server, json, os, shutil, sys, tempfile, threading
+sys.path.insert(0, 'patcher')
+import config
+import updater
+
+# ---------------------------------------------------------------------------
+# Conditional manifest fetch: the second check sends If-None-Match, reuses the
+# cached manifest on 304, and - with the install untouched - answers "up to date"
+# without hashing anything. Any local change must still be noticed.
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_mc_")
+# Keep the cache out of patcher/ (where a source checkout would put it).
+config.data_path = lambda name: os.path.join(work, name)
+
+root = os.path.join(work, "mq")
+os.makedirs(os.path.join(root, "lua"))
+body = b"return 1\n"
+open(os.path.join(root, "lua", "a.lua"), "wb").write(body)
+manifest = json.dumps({"version": "1.0", "files": [
+    {"path": "lua/a.lua", "hash": hashlib.sha256(body).hexdigest()},
+]}).encode()
+ETAG = '"v1"'
+seen = []
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(manifest)))
+        self.end_headers()
+        self.wfile.write(manifest)
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+
+# 1. first check: full fetch, file compared, state remembered
+to_update, version, _cl, err = updater.check_for_updates(base, root)
+assert err is None and to_update == [] and version == "1.0", (to_update, err)
+assert seen == [None]
+assert os.path.isfile(os.path.join(work, "manifest_cache.json"))
+print("PASS: first check fetches the manifest and caches it with its ETag")
+
+# 2. second check: conditional request, 304, short-circuit without hashing
+real_stale = updater._stale_entries
+updater._stale_entries = lambda *a, **k: (_ for _ in ()).throw(AssertionError("hashed"))
+try:
+    to_update, version, _cl, err = updater.check_for_updates(base, root)
+finally:
+    updater._stale_entries = real_stale
+assert err is None and to_update == [] and version == "1.0"
+assert seen[-1] == ETAG
+print("PASS: 304 + unchanged install is 'up to date' with no hashing")
+
+# 3. a local edit defeats the short-circuit even though the manifest is unchanged
+open(os.path.join(root, "lua", "a.lua"), "wb").write(b"edited locally\n")
+to_update, _v, _cl, err = updater.check_for_updates(base, root)
+assert err is None and [e["path"] for e in to_update] == ["lua/a.lua"], to_update
+assert seen[-1] == ETAG
+print("PASS: local change is detected on a 304")
+
+# 4. with files outstanding the remembered state is cleared, so restoring the file
+#    goes through a real comparison again
+open(os.path.join(root, "lua", "a.lua"), "wb").write(body)
+to_update, _v, _cl, err = updater.check_for_updates(base, root)
+assert err is None and to_update == []
+print("PASS: restored file compares clean")
+
+server.shutdown()
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL MANIFEST CACHE TESTS PASSED")
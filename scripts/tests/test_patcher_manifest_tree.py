@@ -0,0 +1,115 @@
+import hashlib, http.server, json, os, shutil, sys, tempfile, threading
+sys.path.insert(0, 'patcher')
+import config
+import manifest_tree
+import updater
+
+# ---------------------------------------------------------------------------
+# v2 (Merkle) manifests: a one-file hotfix must only compare the files in the
+# directories whose digest changed, and the v1 "files" array must keep working.
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_mt_")
+config.data_path = lambda name: os.path.join(work, name)
+root = os.path.join(work, "mq")
+
+contents = {}
+for d in ("lua/itemui/views", "lua/itemui/services", "lua/coopui", "uifiles/coopt"):
+    for i in range(10):
+        contents[f"{d}/f{i}.lua"] = f"-- {d} {i}\n".encode()
+for path, body in contents.items():
+    p = os.path.join(root, path.replace("/", os.sep))
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    open(p, "wb").write(body)
+
+
+def make_manifest():
+    files = [{"path": p, "hash": hashlib.sha256(b).hexdigest(), "size": len(b)}
+             for p, b in sorted(contents.items())]
+    return {"version": "1", "schema": 2, "files": files, "tree": manifest_tree.build_tree(files)}
+
+
+served = {"body": json.dumps(make_manifest()).encode()}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(served["body"])))
+        self.end_headers()
+        self.wfile.write(served["body"])
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+
+compared = []
+real_stale = updater._stale_entries
+updater._stale_entries = lambda files, *a, **k: (compared.append([e["path"] for e in files]), real_stale(files, *a, **k))[1]
+
+# Directory digests are order-independent and change with any file below them.
+m = make_manifest()
+assert manifest_tree.build_tree(list(reversed(m["files"]))) == m["tree"]
+assert set(m["tree"]) >= {"", "lua", "lua/itemui", "lua/itemui/views", "uifiles/coopt"}
+print("PASS: tree covers every directory level and ignores entry order")
+
+# 1. cold: no local tree yet -> everything compared, install matches
+to_update, _v, _c, err = updater.check_for_updates(base, root)
+assert err is None and to_update == [], (to_update, err)
+assert len(compared[-1]) == 40
+print("PASS: first v2 check compares all 40 files")
+
+# 2. a one-file hotfix in lua/itemui/views -> only that directory is compared
+contents["lua/itemui/views/f3.lua"] = b"-- hotfix\n"
+served["body"] = json.dumps(make_manifest()).encode()
+to_update, _v, _c, err = updater.check_for_updates(base, root)
+assert [e["path"] for e in to_update] == ["lua/itemui/views/f3.lua"], to_update
+assert sorted(compared[-1]) == sorted(p for p in contents if p.startswith("lua/itemui/views/")), compared[-1]
+print(f"PASS: hotfix compared {len(compared[-1])} file(s), not 40")
+
+# 3. until the hotfix lands, that directory stays dirty
+to_update, _v, _c, err = updater.check_for_updates(base, root)
+assert [e["path"] for e in to_update] == ["lua/itemui/views/f3.lua"]
+print("PASS: an unapplied change is still reported on the next check")
+
+# 3b. files deleted or edited under directories whose digest is unchanged are still
+#     found (by stat against the hash index), and only they are hashed
+os.remove(os.path.join(root, "lua", "coopui", "f4.lua"))
+with open(os.path.join(root, "uifiles", "coopt", "f1.lua"), "ab") as f:
+    f.write(b"-- local edit\n")
+to_update, _v, _c, err = updater.check_for_updates(base, root)
+assert sorted(e["path"] for e in to_update) == ["lua/coopui/f4.lua", "lua/itemui/views/f3.lua", "uifiles/coopt/f1.lua"], to_update
+assert len(compared[-1]) == 12, compared[-1]
+for path in ("lua/coopui/f4.lua", "uifiles/coopt/f1.lua"):
+    with open(os.path.join(root, path.replace("/", os.sep)), "wb") as f:
+        f.write(contents[path])
+print("PASS: a deleted / edited file under an unchanged directory is still reported")
+
+# 4. a tree that does not match its files array is ignored (full compare)
+bad = make_manifest()
+bad["tree"][""] = "0" * 64
+served["body"] = json.dumps(bad).encode()
+updater.check_for_updates(base, root)
+assert len(compared[-1]) == 40
+print("PASS: inconsistent tree falls back to comparing every file")
+
+# 5. rehash ignores the local tree
+served["body"] = json.dumps(make_manifest()).encode()
+updater.check_for_updates(base, root, rehash=True)
+assert len(compared[-1]) == 40
+print("PASS: rehash compares every file")
+
+# 6. a v1 manifest (no tree) still works
+v1 = make_manifest()
+del v1["tree"], v1["schema"]
+served["body"] = json.dumps(v1).encode()
+to_update, _v, _c, err = updater.check_for_updates(base, root)
+assert [e["path"] for e in to_update] == ["lua/itemui/views/f3.lua"] and len(compared[-1]) == 40
+print("PASS: v1 manifests are compared in full")
+
+server.shutdown()
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL MANIFEST TREE TESTS PASSED")
@@ -0,0 +1,137 @@
+import hashlib, http.server, os, shutil, sys, tempfile, threading, time
+sys.path.insert(0, 'patcher')
+import config
+import object_store
+import updater
+
+# ---------------------------------------------------------------------------
+# Shared content-addressed store: a second MQ root is patched without any download,
+# corrupt objects are re-downloaded, LRU eviction honours the size cap, and default
+# config files are served from the store too.
+# ---------------------------------------------------------------------------
+FILES = {f"/lua/coopui/f{i}.lua": f"-- module {i}\n".encode() * 40 for i in range(12)}
+FILES["/config_templates/a.ini"] = b"[Settings]\nx=1\n"
+requests_seen = []
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        requests_seen.append(self.path)
+        body = FILES.get(self.path)
+        self.send_response(200 if body is not None else 404)
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+data_dir = tempfile.mkdtemp(prefix="coopt_store_data_")
+config.data_path = lambda name: os.path.join(data_dir, name)
+roots = [tempfile.mkdtemp(prefix=f"coopt_store_root{i}_") for i in range(3)]
+entries = [{"path": p.lstrip("/"), "hash": hashlib.sha256(b).hexdigest()}
+           for p, b in FILES.items() if p.endswith(".lua")]
+
+# 1. the first root downloads everything, the next ones download nothing
+ok, msg, _ = updater.patch(entries, base, roots[0])
+assert ok, msg
+assert len(requests_seen) == len(entries)
+for root in roots[1:]:
+    requests_seen.clear()
+    ok, msg, _ = updater.patch(entries, base, root)
+    assert ok, msg
+    assert requests_seen == [], requests_seen
+    for p, body in FILES.items():
+        if p.endswith(".lua"):
+            assert open(os.path.join(root, p.lstrip("/")), "rb").read() == body
+    ok, failed = updater.verify_installation(entries, root, rehash=True)
+    assert ok, failed
+print(f"PASS: {len(roots) - 1} more roots patched with 0 downloads")
+
+# 2. a corrupted object is detected, dropped and re-downloaded
+store = object_store.ObjectStore.default()
+bad = entries[0]["hash"]
+with open(store._object_path(bad), "wb") as f:
+    f.write(b"tampered")
+target = os.path.join(roots[1], entries[0]["path"])
+os.remove(target)
+requests_seen.clear()
+ok, msg, _ = updater.patch([entries[0]], base, roots[1])
+assert ok, msg
+assert requests_seen == ["/" + entries[0]["path"]], requests_seen
+assert open(target, "rb").read() == FILES["/" + entries[0]["path"]]
+assert open(store._object_path(bad), "rb").read() == FILES["/" + entries[0]["path"]]
+print("PASS: corrupt object re-downloaded and replaced")
+
+# 3. LRU eviction under the size cap keeps the most recently used objects
+lru_dir = tempfile.mkdtemp(prefix="coopt_store_lru_")
+src = os.path.join(lru_dir, "src.bin")
+small = object_store.ObjectStore(os.path.join(lru_dir, "store"), max_bytes=3000)
+digests = []
+for i in range(5):
+    data = bytes([i]) * 1000
+    with open(src, "wb") as f:
+        f.write(data)
+    digests.append(hashlib.sha256(data).hexdigest())
+    small.add(src, digests[-1])
+    time.sleep(0.01)
+# touch the oldest so it survives; objects 1 and 2 are then the least recently used
+assert small.materialize(digests[0], os.path.join(lru_dir, "out.bin"), "out.bin")
+small.save()
+kept = [small.has(d) for d in digests]
+assert kept == [True, False, False, True, True], kept
+reopened = object_store.ObjectStore(os.path.join(lru_dir, "store"), max_bytes=3000)
+assert set(reopened._used) == {digests[0], digests[3], digests[4]}
+print("PASS: LRU eviction to the size cap ->", kept)
+
+# 4. default config files are served from the store once any root has them
+cfg_entry = {"repoPath": "config_templates/a.ini", "installPath": "Macros/a.ini",
+             "hash": hashlib.sha256(FILES["/config_templates/a.ini"]).hexdigest()}
+ok, msg = updater.install_default_config([cfg_entry], base, roots[0])
+assert ok, msg
+requests_seen.clear()
+ok, msg = updater.install_default_config([cfg_entry], base, roots[1])
+assert ok and requests_seen == [], (msg, requests_seen)
+assert open(os.path.join(roots[1], "Macros", "a.ini"), "rb").read() == FILES["/config_templates/a.ini"]
+print("PASS: default config materialized from the store")
+
+# 5. with object_store_hardlinks on, payload files are linked to the store but default
+#    config files (which users edit) are always separate copies, both when they come
+#    from the store and when they are downloaded and added to it
+FILES["/config_templates/b.ini"] = b"[Settings]\ny=2\n"
+cfg_b = {"repoPath": "config_templates/b.ini", "installPath": "Macros/b.ini",
+         "hash": hashlib.sha256(FILES["/config_templates/b.ini"]).hexdigest()}
+config.save({"object_store_hardlinks": True})
+assert object_store.ObjectStore.default().hardlink
+lua = os.path.join(roots[2], entries[1]["path"])
+os.remove(lua)
+ok, msg, _ = updater.patch([entries[1]], base, roots[2])
+assert ok, msg
+payload_links = os.stat(lua).st_nlink
+ok, msg = updater.install_default_config([cfg_entry, cfg_b], base, roots[2])
+assert ok, msg
+for name, entry in (("a.ini", cfg_entry), ("b.ini", cfg_b)):
+    installed = os.path.join(roots[2], "Macros", name)
+    assert os.stat(installed).st_nlink == 1, name
+    assert os.stat(store._object_path(entry["hash"])).st_nlink == 1, name
+with open(os.path.join(roots[2], "Macros", "a.ini"), "ab") as f:
+    f.write(b"edited=1\n")
+assert open(os.path.join(roots[1], "Macros", "a.ini"), "rb").read() == FILES["/config_templates/a.ini"]
+assert store.materialize(cfg_entry["hash"], os.path.join(lru_dir, "a.ini"), "a.ini")
+print(f"PASS: hardlinks on -> payload st_nlink {payload_links}, default config st_nlink 1")
+
+# 6. object_store_max_mb = 0 disables the store
+config.save({"object_store_max_mb": 0})
+assert object_store.ObjectStore.default() is None
+print("PASS: store disabled by config")
+
+server.shutdown()
+for d in roots + [data_dir, lru_dir]:
+    shutil.rmtree(d, ignore_errors=True)
+print("\nALL OBJECT STORE TESTS PASSED")
@@ -0,0 +1,227 @@
+import io, os, shutil, sys, tempfile, threading, zipfile
+sys.path.insert(0, 'patcher')
+import config
+import hash_index
+import installer
+
+# ---------------------------------------------------------------------------
+# Streaming overlay: members go straight from the zip into <dest>.tmp -> os.replace, with
+# no temp extraction tree; preserved user files are never decompressed; a member that
+# fails mid-stream leaves the old target file intact and no .tmp behind; a repair skips
+# members whose size + CRC32 already match (incremental, via the CRC index); the parallel
+# writer pool matches the serial path, throttles progress and surfaces a worker's failure.
+# ---------------------------------------------------------------------------
+BUNDLE = {
+    "MacroQuest.exe": b"MZ new exe" * 100,
+    "config/MacroQuest.ini": b"[Plugins]\nmq2mono=1\n",
+    "config/server_char.ini": b"bundle char ini",
+    "lua/itemui/init.lua": b"-- new itemui",
+    "Macros/sell_flags.ini": b"bundle flags",
+    "mono/macros/e3/Bob/Bob.ini": b"bundle e3",
+    "resources/skin/a.tga": b"tga" * 50,
+    "../escape.txt": b"must stay inside the target",
+}
+
+
+def make_zip(wrapper=""):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        if wrapper:
+            zf.writestr(wrapper + "/", b"")
+        for name, body in BUNDLE.items():
+            zf.writestr(wrapper + ("/" if wrapper else "") + name, body)
+    return buf.getvalue()
+
+
+def make_target():
+    target = tempfile.mkdtemp(prefix="coopt_overlay_")
+    existing = {
+        "config/MacroQuest.ini": b"[MacroQuest]\nEQPath=C:\\EQ\n",
+        "config/server_char.ini": b"user char ini",
+        "lua/itemui/init.lua": b"-- old itemui",
+        "Macros/sell_flags.ini": b"user flags",
+        "mono/macros/e3/Bob/Bob.ini": b"user e3",
+    }
+    for rel, body in existing.items():
+        p = os.path.join(target, rel)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(p, "wb") as f:
+            f.write(body)
+    return target
+
+
+work = tempfile.mkdtemp(prefix="coopt_overlay_zip_")
+opened = []
+real_open = zipfile.ZipFile.open
+
+
+opened_on = []
+
+
+def recording_open(self, name, *a, **kw):
+    if self.filename and self.filename.startswith(work):  # the bundle, not a rollback snapshot
+        opened.append(name.filename if isinstance(name, zipfile.ZipInfo) else name)
+        opened_on.append(threading.current_thread().name)
+    return real_open(self, name, *a, **kw)
+
+
+zipfile.ZipFile.open = recording_open
+real_mkdtemp = tempfile.mkdtemp
+
+# 1. flat and wrapped bundles overlay identically, without any temp extraction tree
+for wrapper in ("", "E3NextAndMQNextBinary-main"):
+    zp = os.path.join(work, f"bundle{wrapper}.zip")
+    with open(zp, "wb") as f:
+        f.write(make_zip(wrapper))
+    target = make_target()
+    opened.clear()
+    progress = []
+    tempfile.mkdtemp = lambda *a, **kw: (_ for _ in ()).throw(AssertionError("temp tree created"))
+    try:
+        summary = installer.overlay_bundle(zp, target, lambda m, f: progress.append(f))
+    finally:
+        tempfile.mkdtemp = real_mkdtemp
+    assert summary == {"written": 4, "preserved": 4, "unchanged": 0, "total": 8}, summary
+    read = lambda rel: open(os.path.join(target, rel), "rb").read()
+    assert read("MacroQuest.exe") == BUNDLE["MacroQuest.exe"]
+    assert read("lua/itemui/init.lua") == b"-- new itemui"
+    assert read("config/server_char.ini") == b"user char ini"
+    assert read("Macros/sell_flags.ini") == b"user flags"
+    assert read("mono/macros/e3/Bob/Bob.ini") == b"user e3"
+    assert read("escape.txt") == BUNDLE["../escape.txt"]
+    assert not os.path.exists(os.path.join(os.path.dirname(target), "escape.txt"))
+    ini = read("config/MacroQuest.ini").decode()
+    assert "EQPath=C:\\EQ" in ini and "MQ2CoOptUI=1" in ini, ini
+    # preserved members were decided from the central directory: never opened
+    preserved_names = {n for n in opened if "config/" in n or n.endswith(("flags.ini", "Bob.ini"))}
+    assert preserved_names == set(), preserved_names
+    assert len(opened) == 4, opened
+    assert progress and progress[-1] == 1.0 and min(progress) > 0.5
+    leftovers = [f for _d, _s, fs in os.walk(target) for f in fs if f.endswith(".tmp")]
+    assert leftovers == [], leftovers
+    shutil.rmtree(target, ignore_errors=True)
+print("PASS: streamed overlay (flat + wrapped), preserved files never decompressed")
+
+# 2. a corrupt member aborts with the previous file intact and no .tmp left behind
+stored = io.BytesIO()
+with zipfile.ZipFile(stored, "w", zipfile.ZIP_STORED) as zf:
+    zf.writestr("lua/itemui/init.lua", b"-- new itemui " * 200)
+raw = bytearray(stored.getvalue())
+at = raw.index(b"-- new itemui")
+raw[at + 5] ^= 0xFF  # payload byte flipped: the CRC check fails at end of stream
+zp = os.path.join(work, "corrupt.zip")
+with open(zp, "wb") as f:
+    f.write(bytes(raw))
+target = make_target()
+try:
+    installer.overlay_bundle(zp, target)
+    raise AssertionError("corrupt member was installed")
+except zipfile.BadZipFile:
+    pass
+assert open(os.path.join(target, "lua/itemui/init.lua"), "rb").read() == b"-- old itemui"
+assert not os.path.exists(os.path.join(target, "lua/itemui/init.lua.tmp"))
+shutil.rmtree(target, ignore_errors=True)
+print("PASS: bad CRC leaves the old file and no .tmp")
+
+# 3. the stock base bundle forces the plugin off
+target = make_target()
+installer.overlay_bundle(os.path.join(work, "bundle.zip"), target, enable_coopt_plugin=False)
+assert "MQ2CoOptUI=0" in open(os.path.join(target, "config/MacroQuest.ini")).read()
+shutil.rmtree(target, ignore_errors=True)
+print("PASS: enable_coopt_plugin=False")
+
+# 4. incremental repair: identical members are skipped, from the CRC index without re-reading
+target = make_target()
+zp = os.path.join(work, "bundle.zip")
+installer.overlay_bundle(zp, target)
+assert os.path.isfile(hash_index.state_path(target, hash_index.CRC_INDEX_NAME))
+crc_reads = []
+real_crc = hash_index._crc32_file
+hash_index._crc32_file = lambda path, *a: crc_reads.append(path) or real_crc(path, *a)
+opened.clear()
+summary = installer.overlay_bundle(zp, target)
+assert summary == {"written": 0, "preserved": 4, "unchanged": 4, "total": 8}, summary
+assert opened == [] and crc_reads == [], (opened, crc_reads)
+# same size, different bytes: caught (the stat change misses the index, the CRC differs)
+exe = os.path.join(target, "MacroQuest.exe")
+with open(exe, "wb") as f:
+    f.write(b"MZ old exe" * 100)
+summary = installer.overlay_bundle(zp, target)
+assert summary["written"] == 1 and summary["unchanged"] == 3, summary
+assert open(exe, "rb").read() == BUNDLE["MacroQuest.exe"]
+assert len(crc_reads) == 1, crc_reads
+# a cold index (deleted) re-reads but still writes nothing
+os.remove(hash_index.state_path(target, hash_index.CRC_INDEX_NAME))
+crc_reads.clear()
+summary = installer.overlay_bundle(zp, target)
+assert summary["written"] == 0 and summary["unchanged"] == 4 and len(crc_reads) == 4, summary
+# incremental=False rewrites everything
+assert installer.overlay_bundle(zp, target, incremental=False)["written"] == 4
+hash_index._crc32_file = real_crc
+shutil.rmtree(target, ignore_errors=True)
+print("PASS: incremental repair skips identical members via the CRC index")
+
+# 5. parallel writers: same tree as serial, bounded progress, config-driven worker count
+many = os.path.join(work, "many.zip")
+with zipfile.ZipFile(many, "w", zipfile.ZIP_DEFLATED) as zf:
+    for i in range(300):
+        zf.writestr(f"mono/lib/d{i % 7}/sub{i % 3}/f{i}.dll", os.urandom(64) * (i + 1))
+trees = []
+for workers in (1, 4):
+    target = tempfile.mkdtemp(prefix="coopt_overlay_par_")
+    opened_on.clear()
+    summary = installer.overlay_bundle(many, target, workers=workers)
+    assert summary["written"] == 300, summary
+    trees.append({os.path.relpath(os.path.join(d, f), target): open(os.path.join(d, f), "rb").read()
+                  for d, _s, fs in os.walk(target) for f in fs if ".coopui" not in d})
+    if workers > 1:
+        assert all(n.startswith("coopui-overlay") for n in opened_on), set(opened_on)
+    else:
+        assert all(n == threading.current_thread().name for n in opened_on)
+    shutil.rmtree(target, ignore_errors=True)
+assert trees[0] == trees[1] and len(trees[0]) == 300
+calls = []
+real_interval = installer._OVERLAY_PROGRESS_INTERVAL
+installer._OVERLAY_PROGRESS_INTERVAL = 60
+target = tempfile.mkdtemp(prefix="coopt_overlay_par_")
+installer.overlay_bundle(many, target, lambda m, f: calls.append(f), workers=4)
+installer._OVERLAY_PROGRESS_INTERVAL = real_interval
+assert len(calls) == 2 and calls[-1] == 1.0, calls
+shutil.rmtree(target, ignore_errors=True)
+data_dir = tempfile.mkdtemp(prefix="coopt_overlay_cfg_")
+real_data_path = config.data_path
+config.data_path = lambda name: os.path.join(data_dir, name)
+assert installer._overlay_workers() == installer.DEFAULT_OVERLAY_WORKERS
+config.save({"overlay_workers": 1})
+assert installer._overlay_workers() == 1
+config.data_path = real_data_path
+shutil.rmtree(data_dir, ignore_errors=True)
+print("PASS: parallel writers match serial, progress throttled, overlay_workers honoured")
+
+# 6. one worker's bad member fails the overlay: its old file kept, no .tmp anywhere
+corrupt = io.BytesIO()
+with zipfile.ZipFile(corrupt, "w", zipfile.ZIP_STORED) as zf:
+    for i in range(40):
+        zf.writestr(f"lua/itemui/m{i}.lua", f"-- module {i} ".encode() * 100)
+raw = bytearray(corrupt.getvalue())
+raw[raw.index(b"-- module 17 ") + 3] ^= 0xFF
+zp = os.path.join(work, "corrupt_many.zip")
+with open(zp, "wb") as f:
+    f.write(bytes(raw))
+target = make_target()
+with open(os.path.join(target, "lua/itemui/m17.lua"), "wb") as f:
+    f.write(b"-- old 17")
+try:
+    installer.overlay_bundle(zp, target, workers=4)
+    raise AssertionError("corrupt member was installed")
+except zipfile.BadZipFile:
+    pass
+assert open(os.path.join(target, "lua/itemui/m17.lua"), "rb").read() == b"-- old 17"
+leftovers = [f for _d, _s, fs in os.walk(target) for f in fs if f.endswith(".tmp")]
+assert leftovers == [], leftovers
+shutil.rmtree(target, ignore_errors=True)
+print("PASS: a failing worker aborts the parallel overlay cleanly")
+
+zipfile.ZipFile.open = real_open
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL OVERLAY TESTS PASSED")
@@ -0,0 +1,181 @@
+import contextlib, http.server, io, json, os, re, shutil, sys, tempfile, threading
+sys.path.insert(0, 'patcher')
+import config
+import installer
+import preserve_rules
+
+# ---------------------------------------------------------------------------
+# Declarative preserve rules: the compiled built-in table decides every path of a bundle
+# listing exactly like the hand-coded should_preserve it replaced; the shipped
+# preserve_rules.json matches the built-in copy; a fetched table takes over, a broken one
+# never half-applies; explain mode names the rule.
+# ---------------------------------------------------------------------------
+REPO = os.path.abspath(".")
+
+
+def legacy_should_preserve(rel_path):
+    # Verbatim behaviour of installer.should_preserve before the rule table.
+    p = rel_path.replace("\\", "/").lstrip("/").lower()
+    ext = os.path.splitext(p)[1]
+    base = os.path.basename(p)
+    if ext in (".exe", ".dll", ".lua", ".mac", ".png", ".ico"):
+        return False
+    if p.startswith("resources/"):
+        return False
+    if p.startswith("config/"):
+        return True
+    if p.startswith("macros/") and ext in (".ini", ".cfg"):
+        return True
+    if p == "lua/scripttracker/scripttracker.ini":
+        return True
+    if base.startswith("login.db"):
+        return True
+    if p.startswith("mono/macros/e3/") and ext in (".ini", ".txt"):
+        return True
+    return False
+
+
+# A bundle listing: everything the EMU zip stages from this repo (the release manifest,
+# the default config, the repo's config/ Macros/ resources/ lua/ trees), the MacroQuest /
+# Mono / E3 runtime files scripts/list-zip.ps1 requires, and the user data a live install
+# accumulates.
+listing = set()
+listing.update(f["path"] for f in json.load(open("release_manifest.json"))["files"])
+listing.update(f["installPath"] for f in json.load(open("default_config_manifest.json"))["files"])
+for top in ("config", "Macros", "resources", "lua"):
+    for d, _s, fs in os.walk(top):
+        listing.update(os.path.relpath(os.path.join(d, f), REPO).replace("\\", "/") for f in fs)
+listing.update(re.findall(r'^\s+"([^"$]+)",?$', open("scripts/list-zip.ps1").read(), re.M))
+listing.update([
+    "MQ2Main.dll", "eqlib.dll", "imgui.dll", "mono-2.0-sgen.dll", "README.txt", "login.db",
+    "login.db-journal", "plugins/MQ2Lua.dll", "plugins/MQ2Mono.dll", "config/MacroQuest.ini",
+    "config/MQ2AutoLogin.ini", "config/server_Bob.ini", "config/e3 Macro Inis/General Settings.ini",
+    "config/e3 Bot Inis/README.txt", "config/Autoexec/AutoExec.cfg", "config/overlay.png",
+    "mono/macros/e3/E3.dll", "mono/macros/e3/Bob/Bob_server.ini", "mono/macros/e3/Bob/notes.txt",
+    "mono/macros/e3/e3.xml", "mono/libs/SQLite.Interop.dll", "Macros/sell_flags.ini",
+    "Macros/loot.mac", "Macros/layout.cfg", "Macros/notes.txt", "lua/scripttracker/scripttracker.ini",
+    "lua/scripttracker/init.lua", "lua/itemui/layout.ini", "resources/UIFiles/Default/EQUI.xml",
+    "resources/e3_seed_config/e3.ini", "uifiles/default/x.ini", "logs/login.db.bak",
+])
+assert len(listing) > 150, len(listing)
+
+# 1. parity over the listing, in every spelling the bundle or Windows may produce
+rules = preserve_rules.BUILTIN
+checked = 0
+for path in sorted(listing):
+    for variant in (path, path.upper(), path.replace("/", "\\"), "/" + path):
+        assert rules.preserve(variant) == legacy_should_preserve(variant), variant
+        assert installer.should_preserve(variant) == legacy_should_preserve(variant), variant
+        checked += 1
+print(f"PASS: {checked} path spellings decide exactly like the legacy rules")
+
+# 2. table-driven: the deciding rule for each kind of path
+TABLE = [
+    ("MacroQuest.exe", False, "code-and-binaries"),
+    ("config/MQ2CoOptUI.dll", False, "code-and-binaries"),
+    ("config/MacroQuest.ini", True, "mq-config"),
+    ("resources/UIFiles/Default/EQUI.xml", False, "resources"),
+    ("resources/e3_seed_config/e3.ini", False, "resources"),
+    ("Macros/sell_flags.ini", True, "macro-user-config"),
+    ("Macros/layout.cfg", True, "macro-user-config"),
+    ("Macros/sell.mac", False, "code-and-binaries"),
+    ("Macros/notes.txt", False, None),
+    ("lua/scripttracker/scripttracker.ini", True, "scripttracker-settings"),
+    ("lua/itemui/layout.ini", False, None),
+    ("login.db", True, "login-db"),
+    ("logs/Login.DB-wal", True, "login-db"),
+    ("mono/macros/e3/Bob/Bob_server.ini", True, "e3-character-data"),
+    ("mono/macros/e3/E3.dll", False, "code-and-binaries"),
+    ("mono/macros/e3/e3.xml", False, None),
+    ("README.txt", False, None),
+]
+for path, expected, rule_id in TABLE:
+    rule = rules.match(path)
+    assert rules.preserve(path) is expected, path
+    assert (rule["id"] if rule else None) == rule_id, (path, rule)
+    assert (rule_id or "no rule matched") in rules.explain(path)
+print(f"PASS: {len(TABLE)} table rows")
+
+# 3. the shipped table is the built-in table
+with open("preserve_rules.json", encoding="utf-8") as f:
+    assert json.load(f) == preserve_rules.DEFAULT_RULES, "preserve_rules.json drifted from DEFAULT_RULES"
+print("PASS: preserve_rules.json == built-in rules")
+
+# 4. validation: a broken table is refused as a whole
+DEFAULT_RULES = preserve_rules.DEFAULT_RULES
+bad_tables = [
+    {"schema": 2, "rules": DEFAULT_RULES["rules"]},
+    {"schema": 1, "rules": []},
+    {"schema": 1, "rules": [{"action": "preserve", "prefix": "x/"}]},
+    {"schema": 1, "rules": [{"id": "a", "action": "keep", "prefix": "x/"}]},
+    {"schema": 1, "rules": [{"id": "a", "action": "preserve", "prefix": "config"}]},
+    {"schema": 1, "rules": [{"id": "a", "action": "preserve"}]},
+    {"schema": 1, "rules": [{"id": "a", "action": "preserve", "ext": "ini"}]},
+    {"schema": 1, "rules": [{"id": "a", "action": "preserve", "path": "a"},
+                            {"id": "a", "action": "refresh", "path": "b"}]},
+]
+for table in bad_tables:
+    try:
+        preserve_rules.RuleSet(table)
+        raise AssertionError(f"accepted {table}")
+    except ValueError:
+        pass
+# priority, not file order, decides; equal priority -> the earlier rule
+custom = preserve_rules.RuleSet({"schema": 1, "rules": [
+    {"id": "low", "action": "preserve", "priority": 1, "prefix": "lua/"},
+    {"id": "high", "action": "refresh", "priority": 5, "ext": [".lua"]},
+    {"id": "first", "action": "preserve", "priority": 3, "glob": "lua/mine/*"},
+    {"id": "second", "action": "refresh", "priority": 3, "path": "lua/mine/x.ini"},
+]})
+assert custom.match("lua/a.lua")["id"] == "high" and custom.match("lua/a.ini")["id"] == "low"
+assert custom.match("lua/mine/x.ini")["id"] == "first"
+print("PASS: validation and priorities")
+
+# 5. refresh(): a fetched table takes over; a missing or broken one falls back to built-in
+work = tempfile.mkdtemp(prefix="coopt_rules_")
+config.data_path = lambda name: os.path.join(work, name)
+SERVED = {"/preserve_rules.json": json.dumps({"schema": 1, "rules": DEFAULT_RULES["rules"] + [
+    {"id": "itemui-layout", "action": "preserve", "priority": 65, "path": "lua/itemui/layout.ini",
+     "why": "Saved window layout."}]}).encode(),
+    "/broken/preserve_rules.json": b'{"schema": 1, "rules": [{"id": "x"}]}'}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        body = SERVED.get(self.path)
+        self.send_response(200 if body is not None else 404)
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+assert preserve_rules.refresh(base) is None
+assert installer.should_preserve("lua/itemui/layout.ini")
+assert "itemui-layout" in preserve_rules.active().explain("lua/itemui/layout.ini")
+err = preserve_rules.refresh(base + "/broken")
+assert err and preserve_rules.active() is preserve_rules.BUILTIN, err
+assert not installer.should_preserve("lua/itemui/layout.ini")
+err = preserve_rules.refresh(base + "/missing")
+assert err and "404" in err and preserve_rules.active() is preserve_rules.BUILTIN, err
+print("PASS: fetched rules applied; broken / missing tables fall back to built-in")
+
+# 6. explain CLI
+out = io.StringIO()
+with contextlib.redirect_stdout(out):
+    assert preserve_rules.main(["config/MacroQuest.ini", "plugins/MQ2Lua.dll"]) == 0
+lines = out.getvalue().splitlines()
+assert "preserve" in lines[0] and "mq-config" in lines[0], lines
+assert "refresh" in lines[1] and "code-and-binaries" in lines[1], lines
+print("PASS: explain mode")
+
+server.shutdown()
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL PRESERVE RULE TESTS PASSED")
@@ -0,0 +1,172 @@
+import http.server, io, json, os, shutil, sys, tempfile, threading, zipfile
+sys.path.insert(0, 'patcher')
+import installer
+import jobs
+import progress_bus
+
+# ---------------------------------------------------------------------------
+# Progress bus: events rate-limited to `hz` however often producers report, phase start
+# and end always emitted, smoothed rate and ETA, every sink (console, NDJSON, UI channel,
+# ProgressCb fraction), and the installer's download / overlay phases on a real bus.
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_progress_")
+
+
+class Clock:
+    now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+# 1. throttle: 20000 files in 10 simulated seconds at 20 Hz -> ~200 events, not 20000
+clock = Clock()
+events = []
+bus = progress_bus.ProgressBus(events.append, hz=20, clock=clock)
+with bus.phase("Installing", total=20000) as phase:
+    for i in range(20000):
+        clock.now += 0.0005
+        phase.advance(item=f"lua/f{i}.lua")
+kinds = [e["event"] for e in events]
+assert kinds[0] == "start" and kinds[-1] == "end" and kinds.count("end") == 1, kinds[:3]
+assert 190 <= kinds.count("progress") <= 201, kinds.count("progress")
+assert all(b["t"] - a["t"] >= 0.05 - 1e-9 for a, b in zip(events[1:-1], events[2:-1]))
+end = events[-1]
+assert end["done"] == 20000 and end["fraction"] == 1.0 and end["ok"] and end["eta"] == 0.0, end
+print(f"PASS: 20000 advances -> {len(events)} events ({kinds.count('progress')} progress)")
+
+# 2. rate and ETA: 2000 files/s steady -> rate 2000, ETA = remaining / rate
+mid = events[len(events) // 2]
+assert abs(mid["rate"] - 2000) < 1, mid
+assert abs(mid["eta"] - (20000 - mid["done"]) / 2000) < 0.1, mid
+assert abs(end["rate"] - 2000) < 1 and end["elapsed"] == 10.0, end
+# a slowdown moves the smoothed rate (and ETA) toward the new speed within a few events
+events.clear()
+phase = bus.phase("Updating", total=1000)
+for i in range(400):
+    clock.now += 0.01 if i < 200 else 0.04  # 100 files/s, then 25 files/s
+    phase.advance()
+last = [e for e in events if e["event"] == "progress"][-1]
+assert 25 <= last["rate"] < 30, last["rate"]
+assert abs(last["eta"] - (1000 - last["done"]) / last["rate"]) < 0.1, last
+print(f"PASS: rate {mid['rate']:.0f}/s, ETA {mid['eta']}s; after slowing: {last['rate']:.1f}/s")
+
+# 3. unknown totals, late totals, failures: fraction None until known; a phase left by
+#    an exception still ends, marked ok=False where it stopped
+events.clear()
+phase = bus.phase("Downloading", unit="bytes")
+clock.now += 1
+phase.update(5 * 1048576)
+assert events[-1]["fraction"] is None and events[-1]["eta"] is None and events[-1]["rate"] == 5 * 1048576
+clock.now += 1
+phase.update(10 * 1048576, total=40 * 1048576)
+assert events[-1]["fraction"] == 0.25 and events[-1]["eta"] is not None, events[-1]
+try:
+    with phase:
+        raise OSError("connection reset")
+except OSError:
+    pass
+assert events[-1]["event"] == "end" and events[-1]["ok"] is False and events[-1]["fraction"] == 0.25
+phase.end()  # a second end is ignored
+assert sum(e["event"] == "end" for e in events) == 1
+print("PASS: unknown / late totals, failed phase ends where it stopped")
+
+# 4. describe(): the status line
+assert progress_bus.describe(mid).startswith(f"Installing: {mid['item']}  ({mid['done']}/20000 files · 2000 files/s · ETA 0:0")
+line = progress_bus.describe(events[-2])
+assert line == "Downloading: 10.0/40.0 MB · 5.0 MB/s · ETA 0:06", line
+assert progress_bus.describe(events[-1]).endswith("stopped"), progress_bus.describe(events[-1])
+assert progress_bus.describe(end).endswith("2000 files/s · 10.0s)"), progress_bus.describe(end)
+assert progress_bus.format_eta(3725) == "1:02:05" and progress_bus.format_eta(59.6) == "1:00"
+print("PASS:", progress_bus.describe(mid), "|", line)
+
+# 5. sinks. ConsoleSink: redrawn in place on a terminal, thinned to one line per interval
+#    in a log; JsonLogSink: one parseable object per line
+tty = io.StringIO()
+tty.isatty = lambda: True
+log = io.StringIO()
+json_path = os.path.join(work, "state", "progress.jsonl")
+json_log = progress_bus.JsonLogSink(json_path)
+clock = Clock()
+bus = progress_bus.ProgressBus(progress_bus.ConsoleSink(tty), progress_bus.ConsoleSink(log, log_interval=1.0),
+                               json_log, hz=20, clock=clock)
+with bus.phase("Zipping", total=1000) as phase:
+    for i in range(1000):
+        clock.now += 0.005
+        phase.advance(item=f"f{i}")
+bus.note("done")
+json_log.close()
+assert tty.getvalue().count("\n") == 2 and tty.getvalue().count("\r") > 90, tty.getvalue()[-200:]
+assert 5 <= len(log.getvalue().splitlines()) <= 9, log.getvalue()
+logged = [json.loads(line) for line in open(json_path, encoding="utf-8")]
+assert [e["event"] for e in logged[-2:]] == ["end", "note"] and len(logged) == tty.getvalue().count("\r")
+print(f"PASS: console {tty.getvalue().count(chr(13))} redraws / {len(log.getvalue().splitlines())} log lines, "
+      f"{len(logged)} JSON events")
+
+# channel_sink: the Tk side applies the latest event only; fraction_sink: the legacy
+# ProgressCb, mapped onto its stretch of the bar, `unknown` while there is no total
+ui = jobs.UiChannel()
+applied = []
+calls = []
+bus = progress_bus.ProgressBus(progress_bus.channel_sink(ui, applied.append, key="bar"), hz=0, clock=clock)
+phase = bus.phase("Installing", total=4,
+                  sinks=[progress_bus.fraction_sink(lambda m, f: calls.append(f), 0.5, 1.0)])
+for _ in range(4):
+    phase.advance()
+phase.end()
+assert ui.drain() == 1 and applied[-1]["event"] == "end"
+assert calls == [0.625, 0.75, 0.875, 1.0, 1.0], calls  # the start is not forwarded
+calls.clear()
+phase = bus.phase("Downloading", unit="bytes",
+                  sinks=[progress_bus.fraction_sink(lambda m, f: calls.append(f), 0.0, 0.5,
+                                                    unknown=installer._download_creep)])
+phase.update(512 * 1048576)
+assert len(calls) == 1 and 0.02 < calls[0] < 0.48, calls
+print("PASS: channel sink coalesced; fraction sink", calls)
+
+# 6. the installer on a bus: a 300-member overlay and a bundle download report phases to
+#    a JSON log while progress_cb sees a handful of rate-limited calls
+zip_path = os.path.join(work, "bundle.zip")
+with zipfile.ZipFile(zip_path, "w") as zf:
+    for i in range(300):
+        zf.writestr(f"lua/coopui/gen/f{i:03d}.lua", f"-- generated {i}\n" * 50)
+target = os.path.join(work, "MQ")
+events.clear()
+calls = []
+installer.overlay_bundle(zip_path, target, lambda m, f: calls.append((m, f)), incremental=False,
+                         workers=2, bus=progress_bus.ProgressBus(events.append))
+assert events[0]["phase"] == "Installing" and events[0]["total"] == 300
+assert events[-1]["event"] == "end" and events[-1]["done"] == 300 and events[-1]["ok"]
+assert len(calls) == len(events) - 1 < 60 and calls[-1][1] == 1.0, len(calls)
+assert all(0.5 < f <= 1.0 for _m, f in calls)
+
+BODY = os.urandom(3 * 1048576)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+events.clear()
+calls.clear()
+dest = os.path.join(work, "dl", "b.zip")
+installer._download_zip(f"http://127.0.0.1:{server.server_address[1]}/b.zip",
+                        lambda m, f: calls.append((m, f)), dest=dest, bus=progress_bus.ProgressBus(events.append))
+server.shutdown()
+assert open(dest, "rb").read() == BODY
+assert events[0]["phase"] == "Downloading" and events[-1]["done"] == len(BODY) and events[-1]["unit"] == "bytes"
+assert calls[-1][1] == 0.5 and all(0 <= f <= 0.5 for _m, f in calls), calls
+assert calls[-1][0].startswith("Downloading: 3.0/3.0 MB"), calls[-1]
+print(f"PASS: overlay {len(events)} events for 300 members; download -> {calls[-1][0]!r}")
+
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL PROGRESS BUS TESTS PASSED")
@@ -0,0 +1,92 @@
+import ast, importlib.util, json, os, shutil, subprocess, sys, tempfile, threading, time
+sys.path.insert(0, 'patcher')
+import path_finder
+
+# ---------------------------------------------------------------------------
+# Patcher startup: patcher.py imports nothing heavy at module load, install detection
+# streams results as each drive answers (a hung drive delays only itself), and — where
+# customtkinter and a display exist — the window paints within budget.
+# ---------------------------------------------------------------------------
+FIRST_PAINT_BUDGET = 1.5  # seconds from module load to the first idle after layout
+LAUNCH_BUDGET = 4.0       # seconds from process start until the profile is printed
+
+# 1. module-level imports of patcher.py: none of DEFERRED_IMPORTS, each of them still used
+tree = ast.parse(open("patcher/patcher.py", encoding="utf-8").read())
+deferred = next(ast.literal_eval(n.value) for n in tree.body
+                if isinstance(n, ast.Assign) and n.targets[0].id == "DEFERRED_IMPORTS")
+
+
+def imported(nodes):
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            yield from (a.name.split(".")[0] for a in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            yield node.module.split(".")[0]
+
+
+top_level = set(imported(tree.body))
+assert not top_level & set(deferred), top_level & set(deferred)
+everywhere = set(imported(ast.walk(tree)))
+assert set(deferred) <= everywhere, set(deferred) - everywhere
+# what the startup path does import stays free of network / zip machinery
+probe = ("import sys; sys.path.insert(0, 'patcher'); import config, validator; "
+         "print(sorted({'http.client', 'zipfile', 'urllib.request', 'concurrent.futures'} & set(sys.modules)))")
+heavy = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout.strip()
+assert heavy == "[]", heavy
+print(f"PASS: module load imports {sorted(top_level)}; deferred: {len(deferred)} modules")
+
+# 2. detection streams: a fast drive is listed at once, a slow one when it answers,
+#    a hung one is abandoned at the timeout; duplicates are listed once
+work = tempfile.mkdtemp(prefix="coopt_detect_")
+roots = []
+for name in ("fast", "slow", "registry"):
+    root = os.path.join(work, name, "MacroQuest")
+    os.makedirs(os.path.join(root, "config"))
+    roots.append(root)
+not_mq = os.path.join(work, "notmq")
+os.makedirs(not_mq)
+hang = threading.Event()
+real_scopes = path_finder._search_scopes
+path_finder._search_scopes = lambda: [
+    lambda c: c.update({roots[0], not_mq}),
+    lambda c: (time.sleep(0.6), c.add(roots[1])),
+    lambda c: (hang.wait(), c.add(work)),
+    lambda c: c.update({roots[2], roots[0] + os.sep}),
+]
+t0 = time.monotonic()
+arrivals = [(p, time.monotonic() - t0) for p in path_finder.iter_mq_installations(timeout=1.5)]
+elapsed = time.monotonic() - t0
+hang.set()
+paths = [p for p, _t in arrivals]
+assert sorted(paths) == sorted(roots), paths
+assert max(t for p, t in arrivals if p != roots[1]) < 0.4, arrivals
+assert 0.5 < dict(arrivals)[roots[1]] < 1.4, arrivals
+assert 1.4 < elapsed < 2.5, elapsed
+print("PASS: streamed", [(os.path.basename(os.path.dirname(p)), round(t, 2)) for p, t in arrivals],
+      f"hung scope abandoned at {elapsed:.1f}s")
+
+path_finder._search_scopes = lambda: [lambda c: c.update({roots[1], roots[0]}), lambda c: c.add(roots[2])]
+assert path_finder.find_mq_installations() == sorted(roots)
+path_finder._search_scopes = real_scopes
+t0 = time.monotonic()
+assert isinstance(path_finder.find_mq_installations(), list)  # the real search, any platform
+print(f"PASS: find_mq_installations sorted; real search {time.monotonic() - t0:.2f}s on this machine")
+shutil.rmtree(work, ignore_errors=True)
+
+# 3. time to first paint, where the GUI can run
+if importlib.util.find_spec("customtkinter") is None or (os.name != "nt" and not os.environ.get("DISPLAY")):
+    print("SKIP: first-paint timing (needs customtkinter and a display)")
+else:
+    env = dict(os.environ, COOPUI_STARTUP_PROFILE="exit")
+    t0 = time.monotonic()
+    proc = subprocess.run([sys.executable, "patcher.py"], cwd="patcher", env=env,
+                          capture_output=True, text=True, timeout=60)
+    launch = time.monotonic() - t0
+    lines = [json.loads(line) for line in proc.stderr.splitlines() if line.startswith('{"startup"')]
+    assert lines, proc.stderr
+    marks = lines[0]["startup"]
+    assert marks["first_paint"] < FIRST_PAINT_BUDGET, marks
+    assert launch < LAUNCH_BUDGET, launch
+    print(f"PASS: first paint {marks['first_paint'] * 1000:.0f} ms after load, process {launch:.2f}s; {marks}")
+
+print("\nALL STARTUP TESTS PASSED")
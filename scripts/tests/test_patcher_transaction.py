@@ -0,0 +1,320 @@
+import hashlib, http.server, os, shutil, subprocess, sys, tempfile, threading, zipfile
+sys.path.insert(0, 'patcher')
+import config
+import transaction
+import updater
+
+# ---------------------------------------------------------------------------
+# Transactions: a commit snapshots what it replaces and moves the staged set in; a locked
+# file mid-commit rolls everything back; a crash is replayed ("committing") or discarded
+# ("prepared") by recover(); revert() restores the newest snapshot group offline; pruning
+# keeps the newest unless it alone is over snapshot_max_mb; patch() leaves the install untouched when a download fails; the
+# install lock keeps two patchers from sharing one install's staging and journal.
+# ---------------------------------------------------------------------------
+work = tempfile.mkdtemp(prefix="coopt_txn_")
+config.data_path = lambda name: os.path.join(work, name)
+OLD = {"MQ2Main.dll": b"old main", "lua/itemui/init.lua": b"-- old itemui",
+       "lua/itemui/gone.lua": b"-- retired", "Macros/coopui_installed_version.txt": b"1.0.0"}
+
+
+def make_root():
+    root = tempfile.mkdtemp(prefix="coopt_txn_root_", dir=work)
+    for rel, body in OLD.items():
+        write(root, rel, body)
+    return root
+
+
+def write(root, rel, body):
+    p = os.path.join(root, rel.replace("/", os.sep))
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    with open(p, "wb") as f:
+        f.write(body)
+
+
+def tree(root):
+    return {os.path.relpath(os.path.join(d, f), root).replace(os.sep, "/"): open(os.path.join(d, f), "rb").read()
+            for d, _s, fs in os.walk(root) for f in fs
+            if ".coopui" not in os.path.relpath(d, root).split(os.sep)}
+
+
+NEW = {"MQ2Main.dll": b"new main", "lua/itemui/init.lua": b"-- new itemui", "lua/itemui/new.lua": b"-- added"}
+
+
+def stage_update(txn):
+    for rel, body in NEW.items():
+        with open(txn.stage(rel), "wb") as f:
+            f.write(body)
+    txn.remove("lua/itemui/gone.lua")
+
+
+# 1. commit: snapshot of what is replaced / removed, staged set moved in, nothing left behind
+root = make_root()
+txn = transaction.Transaction(root, "update", also_snapshot=("Macros/coopui_installed_version.txt",))
+stage_update(txn)
+result = txn.commit()
+assert result["committed"] == 3 and result["removed"] == 1 and result["snapshot"], result
+after = tree(root)
+assert after == {**{k: v for k, v in OLD.items() if k != "lua/itemui/gone.lua"}, **NEW}, after
+assert not transaction.pending(root) and not os.path.exists(transaction._staging_dir(root))
+(snap,) = transaction.list_snapshots(root)
+with zipfile.ZipFile(snap["path"]) as zf:
+    assert zf.read("MQ2Main.dll") == b"old main" and zf.read("lua/itemui/gone.lua") == b"-- retired"
+    assert zf.getinfo("MQ2Main.dll").compress_type == zipfile.ZIP_DEFLATED
+assert snap["meta"]["created"] == ["lua/itemui/new.lua"], snap["meta"]
+assert snap["meta"]["kept"] == ["Macros/coopui_installed_version.txt"], snap["meta"]
+print("PASS: commit snapshots originals and moves the staged set in")
+
+# 2. a file locked mid-commit: the files already moved are put back
+root = make_root()
+real_replace = os.replace
+STAGING = os.path.join(".coopui", transaction.TXN_DIRNAME, "staging")
+
+
+def locked_replace(src, dst):
+    if dst.endswith("init.lua") and STAGING in src:
+        raise PermissionError(13, "The process cannot access the file", dst)
+    return real_replace(src, dst)
+
+
+transaction.os.replace = locked_replace
+txn = transaction.Transaction(root, "update")
+stage_update(txn)
+try:
+    txn.commit()
+    raise AssertionError("commit over a locked file succeeded")
+except transaction.TransactionError as e:
+    assert e.rel == "lua/itemui/init.lua" and e.rolled_back, (e.rel, e.rolled_back)
+finally:
+    transaction.os.replace = real_replace
+assert tree(root) == OLD, tree(root)
+assert not transaction.pending(root) and transaction.list_snapshots(root) == []
+print("PASS: locked file -> whole commit rolled back, no snapshot kept")
+
+# 3. crash while committing: the next recover() replays the journal
+root = make_root()
+moves = [0]
+
+
+def crash_after_one(src, dst):
+    if STAGING in src:
+        moves[0] += 1
+        if moves[0] == 2:
+            raise KeyboardInterrupt("power cut")
+    return real_replace(src, dst)
+
+
+transaction.os.replace = crash_after_one
+txn = transaction.Transaction(root, "update")
+stage_update(txn)
+try:
+    txn.commit()
+    raise AssertionError("no crash")
+except KeyboardInterrupt:
+    pass
+finally:
+    transaction.os.replace = real_replace
+assert transaction.pending(root) and tree(root) != OLD
+note = transaction.recover(root)
+assert note and "Finished" in note, note
+assert tree(root) == {**{k: v for k, v in OLD.items() if k != "lua/itemui/gone.lua"}, **NEW}
+assert not transaction.pending(root) and len(transaction.list_snapshots(root)) == 1
+print("PASS: crash mid-commit replayed ->", note)
+
+# 4. crash before the commit started ("prepared"): discarded, install untouched
+root = make_root()
+real_snapshot = transaction._write_snapshot
+transaction._write_snapshot = lambda *a: (_ for _ in ()).throw(KeyboardInterrupt("crash"))
+txn = transaction.Transaction(root, "update")
+stage_update(txn)
+try:
+    txn.commit()
+except KeyboardInterrupt:
+    pass
+transaction._write_snapshot = real_snapshot
+assert transaction.pending(root)
+note = transaction.recover(root)
+assert note and "discarded" in note and tree(root) == OLD, note
+print("PASS: crash before commit discarded ->", note)
+
+# 5. replay impossible (file still locked at start): rolled back; still locked: journal kept
+root = make_root()
+transaction.os.replace = crash_after_one
+moves[0] = 0
+txn = transaction.Transaction(root, "update")
+stage_update(txn)
+try:
+    txn.commit()
+except KeyboardInterrupt:
+    pass
+transaction.os.replace = locked_replace
+note = transaction.recover(root)
+transaction.os.replace = real_replace
+assert note and "Rolled back" in note, note
+assert tree(root) == OLD and not transaction.pending(root), tree(root)
+print("PASS: unreplayable journal rolled back ->", note)
+
+# 6. revert: a group (overlay + manifest phase) restores as one; reverting again steps back
+root = make_root()
+with transaction.group():
+    txn = transaction.Transaction(root, "repair", also_snapshot=("Macros/coopui_installed_version.txt",))
+    stage_update(txn)
+    txn.commit()
+    txn = transaction.Transaction(root, "update", also_snapshot=("Macros/coopui_installed_version.txt",))
+    with open(txn.stage("lua/itemui/new.lua"), "wb") as f:
+        f.write(b"-- patched again")
+    with open(txn.stage("plugins/MQ2CoOptUI.dll"), "wb") as f:
+        f.write(b"plugin")
+    txn.commit()
+write(root, "Macros/coopui_installed_version.txt", b"2.0.0")
+assert len(transaction.list_snapshots(root)) == 2
+ok, message = transaction.revert(root)
+assert ok, message
+assert tree(root) == OLD, tree(root)
+assert transaction.list_snapshots(root) == []
+ok, again = transaction.revert(root)
+assert not ok and "no previous version" in again, again
+print("PASS: revert restores the whole group ->", message)
+
+# 7. pruning: by age and size, oldest first; the newest group stays
+root = make_root()
+for i in range(4):
+    txn = transaction.Transaction(root, f"update{i}")
+    with open(txn.stage("MQ2Main.dll"), "wb") as f:
+        f.write(os.urandom(300_000))
+    txn.commit()
+assert len(transaction.list_snapshots(root)) == 4
+assert transaction.prune_snapshots(root, max_bytes=10 ** 9, max_age_days=30) == 0
+config.save({"snapshot_max_mb": 1})
+txn = transaction.Transaction(root, "update5")
+with open(txn.stage("MQ2Main.dll"), "wb") as f:
+    f.write(b"five")
+txn.commit()  # prunes with the configured cap on the way out
+assert [s["label"] for s in transaction.list_snapshots(root)] == ["update5", "update3", "update2"]
+config.save({})
+newest = transaction.list_snapshots(root)[0]["name"]
+assert transaction.prune_snapshots(root, max_bytes=0, max_age_days=30) == 2
+assert [s["name"] for s in transaction.list_snapshots(root)] == [newest]
+print("PASS: snapshots pruned by age / size, newest kept")
+
+# 8. patch(): a failed download leaves the install untouched; a good one can be reverted
+FILES = {"/lua/itemui/init.lua": b"-- served itemui", "/MQ2Main.dll": b"served main"}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        body = FILES.get(self.path)
+        self.send_response(200 if body is not None else 500)
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+entries = [{"path": p.lstrip("/"), "hash": hashlib.sha256(b).hexdigest()} for p, b in FILES.items()]
+root = make_root()
+broken = entries + [{"path": "lua/itemui/broken.lua", "hash": "0" * 64}]
+ok, msg, _ = updater.patch(broken, base, root, workers=1, use_store=False)
+assert not ok and tree(root) == OLD, (msg, tree(root))
+assert transaction.list_snapshots(root) == []
+ok, msg, _ = updater.patch(entries, base, root, use_store=False)
+assert ok, msg
+assert open(os.path.join(root, "MQ2Main.dll"), "rb").read() == b"served main"
+updater.write_installed_version(root, "2.0.0")
+ok, message = transaction.revert(root)
+assert ok and tree(root) == OLD, (message, tree(root))
+print("PASS: failed patch changes nothing; a good patch reverts offline")
+
+# 9. the install lock: while a transaction is open, no other one (in this process or
+#    another) can start, and recover() leaves its staged files alone; released on abort /
+#    commit, and by the OS when the holding process dies
+root = make_root()
+txn = transaction.Transaction(root, "update")
+with open(txn.stage("lua/itemui/init.lua"), "wb") as f:
+    f.write(b"-- staged by the first patcher")
+assert transaction.locked(root)
+try:
+    transaction.Transaction(root, "update")
+    raise AssertionError("a second transaction started on a locked install")
+except transaction.TransactionError as e:
+    assert "Another patcher" in str(e), e
+assert transaction.recover(root) is None and os.path.isfile(transaction._staged(root, "lua/itemui/init.lua"))
+ok, msg, _ = updater.patch(entries, base, root, use_store=False)
+assert not ok and "Another patcher" in msg and tree(root) == OLD, msg
+probe = ("import sys; sys.path.insert(0, 'patcher'); import transaction; "
+         "print(transaction.locked(sys.argv[1]))")
+assert subprocess.run([sys.executable, "-c", probe, root], capture_output=True, text=True).stdout.strip() == "True"
+txn.commit()
+assert not transaction.locked(root) and tree(root)["lua/itemui/init.lua"] == b"-- staged by the first patcher"
+holder = ("import os, sys; sys.path.insert(0, 'patcher'); import transaction; "
+          "transaction.Transaction(sys.argv[1], 'update'); print('held', flush=True); os._exit(1)")
+assert subprocess.run([sys.executable, "-c", holder, root], capture_output=True, text=True).stdout.strip() == "held"
+assert not transaction.locked(root)
+transaction.Transaction(root, "update").abort()
+print("PASS: install lock excludes a second transaction, across processes; freed on exit")
+
+# 10. install_default_config(): one transaction, the hash index written once; a failure
+#     part-way installs none of the files
+FILES["/config_templates/a.ini"] = b"[A]\n"
+FILES["/config_templates/b.ini"] = b"[B]\n"
+defaults = [{"repoPath": f"config_templates/{n}.ini", "installPath": f"Macros/{n}.ini",
+             "hash": hashlib.sha256(FILES[f"/config_templates/{n}.ini"]).hexdigest()} for n in "ab"]
+root = make_root()
+ok, msg = updater.install_default_config(
+    defaults + [{"repoPath": "config_templates/gone.ini", "installPath": "Macros/gone.ini"}], base, root,
+    use_store=False)
+assert not ok and tree(root) == OLD and not transaction.pending(root), (msg, tree(root))
+saves = []
+real_save = updater.HashIndex.save
+updater.HashIndex.save = lambda self: saves.append(1) or real_save(self)
+ok, msg = updater.install_default_config(defaults, base, root, use_store=False)
+updater.HashIndex.save = real_save
+assert ok and tree(root)["Macros/b.ini"] == b"[B]\n" and len(saves) == 1, (msg, saves)
+assert updater.HashIndex(root).cached("Macros/a.ini") == defaults[0]["hash"]
+ok, message = transaction.revert(root)
+assert ok and tree(root) == OLD, (message, tree(root))
+print("PASS: default config commits as one transaction, index saved once, reverts")
+
+# 11. a newest group over snapshot_max_mb on its own: the snapshot guards the commit,
+#     then it and every older snapshot are dropped, and revert() says why; the next
+#     update within the cap keeps its snapshot again
+config.save({"snapshot_max_mb": 1})
+root = make_root()
+txn = transaction.Transaction(root, "update")
+with open(txn.stage("lua/itemui/init.lua"), "wb") as f:
+    f.write(b"-- small update")
+txn.commit()
+write(root, "plugins/MQ2Big.dll", os.urandom(1_500_000))
+with transaction.group():
+    txn = transaction.Transaction(root, "repair")
+    with open(txn.stage("plugins/MQ2Big.dll"), "wb") as f:
+        f.write(b"new big")
+    assert txn.commit()["snapshot"] is None
+    txn = transaction.Transaction(root, "repair")  # the group's second phase, under the cap
+    with open(txn.stage("MQ2Main.dll"), "wb") as f:
+        f.write(b"repaired main")
+    assert txn.commit()["snapshot"] is None
+assert tree(root)["plugins/MQ2Big.dll"] == b"new big" and tree(root)["MQ2Main.dll"] == b"repaired main"
+assert transaction.list_snapshots(root) == [] and not transaction.pending(root)
+assert transaction.skipped_snapshot(root)["label"] == "repair"
+ok, message = transaction.revert(root)
+assert not ok and "snapshot_max_mb (1)" in message and tree(root)["MQ2Main.dll"] == b"repaired main", message
+txn = transaction.Transaction(root, "update")
+with open(txn.stage("MQ2Main.dll"), "wb") as f:
+    f.write(b"next main")
+assert txn.commit()["snapshot"]
+assert transaction.skipped_snapshot(root) is None
+ok, _message = transaction.revert(root)
+assert ok and tree(root)["MQ2Main.dll"] == b"repaired main"
+config.save({})
+print("PASS: newest group over snapshot_max_mb dropped after its commit ->", message)
+
+server.shutdown()
+shutil.rmtree(work, ignore_errors=True)
+print("\nALL TRANSACTION TESTS PASSED")
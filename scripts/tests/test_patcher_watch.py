@@ -0,0 +1,172 @@
+import contextlib, hashlib, http.server, io, json, os, shutil, sys, tempfile, threading, time
+sys.path.insert(0, 'patcher')
+import config
+import batch
+import cli
+import transaction
+import watcher
+from jobs import CancelToken
+from object_store import ObjectStore
+
+# ---------------------------------------------------------------------------
+# Update watcher: a check while MacroQuest runs stages every changed file in the object
+# store without touching the install; once preflight clears the update applies with no
+# file downloads; an unchanged manifest (304) stages nothing; run() stops on cancel.
+# ---------------------------------------------------------------------------
+FILES = {f"/lua/coopui/w{i}.lua": f"-- coopui watch {i}\n".encode() * 40 for i in range(12)}
+FILES["/config_templates/loot.ini"] = b"[Settings]\n"
+release = {
+    "version": "9.9.10", "changelog": [],
+    "files": [{"path": p.lstrip("/"), "hash": hashlib.sha256(b).hexdigest()}
+              for p, b in FILES.items() if p.endswith(".lua")],
+}
+defaults = {"files": [{"repoPath": "config_templates/loot.ini", "installPath": "Macros/loot.ini",
+                       "hash": hashlib.sha256(FILES["/config_templates/loot.ini"]).hexdigest()}]}
+FILES["/release_manifest.json"] = json.dumps(release).encode()
+FILES["/default_config_manifest.json"] = json.dumps(defaults).encode()
+requests_seen = []
+lock = threading.Lock()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_a):
+        pass
+
+    def do_GET(self):
+        body = FILES.get(self.path)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"' if body is not None else None
+        not_modified = etag is not None and self.headers.get("If-None-Match") == etag
+        with lock:
+            requests_seen.append((self.path, 304 if not_modified else 200))
+        if not_modified:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200 if body is not None else 404)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        self.wfile.write(body or b"")
+
+
+def file_gets():
+    return [p for p, _status in requests_seen if not p.endswith("manifest.json")]
+
+
+server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+data_dir = tempfile.mkdtemp(prefix="coopt_watch_data_")
+config.data_path = lambda name: os.path.join(data_dir, name)
+
+
+def make_root(i):
+    root = tempfile.mkdtemp(prefix=f"coopt_watch_{i}_")
+    for d in ("config", "lua", "Macros"):
+        os.makedirs(os.path.join(root, d))
+    return root
+
+
+roots = [make_root(i) for i in range(2)]
+# MacroQuest is "running" until the flag clears
+running = [True]
+real = (watcher.preflight_blockers, batch.preflight_blockers)
+blocked = lambda r, paths=None: "Close MacroQuest and EverQuest, then retry." if running[0] else None
+watcher.preflight_blockers = batch.preflight_blockers = blocked
+events = []
+w = watcher.Watcher(base, roots=roots, poll=0.05, on_event=lambda kind, **f: events.append((kind, f)))
+
+# 1. a check while MQ runs: everything staged in the store, installs untouched, and
+#    nothing applies while blocked
+pending = w.check()
+assert sorted(pending) == sorted(roots), pending
+assert [k for k, _f in events] == [watcher.EVENT_STAGED] * 2, events
+assert events[0][1]["files"] == 12 and events[0][1]["defaults"] == 1 and events[0][1]["downloaded"] == 13
+assert events[1][1]["downloaded"] == 0  # the second root's files were already staged
+for root in roots:
+    assert not os.listdir(os.path.join(root, "lua")) and not os.path.exists(os.path.join(root, "Macros", "loot.ini"))
+store = ObjectStore.default()
+assert all(store.has(hashlib.sha256(b).hexdigest()) for p, b in FILES.items() if not p.endswith(".json"))
+assert sorted(file_gets()) == sorted(p for p in FILES if not p.endswith(".json")), file_gets()
+assert w.apply_ready() == [] and sorted(w.pending) == sorted(roots)
+print(f"PASS: staged {len(file_gets())} files while blocked; installs untouched")
+
+# 2. MQ exits: the staged update applies with no file downloads
+running[0] = False
+requests_seen.clear()
+events.clear()
+t0 = time.monotonic()
+rows = w.apply_ready()
+elapsed = time.monotonic() - t0
+assert [r["status"] for r in rows] == [batch.STATUS_UPDATED] * 2, rows
+assert file_gets() == [], file_gets()
+assert w.pending == {} and [k for k, _f in events] == [watcher.EVENT_APPLIED] * 2
+for root in roots:
+    for p, body in FILES.items():
+        if p.endswith(".lua"):
+            assert open(os.path.join(root, p.lstrip("/")), "rb").read() == body, (root, p)
+    assert open(os.path.join(root, "Macros", "loot.ini"), "rb").read() == FILES["/config_templates/loot.ini"]
+    assert open(os.path.join(root, "Macros", "coopui_installed_version.txt")).read() == "9.9.10"
+print(f"PASS: applied in {elapsed:.2f}s with 0 file downloads;", watcher.describe_event(*events[0][:1], **events[0][1]))
+
+# 3. the next check: manifests answer 304, nothing to stage, nothing pending
+requests_seen.clear()
+events.clear()
+assert w.check() == {}
+assert [k for k, _f in events] == [watcher.EVENT_CHECKED] * 2, events
+assert file_gets() == [] and all(status == 304 for _p, status in requests_seen), requests_seen
+print("PASS: unchanged manifest ->", requests_seen)
+
+# 4. a manifest error is one event; run() in a thread returns promptly on cancel
+events.clear()
+w_bad = watcher.Watcher(base, roots=roots, manifest_path="missing.json", poll=0.05,
+                        on_event=lambda kind, **f: events.append((kind, f)))
+cancel = CancelToken()
+th = threading.Thread(target=w_bad.run, args=(cancel,))
+th.start()
+time.sleep(0.3)
+t0 = time.monotonic()
+cancel.cancel()
+th.join(5)
+assert not th.is_alive() and time.monotonic() - t0 < 1.0
+assert events and events[0][0] == watcher.EVENT_ERROR and "404" in events[0][1]["message"], events
+print("PASS: run() stopped on cancel; manifest error ->", events[0][1]["message"])
+
+# 5. `python -m patcher watch --once`: exit 3 while an update stays staged, 0 once applied
+FILES["/lua/coopui/w0.lua"] = b"-- coopui watch 0, v2\n"
+release["files"][0]["hash"] = hashlib.sha256(FILES["/lua/coopui/w0.lua"]).hexdigest()
+FILES["/release_manifest.json"] = json.dumps(release).encode()
+running[0] = True
+with contextlib.redirect_stdout(io.StringIO()) as stdout:
+    code = cli.main(["watch", roots[0], "--repo", base, "--once", "--json"])
+result = json.loads(stdout.getvalue())
+assert code == cli.EXIT_BLOCKED and result["pending"] == [roots[0]], result
+running[0] = False
+with contextlib.redirect_stdout(io.StringIO()) as stdout:
+    code = cli.main(["watch", roots[0], "--repo", base, "--once", "--ndjson"])
+lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+assert code == cli.EXIT_OK and [e["event"] for e in lines] == ["staged", "applied", "result"], lines
+assert lines[0]["downloaded"] == 0 and lines[1]["status"] == batch.STATUS_UPDATED
+assert open(os.path.join(roots[0], "lua", "coopui", "w0.lua"), "rb").read() == FILES["/lua/coopui/w0.lua"]
+print("PASS: watch --once ->", result["message"], "then", lines[-1]["message"])
+
+# 6. another patcher updating the install (its transaction holds the install lock): the
+#    watcher leaves it pending and applies on a later poll
+assert sorted(w.check()) == [roots[1]], w.pending
+other = transaction.Transaction(roots[1], "update")
+assert w.apply_ready() == [] and list(w.pending) == [roots[1]]
+other.abort()
+rows = w.apply_ready()
+assert [r["status"] for r in rows] == [batch.STATUS_UPDATED] and w.pending == {}, rows
+print("PASS: a root locked by another patcher waits for the next poll")
+
+watcher.preflight_blockers, batch.preflight_blockers = real
+server.shutdown()
+for d in roots + [data_dir]:
+    shutil.rmtree(d, ignore_errors=True)
+print("\nALL WATCH TESTS PASSED")